@@ -62,8 +62,11 @@ CREATE TABLE IF NOT EXISTS audit_logs (
     PRIMARY KEY (id, created_at)
 );
 
--- Convert audit_logs to a hypertable for better time-series performance
-SELECT create_hypertable('audit_logs', 'created_at', if_not_exists => TRUE);
+-- Convert audit_logs to a hypertable for better time-series performance.
+-- Weekly chunks let the retention policy below drop whole weeks at once.
+SELECT create_hypertable('audit_logs', 'created_at',
+    chunk_time_interval => INTERVAL '7 days',
+    if_not_exists => TRUE);
 
 -- Create index on audit logs
 CREATE INDEX idx_audit_logs_user_id ON audit_logs(user_id);
@@ -77,9 +80,12 @@ CREATE TABLE IF NOT EXISTS trades (
     symbol VARCHAR(20) NOT NULL,
     side VARCHAR(10) NOT NULL, -- 'buy', 'sell'
     quantity DECIMAL(15, 8) NOT NULL,
-    price DECIMAL(15, 8) NOT NULL,
+    price DECIMAL(15, 8), -- limit price; NULL for market and stop orders
+    stop_price DECIMAL(15, 8),
     order_type VARCHAR(20) NOT NULL, -- 'market', 'limit', 'stop', etc.
-    status VARCHAR(20) NOT NULL, -- 'pending', 'filled', 'cancelled', 'rejected'
+    status VARCHAR(20) NOT NULL, -- 'pending', 'accepted', 'partially_filled', 'filled', 'cancelled', 'rejected'
+    filled_quantity DECIMAL(15, 8) NOT NULL DEFAULT 0,
+    average_fill_price DECIMAL(15, 8),
     broker_order_id VARCHAR(255),
     filled_at TIMESTAMP WITH TIME ZONE,
     commission DECIMAL(10, 4) DEFAULT 0,
@@ -89,8 +95,11 @@ CREATE TABLE IF NOT EXISTS trades (
     PRIMARY KEY (id, created_at)
 );
 
--- Convert trades to a hypertable
-SELECT create_hypertable('trades', 'created_at', if_not_exists => TRUE);
+-- Convert trades to a hypertable. Trade volume is low, so monthly chunks
+-- keep the chunk count (and per-query planning cost) small.
+SELECT create_hypertable('trades', 'created_at',
+    chunk_time_interval => INTERVAL '30 days',
+    if_not_exists => TRUE);
 
 -- Create indexes on trades
 CREATE INDEX idx_trades_account_id ON trades(account_id);
@@ -110,12 +119,121 @@ CREATE TABLE IF NOT EXISTS market_data (
     PRIMARY KEY (time, symbol, timeframe)
 );
 
--- Convert market_data to a hypertable
-SELECT create_hypertable('market_data', 'time', if_not_exists => TRUE);
+-- Convert market_data to a hypertable. Daily chunks keep the chunk being
+-- written to, and its indexes, small enough to stay in memory.
+SELECT create_hypertable('market_data', 'time',
+    chunk_time_interval => INTERVAL '1 day',
+    if_not_exists => TRUE);
 
 -- Create indexes on market_data
 CREATE INDEX idx_market_data_symbol_time ON market_data(symbol, time DESC);
 
+-- Compress market_data chunks once they stop receiving writes. Rows are
+-- segmented by the columns every read filters on, so a bar query only
+-- decompresses the segment of its own series, and ordered by time so range
+-- scans come back already sorted. The compression delay is kept well past
+-- the backfill lookback so gap fills land in uncompressed chunks.
+ALTER TABLE market_data SET (
+    timescaledb.compress,
+    timescaledb.compress_segmentby = 'symbol, timeframe',
+    timescaledb.compress_orderby = 'time DESC'
+);
+
+SELECT add_compression_policy('market_data',
+    compress_after => INTERVAL '14 days',
+    if_not_exists => TRUE);
+
+-- Roll 1m bars up into coarser timeframes with continuous aggregates.
+-- Each level is built from the one below it so refreshes only touch
+-- already-reduced rows; materialized_only = false keeps the newest,
+-- not yet materialized buckets visible through real-time aggregation.
+CREATE MATERIALIZED VIEW IF NOT EXISTS market_data_5m
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT
+    time_bucket(INTERVAL '5 minutes', time) AS time,
+    symbol,
+    first(open, time) AS open,
+    max(high) AS high,
+    min(low) AS low,
+    last(close, time) AS close,
+    sum(volume)::BIGINT AS volume
+FROM market_data
+WHERE timeframe = '1m'
+GROUP BY time_bucket(INTERVAL '5 minutes', time), symbol
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS market_data_15m
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT
+    time_bucket(INTERVAL '15 minutes', time) AS time,
+    symbol,
+    first(open, time) AS open,
+    max(high) AS high,
+    min(low) AS low,
+    last(close, time) AS close,
+    sum(volume)::BIGINT AS volume
+FROM market_data_5m
+GROUP BY time_bucket(INTERVAL '15 minutes', time), symbol
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS market_data_1h
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT
+    time_bucket(INTERVAL '1 hour', time) AS time,
+    symbol,
+    first(open, time) AS open,
+    max(high) AS high,
+    min(low) AS low,
+    last(close, time) AS close,
+    sum(volume)::BIGINT AS volume
+FROM market_data_15m
+GROUP BY time_bucket(INTERVAL '1 hour', time), symbol
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS market_data_1d
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT
+    time_bucket(INTERVAL '1 day', time) AS time,
+    symbol,
+    first(open, time) AS open,
+    max(high) AS high,
+    min(low) AS low,
+    last(close, time) AS close,
+    sum(volume)::BIGINT AS volume
+FROM market_data_1h
+GROUP BY time_bucket(INTERVAL '1 day', time), symbol
+WITH NO DATA;
+
+-- Refresh each rollup shortly after its buckets close
+SELECT add_continuous_aggregate_policy('market_data_5m',
+    start_offset => INTERVAL '1 day',
+    end_offset => INTERVAL '5 minutes',
+    schedule_interval => INTERVAL '5 minutes',
+    if_not_exists => TRUE);
+
+SELECT add_continuous_aggregate_policy('market_data_15m',
+    start_offset => INTERVAL '2 days',
+    end_offset => INTERVAL '15 minutes',
+    schedule_interval => INTERVAL '15 minutes',
+    if_not_exists => TRUE);
+
+SELECT add_continuous_aggregate_policy('market_data_1h',
+    start_offset => INTERVAL '7 days',
+    end_offset => INTERVAL '1 hour',
+    schedule_interval => INTERVAL '1 hour',
+    if_not_exists => TRUE);
+
+SELECT add_continuous_aggregate_policy('market_data_1d',
+    start_offset => INTERVAL '30 days',
+    end_offset => INTERVAL '1 day',
+    schedule_interval => INTERVAL '1 day',
+    if_not_exists => TRUE);
+
+-- Keep audit logs for a year
+SELECT add_retention_policy('audit_logs',
+    drop_after => INTERVAL '365 days',
+    if_not_exists => TRUE);
+
 -- Create strategies table
 CREATE TABLE IF NOT EXISTS strategies (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
@@ -3,7 +3,9 @@ Configuration management for Market Data Service
 """
 from pydantic_settings import BaseSettings
 from pydantic import Field, validator
-from typing import List, Optional
+from typing import List, Optional, Dict, Any
+from functools import lru_cache
+import json
 import os
 
 
@@ -39,6 +41,88 @@ class Settings(BaseSettings):
     LOG_LEVEL: str = Field(default="INFO")
     LOG_FORMAT: str = Field(default="json")
     
+    # Shared JSON configuration (config/<PYTHON_ENV>.json)
+    CONFIG_DIR: str = Field(default="config", env="CONFIG_DIR")
+    
+    # Quote cache
+    QUOTE_CACHE_TTL: int = Field(default=60)  # seconds, overridden by market_data.cache_ttl
+    QUOTE_CACHE_LOCAL_TTL: float = Field(default=5.0)  # seconds
+    QUOTE_CACHE_MAX_SIZE: int = Field(default=10000)
+    QUOTES_MAX_SYMBOLS: int = Field(default=200)  # per batch request
+    
+    # Read coalescing
+    SINGLE_FLIGHT_REDIS: bool = Field(default=True)  # coalesce quote loads across workers
+    SINGLE_FLIGHT_LOCK_TTL: float = Field(default=5.0)  # seconds
+    SINGLE_FLIGHT_RESULT_TTL: float = Field(default=1.0)  # seconds
+    
+    # Historical bars
+    BARS_MAX_LIMIT: int = Field(default=50000)  # bars per page
+    BARS_CHUNK_SIZE: int = Field(default=2000)  # rows fetched per pool checkout
+    BARS_SETTLE_SECONDS: float = Field(default=691200.0)  # after the last bar closes, before a range counts as closed; at least the backfill lookback
+    BARS_CLOSED_MAX_AGE: int = Field(default=604800)  # seconds clients may reuse a closed range
+    
+    # Indicators
+    INDICATOR_CACHE_SIZE: int = Field(default=1000)
+    INDICATOR_CACHE_TTL: float = Field(default=300.0)  # seconds
+    STREAMING_INDICATORS: str = Field(default="ema:20,sma:20,rsi:14,var")
+    STREAMING_PUBLISH_INTERVAL: float = Field(default=0.1)  # seconds
+    
+    # Local columnar bar store
+    BAR_STORE_DIR: str = Field(default="data/bars")
+    BAR_STORE_SYNC_INTERVAL: float = Field(default=60.0)  # seconds
+    BAR_STORE_SYNC_CONCURRENCY: int = Field(default=4)
+    
+    # Bar ingestion
+    INGEST_BATCH_SIZE: int = Field(default=5000)
+    INGEST_FLUSH_INTERVAL: float = Field(default=1.0)  # seconds
+    INGEST_MAX_QUEUE: int = Field(default=100000)
+    BAR_WRITE_LOG_SIZE: int = Field(default=400)  # days of bar writes tracked per symbol for ETags
+    
+    # Tick-to-bar aggregation
+    AGGREGATOR_TIMEFRAMES: str = Field(default="1s,1m")
+    AGGREGATOR_GRACE: float = Field(default=2.0)  # seconds late ticks are accepted after a bar boundary
+    AGGREGATOR_INTERVAL: float = Field(default=0.25)  # seconds between closing sweeps
+    
+    # WebSocket streaming
+    STREAM_MAX_SYMBOLS: int = Field(default=500)  # per connection
+    
+    # Gap detection and backfill
+    BACKFILL_TIMEFRAMES: str = Field(default="1m:14400")  # timeframe:max gap seconds; longer gaps are session breaks
+    BACKFILL_INTERVAL: float = Field(default=3600.0)  # seconds between runs
+    BACKFILL_LOOKBACK_DAYS: int = Field(default=7)  # keep below the market_data compression delay in init-db.sql
+    BACKFILL_CONCURRENCY: int = Field(default=4)  # concurrent fetches per provider
+    BACKFILL_RATE_LIMITS: str = Field(default="alpaca:3")  # provider:requests per second, unlisted are unlimited
+    BACKFILL_MAX_GAPS: int = Field(default=10000)  # per run
+    
+    # Historical replay
+    REPLAY_DIR: str = Field(default="data/replay")  # CSV exports available to replay
+    REPLAY_BATCH_SIZE: int = Field(default=500)  # ticks per pipelined publish
+    REPLAY_MAX_SAMPLES: int = Field(default=100000)  # latency samples kept per replay
+    
+    # Market data providers
+    MARKET_DATA_PROVIDERS: str = Field(default="")  # comma-separated, e.g. "alpaca" or "simulated"
+    PROVIDER_SYMBOLS: str = Field(default="AAPL,MSFT,GOOGL,AMZN,TSLA")
+    PROVIDER_BACKOFF_MAX: float = Field(default=60.0)  # seconds
+    HTTP_MAX_CONNECTIONS: int = Field(default=100)
+    HTTP_MAX_KEEPALIVE: int = Field(default=20)
+    HTTP_TIMEOUT: float = Field(default=10.0)  # seconds
+    
+    ALPACA_API_KEY: Optional[str] = Field(default=None, env="ALPACA_API_KEY")
+    ALPACA_SECRET_KEY: Optional[str] = Field(default=None, env="ALPACA_SECRET_KEY")
+    ALPACA_DATA_URL: str = Field(default="https://data.alpaca.markets")
+    ALPACA_STREAM_URL: str = Field(default="wss://stream.data.alpaca.markets/v2/iex")
+    
+    SIMULATOR_RATE: float = Field(default=100.0)  # ticks per second across all symbols
+    SIMULATOR_SEED: int = Field(default=42)
+    SIMULATOR_VOLATILITY: float = Field(default=0.0005)  # per-tick standard deviation of returns
+    SIMULATOR_BOOK_LEVELS: int = Field(default=10)  # simulated L2 levels per side
+    
+    # Order books
+    BOOK_PUBLISH_DEPTH: int = Field(default=20)  # levels per side
+    BOOK_PUBLISH_INTERVAL: float = Field(default=0.1)  # seconds
+    BOOK_RESYNC_BUFFER: int = Field(default=10000)  # deltas held while awaiting a snapshot
+    BOOK_MAX_DEPTH: int = Field(default=500)  # levels per side per REST request
+    
     @validator("PYTHON_ENV")
     def validate_environment(cls, v):
         allowed = ["development", "staging", "production"]
@@ -46,6 +130,17 @@ class Settings(BaseSettings):
             raise ValueError(f"PYTHON_ENV must be one of {allowed}")
         return v
     
+    @validator("BACKFILL_LOOKBACK_DAYS")
+    def validate_backfill_lookback(cls, v, values):
+        # Backfill rewrites bars this far back, so ranges must not count as
+        # closed (and publicly cacheable) before it is done with them
+        settle = values.get("BARS_SETTLE_SECONDS")
+        if settle is not None and v * 86400 > settle:
+            raise ValueError(
+                f"BARS_SETTLE_SECONDS ({settle:g}) must cover BACKFILL_LOOKBACK_DAYS ({v} days)"
+            )
+        return v
+    
     @validator("LOG_LEVEL")
     def validate_log_level(cls, v):
         allowed = ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
@@ -111,3 +206,23 @@ def get_safe_config() -> dict:
             config[key] = "***REDACTED***"
     
     return config
+
+
+@lru_cache()
+def get_app_config() -> Dict[str, Any]:
+    """
+    Load the shared JSON configuration for the current environment
+    """
+    path = os.path.join(settings.CONFIG_DIR, f"{settings.PYTHON_ENV}.json")
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def get_market_data_config() -> Dict[str, Any]:
+    """
+    Get the `market_data` section of the shared JSON configuration
+    """
+    return get_app_config().get("market_data", {})
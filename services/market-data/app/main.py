@@ -1,10 +1,11 @@
 """
 Market Data Service - Main Application
 """
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, HTTPException, Header, Query, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from contextlib import asynccontextmanager
+import asyncio
 import logging
 import json
 import time
@@ -12,8 +13,28 @@ import uuid
 import os
 from typing import Dict, Any
 
-from .database import init_db, close_db
+from .database import init_db, close_db, init_pool, close_pool
 from .config import settings
+from .utils.redis_client import init_redis, close_redis
+from .utils.http_client import init_http_client, close_http_client
+from .utils.conditional import make_etag, etag_matches, is_closed_range, cache_headers
+from .services.quote_cache import init_quote_cache, close_quote_cache, get_quote_cache
+from .services.quotes import load_latest_quote, load_latest_quotes
+from .services.bars import parse_time, stream_bars, get_last_bar_time, get_series_version, bar_flight, BAR_SECONDS
+from .services.bar_store import init_bar_store, close_bar_store, get_bar_store
+from .services.ingestion import init_bar_writer, close_bar_writer, get_bar_writer
+from .services.aggregator import init_bar_aggregator, close_bar_aggregator, get_bar_aggregator
+from .services.indicators import load_indicators, parse_spec, indicator_cache, indicator_flight
+from .services.streaming_indicators import init_indicator_stream, close_indicator_stream, get_indicator_stream
+from .services.stream import (
+    init_stream_hub, close_stream_hub, get_stream_hub, decode_message, ENCODINGS, TICKS, DEPTH, REPLAY
+)
+from .services.replay import db_source, file_source, resolve_replay_file, start_replay, stop_replay, get_replay, on_replay_tick
+from .services.order_book import init_book_manager, close_book_manager, get_book_manager
+from .services.ticks import publish_ticks
+from .services.backfill import init_backfill, close_backfill, get_backfill
+from .services.storage import get_storage_stats
+from .providers.manager import init_providers, close_providers, get_providers, load_book_snapshot
 
 # Setup logging
 logging.basicConfig(
@@ -33,14 +54,42 @@ async def lifespan(app: FastAPI):
     
     # Initialize database connection
     await init_db()
+    await init_pool()
+    await init_bar_writer()
+    await init_bar_store()
+    
+    # Initialize Redis connection
+    await init_redis()
+    await init_quote_cache(load_latest_quote, load_latest_quotes)
+    await init_stream_hub()
+    get_stream_hub().add_listener(get_quote_cache().on_tick)
+    get_stream_hub().add_replay_listener(on_replay_tick)
+    await init_indicator_stream()
+    await init_book_manager(load_book_snapshot)
+    await init_bar_aggregator()
     
-    # TODO: Initialize Redis connection
-    # TODO: Initialize market data providers
+    # Initialize market data providers
+    await init_http_client()
+    await init_providers(publish_ticks, get_book_manager().apply_deltas)
+    await init_backfill()
     
     yield
     
     # Shutdown
     logger.info("Shutting down Market Data Service")
+    await close_backfill()
+    await close_providers()
+    await close_http_client()
+    await stop_replay()
+    await close_bar_aggregator()
+    await close_book_manager()
+    await close_indicator_stream()
+    await close_stream_hub()
+    await close_quote_cache()
+    await close_bar_store()
+    await close_bar_writer()
+    await close_redis()
+    await close_pool()
     await close_db()
 
 
@@ -116,20 +165,75 @@ async def health_check():
     }
 
 
+@app.get("/api/v1/admin/cache")
+async def get_cache_stats() -> Dict[str, Any]:
+    """
+    Get cache hit/miss/eviction counters
+    """
+    return {
+        "quotes": get_quote_cache().stats(),
+        "indicators": {
+            **indicator_cache.stats(),
+            "single_flight": indicator_flight.stats()
+        },
+        "bars": {
+            "single_flight": bar_flight.stats()
+        }
+    }
+
+
+@app.get("/api/v1/admin/ingestion")
+async def get_ingestion_metrics() -> Dict[str, Any]:
+    """
+    Get bar ingestion throughput, flush latency and queue depth
+    """
+    return get_bar_writer().metrics()
+
+
+@app.get("/api/v1/quotes")
+async def get_quotes(symbols: str) -> Dict[str, Any]:
+    """
+    Get real-time quotes for a comma-separated list of symbols
+    """
+    requested = list(dict.fromkeys(s.strip().upper() for s in symbols.split(",") if s.strip()))
+    if not requested:
+        raise HTTPException(status_code=400, detail="No symbols requested")
+    if len(requested) > settings.QUOTES_MAX_SYMBOLS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.QUOTES_MAX_SYMBOLS} symbols per request"
+        )
+    
+    quotes = await get_quote_cache().get_many(requested)
+    return {
+        "quotes": quotes,
+        "missing": [symbol for symbol in requested if symbol not in quotes]
+    }
+
+
 @app.get("/api/v1/quotes/{symbol}")
 async def get_quote(symbol: str) -> Dict[str, Any]:
     """
     Get real-time quote for a symbol
     """
-    # TODO: Implement real quote fetching
-    return {
-        "symbol": symbol.upper(),
-        "price": 150.25,
-        "bid": 150.20,
-        "ask": 150.30,
-        "volume": 1234567,
-        "timestamp": time.time()
-    }
+    quote = await get_quote_cache().get(symbol)
+    if quote is None:
+        raise HTTPException(status_code=404, detail=f"No quote available for {symbol.upper()}")
+    return quote
+
+
+@app.get("/api/v1/book/{symbol}")
+async def get_book(
+    symbol: str,
+    depth: int = Query(default=10, ge=1, le=settings.BOOK_MAX_DEPTH)
+) -> Dict[str, Any]:
+    """
+    Get the top levels of a symbol's L2 order book
+    """
+    book = await get_book_manager().load_depth(symbol, depth)
+    if book is None:
+        raise HTTPException(status_code=404, detail=f"No order book available for {symbol.upper()}")
+    return book
 
 
 @app.get("/api/v1/bars/{symbol}")
@@ -138,43 +242,302 @@ async def get_bars(
     timeframe: str = "1d",
     start: str = None,
     end: str = None,
-    limit: int = 100
+    limit: int = Query(default=100, ge=1, le=settings.BARS_MAX_LIMIT),
+    cursor: str = None,
+    if_none_match: str = Header(default=None)
+) -> StreamingResponse:
+    """
+    Get historical price bars.
+    
+    Pages forward in time; pass the returned `next_cursor` back as `cursor`
+    to fetch the following page. Without `start` the newest `limit` bars
+    before `end` are returned.
+    
+    Responses carry an ETag derived from the request, the newest bar before
+    `end` and the last write of the symbol's bars before `end`; sending it
+    back in If-None-Match returns 304 until bars in the range are added or
+    rewritten.
+    Ranges that are fully closed may be cached by clients.
+    """
+    try:
+        start_time = parse_time(start)
+        end_time = parse_time(end)
+        cursor_time = parse_time(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid timestamp: {str(e)}")
+    
+    symbol = symbol.upper()
+    last_time, version = await asyncio.gather(
+        get_last_bar_time(symbol, timeframe, end_time), get_series_version(symbol, timeframe, end_time)
+    )
+    headers = cache_headers(
+        make_etag("bars", symbol, timeframe, start_time, end_time, limit, cursor_time, last_time, version),
+        version is not None
+        and is_closed_range(end_time, BAR_SECONDS.get(timeframe, 0), settings.BARS_SETTLE_SECONDS),
+        settings.BARS_CLOSED_MAX_AGE
+    )
+    if version is not None and etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    
+    return StreamingResponse(
+        stream_bars(
+            symbol,
+            timeframe,
+            start_time,
+            end_time,
+            limit,
+            cursor=cursor_time,
+            chunk_size=settings.BARS_CHUNK_SIZE
+        ),
+        media_type="application/json",
+        headers=headers
+    )
+
+
+@app.get("/api/v1/admin/aggregator")
+async def get_aggregator_stats() -> Dict[str, Any]:
+    """
+    Get tick-to-bar aggregation counters
+    """
+    return get_bar_aggregator().stats()
+
+
+@app.get("/api/v1/admin/bar-store")
+async def get_bar_store_stats() -> Dict[str, Any]:
+    """
+    Get local bar store size and sync counters
+    """
+    return get_bar_store().stats()
+
+
+@app.get("/api/v1/admin/stream")
+async def get_stream_stats() -> Dict[str, Any]:
+    """
+    Get WebSocket fan-out counters
+    """
+    return get_stream_hub().stats()
+
+
+@app.get("/api/v1/admin/providers")
+async def get_provider_stats() -> Dict[str, Any]:
+    """
+    Get tick and connection counters for each market data provider
+    """
+    return {name: provider.stats() for name, provider in get_providers().items()}
+
+
+@app.get("/api/v1/admin/backfill")
+async def get_backfill_progress() -> Dict[str, Any]:
+    """
+    Get gap detection and backfill progress
+    """
+    return get_backfill().progress()
+
+
+@app.post("/api/v1/admin/backfill")
+async def trigger_backfill() -> Dict[str, Any]:
+    """
+    Start a gap detection and backfill run now
+    """
+    if not get_backfill().trigger():
+        raise HTTPException(status_code=409, detail="A backfill run is already in progress")
+    return get_backfill().progress()
+
+
+@app.get("/api/v1/admin/storage")
+async def get_storage() -> Dict[str, Any]:
+    """
+    Get hypertable sizes, compression ratios and policy job status
+    """
+    return await get_storage_stats()
+
+
+@app.get("/api/v1/admin/books")
+async def get_book_stats() -> Dict[str, Any]:
+    """
+    Get order book sequence, gap and resync counters
+    """
+    return get_book_manager().stats()
+
+
+@app.post("/api/v1/admin/replay")
+async def create_replay(
+    symbols: str = None,
+    timeframe: str = "1m",
+    start: str = None,
+    end: str = None,
+    file: str = None,
+    speed: float = Query(default=1.0, ge=0)
 ) -> Dict[str, Any]:
     """
-    Get historical price bars
+    Replay historical bars through the live tick path for load testing
+    
+    Replays `symbols` between `start` and `end` from the market_data table,
+    or a CSV `file` from the replay directory, at `speed` times real time
+    (0 replays as fast as possible).
     """
-    # TODO: Implement historical data fetching
-    return {
-        "symbol": symbol.upper(),
-        "timeframe": timeframe,
-        "bars": [
-            {
-                "time": "2024-01-01T09:30:00Z",
-                "open": 150.00,
-                "high": 151.00,
-                "low": 149.50,
-                "close": 150.75,
-                "volume": 100000
-            }
-        ]
-    }
+    if file:
+        try:
+            source = file_source(resolve_replay_file(file))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except FileNotFoundError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+    else:
+        symbol_list = [s.strip().upper() for s in (symbols or "").split(",") if s.strip()]
+        if not symbol_list or not start or not end:
+            raise HTTPException(status_code=400, detail="symbols, start and end are required without a file")
+        try:
+            source = db_source(symbol_list, timeframe, parse_time(start), parse_time(end))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid timestamp: {str(e)}")
+    
+    try:
+        session = start_replay(source, speed)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return session.report()
+
+
+@app.get("/api/v1/admin/replay")
+async def get_replay_report() -> Dict[str, Any]:
+    """
+    Get progress, throughput and delivery latency of the current replay
+    """
+    session = get_replay()
+    if session is None:
+        raise HTTPException(status_code=404, detail="No replay has been started")
+    return session.report()
+
+
+@app.delete("/api/v1/admin/replay")
+async def cancel_replay() -> Dict[str, Any]:
+    """
+    Cancel the current replay
+    """
+    session = get_replay()
+    if session is None:
+        raise HTTPException(status_code=404, detail="No replay has been started")
+    await stop_replay()
+    return session.report()
+
+
+@app.get("/api/v1/indicators/{symbol}/live")
+async def get_live_indicators(symbol: str) -> Dict[str, Any]:
+    """
+    Get the current streaming indicator values for a symbol
+    """
+    snapshot = get_indicator_stream().snapshot(symbol.upper())
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail=f"No live indicators for {symbol.upper()}")
+    return snapshot
+
+
+@app.get("/api/v1/indicators/{symbol}")
+async def get_indicators(
+    symbol: str,
+    response: Response,
+    timeframe: str = "1d",
+    indicators: str = "sma:20",
+    start: str = None,
+    end: str = None,
+    limit: int = Query(default=500, ge=1, le=settings.BARS_MAX_LIMIT),
+    if_none_match: str = Header(default=None)
+) -> Dict[str, Any]:
+    """
+    Get technical indicators computed over historical bars.
+    
+    `indicators` is a comma-separated list of name[:param...] entries, e.g.
+    "sma:20,ema:50,rsi:14,macd:12:26:9,bbands:20:2,atr:14,vwap".
+    Supports If-None-Match like the bars endpoint.
+    """
+    try:
+        spec = parse_spec(indicators)
+        start_time = parse_time(start)
+        end_time = parse_time(end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    symbol = symbol.upper()
+    last_time, version = await asyncio.gather(
+        get_last_bar_time(symbol, timeframe, end_time), get_series_version(symbol, timeframe, end_time)
+    )
+    if last_time is None:
+        raise HTTPException(status_code=404, detail=f"No bars available for {symbol}")
+    
+    headers = cache_headers(
+        make_etag("indicators", symbol, timeframe, spec, start_time, end_time, limit, last_time, version),
+        version is not None
+        and is_closed_range(end_time, BAR_SECONDS.get(timeframe, 0), settings.BARS_SETTLE_SECONDS),
+        settings.BARS_CLOSED_MAX_AGE
+    )
+    if version is not None and etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    
+    result = await load_indicators(symbol, timeframe, spec, start_time, end_time, limit, last_time, version)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"No bars available for {symbol}")
+    response.headers.update(headers)
+    return result
 
 
 @app.websocket("/ws/stream")
-async def websocket_stream(websocket):
+async def websocket_stream(websocket: WebSocket, encoding: str = "json"):
     """
     WebSocket endpoint for real-time market data streaming
+    
+    Clients send {"action": "subscribe" | "unsubscribe", "symbols": [...]}
+    and receive {"type": "tick", "symbol": ..., "data": {...}} frames for
+    every subscribed symbol. Adding "channel": "depth" subscribes to order
+    book depth instead, delivered as {"type": "depth", ...} frames, and
+    "channel": "replay" to ticks of load-test replays, delivered as
+    {"type": "replay", ...} frames and never mixed into "tick" frames. Connect
+    with `?encoding=msgpack` to receive msgpack binary frames instead of
+    JSON text.
     """
     await websocket.accept()
+    if encoding not in ENCODINGS:
+        await websocket.close(code=1008, reason=f"encoding must be one of {ENCODINGS}")
+        return
+    
+    hub = get_stream_hub()
+    connection = hub.connect(websocket, encoding)
     try:
         while True:
-            # TODO: Implement real-time data streaming
-            data = await websocket.receive_text()
-            await websocket.send_text(f"Echo: {data}")
+            received = await websocket.receive()
+            if received["type"] == "websocket.disconnect":
+                break
+            
+            try:
+                message = decode_message(received.get("bytes") or received.get("text"))
+                action = message["action"]
+                symbols = message["symbols"]
+                channel = message.get("channel", TICKS)
+                if not isinstance(symbols, list):
+                    raise ValueError("symbols must be a list")
+                
+                if action == "subscribe":
+                    hub.subscribe(connection, symbols, channel)
+                elif action == "unsubscribe":
+                    hub.unsubscribe(connection, symbols, channel)
+                else:
+                    raise ValueError(f"Unknown action: {action}")
+            except (ValueError, KeyError, TypeError) as e:
+                connection.enqueue({"type": "error", "message": str(e)})
+                continue
+            
+            connection.enqueue({
+                "type": "subscriptions",
+                "symbols": sorted(connection.symbols),
+                DEPTH: sorted(connection.depth_symbols),
+                REPLAY: sorted(connection.replay_symbols)
+            })
+    except WebSocketDisconnect:
+        pass
     except Exception as e:
         logger.error(f"WebSocket error: {str(e)}")
     finally:
-        await websocket.close()
+        await hub.disconnect(connection)
 
 
 # Graceful shutdown
@@ -0,0 +1,3 @@
+"""
+Market data providers for Market Data Service
+"""
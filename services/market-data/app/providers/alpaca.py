@@ -0,0 +1,118 @@
+"""
+Alpaca market data provider
+"""
+import json
+import logging
+from datetime import datetime
+from typing import Any, Dict, List
+
+from ..config import settings
+from ..services.bars import format_time, parse_time
+from ..utils.http_client import get_http_client
+from .base import StreamingProvider, Tick
+
+logger = logging.getLogger(__name__)
+
+TIMEFRAMES = {"1m": "1Min", "5m": "5Min", "15m": "15Min", "1h": "1Hour", "1d": "1Day"}
+
+
+class AlpacaProvider(StreamingProvider):
+    """
+    Live trades from the Alpaca data stream and bars from its REST API
+    """
+    name = "alpaca"
+    
+    def url(self) -> str:
+        return settings.ALPACA_STREAM_URL
+    
+    def _headers(self) -> Dict[str, str]:
+        """
+        Get REST authentication headers
+        """
+        return {
+            "APCA-API-KEY-ID": settings.ALPACA_API_KEY or "",
+            "APCA-API-SECRET-KEY": settings.ALPACA_SECRET_KEY or ""
+        }
+    
+    async def on_connect(self, ws):
+        """
+        Authenticate, then subscribe to trades for every symbol
+        """
+        await ws.send(json.dumps({
+            "action": "auth",
+            "key": settings.ALPACA_API_KEY,
+            "secret": settings.ALPACA_SECRET_KEY
+        }))
+        # The server greets with "connected" before answering the auth request
+        while True:
+            for message in json.loads(await ws.recv()):
+                if message.get("T") == "error":
+                    raise ConnectionError(f"Alpaca error {message.get('code')}: {message.get('msg')}")
+                if message.get("T") == "success" and message.get("msg") == "authenticated":
+                    await ws.send(json.dumps({"action": "subscribe", "trades": self.symbols}))
+                    return
+    
+    def parse(self, message: str) -> List[Tick]:
+        """
+        Turn a batch of stream messages into ticks
+        """
+        ticks = []
+        for item in json.loads(message):
+            kind = item.get("T")
+            if kind == "t":
+                ticks.append((item["S"], {
+                    "symbol": item["S"],
+                    "price": item["p"],
+                    "size": item["s"],
+                    "timestamp": parse_time(item["t"]).timestamp()
+                }))
+            elif kind == "error":
+                logger.error(f"Alpaca stream error {item.get('code')}: {item.get('msg')}")
+        return ticks
+    
+    async def fetch_bars(
+        self,
+        symbol: str,
+        timeframe: str,
+        start: datetime,
+        end: datetime
+    ) -> List[Dict[str, Any]]:
+        """
+        Fetch bars page by page over the shared HTTP client
+        """
+        if timeframe not in TIMEFRAMES:
+            raise ValueError(f"Alpaca does not serve {timeframe} bars")
+        
+        bars = []
+        params = {
+            "timeframe": TIMEFRAMES[timeframe],
+            "start": format_time(start),
+            "end": format_time(end),
+            "limit": 10000
+        }
+        while True:
+            response = await get_http_client().get(
+                f"{settings.ALPACA_DATA_URL}/v2/stocks/{symbol}/bars",
+                params=params,
+                headers=self._headers()
+            )
+            response.raise_for_status()
+            body = response.json()
+            for bar in body.get("bars") or []:
+                time = parse_time(bar["t"])
+                # The end bound is inclusive upstream
+                if time >= end:
+                    continue
+                bars.append({
+                    "time": time,
+                    "symbol": symbol,
+                    "open": bar["o"],
+                    "high": bar["h"],
+                    "low": bar["l"],
+                    "close": bar["c"],
+                    "volume": int(bar["v"]),
+                    "timeframe": timeframe
+                })
+            if not body.get("next_page_token"):
+                return bars
+            params["page_token"] = body["next_page_token"]
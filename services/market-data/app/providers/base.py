@@ -0,0 +1,250 @@
+"""
+Market data provider interfaces
+"""
+import asyncio
+import logging
+import random
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+import websockets
+
+logger = logging.getLogger(__name__)
+
+# (symbol, quote) pairs handed to the tick pipeline in one batch
+Tick = Tuple[str, Dict[str, Any]]
+TickSink = Callable[[List[Tick]], Awaitable[int]]
+
+# (symbol, sequence, side, action, price, size) level changes of L2 books
+BookDelta = Tuple[str, int, str, str, float, float]
+BookSink = Callable[[List[BookDelta]], Any]
+
+
+def backoff_delay(attempt: int, base: float, cap: float, rng: random.Random = random) -> float:
+    """
+    Exponential backoff with equal jitter: the delay for attempt n is drawn
+    from the upper half of min(cap, base * 2^(n-1)), so reconnecting clients
+    spread out without ever retrying immediately
+    """
+    window = min(cap, base * 2 ** (attempt - 1))
+    return window / 2 + rng.uniform(0, window / 2)
+
+
+class MarketDataProvider(ABC):
+    """
+    A source of live ticks and historical bars.
+    
+    Subclasses implement `run`, which produces ticks until cancelled and
+    hands them to `emit` in batches, and `fetch_bars` for history. Those
+    with L2 data also hand sequenced book deltas to `emit_book` once a book
+    sink is attached, and serve snapshots from `fetch_book` for resyncs.
+    """
+    name = "provider"
+    
+    def __init__(self, symbols: Iterable[str], sink: TickSink):
+        self.symbols = [symbol.upper() for symbol in symbols]
+        self.sink = sink
+        self.book_sink: Optional[BookSink] = None
+        self.status = "stopped"
+        self.error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+        
+        self.ticks = 0
+        self.batches = 0
+        self.book_deltas = 0
+        self.started_at: Optional[float] = None
+    
+    @abstractmethod
+    async def run(self):
+        """
+        Produce ticks until cancelled
+        """
+    
+    @abstractmethod
+    async def fetch_bars(
+        self,
+        symbol: str,
+        timeframe: str,
+        start: datetime,
+        end: datetime
+    ) -> List[Dict[str, Any]]:
+        """
+        Fetch historical bars in [start, end) as market_data rows
+        """
+    
+    async def fetch_book(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """
+        Fetch a snapshot of a symbol's book as {"sequence", "bids", "asks"},
+        or None when this provider has no book for it
+        """
+        return None
+    
+    def attach_book(self, sink: BookSink):
+        """
+        Start handing book deltas to `sink`
+        """
+        self.book_sink = sink
+    
+    def emit_book(self, deltas: List[BookDelta]):
+        """
+        Hand a batch of book deltas to the book sink
+        """
+        if not deltas or self.book_sink is None:
+            return
+        self.book_sink(deltas)
+        self.book_deltas += len(deltas)
+    
+    async def emit(self, ticks: List[Tick]):
+        """
+        Hand a batch of ticks to the pipeline
+        """
+        if not ticks:
+            return
+        await self.sink(ticks)
+        self.ticks += len(ticks)
+        self.batches += 1
+    
+    async def _run(self):
+        """
+        Run the provider, recording why it stopped
+        """
+        self.status = "running"
+        self.started_at = time.time()
+        try:
+            await self.run()
+            self.status = "stopped"
+        except asyncio.CancelledError:
+            self.status = "stopped"
+            raise
+        except Exception as e:
+            logger.error(f"Provider {self.name} failed: {str(e)}")
+            self.status = "failed"
+            self.error = str(e)
+    
+    def start(self):
+        """
+        Start producing ticks
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """
+        Stop producing ticks
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get tick counters
+        """
+        elapsed = time.time() - self.started_at if self.started_at else 0.0
+        return {
+            "name": self.name,
+            "status": self.status,
+            "error": self.error,
+            "symbols": len(self.symbols),
+            "ticks": self.ticks,
+            "batches": self.batches,
+            "book_deltas": self.book_deltas,
+            "ticks_per_sec": self.ticks / elapsed if elapsed else 0.0
+        }
+
+
+class StreamingProvider(MarketDataProvider):
+    """
+    Provider fed by one persistent WebSocket connection.
+    
+    The connection is re-established after any failure with jittered
+    exponential backoff starting at `reconnect_interval` seconds. After
+    `max_reconnect_attempts` consecutive failed attempts the provider gives
+    up and reports itself failed; a successful connection resets the count.
+    """
+    def __init__(
+        self,
+        symbols: Iterable[str],
+        sink: TickSink,
+        reconnect_interval: float = 5.0,
+        max_reconnect_attempts: int = 10,
+        backoff_max: float = 60.0
+    ):
+        super().__init__(symbols, sink)
+        self.reconnect_interval = reconnect_interval
+        self.max_reconnect_attempts = max_reconnect_attempts
+        self.backoff_max = backoff_max
+        
+        self.messages = 0
+        self.connects = 0
+        self.reconnects = 0
+    
+    @abstractmethod
+    def url(self) -> str:
+        """
+        Get the streaming endpoint
+        """
+    
+    async def on_connect(self, ws):
+        """
+        Authenticate and subscribe on a new connection
+        """
+    
+    @abstractmethod
+    def parse(self, message: str) -> List[Tick]:
+        """
+        Turn one message into ticks
+        """
+    
+    async def connect(self):
+        """
+        Open the streaming connection
+        """
+        return await websockets.connect(self.url(), ping_interval=20, ping_timeout=20)
+    
+    async def run(self):
+        """
+        Consume the stream, reconnecting with backoff
+        """
+        failures = 0
+        while True:
+            try:
+                ws = await self.connect()
+                try:
+                    await self.on_connect(ws)
+                    self.status = "connected"
+                    self.connects += 1
+                    failures = 0
+                    async for message in ws:
+                        self.messages += 1
+                        await self.emit(self.parse(message))
+                finally:
+                    await ws.close()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Provider {self.name} connection error: {str(e)}")
+            
+            failures += 1
+            if failures > self.max_reconnect_attempts:
+                raise ConnectionError(f"Gave up after {self.max_reconnect_attempts} reconnect attempts")
+            self.status = "reconnecting"
+            self.reconnects += 1
+            await asyncio.sleep(backoff_delay(failures, self.reconnect_interval, self.backoff_max))
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get tick and connection counters
+        """
+        return {
+            **super().stats(),
+            "messages": self.messages,
+            "connects": self.connects,
+            "reconnects": self.reconnects
+        }
@@ -0,0 +1,107 @@
+"""
+Provider registry and lifecycle
+"""
+import logging
+from typing import Any, Dict, List, Optional, Type
+
+from ..config import settings, get_market_data_config
+from .alpaca import AlpacaProvider
+from .base import BookSink, MarketDataProvider, StreamingProvider, TickSink
+from .simulated import SimulatedProvider
+
+logger = logging.getLogger(__name__)
+
+PROVIDERS: Dict[str, Type[MarketDataProvider]] = {
+    AlpacaProvider.name: AlpacaProvider,
+    SimulatedProvider.name: SimulatedProvider,
+}
+
+
+def create_provider(name: str, symbols: List[str], sink: TickSink) -> MarketDataProvider:
+    """
+    Build a provider from settings and the market_data config section
+    """
+    provider_class = PROVIDERS.get(name)
+    if provider_class is None:
+        raise ValueError(f"Unknown market data provider: {name}")
+    
+    if provider_class is SimulatedProvider:
+        return SimulatedProvider(
+            symbols,
+            sink,
+            rate=settings.SIMULATOR_RATE,
+            seed=settings.SIMULATOR_SEED,
+            volatility=settings.SIMULATOR_VOLATILITY,
+            book_levels=settings.SIMULATOR_BOOK_LEVELS
+        )
+    if issubclass(provider_class, StreamingProvider):
+        websocket_config = get_market_data_config().get("websocket", {})
+        return provider_class(
+            symbols,
+            sink,
+            reconnect_interval=websocket_config.get("reconnect_interval", 5),
+            max_reconnect_attempts=websocket_config.get("max_reconnect_attempts", 10),
+            backoff_max=settings.PROVIDER_BACKOFF_MAX
+        )
+    return provider_class(symbols, sink)
+
+
+# Running providers
+providers: Dict[str, MarketDataProvider] = {}
+
+
+async def init_providers(sink: TickSink, book_sink: Optional[BookSink] = None):
+    """
+    Start every provider listed in MARKET_DATA_PROVIDERS, handing their
+    book deltas to `book_sink` when given
+    """
+    names = [name.strip() for name in settings.MARKET_DATA_PROVIDERS.split(",") if name.strip()]
+    symbols = [symbol.strip().upper() for symbol in settings.PROVIDER_SYMBOLS.split(",") if symbol.strip()]
+    for name in names:
+        provider = create_provider(name, symbols, sink)
+        if book_sink is not None:
+            provider.attach_book(book_sink)
+        provider.start()
+        providers[name] = provider
+        logger.info(f"Provider {name} started for {len(symbols)} symbols")
+    if not names:
+        logger.info("No market data providers configured")
+
+
+async def close_providers():
+    """
+    Stop every running provider
+    """
+    for name in list(providers):
+        await providers.pop(name).stop()
+
+
+async def load_book_snapshot(symbol: str) -> Optional[Dict[str, Any]]:
+    """
+    Fetch a book snapshot from the first running provider that has one
+    """
+    for provider in list(providers.values()):
+        snapshot = await provider.fetch_book(symbol)
+        if snapshot is not None:
+            return snapshot
+    return None
+
+
+def get_provider(name: Optional[str] = None) -> MarketDataProvider:
+    """
+    Get a running provider by name, or the first one
+    """
+    if name is None:
+        if not providers:
+            raise RuntimeError("No market data providers running")
+        return next(iter(providers.values()))
+    if name not in providers:
+        raise RuntimeError(f"Provider {name} not running")
+    return providers[name]
+
+
+def get_providers() -> Dict[str, MarketDataProvider]:
+    """
+    Get every running provider
+    """
+    return providers
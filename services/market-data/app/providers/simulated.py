@@ -0,0 +1,187 @@
+"""
+Deterministic simulated market data provider
+"""
+import asyncio
+import math
+import random
+import time
+import zlib
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from ..services.bars import BAR_SECONDS
+from .base import BookDelta, MarketDataProvider, Tick, TickSink
+
+
+class SimulatedProvider(MarketDataProvider):
+    """
+    Random-walk ticks for a symbol universe, without network access.
+    
+    Prices follow a geometric random walk from a seeded generator, so two
+    runs with the same seed, symbols and rate produce the same sequence of
+    prices and sizes (timestamps are wall-clock). Ticks are emitted in
+    batches every `interval` seconds to hold `rate` ticks per second across
+    all symbols; a rate of 0 emits as fast as the pipeline accepts them.
+    
+    With a book sink attached, each symbol also keeps an L2 book of
+    `book_levels` levels per side, `book_tick` apart around its price, and
+    every tick emits the sequenced deltas that move the book along with it.
+    """
+    name = "simulated"
+    
+    def __init__(
+        self,
+        symbols: Iterable[str],
+        sink: TickSink,
+        rate: float = 100.0,
+        seed: int = 42,
+        volatility: float = 0.0005,
+        interval: float = 0.01,
+        max_batch: int = 1000,
+        book_levels: int = 10,
+        book_tick: float = 0.01
+    ):
+        super().__init__(symbols, sink)
+        self.rate = rate
+        self.seed = seed
+        self.volatility = volatility
+        self.interval = interval
+        self.max_batch = max_batch
+        self.rng = random.Random(seed)
+        self.prices = {symbol: self._start_price(symbol) for symbol in self.symbols}
+        self.sequence = 0
+        self.book_levels = book_levels
+        self.book_tick = book_tick
+        # Sizes come from their own generator so prices stay the same with or without books
+        self.book_rng = random.Random(seed + 1)
+        self.books: Dict[str, Dict[str, Dict[float, float]]] = {}
+        self.book_sequences: Dict[str, int] = {}
+    
+    def _start_price(self, symbol: str) -> float:
+        """
+        Get a stable starting price for a symbol
+        """
+        return 20.0 + zlib.crc32(symbol.encode()) % 480
+    
+    def next_tick(self, timestamp: float) -> Tick:
+        """
+        Advance the walk of the next symbol in turn
+        """
+        symbol = self.symbols[self.sequence % len(self.symbols)]
+        self.sequence += 1
+        price = self.prices[symbol] * math.exp(self.rng.gauss(0.0, self.volatility))
+        self.prices[symbol] = price
+        return symbol, {
+            "symbol": symbol,
+            "price": round(price, 4),
+            "size": self.rng.randint(1, 500),
+            "timestamp": timestamp
+        }
+    
+    def _book_levels(self, price: float) -> Dict[str, List[float]]:
+        """
+        Get the price levels of each side of a book around a price
+        """
+        tick = self.book_tick
+        best_bid = math.floor(price / tick) * tick
+        return {
+            "bid": [round(best_bid - i * tick, 4) for i in range(self.book_levels)],
+            "ask": [round(best_bid + (i + 1) * tick, 4) for i in range(self.book_levels)]
+        }
+    
+    def next_book_deltas(self, symbol: str) -> List[BookDelta]:
+        """
+        Move a symbol's book to its current price: levels left behind are
+        deleted, levels reached are added and one level per side is resized
+        """
+        book = self.books.setdefault(symbol, {"bid": {}, "ask": {}})
+        sequence = self.book_sequences.get(symbol, 0)
+        rng = self.book_rng
+        deltas = []
+        for side, prices in self._book_levels(self.prices[symbol]).items():
+            levels = book[side]
+            wanted = set(prices)
+            for price in sorted(set(levels) - wanted):
+                del levels[price]
+                sequence += 1
+                deltas.append((symbol, sequence, side, "delete", price, 0.0))
+            for price in prices:
+                if price not in levels:
+                    levels[price] = float(rng.randint(1, 50) * 100)
+                    sequence += 1
+                    deltas.append((symbol, sequence, side, "add", price, levels[price]))
+            price = rng.choice(prices)
+            levels[price] = float(rng.randint(1, 50) * 100)
+            sequence += 1
+            deltas.append((symbol, sequence, side, "modify", price, levels[price]))
+        self.book_sequences[symbol] = sequence
+        return deltas
+    
+    async def fetch_book(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a snapshot of a simulated book
+        """
+        book = self.books.get(symbol.upper())
+        if book is None:
+            return None
+        return {
+            "sequence": self.book_sequences[symbol.upper()],
+            "bids": [[price, size] for price, size in book["bid"].items()],
+            "asks": [[price, size] for price, size in book["ask"].items()]
+        }
+    
+    async def run(self):
+        """
+        Emit ticks at the configured rate
+        """
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        sent = 0
+        while True:
+            if self.rate > 0:
+                due = min(int((loop.time() - started) * self.rate) - sent, self.max_batch)
+            else:
+                due = self.max_batch
+            if due > 0:
+                now = time.time()
+                ticks, deltas = [], []
+                for _ in range(due):
+                    ticks.append(self.next_tick(now))
+                    if self.book_sink is not None:
+                        deltas.extend(self.next_book_deltas(ticks[-1][0]))
+                self.emit_book(deltas)
+                await self.emit(ticks)
+                sent += due
+            await asyncio.sleep(self.interval if self.rate > 0 else 0)
+    
+    async def fetch_bars(
+        self,
+        symbol: str,
+        timeframe: str,
+        start: datetime,
+        end: datetime
+    ) -> List[Dict[str, Any]]:
+        """
+        Generate bars for [start, end); the same range always yields the same bars
+        """
+        if timeframe not in BAR_SECONDS:
+            raise ValueError(f"Unsupported timeframe: {timeframe}")
+        step = BAR_SECONDS[timeframe]
+        first = math.ceil(start.timestamp() / step) * step
+        
+        bars = []
+        for epoch in range(first, math.ceil(end.timestamp()), step):
+            rng = random.Random(zlib.crc32(f"{self.seed}:{symbol}:{timeframe}:{epoch}".encode()))
+            open_ = self._start_price(symbol) * math.exp(rng.gauss(0.0, 0.05))
+            close = open_ * math.exp(rng.gauss(0.0, self.volatility * math.sqrt(step)))
+            bars.append({
+                "time": datetime.fromtimestamp(epoch, tz=timezone.utc),
+                "symbol": symbol,
+                "open": round(open_, 4),
+                "high": round(max(open_, close) * (1 + rng.random() * 0.001), 4),
+                "low": round(min(open_, close) * (1 - rng.random() * 0.001), 4),
+                "close": round(close, 4),
+                "volume": rng.randint(100, 100000),
+                "timeframe": timeframe
+            })
+        return bars
@@ -0,0 +1,355 @@
+"""
+Streaming tick-to-bar aggregation
+"""
+import asyncio
+import json
+import logging
+import time
+from array import array
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from ..config import settings
+from ..utils.redis_client import get_redis, bar_channel
+from .bars import format_time
+from .ingestion import BarWriter, get_bar_writer
+
+logger = logging.getLogger(__name__)
+
+# Coarser timeframes are rolled up from 1m bars by the continuous aggregates
+TIMEFRAME_SECONDS = {"1s": 1, "1m": 60}
+
+# (symbol, timeframe, start, open, high, low, close, volume)
+ClosedBar = Tuple[str, str, int, float, float, float, float, float]
+
+
+class BarColumns:
+    """
+    One open bar per symbol slot, stored column-wise in typed arrays.
+    
+    Values are written in place as raw doubles, so updating a bar neither
+    allocates nor keeps a reference to the tick. A start of -1 marks an
+    empty slot.
+    """
+    __slots__ = ("start", "open", "high", "low", "close", "volume", "last")
+    
+    def __init__(self):
+        self.start = array("q")
+        self.open = array("d")
+        self.high = array("d")
+        self.low = array("d")
+        self.close = array("d")
+        self.volume = array("d")
+        self.last = array("d")
+    
+    def add_slot(self):
+        """
+        Append an empty slot
+        """
+        self.start.append(-1)
+        for column in (self.open, self.high, self.low, self.close, self.volume, self.last):
+            column.append(0.0)
+    
+    def open_bar(self, slot: int, start: int, price: float, size: float, timestamp: float):
+        """
+        Start a bar in a slot from its first tick
+        """
+        self.start[slot] = start
+        self.open[slot] = self.high[slot] = self.low[slot] = self.close[slot] = price
+        self.volume[slot] = size
+        self.last[slot] = timestamp
+    
+    def merge(self, slot: int, price: float, size: float, timestamp: float):
+        """
+        Fold a tick into the bar in a slot
+        """
+        if price > self.high[slot]:
+            self.high[slot] = price
+        elif price < self.low[slot]:
+            self.low[slot] = price
+        # A late tick may not be the newest one seen for the bar
+        if timestamp >= self.last[slot]:
+            self.close[slot] = price
+            self.last[slot] = timestamp
+        self.volume[slot] += size
+    
+    def move(self, slot: int, target: "BarColumns"):
+        """
+        Move the bar in a slot into the same slot of `target`
+        """
+        target.start[slot] = self.start[slot]
+        target.open[slot] = self.open[slot]
+        target.high[slot] = self.high[slot]
+        target.low[slot] = self.low[slot]
+        target.close[slot] = self.close[slot]
+        target.volume[slot] = self.volume[slot]
+        target.last[slot] = self.last[slot]
+        self.start[slot] = -1
+    
+    def take(self, slot: int, symbol: str, timeframe: str) -> ClosedBar:
+        """
+        Remove the bar in a slot and return it
+        """
+        start = self.start[slot]
+        self.start[slot] = -1
+        return (
+            symbol, timeframe, start,
+            self.open[slot], self.high[slot], self.low[slot], self.close[slot], self.volume[slot]
+        )
+
+
+class Timeframe:
+    """
+    Open bars of one timeframe: the current bar of every symbol, plus the
+    previous one while it is still inside its grace window, and the start
+    of the last bar closed per symbol so a late tick cannot reopen it
+    """
+    __slots__ = ("name", "seconds", "grace", "current", "previous", "closed")
+    
+    def __init__(self, name: str, grace: float):
+        if name not in TIMEFRAME_SECONDS:
+            raise ValueError(f"Unsupported aggregation timeframe: {name}")
+        self.name = name
+        self.seconds = TIMEFRAME_SECONDS[name]
+        # A bar is superseded once the bar after next opens
+        self.grace = min(grace, self.seconds)
+        self.current = BarColumns()
+        self.previous = BarColumns()
+        self.closed = array("q")
+    
+    def add_slot(self):
+        """
+        Append an empty slot
+        """
+        self.current.add_slot()
+        self.previous.add_slot()
+        self.closed.append(-1)
+    
+    def take(self, columns: BarColumns, slot: int, symbol: str) -> ClosedBar:
+        """
+        Close the bar in a slot of `columns`
+        """
+        self.closed[slot] = columns.start[slot]
+        return columns.take(slot, symbol, self.name)
+
+
+class BarAggregator:
+    """
+    Turns ticks into OHLCV bars for every symbol on one event loop.
+    
+    Each symbol gets a fixed slot in per-timeframe column arrays, so a tick
+    costs a dict lookup and a few in-place array writes. A bar is closed on
+    its time boundary plus `grace` seconds, during which late ticks still
+    fold into it; ticks later than that are counted and dropped. Every
+    `interval` seconds due bars are closed and emitted to the bar writer and
+    on their Redis bar channels in one pipelined round trip.
+    """
+    def __init__(
+        self,
+        timeframes: Sequence[str] = ("1s", "1m"),
+        grace: float = 2.0,
+        interval: float = 0.25,
+        writer: Optional[BarWriter] = None,
+        publish: bool = True,
+        clock: Callable[[], float] = time.time
+    ):
+        self.timeframes = [Timeframe(name, grace) for name in timeframes]
+        self.interval = interval
+        self.writer = writer
+        self.publish = publish
+        self.clock = clock
+        self.slots: Dict[str, int] = {}
+        self.symbols: List[str] = []
+        self.closed: List[ClosedBar] = []
+        self._task: Optional[asyncio.Task] = None
+        
+        self.ticks = 0
+        self.late_ticks = 0
+        self.bars_closed = 0
+        self.bars_emitted = 0
+    
+    def _add_symbol(self, symbol: str) -> int:
+        """
+        Assign a slot to a new symbol
+        """
+        slot = self.slots[symbol] = len(self.symbols)
+        self.symbols.append(symbol)
+        for frame in self.timeframes:
+            frame.add_slot()
+        return slot
+    
+    def update(self, symbol: str, price: float, size: float = 0.0, timestamp: Optional[float] = None):
+        """
+        Fold a tick into the open bars of its symbol
+        """
+        slot = self.slots.get(symbol)
+        if slot is None:
+            slot = self._add_symbol(symbol)
+        if timestamp is None:
+            timestamp = self.clock()
+        self.ticks += 1
+        
+        second = int(timestamp)
+        for frame in self.timeframes:
+            start = second - second % frame.seconds
+            current = frame.current
+            open_start = current.start[slot]
+            if start == open_start:
+                current.merge(slot, price, size, timestamp)
+            elif start <= frame.closed[slot]:
+                self.late_ticks += 1
+            elif start > open_start:
+                previous = frame.previous
+                if previous.start[slot] >= 0:
+                    self.closed.append(frame.take(previous, slot, symbol))
+                if open_start >= 0:
+                    current.move(slot, previous)
+                current.open_bar(slot, start, price, size, timestamp)
+            elif start == frame.previous.start[slot]:
+                frame.previous.merge(slot, price, size, timestamp)
+            else:
+                self.late_ticks += 1
+    
+    def close_due(self, now: float) -> int:
+        """
+        Close every bar whose boundary plus grace has passed by `now`
+        """
+        closed = self.closed
+        count = len(closed)
+        symbols = self.symbols
+        for frame in self.timeframes:
+            cutoff = now - frame.seconds - frame.grace
+            for columns in (frame.previous, frame.current):
+                starts = columns.start
+                for slot in range(len(starts)):
+                    start = starts[slot]
+                    if 0 <= start <= cutoff:
+                        closed.append(frame.take(columns, slot, symbols[slot]))
+        return len(closed) - count
+    
+    async def emit(self) -> int:
+        """
+        Send closed bars to the bar writer and their Redis channels
+        """
+        if not self.closed:
+            return 0
+        closed, self.closed = self.closed, []
+        self.bars_closed += len(closed)
+        
+        bars = [
+            {
+                "time": datetime.fromtimestamp(start, tz=timezone.utc),
+                "symbol": symbol,
+                "open": open_,
+                "high": high,
+                "low": low,
+                "close": close,
+                "volume": int(volume),
+                "timeframe": timeframe
+            }
+            for symbol, timeframe, start, open_, high, low, close, volume in closed
+        ]
+        
+        if self.publish:
+            try:
+                pipe = get_redis().pipeline(transaction=False)
+                for bar in bars:
+                    pipe.publish(
+                        bar_channel(bar["symbol"], bar["timeframe"]),
+                        json.dumps({**bar, "time": format_time(bar["time"])})
+                    )
+                await pipe.execute()
+            except Exception as e:
+                logger.error(f"Bar publish failed: {str(e)}")
+        if self.writer is not None:
+            await self.writer.put_many(bars)
+        
+        self.bars_emitted += len(bars)
+        return len(bars)
+    
+    async def _run(self):
+        """
+        Close and emit due bars on a fixed interval until stopped
+        """
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.close_due(self.clock())
+                await self.emit()
+            except Exception as e:
+                logger.error(f"Bar aggregation failed: {str(e)}")
+    
+    def start(self):
+        """
+        Start closing bars
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """
+        Close every open bar, emit them and stop
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.close_due(float("inf"))
+        await self.emit()
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get tick and bar counters
+        """
+        return {
+            "timeframes": [frame.name for frame in self.timeframes],
+            "symbols": len(self.symbols),
+            "ticks": self.ticks,
+            "late_ticks": self.late_ticks,
+            "bars_closed": self.bars_closed,
+            "bars_emitted": self.bars_emitted,
+            "pending": len(self.closed)
+        }
+
+
+# Global bar aggregator
+bar_aggregator: Optional[BarAggregator] = None
+
+
+async def init_bar_aggregator():
+    """
+    Initialize the bar aggregator and start closing bars
+    """
+    global bar_aggregator
+    
+    bar_aggregator = BarAggregator(
+        timeframes=[name.strip() for name in settings.AGGREGATOR_TIMEFRAMES.split(",") if name.strip()],
+        grace=settings.AGGREGATOR_GRACE,
+        interval=settings.AGGREGATOR_INTERVAL,
+        writer=get_bar_writer()
+    )
+    bar_aggregator.start()
+    logger.info(f"Bar aggregator started for {settings.AGGREGATOR_TIMEFRAMES}")
+
+
+async def close_bar_aggregator():
+    """
+    Flush open bars and stop the bar aggregator
+    """
+    global bar_aggregator
+    
+    if bar_aggregator:
+        await bar_aggregator.stop()
+        bar_aggregator = None
+
+
+def get_bar_aggregator() -> BarAggregator:
+    """
+    Get bar aggregator instance
+    """
+    if not bar_aggregator:
+        raise RuntimeError("Bar aggregator not initialized")
+    return bar_aggregator
@@ -0,0 +1,444 @@
+"""
+Gap detection and concurrent backfill for the market_data hypertable
+"""
+import asyncio
+import logging
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from ..config import settings
+from ..database import get_pool
+from ..providers.base import MarketDataProvider
+from ..providers.manager import get_providers
+from .bar_store import get_bar_store
+from .bars import AGGREGATE_RELATIONS, BAR_SECONDS
+from .ingestion import get_bar_writer
+
+logger = logging.getLogger(__name__)
+
+# Consecutive bars further apart than one bar but no further than the
+# timeframe's max span, across every symbol in one pass. Longer gaps are
+# session breaks (nights, weekends) rather than missing data.
+GAP_QUERY = """
+    SELECT symbol, timeframe, time AS gap_start, next_time AS gap_end
+    FROM (
+        SELECT m.symbol, m.timeframe, m.time, r.step, r.max_span,
+               lead(m.time) OVER (PARTITION BY m.symbol, m.timeframe ORDER BY m.time) AS next_time
+        FROM market_data m
+        JOIN unnest($3::varchar[], $4::int[], $5::int[]) AS r(timeframe, step, max_span)
+          ON m.timeframe = r.timeframe
+        WHERE m.time >= $1
+          AND m.time < $2
+    ) bars
+    WHERE next_time - time > make_interval(secs => step)
+      AND next_time - time <= make_interval(secs => max_span)
+    ORDER BY symbol, timeframe, gap_start
+    LIMIT $6
+"""
+
+
+# Timeframe the continuous aggregates roll up from
+ROLLUP_SOURCE = "1m"
+
+# Materialize a rollup over a window; the casts let the procedure's
+# "any" arguments be bound as parameters
+REFRESH_ROLLUP = "CALL refresh_continuous_aggregate($1::regclass, $2::timestamptz, $3::timestamptz)"
+
+
+class Gap(NamedTuple):
+    symbol: str
+    timeframe: str
+    start: datetime  # last bar before the gap
+    end: datetime  # first bar after the gap
+
+
+GapFinder = Callable[[datetime, datetime, Dict[str, int], int], Awaitable[List[Gap]]]
+
+
+def parse_gap_rules(spec: str) -> Dict[str, int]:
+    """
+    Parse "1m:14400,1d:345600" into timeframe -> max gap span in seconds
+    """
+    rules = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        timeframe, _, span = item.strip().partition(":")
+        if timeframe not in BAR_SECONDS:
+            raise ValueError(f"Unknown timeframe: {timeframe}")
+        rules[timeframe] = int(span)
+    return rules
+
+
+def parse_rate_limits(spec: str) -> Dict[str, float]:
+    """
+    Parse "alpaca:3,simulated:0" into provider -> requests per second
+    """
+    limits = {}
+    for item in spec.split(","):
+        if item.strip():
+            name, _, rate = item.strip().partition(":")
+            limits[name] = float(rate)
+    return limits
+
+
+async def find_gaps(start: datetime, end: datetime, rules: Dict[str, int], limit: int) -> List[Gap]:
+    """
+    Find gaps between start and end with a single query over the hypertable
+    """
+    timeframes = list(rules)
+    async with get_pool().acquire() as conn:
+        rows = await conn.fetch(
+            GAP_QUERY,
+            start,
+            end,
+            timeframes,
+            [BAR_SECONDS[timeframe] for timeframe in timeframes],
+            [rules[timeframe] for timeframe in timeframes],
+            limit
+        )
+    return [Gap(*row) for row in rows]
+
+
+async def refresh_rollups(start: datetime, end: datetime):
+    """
+    Refresh every continuous aggregate over [start, end), widened to whole
+    buckets, from the finest up since each is built from the one below
+    """
+    async with get_pool().acquire() as conn:
+        for timeframe, relation in AGGREGATE_RELATIONS.items():
+            step = BAR_SECONDS[timeframe]
+            first = int(start.timestamp()) // step * step
+            last = -(-int(end.timestamp()) // step) * step
+            await conn.execute(
+                REFRESH_ROLLUP,
+                relation,
+                datetime.fromtimestamp(first, tz=timezone.utc),
+                datetime.fromtimestamp(last, tz=timezone.utc)
+            )
+
+
+class TokenBucket:
+    """
+    Async token bucket allowing `rate` acquisitions per second with bursts
+    of up to `burst`; a rate of 0 means unlimited
+    """
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.capacity = burst or max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    async def acquire(self):
+        """
+        Wait for a token
+        """
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class BackfillScheduler:
+    """
+    Periodically finds gaps and fills them from the market data providers.
+    
+    Gaps come from one set-based query per run. Each symbol's gaps go to
+    one provider, preferring those streaming it, so symbols are spread
+    across providers; every provider's gaps are then fetched by
+    `concurrency` workers sharing its queue, paced by its own token bucket.
+    Filled bars are written straight through the bar writer. Afterwards the
+    rollups are refreshed over the filled window, and any series the local
+    bar store tracks that gained bars, directly or through a rollup, is
+    rebuilt so the filled range shows up there too. Gaps a provider has no
+    data for (holidays, halts) are remembered so later runs skip them.
+    """
+    def __init__(
+        self,
+        rules: Dict[str, int],
+        rate_limits: Dict[str, float],
+        interval: float = 3600.0,
+        lookback: timedelta = timedelta(days=7),
+        concurrency: int = 4,
+        max_gaps: int = 10000,
+        gap_finder: GapFinder = find_gaps,
+        rollup_refresher: Callable[[datetime, datetime], Awaitable[None]] = refresh_rollups,
+        provider_resolver: Callable[[], Dict[str, MarketDataProvider]] = get_providers
+    ):
+        self.rules = rules
+        self.rate_limits = rate_limits
+        self.interval = interval
+        self.lookback = lookback
+        self.concurrency = concurrency
+        self.max_gaps = max_gaps
+        self.gap_finder = gap_finder
+        self.rollup_refresher = rollup_refresher
+        self.provider_resolver = provider_resolver
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.empty: Set[Gap] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._run_task: Optional[asyncio.Task] = None
+        
+        self.status = "idle"
+        self.runs = 0
+        self.last_error: Optional[str] = None
+        self._reset_progress()
+    
+    def _reset_progress(self):
+        """
+        Clear the counters of the current run
+        """
+        self.run_started: Optional[float] = None
+        self.run_finished: Optional[float] = None
+        self.gaps_found = 0
+        self.gaps_skipped = 0
+        self.gaps_filled = 0
+        self.gaps_empty = 0
+        self.gaps_failed = 0
+        self.bars_written = 0
+        self.in_flight = 0
+        self.rebuilt = 0
+    
+    def _bucket(self, provider: MarketDataProvider) -> TokenBucket:
+        """
+        Get the token bucket for a provider
+        """
+        bucket = self.buckets.get(provider.name)
+        if bucket is None:
+            bucket = self.buckets[provider.name] = TokenBucket(self.rate_limits.get(provider.name, 0.0))
+        return bucket
+    
+    def _assign(self, symbol: str, providers: List[MarketDataProvider]) -> MarketDataProvider:
+        """
+        Pick the provider that fills a symbol's gaps: a stable choice among
+        the providers streaming it, or among all of them if none does
+        """
+        candidates = [provider for provider in providers if symbol in provider.symbols] or providers
+        return candidates[zlib.crc32(symbol.encode()) % len(candidates)]
+    
+    async def _fill(self, provider: MarketDataProvider, gap: Gap) -> int:
+        """
+        Fetch and write the bars missing inside one gap
+        """
+        await self._bucket(provider).acquire()
+        step = timedelta(seconds=BAR_SECONDS[gap.timeframe])
+        bars = await provider.fetch_bars(gap.symbol, gap.timeframe, gap.start + step, gap.end)
+        if not bars:
+            return 0
+        if not await get_bar_writer().write(bars):
+            raise RuntimeError(f"Failed to write {len(bars)} bars")
+        return len(bars)
+    
+    async def _worker(self, provider: MarketDataProvider, queue: asyncio.Queue, filled: Dict[Tuple[str, str], Gap]):
+        """
+        Fill gaps from the queue until it is empty
+        """
+        while True:
+            try:
+                gap = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            self.in_flight += 1
+            try:
+                count = await self._fill(provider, gap)
+                if count:
+                    self.gaps_filled += 1
+                    self.bars_written += count
+                    key = (gap.symbol, gap.timeframe)
+                    known = filled.get(key, gap)
+                    filled[key] = known._replace(start=min(known.start, gap.start), end=max(known.end, gap.end))
+                else:
+                    self.gaps_empty += 1
+                    self.empty.add(gap)
+            except Exception as e:
+                logger.error(f"Backfill of {gap.symbol} {gap.timeframe} from {gap.start} failed: {str(e)}")
+                self.gaps_failed += 1
+                self.last_error = str(e)
+            finally:
+                self.in_flight -= 1
+    
+    async def run_once(self) -> Dict[str, Any]:
+        """
+        Find and fill gaps once
+        """
+        providers = list(self.provider_resolver().values())
+        if not providers:
+            self.status = "no provider"
+            return self.progress()
+        
+        self._reset_progress()
+        self.run_started = time.time()
+        self.status = "scanning"
+        end = datetime.now(timezone.utc)
+        try:
+            gaps = await self.gap_finder(end - self.lookback, end, self.rules, self.max_gaps)
+            self.gaps_found = len(gaps)
+            
+            queues: Dict[str, Tuple[MarketDataProvider, asyncio.Queue]] = {}
+            for gap in gaps:
+                if gap in self.empty:
+                    self.gaps_skipped += 1
+                    continue
+                provider = self._assign(gap.symbol, providers)
+                if provider.name not in queues:
+                    queues[provider.name] = (provider, asyncio.Queue())
+                queues[provider.name][1].put_nowait(gap)
+            
+            self.status = "filling"
+            # Filled series with the window their filled gaps span
+            filled: Dict[Tuple[str, str], Gap] = {}
+            await asyncio.gather(*(
+                self._worker(provider, queue, filled)
+                for provider, queue in queues.values()
+                for _ in range(self.concurrency)
+            ))
+            
+            rollup_gaps = [gap for gap in filled.values() if gap.timeframe == ROLLUP_SOURCE]
+            if rollup_gaps:
+                self.status = "refreshing"
+                await self.rollup_refresher(
+                    min(gap.start for gap in rollup_gaps), max(gap.end for gap in rollup_gaps)
+                )
+            
+            self.status = "rebuilding"
+            await self._rebuild(filled)
+        except Exception as e:
+            logger.error(f"Backfill run failed: {str(e)}")
+            self.last_error = str(e)
+        finally:
+            self.status = "idle"
+            self.run_finished = time.time()
+            self.runs += 1
+        return self.progress()
+    
+    async def _rebuild(self, filled: Dict[Tuple[str, str], Gap]):
+        """
+        Rebuild the local bar store copies of series that gained bars,
+        including the rollups of filled 1m series
+        """
+        store = get_bar_store()
+        series = set(filled)
+        for symbol, timeframe in filled:
+            if timeframe == ROLLUP_SOURCE:
+                series.update((symbol, rollup) for rollup in AGGREGATE_RELATIONS)
+        for key in sorted(series):
+            if key in store.tracked:
+                await store.rebuild(*key)
+                self.rebuilt += 1
+    
+    def trigger(self) -> bool:
+        """
+        Start a run now unless one is in progress
+        """
+        if self._run_task is not None and not self._run_task.done():
+            return False
+        self._run_task = asyncio.create_task(self.run_once())
+        return True
+    
+    async def _run(self):
+        """
+        Run on a fixed interval until stopped
+        """
+        while True:
+            self.trigger()
+            await self._run_task
+            await asyncio.sleep(self.interval)
+    
+    def start(self):
+        """
+        Start the periodic job
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """
+        Stop the periodic job and any run in progress
+        """
+        for task in (self._task, self._run_task):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = None
+        self._run_task = None
+    
+    def progress(self) -> Dict[str, Any]:
+        """
+        Get progress and throughput of the current or last run
+        """
+        end = self.run_finished or time.time()
+        elapsed = end - self.run_started if self.run_started else 0.0
+        done = self.gaps_filled + self.gaps_empty + self.gaps_failed
+        return {
+            "status": self.status,
+            "runs": self.runs,
+            "run_started": self.run_started,
+            "run_finished": self.run_finished,
+            "gaps_found": self.gaps_found,
+            "gaps_skipped": self.gaps_skipped,
+            "gaps_done": done,
+            "gaps_remaining": self.gaps_found - self.gaps_skipped - done,
+            "gaps_filled": self.gaps_filled,
+            "gaps_empty": self.gaps_empty,
+            "gaps_failed": self.gaps_failed,
+            "in_flight": self.in_flight,
+            "bars_written": self.bars_written,
+            "bars_per_sec": self.bars_written / elapsed if elapsed else 0.0,
+            "series_rebuilt": self.rebuilt,
+            "last_error": self.last_error
+        }
+
+
+# Global backfill scheduler
+backfill_scheduler: Optional[BackfillScheduler] = None
+
+
+async def init_backfill():
+    """
+    Initialize the backfill scheduler and start the periodic job
+    """
+    global backfill_scheduler
+    
+    backfill_scheduler = BackfillScheduler(
+        rules=parse_gap_rules(settings.BACKFILL_TIMEFRAMES),
+        rate_limits=parse_rate_limits(settings.BACKFILL_RATE_LIMITS),
+        interval=settings.BACKFILL_INTERVAL,
+        lookback=timedelta(days=settings.BACKFILL_LOOKBACK_DAYS),
+        concurrency=settings.BACKFILL_CONCURRENCY,
+        max_gaps=settings.BACKFILL_MAX_GAPS
+    )
+    backfill_scheduler.start()
+    logger.info("Backfill scheduler started")
+
+
+async def close_backfill():
+    """
+    Stop the backfill scheduler
+    """
+    global backfill_scheduler
+    
+    if backfill_scheduler:
+        await backfill_scheduler.stop()
+        backfill_scheduler = None
+
+
+def get_backfill() -> BackfillScheduler:
+    """
+    Get backfill scheduler instance
+    """
+    if not backfill_scheduler:
+        raise RuntimeError("Backfill scheduler not initialized")
+    return backfill_scheduler
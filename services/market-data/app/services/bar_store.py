@@ -0,0 +1,362 @@
+"""
+Memory-mapped columnar bar store mirroring the market_data hypertable
+"""
+import asyncio
+import json
+import logging
+import os
+import shutil
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+import numpy as np
+
+from ..config import settings
+from ..database import get_pool
+from .bars import FAR_FUTURE, ONE_MICROSECOND, get_bar_queries, get_bar_writes, is_settled, rows_to_arrays
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = (
+    ("time", np.int64),
+    ("open", np.float64),
+    ("high", np.float64),
+    ("low", np.float64),
+    ("close", np.float64),
+    ("volume", np.float64),
+)
+
+EMPTY_START = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+class ColumnSeries:
+    """
+    One symbol/timeframe stored as a raw file per column.
+    
+    `meta.json` records how many rows are complete in every column and the
+    logged bar writes the rows reflect; it is replaced atomically after
+    each write, so readers never see a row whose columns are only partly
+    written.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+        self.writes: Set[str] = set()
+        self._arrays: Optional[Dict[str, np.ndarray]] = None
+        
+        meta_path = os.path.join(path, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            self.count = meta["count"]
+            self.writes = set(meta.get("writes", ()))
+    
+    def _column_path(self, name: str) -> str:
+        return os.path.join(self.path, f"{name}.bin")
+    
+    def arrays(self) -> Dict[str, np.ndarray]:
+        """
+        Map every column read-only
+        """
+        if self._arrays is None:
+            if self.count == 0:
+                self._arrays = {name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS}
+            else:
+                self._arrays = {
+                    name: np.memmap(self._column_path(name), dtype=dtype, mode="r", shape=(self.count,))
+                    for name, dtype in COLUMNS
+                }
+        return self._arrays
+    
+    def last_time(self) -> Optional[int]:
+        """
+        Get the newest stored bar time in epoch seconds
+        """
+        return int(self.arrays()["time"][-1]) if self.count else None
+    
+    def write(self, columns: Dict[str, np.ndarray]):
+        """
+        Write bars at their position by time, overwriting any stored bars
+        from the first new bar onwards and extending the files as needed
+        """
+        rows = len(columns["time"])
+        if not rows:
+            return
+        
+        position = int(np.searchsorted(self.arrays()["time"], columns["time"][0]))
+        os.makedirs(self.path, exist_ok=True)
+        for name, dtype in COLUMNS:
+            path = self._column_path(name)
+            with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+                f.seek(position * np.dtype(dtype).itemsize)
+                f.write(np.ascontiguousarray(columns[name], dtype=dtype).tobytes())
+        
+        self.count = max(self.count, position + rows)
+        self._save_meta()
+        self._arrays = None
+    
+    def record_writes(self, write_ids: Iterable[str]):
+        """
+        Record the logged bar writes the stored rows now reflect
+        """
+        self.writes = set(write_ids)
+        if os.path.isdir(self.path):
+            self._save_meta()
+    
+    def _save_meta(self):
+        """
+        Replace `meta.json` atomically
+        """
+        meta_path = os.path.join(self.path, "meta.json")
+        with open(f"{meta_path}.tmp", "w") as f:
+            json.dump({"count": self.count, "writes": sorted(self.writes)}, f)
+        os.replace(f"{meta_path}.tmp", meta_path)
+    
+    def read(self, start: Optional[int], end: Optional[int], limit: int) -> Dict[str, np.ndarray]:
+        """
+        Get zero-copy views of up to `limit` bars in [start, end), the
+        newest ones when no start is given
+        """
+        arrays = self.arrays()
+        times = arrays["time"]
+        hi = len(times) if end is None else int(np.searchsorted(times, end))
+        if start is None:
+            lo = max(0, hi - limit)
+        else:
+            lo = int(np.searchsorted(times, start))
+            hi = min(hi, lo + limit)
+        return {name: column[lo:hi] for name, column in arrays.items()}
+
+
+class BarStore:
+    """
+    Local columnar cache of bars, one memory-mapped file set per
+    symbol/timeframe, kept in sync with the hypertable in the background.
+    
+    Syncing appends new bars, and follows the bar write log to catch bars
+    rewritten in the middle of the history: when a write the series has not
+    reflected yet touched stored bars, the series is copied again from the
+    first day it touched. A rollup series only counts a write as reflected
+    once the rollup's refresh has run after it, and until then is copied
+    again on every pass. Reads are only served from the store when it
+    reflects the write that versions the requested range.
+    """
+    def __init__(self, root: str, sync_interval: float = 60.0, concurrency: int = 4, chunk_size: int = 50000):
+        self.root = root
+        self.sync_interval = sync_interval
+        self.chunk_size = chunk_size
+        self.series: Dict[Tuple[str, str], ColumnSeries] = {}
+        self.tracked: Set[Tuple[str, str]] = set()
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._task: Optional[asyncio.Task] = None
+        
+        self.syncs = 0
+        self.rows_synced = 0
+        self.resyncs = 0
+        
+        # Anything stored by a previous run keeps being synced
+        if os.path.isdir(root):
+            for timeframe in os.listdir(root):
+                timeframe_path = os.path.join(root, timeframe)
+                if timeframe.startswith(".") or not os.path.isdir(timeframe_path):
+                    continue
+                for symbol in os.listdir(timeframe_path):
+                    if not symbol.endswith(".retired"):
+                        self.tracked.add((symbol, timeframe))
+    
+    def get_series(self, symbol: str, timeframe: str) -> ColumnSeries:
+        """
+        Get the column series for a symbol/timeframe
+        """
+        key = (symbol, timeframe)
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = ColumnSeries(os.path.join(self.root, timeframe, symbol))
+        return series
+    
+    def track(self, symbol: str, timeframe: str):
+        """
+        Keep a symbol/timeframe in sync from the next sync pass on
+        """
+        self.tracked.add((symbol, timeframe))
+    
+    def covers(self, symbol: str, timeframe: str, last_time: datetime, version: Optional[str]) -> bool:
+        """
+        Check whether the store holds bars up to `last_time` as of the
+        write that `version` (see get_series_version) names
+        """
+        if (symbol, timeframe) not in self.tracked or version is None:
+            return False
+        series = self.get_series(symbol, timeframe)
+        if version != "0" and version not in series.writes:
+            return False
+        stored = series.last_time()
+        return stored is not None and stored >= int(last_time.timestamp())
+    
+    def read(
+        self,
+        symbol: str,
+        timeframe: str,
+        start: Optional[datetime],
+        end: Optional[datetime],
+        limit: int
+    ) -> Dict[str, np.ndarray]:
+        """
+        Read bars as zero-copy column slices
+        """
+        return self.get_series(symbol, timeframe).read(
+            int(start.timestamp()) if start else None,
+            int(end.timestamp()) if end else None,
+            limit
+        )
+    
+    async def sync(self, symbol: str, timeframe: str) -> int:
+        """
+        Copy new and rewritten bars from the hypertable, re-reading the
+        newest stored bar in case it was still forming when it was last copied
+        """
+        series = self.get_series(symbol, timeframe)
+        queries = get_bar_queries(timeframe)
+        writes = await get_bar_writes(symbol)
+        last = series.last_time()
+        after = EMPTY_START if last is None else datetime.fromtimestamp(last, tz=timezone.utc) - ONE_MICROSECOND
+        
+        rewritten = [day for write_id, day in writes if write_id not in series.writes]
+        if last is not None and rewritten and min(rewritten) <= last:
+            after = datetime.fromtimestamp(min(rewritten), tz=timezone.utc) - ONE_MICROSECOND
+            self.resyncs += 1
+        
+        written = 0
+        async with self._semaphore:
+            while True:
+                rows = await get_pool().fetch(
+                    queries.page, symbol, after, FAR_FUTURE, self.chunk_size, *queries.args
+                )
+                if not rows:
+                    break
+                await asyncio.to_thread(series.write, rows_to_arrays(rows))
+                written += len(rows)
+                after = rows[-1][0]
+                if len(rows) < self.chunk_size:
+                    break
+        
+        now = time.time()
+        series.record_writes(write_id for write_id, _ in writes if is_settled(write_id, timeframe, now))
+        self.syncs += 1
+        self.rows_synced += written
+        return written
+    
+    async def rebuild(self, symbol: str, timeframe: str) -> int:
+        """
+        Reload a series from scratch, e.g. after bars were backfilled into
+        the middle of its range. Readers holding the old mapping keep it.
+        """
+        series = self.get_series(symbol, timeframe)
+        fresh = BarStore(os.path.join(self.root, ".rebuild"), chunk_size=self.chunk_size)
+        written = await fresh.sync(symbol, timeframe)
+        
+        staged = fresh.get_series(symbol, timeframe).path
+        retired = f"{series.path}.retired"
+        if os.path.isdir(series.path):
+            os.replace(series.path, retired)
+        if os.path.isdir(staged):
+            os.makedirs(os.path.dirname(series.path), exist_ok=True)
+            os.replace(staged, series.path)
+        shutil.rmtree(retired, ignore_errors=True)
+        
+        self.series.pop((symbol, timeframe), None)
+        self.track(symbol, timeframe)
+        return written
+    
+    async def sync_all(self) -> int:
+        """
+        Sync every tracked series
+        """
+        results = await asyncio.gather(
+            *(self.sync(symbol, timeframe) for symbol, timeframe in list(self.tracked)),
+            return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"Bar store sync failed: {str(result)}")
+        return sum(r for r in results if isinstance(r, int))
+    
+    async def _run(self):
+        """
+        Sync on a fixed interval until stopped
+        """
+        while True:
+            await self.sync_all()
+            await asyncio.sleep(self.sync_interval)
+    
+    def start(self):
+        """
+        Start background syncing
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """
+        Stop background syncing
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    def stats(self) -> Dict[str, object]:
+        """
+        Get store size and sync counters
+        """
+        return {
+            "root": self.root,
+            "tracked": len(self.tracked),
+            "rows": sum(self.get_series(s, t).count for s, t in self.tracked),
+            "syncs": self.syncs,
+            "resyncs": self.resyncs,
+            "rows_synced": self.rows_synced
+        }
+
+
+# Global bar store
+bar_store: Optional[BarStore] = None
+
+
+async def init_bar_store():
+    """
+    Initialize the bar store and start background syncing
+    """
+    global bar_store
+    
+    bar_store = BarStore(
+        settings.BAR_STORE_DIR,
+        sync_interval=settings.BAR_STORE_SYNC_INTERVAL,
+        concurrency=settings.BAR_STORE_SYNC_CONCURRENCY
+    )
+    bar_store.start()
+    logger.info(f"Bar store opened at {settings.BAR_STORE_DIR} with {len(bar_store.tracked)} series")
+
+
+async def close_bar_store():
+    """
+    Stop syncing the bar store
+    """
+    global bar_store
+    
+    if bar_store:
+        await bar_store.stop()
+        bar_store = None
+
+
+def get_bar_store() -> BarStore:
+    """
+    Get bar store instance
+    """
+    if not bar_store:
+        raise RuntimeError("Bar store not initialized")
+    return bar_store
@@ -0,0 +1,298 @@
+"""
+Historical bar reads against the market_data hypertable
+"""
+import json
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from ..database import get_pool
+from ..utils.conditional import series_version, write_time
+from ..utils.redis_client import get_redis, bar_writes_key
+from ..utils.single_flight import SingleFlight
+from .ingestion import get_bar_writer
+
+logger = logging.getLogger(__name__)
+
+# Rows after the keyset cursor within [start, end), served by the (symbol, time)
+# index of the relation. Prices are cast to float8 so asyncpg decodes them
+# without building Decimals.
+BARS_QUERY = """
+    SELECT time, open::float8, high::float8, low::float8, close::float8, volume
+    FROM {relation}
+    WHERE symbol = $1
+      AND time > $2
+      AND time < $3{timeframe_filter}
+    ORDER BY time
+    LIMIT $4
+"""
+
+# Start of the window holding the newest `limit` bars before `end`
+LATEST_WINDOW_QUERY = """
+    SELECT min(time)
+    FROM (
+        SELECT time
+        FROM {relation}
+        WHERE symbol = $1
+          AND time < $2{timeframe_filter}
+        ORDER BY time DESC
+        LIMIT $3
+    ) latest
+"""
+
+# Newest bar time before `end`, used to key derived-data caches
+LAST_BAR_TIME_QUERY = """
+    SELECT time
+    FROM {relation}
+    WHERE symbol = $1
+      AND time < $2{timeframe_filter}
+    ORDER BY time DESC
+    LIMIT 1
+"""
+
+# Bar duration in seconds per timeframe
+BAR_SECONDS = {
+    "1s": 1,
+    "1m": 60,
+    "5m": 300,
+    "15m": 900,
+    "1h": 3600,
+    "1d": 86400,
+}
+
+# Coarse timeframes are served from continuous aggregates rolled up from 1m bars
+AGGREGATE_RELATIONS = {
+    "5m": "market_data_5m",
+    "15m": "market_data_15m",
+    "1h": "market_data_1h",
+    "1d": "market_data_1d",
+}
+
+# Seconds between refreshes of each rollup (schedule_interval in init-db.sql)
+AGGREGATE_REFRESH_SECONDS = {
+    "5m": 300,
+    "15m": 900,
+    "1h": 3600,
+    "1d": 86400,
+}
+
+
+class BarQueries(NamedTuple):
+    page: str
+    window: str
+    last_time: str
+    args: tuple
+
+
+def get_bar_queries(timeframe: str) -> BarQueries:
+    """
+    Get the queries and trailing arguments for a timeframe
+    """
+    relation = AGGREGATE_RELATIONS.get(timeframe)
+    if relation is not None:
+        return BarQueries(
+            BARS_QUERY.format(relation=relation, timeframe_filter=""),
+            LATEST_WINDOW_QUERY.format(relation=relation, timeframe_filter=""),
+            LAST_BAR_TIME_QUERY.format(relation=relation, timeframe_filter=""),
+            ()
+        )
+    
+    # Anything else is stored as-is in the raw hypertable
+    return BarQueries(
+        BARS_QUERY.format(relation="market_data", timeframe_filter="\n      AND timeframe = $5"),
+        LATEST_WINDOW_QUERY.format(relation="market_data", timeframe_filter="\n          AND timeframe = $4"),
+        LAST_BAR_TIME_QUERY.format(relation="market_data", timeframe_filter="\n      AND timeframe = $3"),
+        (timeframe,)
+    )
+
+
+FAR_FUTURE = datetime(9999, 1, 1, tzinfo=timezone.utc)
+ONE_MICROSECOND = timedelta(microseconds=1)
+
+
+def parse_time(value: Optional[str]) -> Optional[datetime]:
+    """
+    Parse an ISO-8601 timestamp, treating naive values as UTC
+    """
+    if value is None:
+        return None
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def format_time(value: datetime) -> str:
+    """
+    Format a timestamp the way clients receive it
+    """
+    return value.isoformat().replace("+00:00", "Z")
+
+
+async def resolve_window_start(symbol: str, timeframe: str, end: datetime, limit: int) -> Optional[datetime]:
+    """
+    Find where a window of the newest `limit` bars begins
+    """
+    queries = get_bar_queries(timeframe)
+    return await get_pool().fetchval(queries.window, symbol, end, limit, *queries.args)
+
+
+async def get_last_bar_time(symbol: str, timeframe: str, end: Optional[datetime] = None) -> Optional[datetime]:
+    """
+    Get the time of the newest bar before `end`
+    """
+    queries = get_bar_queries(timeframe)
+    return await get_pool().fetchval(queries.last_time, symbol, end or FAR_FUTURE, *queries.args)
+
+
+async def get_series_version(symbol: str, timeframe: str, end: Optional[datetime] = None) -> Optional[str]:
+    """
+    Get the version of a symbol's bars before `end` in a timeframe, which
+    changes whenever bars in that range are written, or None when it
+    cannot be known
+    """
+    if symbol in get_bar_writer().unversioned:
+        return None
+    try:
+        latest = await get_redis().zrevrangebyscore(
+            bar_writes_key(symbol), f"({end.timestamp()}" if end else "+inf", "-inf", start=0, num=1
+        )
+    except Exception as e:
+        logger.error(f"Failed to read bar version for {symbol}: {str(e)}")
+        return None
+    return series_version(latest[0] if latest else None, AGGREGATE_REFRESH_SECONDS.get(timeframe), time.time())
+
+
+async def get_bar_writes(symbol: str) -> List[Tuple[str, int]]:
+    """
+    Get a symbol's logged bar writes as (write id, first day touched) pairs
+    """
+    entries = await get_redis().zrange(bar_writes_key(symbol), 0, -1, withscores=True)
+    return [(write_id, int(day)) for write_id, day in entries]
+
+
+def is_settled(write_id: str, timeframe: str, now: float) -> bool:
+    """
+    Check whether a write shows in a timeframe, which for rollups means
+    their refresh has run since
+    """
+    return now >= write_time(write_id) + AGGREGATE_REFRESH_SECONDS.get(timeframe, 0)
+
+
+async def fetch_bar_arrays(
+    symbol: str,
+    timeframe: str,
+    start: Optional[datetime],
+    end: Optional[datetime],
+    limit: int
+) -> Dict[str, np.ndarray]:
+    """
+    Load bars into column arrays: int64 epoch seconds and float64 OHLCV
+    """
+    end = end or FAR_FUTURE
+    queries = get_bar_queries(timeframe)
+    if start is None:
+        start = await resolve_window_start(symbol, timeframe, end, limit)
+        if start is None:
+            start = end
+    
+    rows = await get_pool().fetch(queries.page, symbol, start - ONE_MICROSECOND, end, limit, *queries.args)
+    return rows_to_arrays(rows)
+
+
+def rows_to_arrays(rows: list) -> Dict[str, np.ndarray]:
+    """
+    Convert page query rows into column arrays
+    """
+    count = len(rows)
+    return {
+        "time": np.fromiter((int(row[0].timestamp()) for row in rows), dtype=np.int64, count=count),
+        "open": np.fromiter((row[1] for row in rows), dtype=np.float64, count=count),
+        "high": np.fromiter((row[2] for row in rows), dtype=np.float64, count=count),
+        "low": np.fromiter((row[3] for row in rows), dtype=np.float64, count=count),
+        "close": np.fromiter((row[4] for row in rows), dtype=np.float64, count=count),
+        "volume": np.fromiter((row[5] for row in rows), dtype=np.float64, count=count),
+    }
+
+
+# Identical chunk reads in flight at the same time share one query
+bar_flight = SingleFlight()
+
+
+async def read_bar_chunk(
+    queries: BarQueries,
+    symbol: str,
+    after: datetime,
+    end: datetime,
+    size: int
+) -> Tuple[List[str], Optional[datetime]]:
+    """
+    Read one keyset chunk as encoded JSON rows plus the time of the last row
+    """
+    rows = []
+    last_time: Optional[datetime] = None
+    async with get_pool().acquire() as conn:
+        async with conn.transaction():
+            async for row in conn.cursor(
+                queries.page, symbol, after, end, size, *queries.args, prefetch=size
+            ):
+                rows.append(
+                    f'{{"time":"{format_time(row[0])}","open":{row[1]},"high":{row[2]},'
+                    f'"low":{row[3]},"close":{row[4]},"volume":{row[5]}}}'
+                )
+                last_time = row[0]
+    return rows, last_time
+
+
+async def stream_bars(
+    symbol: str,
+    timeframe: str,
+    start: Optional[datetime],
+    end: Optional[datetime],
+    limit: int,
+    cursor: Optional[datetime] = None,
+    chunk_size: int = 2000
+) -> AsyncIterator[str]:
+    """
+    Stream one page of bars as a JSON document.
+    
+    Rows are read in keyset chunks: each chunk checks a connection out of
+    the pool, drains a server-side cursor straight into JSON text and gives
+    the connection back before the chunk is sent, so neither memory nor
+    connection hold time grows with the size of the page. Concurrent
+    requests for the same page share each chunk's query and encoding.
+    """
+    end = end or FAR_FUTURE
+    queries = get_bar_queries(timeframe)
+    if start is None and cursor is None:
+        start = await resolve_window_start(symbol, timeframe, end, limit)
+        if start is None:
+            start = end
+    # The keyset cursor is exclusive while `start` is inclusive
+    after = cursor or start - ONE_MICROSECOND
+    
+    yield f'{{"symbol":{json.dumps(symbol)},"timeframe":{json.dumps(timeframe)},"bars":['
+    
+    sent = 0
+    last_time: Optional[datetime] = None
+    while sent < limit:
+        size = min(chunk_size, limit - sent)
+        key = (symbol, timeframe, after, end, size)
+        rows, chunk_last = await bar_flight.do(
+            key, lambda: read_bar_chunk(queries, symbol, after, end, size)
+        )
+        
+        if not rows:
+            break
+        yield ("," if sent else "") + ",".join(rows)
+        sent += len(rows)
+        after = last_time = chunk_last
+        if len(rows) < size:
+            break
+    
+    next_cursor = json.dumps(format_time(last_time)) if sent == limit and last_time else "null"
+    yield f'],"count":{sent},"next_cursor":{next_cursor}}}'
+
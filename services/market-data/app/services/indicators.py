@@ -0,0 +1,307 @@
+"""
+Vectorized technical indicators over bar columns
+
+Every function takes whole float64 columns and returns columns of the same
+length, with NaN for bars inside an indicator's warm-up period.
+"""
+import asyncio
+import math
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..config import settings
+from ..utils.single_flight import SingleFlight
+from .bar_store import get_bar_store
+from .bars import fetch_bar_arrays, format_time, get_last_bar_time, get_series_version
+from .quote_cache import LRUCache
+
+
+def sma(close: np.ndarray, period: int = 20) -> np.ndarray:
+    """
+    Simple moving average
+    """
+    result = np.full(close.shape, np.nan)
+    if len(close) >= period:
+        sums = np.cumsum(close)
+        sums[period:] = sums[period:] - sums[:-period]
+        result[period - 1:] = sums[period - 1:] / period
+    return result
+
+
+def _smooth(values: np.ndarray, period: int, alpha: float) -> np.ndarray:
+    """
+    Exponential smoothing seeded with the simple average of the first
+    `period` valid values, as in the classic EMA and Wilder definitions
+    """
+    result = np.full(values.shape, np.nan)
+    valid = np.flatnonzero(~np.isnan(values))
+    if len(valid) < period:
+        return result
+    
+    first = valid[0]
+    seeded = values[first + period - 1:].copy()
+    seeded[0] = values[first:first + period].mean()
+    result[first + period - 1:] = pd.Series(seeded).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+    return result
+
+
+def ema(close: np.ndarray, period: int = 20) -> np.ndarray:
+    """
+    Exponential moving average
+    """
+    return _smooth(close, period, 2.0 / (period + 1))
+
+
+def _wilder(values: np.ndarray, period: int) -> np.ndarray:
+    """
+    Wilder's smoothing (an EMA with alpha = 1 / period)
+    """
+    return _smooth(values, period, 1.0 / period)
+
+
+def rsi(close: np.ndarray, period: int = 14) -> np.ndarray:
+    """
+    Relative strength index with Wilder smoothing
+    """
+    delta = np.diff(close, prepend=np.nan)
+    gains = np.where(delta > 0, delta, 0.0)
+    losses = np.where(delta < 0, -delta, 0.0)
+    gains[:1] = losses[:1] = np.nan
+    
+    avg_gain = _wilder(gains, period)
+    avg_loss = _wilder(losses, period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+    flat = avg_loss == 0
+    result[flat] = np.where(avg_gain[flat] == 0, 50.0, 100.0)
+    return result
+
+
+def macd(close: np.ndarray, fast: int = 12, slow: int = 26, signal: int = 9) -> Dict[str, np.ndarray]:
+    """
+    Moving average convergence/divergence
+    """
+    line = ema(close, fast) - ema(close, slow)
+    signal_line = ema(line, signal)
+    return {"macd": line, "signal": signal_line, "histogram": line - signal_line}
+
+
+def bollinger(close: np.ndarray, period: int = 20, width: float = 2.0) -> Dict[str, np.ndarray]:
+    """
+    Bollinger bands around a simple moving average
+    """
+    middle = sma(close, period)
+    deviation = np.full(close.shape, np.nan)
+    if len(close) >= period:
+        windows = np.lib.stride_tricks.sliding_window_view(close, period)
+        deviation[period - 1:] = windows.std(axis=1)
+    return {"upper": middle + width * deviation, "middle": middle, "lower": middle - width * deviation}
+
+
+def atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, period: int = 14) -> np.ndarray:
+    """
+    Average true range with Wilder smoothing
+    """
+    previous_close = np.roll(close, 1)
+    true_range = np.maximum(high - low, np.maximum(np.abs(high - previous_close), np.abs(low - previous_close)))
+    if len(true_range):
+        true_range[0] = high[0] - low[0]
+    return _wilder(true_range, period)
+
+
+def vwap(
+    time: np.ndarray,
+    high: np.ndarray,
+    low: np.ndarray,
+    close: np.ndarray,
+    volume: np.ndarray,
+    session_seconds: int = 86400
+) -> np.ndarray:
+    """
+    Volume-weighted average price, reset at each UTC session boundary
+    """
+    if not len(close):
+        return np.empty(0)
+    
+    price_volume = np.cumsum((high + low + close) / 3.0 * volume)
+    total_volume = np.cumsum(volume)
+    
+    # Subtract the running totals carried in from earlier sessions
+    session = time // session_seconds
+    starts = np.flatnonzero(np.diff(session, prepend=session[0] - 1))
+    carried = np.repeat(np.append(0, starts[1:] - 1), np.diff(np.append(starts, len(close))))
+    first_session = np.arange(len(close)) < (starts[1] if len(starts) > 1 else len(close))
+    price_volume = price_volume - np.where(first_session, 0.0, price_volume[carried])
+    total_volume = total_volume - np.where(first_session, 0.0, total_volume[carried])
+    
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(total_volume > 0, price_volume / total_volume, np.nan)
+
+
+class Indicator(NamedTuple):
+    function: Callable[..., Any]
+    inputs: Tuple[str, ...]
+    defaults: Tuple[float, ...]
+
+
+INDICATORS: Dict[str, Indicator] = {
+    "sma": Indicator(sma, ("close",), (20,)),
+    "ema": Indicator(ema, ("close",), (20,)),
+    "rsi": Indicator(rsi, ("close",), (14,)),
+    "macd": Indicator(macd, ("close",), (12, 26, 9)),
+    "bbands": Indicator(bollinger, ("close",), (20, 2.0)),
+    "atr": Indicator(atr, ("high", "low", "close"), (14,)),
+    "vwap": Indicator(vwap, ("time", "high", "low", "close", "volume"), ()),
+}
+
+
+def parse_spec(spec: str, registry: Optional[Mapping[str, Any]] = None) -> List[Tuple[str, Tuple[float, ...]]]:
+    """
+    Parse "sma:20,rsi,macd:12:26:9" into (name, params) pairs, filling defaults
+    
+    `registry` maps names to anything with a `defaults` tuple and defaults
+    to the batch indicators.
+    """
+    registry = INDICATORS if registry is None else registry
+    parsed = []
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, *raw_params = item.lower().split(":")
+        indicator = registry.get(name)
+        if indicator is None:
+            raise ValueError(f"Unknown indicator: {name}")
+        if len(raw_params) > len(indicator.defaults):
+            raise ValueError(f"Too many parameters for {name}")
+        
+        params = []
+        for raw, default in zip(raw_params, indicator.defaults):
+            value = float(raw)
+            if not math.isfinite(value) or value <= 0:
+                raise ValueError(f"Parameters for {name} must be positive numbers")
+            params.append(type(default)(value) if isinstance(default, int) else value)
+        params.extend(indicator.defaults[len(params):])
+        parsed.append((name, tuple(params)))
+    
+    if not parsed:
+        raise ValueError("No indicators requested")
+    return parsed
+
+
+def spec_key(name: str, params: Tuple[float, ...]) -> str:
+    """
+    Name an indicator result, e.g. "sma_20" or "macd_12_26_9"
+    """
+    return "_".join([name, *(f"{p:g}" for p in params)])
+
+
+def compute(bars: Dict[str, np.ndarray], spec: List[Tuple[str, Tuple[float, ...]]]) -> Dict[str, Any]:
+    """
+    Compute every requested indicator, keyed like "sma_20" or "macd_12_26_9"
+    """
+    results = {}
+    for name, params in spec:
+        indicator = INDICATORS[name]
+        results[spec_key(name, params)] = indicator.function(*(bars[column] for column in indicator.inputs), *params)
+    return results
+
+
+def to_json_column(values: np.ndarray) -> List[Any]:
+    """
+    Convert a column to a JSON-friendly list, with NaN as null
+    """
+    return [None if value != value else value for value in np.round(values, 8).tolist()]
+
+
+def to_json(results: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convert computed indicators to JSON-friendly columns
+    """
+    return {
+        key: {name: to_json_column(column) for name, column in value.items()}
+        if isinstance(value, dict) else to_json_column(value)
+        for key, value in results.items()
+    }
+
+
+# Results keyed by request and the newest bar they were computed from
+indicator_cache = LRUCache(
+    max_size=settings.INDICATOR_CACHE_SIZE,
+    ttl=settings.INDICATOR_CACHE_TTL
+)
+
+# Concurrent misses for the same key share one computation
+indicator_flight = SingleFlight()
+
+
+async def load_indicators(
+    symbol: str,
+    timeframe: str,
+    spec: List[Tuple[str, Tuple[float, ...]]],
+    start: Optional[datetime],
+    end: Optional[datetime],
+    limit: int,
+    last_time: Optional[datetime] = None,
+    version: Optional[str] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Compute indicators over stored bars, reusing results until bars are
+    added or rewritten.
+    
+    `last_time` is the newest bar before `end` and `version` the series
+    version when the caller has already looked them up. Results are not
+    cached when the version is unknown.
+    """
+    if last_time is None:
+        last_time, version = await asyncio.gather(
+            get_last_bar_time(symbol, timeframe, end), get_series_version(symbol, timeframe, end)
+        )
+    if last_time is None:
+        return None
+    
+    if version is None:
+        return await build_indicators(symbol, timeframe, spec, start, end, limit, last_time, None, None)
+    key = (symbol, timeframe, tuple(spec), start, end, limit, last_time, version)
+    cached = indicator_cache.get(key)
+    if cached is not None:
+        return cached
+    
+    return await indicator_flight.do(
+        key, lambda: build_indicators(symbol, timeframe, spec, start, end, limit, last_time, version, key)
+    )
+
+
+async def build_indicators(
+    symbol: str,
+    timeframe: str,
+    spec: List[Tuple[str, Tuple[float, ...]]],
+    start: Optional[datetime],
+    end: Optional[datetime],
+    limit: int,
+    last_time: datetime,
+    version: Optional[str],
+    key: Optional[Tuple]
+) -> Dict[str, Any]:
+    """
+    Read bars, compute the indicators and cache the result under `key`, if any
+    """
+    # Read from the local store once it has caught up with the bars and
+    # writes behind `version`, otherwise from the database while the series
+    # is queued for syncing
+    store = get_bar_store()
+    if store.covers(symbol, timeframe, last_time, version):
+        bars = store.read(symbol, timeframe, start, end, limit)
+    else:
+        store.track(symbol, timeframe)
+        bars = await fetch_bar_arrays(symbol, timeframe, start, end, limit)
+    result = {
+        "symbol": symbol,
+        "timeframe": timeframe,
+        "last_bar_time": format_time(last_time),
+        "time": [format_time(datetime.fromtimestamp(t, tz=timezone.utc)) for t in bars["time"].tolist()],
+        "indicators": to_json(compute(bars, spec))
+    }
+    if key is not None:
+        indicator_cache.set(key, result)
+    return result
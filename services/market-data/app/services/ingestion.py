@@ -0,0 +1,341 @@
+"""
+Batched bar ingestion into the market_data hypertable
+"""
+import asyncio
+import itertools
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from ..config import settings
+from ..database import get_pool
+from ..utils.redis_client import get_redis, bar_writes_key
+
+logger = logging.getLogger(__name__)
+
+# (time, symbol, open, high, low, close, volume, timeframe)
+BarRecord = Tuple[datetime, str, float, float, float, float, int, str]
+
+COLUMNS = ("time", "symbol", "open", "high", "low", "close", "volume", "timeframe")
+
+# Per-connection staging table; float8 columns keep COPY encoding cheap and
+# the cast to DECIMAL happens server-side during the upsert
+CREATE_STAGING_TABLE = """
+    CREATE TEMP TABLE IF NOT EXISTS market_data_staging (
+        time TIMESTAMP WITH TIME ZONE NOT NULL,
+        symbol VARCHAR(20) NOT NULL,
+        open DOUBLE PRECISION NOT NULL,
+        high DOUBLE PRECISION NOT NULL,
+        low DOUBLE PRECISION NOT NULL,
+        close DOUBLE PRECISION NOT NULL,
+        volume BIGINT NOT NULL,
+        timeframe VARCHAR(10) NOT NULL
+    ) ON COMMIT DELETE ROWS
+"""
+
+# DISTINCT ON keeps the newest copy of a bar repeated within one batch
+UPSERT_FROM_STAGING = """
+    INSERT INTO market_data (time, symbol, open, high, low, close, volume, timeframe)
+    SELECT DISTINCT ON (time, symbol, timeframe)
+        time, symbol, open, high, low, close, volume, timeframe
+    FROM market_data_staging
+    ORDER BY time, symbol, timeframe, ctid DESC
+    ON CONFLICT (time, symbol, timeframe) DO UPDATE SET
+        open = EXCLUDED.open,
+        high = EXCLUDED.high,
+        low = EXCLUDED.low,
+        close = EXCLUDED.close,
+        volume = EXCLUDED.volume
+"""
+
+# Log a write (ARGV[2]) whose oldest bar falls on the day starting at
+# ARGV[1]. Entries from that day on are superseded by it, so the newest
+# entry at or before a range's end is the last write that touched the
+# range. Past ARGV[3] entries the two oldest are merged, which changes the
+# version of the oldest ranges once rather than ever serving them stale.
+RECORD_WRITE_SCRIPT = """
+redis.call('zremrangebyscore', KEYS[1], ARGV[1], '+inf')
+redis.call('zadd', KEYS[1], ARGV[1], ARGV[2])
+if redis.call('zcard', KEYS[1]) > tonumber(ARGV[3]) then
+    local oldest = redis.call('zrange', KEYS[1], 0, 1, 'WITHSCORES')
+    redis.call('zrem', KEYS[1], oldest[1])
+    redis.call('zadd', KEYS[1], oldest[2], oldest[3])
+end
+return 1
+"""
+
+# Writes are logged by day so a rollup bucket always starts at or after
+# the day of the bars it was built from
+WRITE_LOG_SECONDS = 86400
+
+_STOP = object()
+
+
+def to_record(bar: Dict[str, Any]) -> BarRecord:
+    """
+    Convert a bar dict into a COPY record
+    """
+    return (
+        bar["time"],
+        bar["symbol"],
+        bar["open"],
+        bar["high"],
+        bar["low"],
+        bar["close"],
+        bar["volume"],
+        bar["timeframe"],
+    )
+
+
+class BarWriter:
+    """
+    Buffers bars in a bounded queue and writes them with COPY.
+    
+    A batch is flushed when it reaches `batch_size` rows or `flush_interval`
+    seconds after its first row arrived, whichever comes first. When the
+    queue is full `put` waits, pushing back on producers instead of growing
+    memory.
+    """
+    def __init__(
+        self,
+        batch_size: int = 5000,
+        flush_interval: float = 1.0,
+        max_queue: int = 100000,
+        max_retries: int = 3,
+        write_log_size: int = 400
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.write_log_size = write_log_size
+        self.unversioned: Dict[str, int] = {}
+        self._write_ids = itertools.count()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._task: Optional[asyncio.Task] = None
+        
+        self.rows_written = 0
+        self.rows_failed = 0
+        self.batches = 0
+        self.last_flush_latency = 0.0
+        self.max_flush_latency = 0.0
+        self.total_flush_latency = 0.0
+        self.started_at = time.monotonic()
+        self._window_started = self.started_at
+        self._window_rows = 0
+        self._rows_per_second = 0.0
+    
+    async def put(self, bar: Dict[str, Any]):
+        """
+        Queue a bar, waiting while the queue is full
+        """
+        await self.queue.put(to_record(bar))
+    
+    async def put_many(self, bars: Iterable[Dict[str, Any]]):
+        """
+        Queue several bars, waiting while the queue is full
+        """
+        for bar in bars:
+            await self.queue.put(to_record(bar))
+    
+    def put_nowait(self, bar: Dict[str, Any]):
+        """
+        Queue a bar, raising asyncio.QueueFull when the queue is full
+        """
+        self.queue.put_nowait(to_record(bar))
+    
+    async def write(self, bars: Iterable[Dict[str, Any]]) -> bool:
+        """
+        Write bars immediately rather than queueing them, for callers that
+        need them visible once this returns; returns whether the write succeeded
+        """
+        batch = [to_record(bar) for bar in bars]
+        if not batch:
+            return True
+        return await self._flush(batch)
+    
+    async def _next_batch(self) -> Tuple[List[BarRecord], bool]:
+        """
+        Collect the next batch, returning it and whether the writer is stopping
+        """
+        loop = asyncio.get_running_loop()
+        first = await self.queue.get()
+        if first is _STOP:
+            return [], True
+        
+        batch = [first]
+        deadline = loop.time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                record = self.queue.get_nowait()
+            except asyncio.QueueEmpty:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    record = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            
+            if record is _STOP:
+                return batch, True
+            batch.append(record)
+        
+        return batch, False
+    
+    async def _bump_versions(self, batch: List[BarRecord]):
+        """
+        Log a written batch for every symbol in it from the oldest day it
+        touched, changing the ETags of the ranges it rewrote
+        """
+        write_id = f"{time.time():.6f}-{os.getpid()}-{next(self._write_ids)}"
+        oldest = dict(self.unversioned)
+        for record in batch:
+            day = int(record[0].timestamp()) // WRITE_LOG_SECONDS * WRITE_LOG_SECONDS
+            if day < oldest.get(record[1], day + 1):
+                oldest[record[1]] = day
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            for symbol, day in oldest.items():
+                pipe.eval(RECORD_WRITE_SCRIPT, 1, bar_writes_key(symbol), day, write_id, self.write_log_size)
+            await pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to record bar versions: {str(e)}")
+            for symbol, day in oldest.items():
+                self.unversioned[symbol] = min(day, self.unversioned.get(symbol, day))
+            return
+        for symbol, day in oldest.items():
+            if self.unversioned.get(symbol) == day:
+                del self.unversioned[symbol]
+    
+    async def _flush(self, batch: List[BarRecord]) -> bool:
+        """
+        COPY a batch into the staging table and upsert it into market_data
+        """
+        started = time.perf_counter()
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                async with get_pool().acquire() as conn:
+                    async with conn.transaction():
+                        await conn.execute(CREATE_STAGING_TABLE)
+                        await conn.copy_records_to_table(
+                            "market_data_staging", records=batch, columns=COLUMNS
+                        )
+                        await conn.execute(UPSERT_FROM_STAGING)
+                break
+            except Exception as e:
+                logger.error(f"Bar flush failed (attempt {attempt}/{self.max_retries}): {str(e)}")
+                if attempt == self.max_retries:
+                    self.rows_failed += len(batch)
+                    return False
+                await asyncio.sleep(0.1 * 2 ** attempt)
+        latency = time.perf_counter() - started
+        await self._bump_versions(batch)
+        self.batches += 1
+        self.rows_written += len(batch)
+        self.last_flush_latency = latency
+        self.max_flush_latency = max(self.max_flush_latency, latency)
+        self.total_flush_latency += latency
+        self._record_throughput(len(batch))
+        return True
+    
+    def _record_throughput(self, rows: int):
+        """
+        Update the rows/s figure over a rolling one-second window
+        """
+        now = time.monotonic()
+        self._window_rows += rows
+        elapsed = now - self._window_started
+        if elapsed >= 1.0:
+            self._rows_per_second = self._window_rows / elapsed
+            self._window_started = now
+            self._window_rows = 0
+    
+    async def _run(self):
+        """
+        Flush batches until stopped
+        """
+        stopping = False
+        while not stopping:
+            batch, stopping = await self._next_batch()
+            if batch:
+                await self._flush(batch)
+    
+    def start(self):
+        """
+        Start the flush loop
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """
+        Flush everything queued so far and stop
+        """
+        if self._task is not None:
+            await self.queue.put(_STOP)
+            await self._task
+            self._task = None
+    
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Get ingestion metrics
+        """
+        uptime = time.monotonic() - self.started_at
+        return {
+            "queue_depth": self.queue.qsize(),
+            "max_queue": self.queue.maxsize,
+            "batch_size": self.batch_size,
+            "flush_interval": self.flush_interval,
+            "rows_written": self.rows_written,
+            "rows_failed": self.rows_failed,
+            "unversioned_symbols": len(self.unversioned),
+            "batches": self.batches,
+            "rows_per_second": round(self._rows_per_second, 1),
+            "avg_rows_per_second": round(self.rows_written / uptime, 1) if uptime else 0.0,
+            "last_flush_latency_ms": round(self.last_flush_latency * 1000, 3),
+            "avg_flush_latency_ms": round(self.total_flush_latency / self.batches * 1000, 3) if self.batches else 0.0,
+            "max_flush_latency_ms": round(self.max_flush_latency * 1000, 3)
+        }
+
+
+# Global bar writer
+bar_writer: Optional[BarWriter] = None
+
+
+async def init_bar_writer():
+    """
+    Initialize the bar writer and start flushing
+    """
+    global bar_writer
+    
+    bar_writer = BarWriter(
+        batch_size=settings.INGEST_BATCH_SIZE,
+        flush_interval=settings.INGEST_FLUSH_INTERVAL,
+        max_queue=settings.INGEST_MAX_QUEUE,
+        write_log_size=settings.BAR_WRITE_LOG_SIZE
+    )
+    bar_writer.start()
+    logger.info("Bar writer started")
+
+
+async def close_bar_writer():
+    """
+    Flush pending bars and stop the writer
+    """
+    global bar_writer
+    
+    if bar_writer:
+        await bar_writer.stop()
+        bar_writer = None
+        logger.info("Bar writer stopped")
+
+
+def get_bar_writer() -> BarWriter:
+    """
+    Get bar writer instance
+    """
+    if not bar_writer:
+        raise RuntimeError("Bar writer not initialized")
+    return bar_writer
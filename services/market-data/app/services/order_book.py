@@ -0,0 +1,422 @@
+"""
+In-memory L2 order books maintained from snapshots and incremental deltas
+"""
+import asyncio
+import json
+import logging
+import time
+from bisect import bisect_left
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from ..config import settings
+from ..providers.base import BookDelta
+from ..utils.redis_client import get_redis, book_channel
+
+logger = logging.getLogger(__name__)
+
+BID = "bid"
+ASK = "ask"
+SIDES = (BID, ASK)
+
+ADD = "add"
+MODIFY = "modify"
+DELETE = "delete"
+ACTIONS = (ADD, MODIFY, DELETE)
+
+Level = Sequence[float]
+Delta = Tuple[int, str, str, float, float]
+SnapshotLoader = Callable[[str], Awaitable[Optional[Dict[str, Any]]]]
+
+
+class BookSide:
+    """
+    One side of a book as parallel sorted arrays of price keys and sizes.
+    
+    Keys are kept ascending from the best level: asks store the price, bids
+    store the negated price. A level lookup is a bisect and an insert or
+    delete is a single memmove, so applying a delta costs O(log n) compares
+    with no per-level objects.
+    """
+    __slots__ = ("sign", "keys", "sizes")
+    
+    def __init__(self, descending: bool = False):
+        self.sign = -1.0 if descending else 1.0
+        self.keys: List[float] = []
+        self.sizes: List[float] = []
+    
+    def __len__(self) -> int:
+        return len(self.keys)
+    
+    def update(self, price: float, size: float) -> bool:
+        """
+        Set the size at a price level; a size of zero removes the level
+        """
+        keys = self.keys
+        key = price * self.sign
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            if size > 0:
+                self.sizes[i] = size
+            else:
+                del keys[i]
+                del self.sizes[i]
+            return True
+        if size > 0:
+            keys.insert(i, key)
+            self.sizes.insert(i, size)
+            return True
+        return False
+    
+    def load(self, levels: Iterable[Level]):
+        """
+        Replace every level
+        """
+        sign = self.sign
+        ordered = sorted((float(price) * sign, float(size)) for price, size in levels if size > 0)
+        self.keys = [key for key, _ in ordered]
+        self.sizes = [size for _, size in ordered]
+    
+    def top(self, depth: int) -> List[List[float]]:
+        """
+        Get the best `depth` levels as [price, size] pairs
+        """
+        sign = self.sign
+        return [[key * sign, size] for key, size in zip(self.keys[:depth], self.sizes[:depth])]
+
+
+class OrderBook:
+    """
+    L2 book for one symbol with sequence-number gap detection.
+    
+    Deltas must arrive with consecutive sequence numbers. Stale deltas are
+    ignored; a gap marks the book out of sync, after which deltas are
+    buffered until a snapshot arrives. The snapshot replaces both sides and
+    the buffered deltas newer than it are replayed, so no update is lost
+    while the snapshot was being fetched.
+    """
+    def __init__(self, symbol: str, max_buffer: int = 10000):
+        self.symbol = symbol
+        self.bids = BookSide(descending=True)
+        self.asks = BookSide()
+        self.sequence = 0
+        self.synced = False
+        self.buffer: Deque[Delta] = deque(maxlen=max_buffer)
+        
+        self.deltas = 0
+        self.stale = 0
+        self.gaps = 0
+        self.snapshots = 0
+    
+    def _apply(self, side: str, action: str, price: float, size: float) -> bool:
+        """
+        Apply one level change without sequence checks
+        """
+        if action == DELETE:
+            size = 0.0
+        elif action not in ACTIONS:
+            raise ValueError(f"Unknown action: {action}")
+        if side == BID:
+            return self.bids.update(price, size)
+        if side == ASK:
+            return self.asks.update(price, size)
+        raise ValueError(f"Unknown side: {side}")
+    
+    def apply_delta(self, sequence: int, side: str, action: str, price: float, size: float = 0.0) -> bool:
+        """
+        Apply an add/modify/delete delta, returning whether the book changed
+        """
+        if not self.synced:
+            self.buffer.append((sequence, side, action, price, size))
+            return False
+        if sequence <= self.sequence:
+            self.stale += 1
+            return False
+        if sequence != self.sequence + 1:
+            self.gaps += 1
+            self.synced = False
+            self.buffer.clear()
+            self.buffer.append((sequence, side, action, price, size))
+            return False
+        
+        self.sequence = sequence
+        self.deltas += 1
+        return self._apply(side, action, price, size)
+    
+    def apply_snapshot(self, sequence: int, bids: Iterable[Level], asks: Iterable[Level]):
+        """
+        Replace the book with a snapshot and replay newer buffered deltas
+        """
+        self.bids.load(bids)
+        self.asks.load(asks)
+        self.sequence = sequence
+        self.synced = True
+        self.snapshots += 1
+        
+        buffered, self.buffer = self.buffer, deque(maxlen=self.buffer.maxlen)
+        for delta in buffered:
+            self.apply_delta(*delta)
+    
+    def best_bid(self) -> Optional[List[float]]:
+        """
+        Get the best bid as [price, size]
+        """
+        top = self.bids.top(1)
+        return top[0] if top else None
+    
+    def best_ask(self) -> Optional[List[float]]:
+        """
+        Get the best ask as [price, size]
+        """
+        top = self.asks.top(1)
+        return top[0] if top else None
+    
+    def depth(self, depth: int = 10) -> Dict[str, Any]:
+        """
+        Get the best `depth` levels of each side
+        """
+        return {
+            "symbol": self.symbol,
+            "sequence": self.sequence,
+            "synced": self.synced,
+            "timestamp": time.time(),
+            "bids": self.bids.top(depth),
+            "asks": self.asks.top(depth)
+        }
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get delta and resync counters
+        """
+        return {
+            "sequence": self.sequence,
+            "synced": self.synced,
+            "bid_levels": len(self.bids),
+            "ask_levels": len(self.asks),
+            "buffered": len(self.buffer),
+            "deltas": self.deltas,
+            "stale": self.stale,
+            "gaps": self.gaps,
+            "snapshots": self.snapshots
+        }
+
+
+class OrderBookManager:
+    """
+    Owns the books of this worker and publishes their depth.
+    
+    Deltas are applied inline; publication is decoupled like the indicator
+    stream: changed symbols are marked dirty and every `interval` seconds
+    their top `publish_depth` levels are stored under the symbol's book key
+    (for other workers' REST reads) and published on its book channel (for
+    WebSocket depth updates) in one pipelined round trip. Providers feed
+    deltas through `apply_deltas`; a book that is new or falls out of sync
+    is resynced through `snapshot_loader` when one is set.
+    """
+    def __init__(
+        self,
+        publish_depth: int = 20,
+        interval: float = 0.1,
+        max_buffer: int = 10000,
+        snapshot_ttl: int = 60,
+        snapshot_loader: Optional[SnapshotLoader] = None
+    ):
+        self.publish_depth = publish_depth
+        self.interval = interval
+        self.max_buffer = max_buffer
+        self.snapshot_ttl = snapshot_ttl
+        self.snapshot_loader = snapshot_loader
+        self.books: Dict[str, OrderBook] = {}
+        self.dirty: Set[str] = set()
+        self.resyncing: Set[str] = set()
+        self._task: Optional[asyncio.Task] = None
+        
+        self.published = 0
+        self.resyncs = 0
+    
+    def get_book(self, symbol: str) -> Optional[OrderBook]:
+        """
+        Get a symbol's book if this worker maintains it
+        """
+        return self.books.get(symbol.upper())
+    
+    def _book(self, symbol: str) -> OrderBook:
+        """
+        Get or create a symbol's book
+        """
+        book = self.books.get(symbol)
+        if book is None:
+            book = self.books[symbol] = OrderBook(symbol, self.max_buffer)
+        return book
+    
+    def apply_delta(self, symbol: str, sequence: int, side: str, action: str, price: float, size: float = 0.0) -> bool:
+        """
+        Apply a delta to a symbol's book, requesting a resync on a gap
+        """
+        book = self._book(symbol)
+        if book.apply_delta(sequence, side, action, price, size):
+            self.dirty.add(symbol)
+            return True
+        if not book.synced:
+            self.request_resync(symbol)
+        return False
+    
+    def apply_deltas(self, deltas: Iterable[BookDelta]) -> int:
+        """
+        Apply a batch of deltas of any symbols, returning how many changed a book
+        """
+        changed = 0
+        for symbol, sequence, side, action, price, size in deltas:
+            try:
+                changed += self.apply_delta(symbol.upper(), sequence, side, action, price, size)
+            except ValueError as e:
+                logger.error(f"Invalid book delta for {symbol}: {str(e)}")
+        return changed
+    
+    def apply_snapshot(self, symbol: str, sequence: int, bids: Iterable[Level], asks: Iterable[Level]):
+        """
+        Load a snapshot into a symbol's book
+        """
+        book = self._book(symbol)
+        book.apply_snapshot(sequence, bids, asks)
+        self.dirty.add(symbol)
+    
+    def request_resync(self, symbol: str):
+        """
+        Fetch a fresh snapshot for a symbol unless one is already on its way
+        """
+        if self.snapshot_loader is None or symbol in self.resyncing:
+            return
+        self.resyncing.add(symbol)
+        asyncio.get_running_loop().create_task(self._resync(symbol))
+    
+    async def _resync(self, symbol: str):
+        """
+        Load and apply a snapshot for a symbol
+        """
+        try:
+            snapshot = await self.snapshot_loader(symbol)
+            if snapshot is not None:
+                self.apply_snapshot(symbol, snapshot["sequence"], snapshot["bids"], snapshot["asks"])
+                self.resyncs += 1
+        except Exception as e:
+            logger.error(f"Book resync failed for {symbol}: {str(e)}")
+        finally:
+            self.resyncing.discard(symbol)
+    
+    async def flush(self) -> int:
+        """
+        Store and publish the depth of every book changed since the last flush
+        """
+        if not self.dirty:
+            return 0
+        dirty, self.dirty = self.dirty, set()
+        
+        pipe = get_redis().pipeline(transaction=False)
+        for symbol in dirty:
+            payload = json.dumps(self.books[symbol].depth(self.publish_depth))
+            pipe.setex(book_channel(symbol), self.snapshot_ttl, payload)
+            pipe.publish(book_channel(symbol), payload)
+        await pipe.execute()
+        self.published += len(dirty)
+        return len(dirty)
+    
+    async def load_depth(self, symbol: str, depth: int) -> Optional[Dict[str, Any]]:
+        """
+        Get a symbol's depth from the local book, or from the last snapshot
+        published by the worker that maintains it
+        """
+        symbol = symbol.upper()
+        book = self.books.get(symbol)
+        if book is not None and book.synced:
+            return book.depth(depth)
+        
+        value = await get_redis().get(book_channel(symbol))
+        if not value:
+            return None
+        snapshot = json.loads(value)
+        snapshot["bids"] = snapshot["bids"][:depth]
+        snapshot["asks"] = snapshot["asks"][:depth]
+        return snapshot
+    
+    async def _run(self):
+        """
+        Flush on a fixed interval until stopped
+        """
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Book publish failed: {str(e)}")
+    
+    def start(self):
+        """
+        Start publishing
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """
+        Stop publishing
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get per-book counters
+        """
+        return {
+            "books": {symbol: book.stats() for symbol, book in self.books.items()},
+            "published": self.published,
+            "resyncs": self.resyncs,
+            "resyncing": sorted(self.resyncing)
+        }
+
+
+# Global book manager
+book_manager: Optional[OrderBookManager] = None
+
+
+async def init_book_manager(snapshot_loader: Optional[SnapshotLoader] = None):
+    """
+    Initialize the book manager and start publishing depth, resyncing
+    books with snapshots from `snapshot_loader`
+    """
+    global book_manager
+    
+    book_manager = OrderBookManager(
+        publish_depth=settings.BOOK_PUBLISH_DEPTH,
+        interval=settings.BOOK_PUBLISH_INTERVAL,
+        max_buffer=settings.BOOK_RESYNC_BUFFER,
+        snapshot_loader=snapshot_loader
+    )
+    book_manager.start()
+    logger.info("Order book manager started")
+
+
+async def close_book_manager():
+    """
+    Stop the book manager
+    """
+    global book_manager
+    
+    if book_manager:
+        await book_manager.stop()
+        book_manager = None
+
+
+def get_book_manager() -> OrderBookManager:
+    """
+    Get book manager instance
+    """
+    if not book_manager:
+        raise RuntimeError("Book manager not initialized")
+    return book_manager
@@ -0,0 +1,368 @@
+"""
+Two-tier quote cache: in-process LRU in front of Redis
+"""
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from ..config import settings, get_market_data_config
+from ..utils.redis_client import get_redis, tick_channel, RedisPubSub
+from ..utils.single_flight import RedisSingleFlight, SingleFlight
+
+logger = logging.getLogger(__name__)
+
+QuoteLoader = Callable[[str], Awaitable[Optional[Dict[str, Any]]]]
+BatchQuoteLoader = Callable[[List[str]], Awaitable[Dict[str, Dict[str, Any]]]]
+
+
+class LRUCache:
+    """
+    Bounded in-process LRU cache with a TTL on every entry
+    """
+    def __init__(
+        self,
+        max_size: int = 10000,
+        ttl: float = 5.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def __contains__(self, key: str) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry[0] > self._clock()
+    
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Get a live entry and mark it as most recently used
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        
+        expires_at, value = entry
+        if expires_at <= self._clock():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+    
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        """
+        Store an entry, evicting the least recently used one when full
+        """
+        expires_at = self._clock() + (self.ttl if ttl is None else ttl)
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+    
+    def invalidate(self, key: str) -> bool:
+        """
+        Drop an entry, returning whether it was present
+        """
+        if self._entries.pop(key, None) is None:
+            return False
+        self.invalidations += 1
+        return True
+    
+    def clear(self):
+        """
+        Drop all entries
+        """
+        self._entries.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache counters
+        """
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations
+        }
+
+
+class QuoteCache:
+    """
+    Quote cache with an in-process LRU tier in front of a shared Redis tier.
+    
+    Reads fall through local -> Redis -> loader. Concurrent misses for the
+    same symbol share a single load through `flight`. Publishing a tick
+    refreshes both tiers and broadcasts on the symbol's tick channel; every
+    worker's stream hub passes that tick to `on_tick` to drop the local copy.
+    """
+    def __init__(
+        self,
+        loader: QuoteLoader,
+        ttl: int = 60,
+        local_ttl: float = 5.0,
+        max_size: int = 10000,
+        prefix: str = "quote",
+        batch_loader: Optional[BatchQuoteLoader] = None,
+        flight: Optional[SingleFlight] = None
+    ):
+        self.loader = loader
+        self.batch_loader = batch_loader
+        self.flight = flight or SingleFlight()
+        self.ttl = ttl
+        self.prefix = prefix
+        self.local = LRUCache(max_size=max_size, ttl=min(local_ttl, ttl))
+        self.client = get_redis()
+        self.pubsub = RedisPubSub()
+        
+        self.redis_hits = 0
+        self.redis_misses = 0
+        self.loads = 0
+    
+    def _make_key(self, symbol: str) -> str:
+        """
+        Create a namespaced key
+        """
+        return f"{self.prefix}:{symbol}"
+    
+    async def get(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a quote, loading it from the backing source on a miss
+        """
+        symbol = symbol.upper()
+        quote = self.local.get(symbol)
+        if quote is not None:
+            return quote
+        
+        try:
+            value = await self.client.get(self._make_key(symbol))
+        except Exception as e:
+            logger.error(f"Redis get error: {str(e)}")
+            value = None
+        
+        if value:
+            self.redis_hits += 1
+            quote = json.loads(value)
+            self.local.set(symbol, quote)
+            return quote
+        
+        self.redis_misses += 1
+        return await self.flight.do(f"{self.prefix}:{symbol}", lambda: self._load(symbol))
+    
+    async def _load(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """
+        Load a quote from the backing source and store it in both tiers
+        """
+        self.loads += 1
+        quote = await self.loader(symbol)
+        if quote is not None:
+            await self.set(symbol, quote)
+        return quote
+    
+    async def get_many(self, symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Get quotes for several symbols: local hits first, then one MGET for
+        the rest, then a single load for whatever Redis did not have
+        """
+        quotes: Dict[str, Dict[str, Any]] = {}
+        remaining = []
+        for symbol in dict.fromkeys(s.upper() for s in symbols):
+            quote = self.local.get(symbol)
+            if quote is not None:
+                quotes[symbol] = quote
+            else:
+                remaining.append(symbol)
+        if not remaining:
+            return quotes
+        
+        try:
+            values = await self.client.mget([self._make_key(symbol) for symbol in remaining])
+        except Exception as e:
+            logger.error(f"Redis mget error: {str(e)}")
+            values = [None] * len(remaining)
+        
+        misses = []
+        for symbol, value in zip(remaining, values):
+            if value:
+                quote = json.loads(value)
+                self.local.set(symbol, quote)
+                quotes[symbol] = quote
+            else:
+                misses.append(symbol)
+        self.redis_hits += len(remaining) - len(misses)
+        self.redis_misses += len(misses)
+        if not misses:
+            return quotes
+        
+        if self.batch_loader is not None:
+            key = f"{self.prefix}:batch:{','.join(sorted(misses))}"
+            loaded = await self.flight.do(key, lambda: self._load_many(misses))
+        else:
+            results = await asyncio.gather(*(
+                self.flight.do(f"{self.prefix}:{symbol}", lambda symbol=symbol: self._load(symbol))
+                for symbol in misses
+            ))
+            loaded = {symbol: quote for symbol, quote in zip(misses, results) if quote is not None}
+        
+        quotes.update(loaded)
+        return quotes
+    
+    async def _load_many(self, symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Load several quotes with the batch loader and store them in both tiers
+        """
+        self.loads += len(symbols)
+        loaded = await self.batch_loader(symbols)
+        if loaded:
+            await self.set_many(loaded)
+        return loaded
+    
+    async def set_many(self, quotes: Dict[str, Dict[str, Any]]):
+        """
+        Store several quotes in both tiers with one pipelined round trip
+        """
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for symbol, quote in quotes.items():
+                self.local.set(symbol, quote)
+                pipe.setex(self._make_key(symbol), self.ttl, json.dumps(quote))
+            await pipe.execute()
+        except Exception as e:
+            logger.error(f"Redis set error: {str(e)}")
+    
+    async def set(self, symbol: str, quote: Dict[str, Any]):
+        """
+        Store a quote in both tiers
+        """
+        symbol = symbol.upper()
+        self.local.set(symbol, quote)
+        try:
+            await self.client.setex(self._make_key(symbol), self.ttl, json.dumps(quote))
+        except Exception as e:
+            logger.error(f"Redis set error: {str(e)}")
+    
+    async def publish_tick(self, symbol: str, quote: Dict[str, Any]) -> int:
+        """
+        Store a new tick and notify every worker that the symbol changed
+        """
+        symbol = symbol.upper()
+        await self.set(symbol, quote)
+        return await self.pubsub.publish(tick_channel(symbol), quote)
+    
+    async def publish_ticks(self, ticks: List[Tuple[str, Dict[str, Any]]]) -> int:
+        """
+        Store and broadcast several ticks with one pipelined round trip
+        """
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for symbol, quote in ticks:
+                payload = json.dumps(quote)
+                self.local.set(symbol, quote)
+                pipe.setex(self._make_key(symbol), self.ttl, payload)
+                pipe.publish(tick_channel(symbol), payload)
+            await pipe.execute()
+            return len(ticks)
+        except Exception as e:
+            logger.error(f"Redis publish error: {str(e)}")
+            return 0
+    
+    def invalidate(self, symbol: str) -> bool:
+        """
+        Drop the local copy of a symbol's quote
+        """
+        return self.local.invalidate(symbol.upper())
+    
+    def on_tick(self, symbol: str, payload: str):
+        """
+        Drop the local copy when any worker publishes a tick
+        """
+        self.invalidate(symbol)
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get counters for both tiers
+        """
+        return {
+            "local": self.local.stats(),
+            "redis": {
+                "ttl": self.ttl,
+                "hits": self.redis_hits,
+                "misses": self.redis_misses
+            },
+            "loads": self.loads,
+            "single_flight": self.flight.stats()
+        }
+
+
+# Global quote cache
+quote_cache: Optional[QuoteCache] = None
+
+
+async def init_quote_cache(loader: QuoteLoader, batch_loader: Optional[BatchQuoteLoader] = None):
+    """
+    Initialize the quote cache
+    """
+    global quote_cache
+    
+    if settings.SINGLE_FLIGHT_REDIS:
+        flight = RedisSingleFlight(
+            get_redis(),
+            lock_ttl=settings.SINGLE_FLIGHT_LOCK_TTL,
+            result_ttl=settings.SINGLE_FLIGHT_RESULT_TTL
+        )
+    else:
+        flight = SingleFlight()
+    
+    quote_cache = QuoteCache(
+        loader,
+        batch_loader=batch_loader,
+        flight=flight,
+        ttl=get_market_data_config().get("cache_ttl", settings.QUOTE_CACHE_TTL),
+        local_ttl=settings.QUOTE_CACHE_LOCAL_TTL,
+        max_size=settings.QUOTE_CACHE_MAX_SIZE
+    )
+    logger.info(f"Quote cache initialized with ttl={quote_cache.ttl}s")
+
+
+async def close_quote_cache():
+    """
+    Stop the quote cache
+    """
+    global quote_cache
+    
+    if quote_cache:
+        quote_cache.local.clear()
+        quote_cache = None
+
+
+def get_quote_cache() -> QuoteCache:
+    """
+    Get quote cache instance
+    """
+    if not quote_cache:
+        raise RuntimeError("Quote cache not initialized")
+    return quote_cache
@@ -0,0 +1,61 @@
+"""
+Quote lookups against the market_data hypertable
+"""
+from typing import Any, Dict, List, Optional
+
+from ..database import get_pool
+
+# Newest bar for a symbol, served by idx_market_data_symbol_time
+LATEST_BAR_QUERY = """
+    SELECT time, close, volume
+    FROM market_data
+    WHERE symbol = $1
+    ORDER BY time DESC
+    LIMIT 1
+"""
+
+# Newest bar for each of several symbols in one round trip: one index
+# lookup per symbol through the lateral join
+LATEST_BARS_QUERY = """
+    SELECT s.symbol, latest.time, latest.close, latest.volume
+    FROM unnest($1::varchar[]) AS s(symbol)
+    CROSS JOIN LATERAL (
+        SELECT time, close, volume
+        FROM market_data
+        WHERE symbol = s.symbol
+        ORDER BY time DESC
+        LIMIT 1
+    ) latest
+"""
+
+
+def _to_quote(symbol: str, row) -> Dict[str, Any]:
+    """
+    Build a quote from a bar row
+    """
+    return {
+        "symbol": symbol,
+        "price": float(row["close"]),
+        "bid": None,
+        "ask": None,
+        "volume": row["volume"],
+        "timestamp": row["time"].timestamp()
+    }
+
+
+async def load_latest_quote(symbol: str) -> Optional[Dict[str, Any]]:
+    """
+    Build a quote from the most recent stored bar
+    """
+    row = await get_pool().fetchrow(LATEST_BAR_QUERY, symbol)
+    if row is None:
+        return None
+    return _to_quote(symbol, row)
+
+
+async def load_latest_quotes(symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Build quotes for several symbols from their most recent stored bars
+    """
+    rows = await get_pool().fetch(LATEST_BARS_QUERY, symbols)
+    return {row["symbol"]: _to_quote(row["symbol"], row) for row in rows}
@@ -0,0 +1,320 @@
+"""
+Accelerated replay of historical bars through the live tick path
+"""
+import asyncio
+import csv
+import json
+import logging
+import os
+import random
+import time
+import uuid
+from datetime import datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from ..config import settings
+from ..database import get_pool
+from ..utils.redis_client import get_redis, replay_tick_channel
+from .bars import ONE_MICROSECOND, parse_time
+
+logger = logging.getLogger(__name__)
+
+# (event time as epoch seconds, symbol, price, size)
+ReplayEvent = Tuple[float, str, float, float]
+Publisher = Callable[[List[Tuple[str, str]]], Awaitable[None]]
+
+# Keyset pages over (time, symbol) so no connection is held between pages
+REPLAY_QUERY = """
+    SELECT time, symbol, close::float8, volume
+    FROM market_data
+    WHERE symbol = ANY($1::varchar[])
+      AND timeframe = $2
+      AND (time, symbol) > ($3, $4)
+      AND time < $5
+    ORDER BY time, symbol
+    LIMIT $6
+"""
+
+
+async def db_source(
+    symbols: List[str],
+    timeframe: str,
+    start: datetime,
+    end: datetime,
+    chunk_size: int = 5000
+) -> AsyncIterator[ReplayEvent]:
+    """
+    Read bars from the market_data hypertable in time order
+    """
+    after_time, after_symbol = start - ONE_MICROSECOND, ""
+    while True:
+        async with get_pool().acquire() as conn:
+            rows = await conn.fetch(
+                REPLAY_QUERY, symbols, timeframe, after_time, after_symbol, end, chunk_size
+            )
+        for row in rows:
+            yield row[0].timestamp(), row[1], row[2], float(row[3])
+        if len(rows) < chunk_size:
+            return
+        after_time, after_symbol = rows[-1][0], rows[-1][1]
+
+
+async def file_source(path: str) -> AsyncIterator[ReplayEvent]:
+    """
+    Read bars from a CSV export with time, symbol, close and volume columns,
+    already ordered by time
+    """
+    with open(path, newline="") as f:
+        for i, row in enumerate(csv.DictReader(f)):
+            yield parse_time(row["time"]).timestamp(), row["symbol"].upper(), float(row["close"]), float(row["volume"])
+            if i % 1000 == 999:
+                # Let the event loop deliver while a large file is read
+                await asyncio.sleep(0)
+
+
+def resolve_replay_file(name: str) -> str:
+    """
+    Resolve a replay file name inside REPLAY_DIR, rejecting anything outside it
+    """
+    root = os.path.realpath(settings.REPLAY_DIR)
+    path = os.path.realpath(os.path.join(root, name))
+    if os.path.dirname(path) != root:
+        raise ValueError(f"Replay files must be plain names inside {settings.REPLAY_DIR}")
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"Replay file not found: {name}")
+    return path
+
+
+async def redis_publisher(messages: List[Tuple[str, str]]):
+    """
+    Publish a batch of (channel, payload) messages in one pipelined round trip
+    """
+    pipe = get_redis().pipeline(transaction=False)
+    for channel, payload in messages:
+        pipe.publish(channel, payload)
+    await pipe.execute()
+
+
+def percentile(ordered: List[float], pct: float) -> Optional[float]:
+    """
+    Get a percentile of sorted values
+    """
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class ReplaySession:
+    """
+    Publishes historical bars as ticks on the replay tick channels.
+    
+    Each bar becomes one tick priced at its close. With `speed` > 0 the gaps
+    between event times are replayed divided by `speed` (1 = real time,
+    10 = ten times faster); with `speed` 0 events are sent as fast as Redis
+    accepts them. Due events are published in pipelined batches.
+    
+    Ticks are published straight to pub/sub, bypassing the quote cache and
+    bar aggregator so replayed history never reaches storage, and on their
+    own channels so only WebSocket clients subscribed to the stream hub's
+    replay channel receive them; live subscribers and the trading engine,
+    which follow the live channels, never see them.
+    They carry a replay id and send time, which `on_tick` reads back when
+    the stream hub delivers them to measure publish-to-deliver latency.
+    """
+    def __init__(
+        self,
+        source: AsyncIterator[ReplayEvent],
+        speed: float = 1.0,
+        batch_size: int = 500,
+        max_samples: int = 100000,
+        drain_timeout: float = 2.0,
+        publisher: Publisher = redis_publisher
+    ):
+        self.id = uuid.uuid4().hex[:12]
+        self.source = source
+        self.speed = speed
+        self.batch_size = batch_size
+        self.max_samples = max_samples
+        self.drain_timeout = drain_timeout
+        self.publisher = publisher
+        self.marker = f'"replay_id":"{self.id}"'
+        self.latencies: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+        
+        self.status = "pending"
+        self.error: Optional[str] = None
+        self.published = 0
+        self.delivered = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.event_time: Optional[float] = None
+    
+    async def _flush(self, batch: List[ReplayEvent]):
+        """
+        Stamp and publish a batch of events
+        """
+        sent_at = time.time()
+        messages = [
+            (
+                replay_tick_channel(symbol),
+                f'{{"symbol":"{symbol}","price":{price},"size":{size},"timestamp":{event_time},'
+                f'{self.marker},"sent_at":{sent_at}}}'
+            )
+            for event_time, symbol, price, size in batch
+        ]
+        await self.publisher(messages)
+        self.published += len(messages)
+        batch.clear()
+    
+    async def run(self):
+        """
+        Replay the whole source
+        """
+        self.status = "running"
+        self.started_at = time.time()
+        batch: List[ReplayEvent] = []
+        loop = asyncio.get_running_loop()
+        first_event: Optional[float] = None
+        wall_start = loop.time()
+        try:
+            async for event in self.source:
+                event_time = event[0]
+                if first_event is None:
+                    first_event = event_time
+                if self.speed > 0:
+                    delay = wall_start + (event_time - first_event) / self.speed - loop.time()
+                    if delay > 0:
+                        if batch:
+                            await self._flush(batch)
+                        await asyncio.sleep(delay)
+                self.event_time = event_time
+                batch.append(event)
+                if len(batch) >= self.batch_size:
+                    await self._flush(batch)
+            if batch:
+                await self._flush(batch)
+            
+            # Give in-flight messages a chance to arrive before reporting
+            deadline = loop.time() + self.drain_timeout
+            while self.delivered < self.published and loop.time() < deadline:
+                await asyncio.sleep(0.01)
+            self.status = "finished"
+        except asyncio.CancelledError:
+            self.status = "cancelled"
+            raise
+        except Exception as e:
+            logger.error(f"Replay {self.id} failed: {str(e)}")
+            self.status = "failed"
+            self.error = str(e)
+        finally:
+            self.finished_at = time.time()
+    
+    def on_tick(self, symbol: str, payload: str):
+        """
+        Record delivery latency for this session's ticks
+        """
+        if self.marker not in payload:
+            return
+        latency = time.time() - json.loads(payload)["sent_at"]
+        self.delivered += 1
+        # Reservoir sampling keeps percentiles representative in bounded memory
+        if len(self.latencies) < self.max_samples:
+            self.latencies.append(latency)
+        else:
+            i = random.randrange(self.delivered)
+            if i < self.max_samples:
+                self.latencies[i] = latency
+    
+    def start(self):
+        """
+        Start replaying in the background
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+    
+    async def stop(self):
+        """
+        Cancel the replay
+        """
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+    
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+    
+    def report(self) -> Dict[str, Any]:
+        """
+        Get progress, throughput and latency percentiles
+        """
+        end = self.finished_at or time.time()
+        elapsed = end - self.started_at if self.started_at else 0.0
+        ordered = sorted(self.latencies)
+        return {
+            "id": self.id,
+            "status": self.status,
+            "error": self.error,
+            "speed": self.speed or "max",
+            "published": self.published,
+            "delivered": self.delivered,
+            "elapsed": elapsed,
+            "msgs_per_sec": self.published / elapsed if elapsed else 0.0,
+            "event_time": self.event_time,
+            "latency_ms": {
+                "p50": (percentile(ordered, 50) or 0.0) * 1000,
+                "p90": (percentile(ordered, 90) or 0.0) * 1000,
+                "p99": (percentile(ordered, 99) or 0.0) * 1000,
+                "max": (ordered[-1] if ordered else 0.0) * 1000
+            }
+        }
+
+
+# Current replay, if any
+replay_session: Optional[ReplaySession] = None
+
+
+def start_replay(source: AsyncIterator[ReplayEvent], speed: float) -> ReplaySession:
+    """
+    Start a replay unless one is already running
+    """
+    global replay_session
+    
+    if replay_session is not None and replay_session.running:
+        raise RuntimeError(f"Replay {replay_session.id} is already running")
+    
+    replay_session = ReplaySession(
+        source,
+        speed=speed,
+        batch_size=settings.REPLAY_BATCH_SIZE,
+        max_samples=settings.REPLAY_MAX_SAMPLES
+    )
+    replay_session.start()
+    logger.info(f"Replay {replay_session.id} started at speed {speed or 'max'}")
+    return replay_session
+
+
+async def stop_replay():
+    """
+    Cancel the current replay
+    """
+    if replay_session is not None:
+        await replay_session.stop()
+
+
+def on_replay_tick(symbol: str, payload: str):
+    """
+    Pass ticks received by this worker to the current replay
+    """
+    if replay_session is not None:
+        replay_session.on_tick(symbol, payload)
+
+
+def get_replay() -> Optional[ReplaySession]:
+    """
+    Get the current or most recent replay
+    """
+    return replay_session
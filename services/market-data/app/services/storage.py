@@ -0,0 +1,90 @@
+"""
+Hypertable storage, compression and policy job statistics
+"""
+import json
+from typing import Any, Dict, List
+
+from ..database import get_pool
+
+HYPERTABLES_QUERY = """
+    SELECT hypertable_name,
+           num_chunks,
+           compression_enabled,
+           hypertable_size(format('%I.%I', hypertable_schema, hypertable_name)::regclass) AS total_bytes
+    FROM timescaledb_information.hypertables
+    ORDER BY hypertable_name
+"""
+
+# One row per compression-enabled hypertable
+COMPRESSION_QUERY = """
+    SELECT h.hypertable_name, s.*
+    FROM timescaledb_information.hypertables h,
+         hypertable_compression_stats(format('%I.%I', h.hypertable_schema, h.hypertable_name)::regclass) s
+    WHERE h.compression_enabled
+"""
+
+POLICY_JOBS_QUERY = """
+    SELECT j.job_id, j.proc_name, j.hypertable_name, j.schedule_interval::text, j.config::text,
+           s.last_run_status, s.last_successful_finish, s.next_start, s.total_failures
+    FROM timescaledb_information.jobs j
+    LEFT JOIN timescaledb_information.job_stats s ON s.job_id = j.job_id
+    WHERE j.proc_name IN ('policy_compression', 'policy_retention')
+    ORDER BY j.hypertable_name, j.proc_name
+"""
+
+
+def compression_ratio(before: int, after: int) -> float:
+    """
+    Get how many times smaller compressed chunks are than they were
+    """
+    return before / after if after else 0.0
+
+
+async def get_storage_stats() -> Dict[str, Any]:
+    """
+    Get size, compression and retention state of every hypertable
+    """
+    async with get_pool().acquire() as conn:
+        hypertables = await conn.fetch(HYPERTABLES_QUERY)
+        compression = await conn.fetch(COMPRESSION_QUERY)
+        jobs = await conn.fetch(POLICY_JOBS_QUERY)
+    
+    compressed: Dict[str, Dict[str, Any]] = {}
+    for row in compression:
+        before = row["before_compression_total_bytes"] or 0
+        after = row["after_compression_total_bytes"] or 0
+        compressed[row["hypertable_name"]] = {
+            "chunks": row["total_chunks"],
+            "compressed_chunks": row["number_compressed_chunks"],
+            "before_bytes": before,
+            "after_bytes": after,
+            "ratio": compression_ratio(before, after)
+        }
+    
+    policies: List[Dict[str, Any]] = [
+        {
+            "job_id": row["job_id"],
+            "policy": row["proc_name"].replace("policy_", ""),
+            "hypertable": row["hypertable_name"],
+            "schedule_interval": row["schedule_interval"],
+            "config": json.loads(row["config"]) if row["config"] else {},
+            "last_run_status": row["last_run_status"],
+            "last_successful_finish": row["last_successful_finish"],
+            "next_start": row["next_start"],
+            "total_failures": row["total_failures"]
+        }
+        for row in jobs
+    ]
+    
+    return {
+        "hypertables": {
+            row["hypertable_name"]: {
+                "chunks": row["num_chunks"],
+                "total_bytes": row["total_bytes"],
+                "compression_enabled": row["compression_enabled"],
+                "compression": compressed.get(row["hypertable_name"])
+            }
+            for row in hypertables
+        },
+        "policies": policies
+    }
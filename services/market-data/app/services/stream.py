@@ -0,0 +1,403 @@
+"""
+Multiplexed tick and depth fan-out for WebSocket clients
+"""
+import asyncio
+import json
+import logging
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Set, Union
+
+import msgpack
+
+from ..config import settings
+from ..utils.redis_client import RedisPubSub, TICK_CHANNEL_PREFIX, REPLAY_TICK_CHANNEL_PREFIX, BOOK_CHANNEL_PREFIX
+
+logger = logging.getLogger(__name__)
+
+TickListener = Callable[[str, str], None]
+
+
+ENCODINGS = ("json", "msgpack")
+
+# Client-facing subscription channels: trade ticks, order book depth and,
+# for clients that opt in, ticks replayed for load tests
+TICKS = "ticks"
+DEPTH = "depth"
+REPLAY = "replay"
+CHANNELS = (TICKS, DEPTH, REPLAY)
+
+
+def encode_message(message: Dict[str, Any], encoding: str) -> Union[str, bytes]:
+    """
+    Encode a control message for a connection's wire encoding
+    """
+    if encoding == "msgpack":
+        return msgpack.packb(message)
+    return json.dumps(message)
+
+
+def encode_tick(symbol: str, payload: str, encoding: str, frame_type: str = "tick") -> Union[str, bytes]:
+    """
+    Frame a tick's (or depth update's) raw JSON payload for a wire encoding
+    """
+    if encoding == "msgpack":
+        return msgpack.packb({"type": frame_type, "symbol": symbol, "data": json.loads(payload)})
+    return f'{{"type":"{frame_type}","symbol":"{symbol}","data":{payload}}}'
+
+
+def decode_message(data: Union[str, bytes]) -> Any:
+    """
+    Decode a client message sent as JSON text or a msgpack binary frame
+    """
+    if isinstance(data, bytes):
+        return msgpack.unpackb(data)
+    return json.loads(data)
+
+
+class StreamConnection:
+    """
+    A client socket with its symbol subscriptions and a bounded outbox.
+    
+    Ticks, depth updates and replayed ticks are conflated: the outbox keeps
+    only the newest frame per symbol and channel, so a client that falls behind receives the
+    latest value of each rather than a backlog, and its memory is bounded by
+    its subscriptions.
+    Control frames (acks, errors) go through a small FIFO ahead of ticks.
+    """
+    def __init__(self, websocket, encoding: str = "json", max_control_frames: int = 64):
+        if encoding not in ENCODINGS:
+            raise ValueError(f"encoding must be one of {ENCODINGS}")
+        self.websocket = websocket
+        self.encoding = encoding
+        self.symbols: Set[str] = set()
+        self.depth_symbols: Set[str] = set()
+        self.replay_symbols: Set[str] = set()
+        self.pending: Dict[str, Union[str, bytes]] = {}
+        self.control: Deque[Union[str, bytes]] = deque(maxlen=max_control_frames)
+        self._ready = asyncio.Event()
+        self._send = websocket.send_bytes if encoding == "msgpack" else websocket.send_text
+        self._sender: Optional[asyncio.Task] = None
+        
+        self.frames_sent = 0
+        self.frames_conflated = 0
+    
+    def push_tick(self, key: str, frame: Union[str, bytes]):
+        """
+        Queue a frame, replacing any unsent frame with the same key
+        """
+        if key in self.pending:
+            self.frames_conflated += 1
+        self.pending[key] = frame
+        self._ready.set()
+    
+    def enqueue(self, message: Dict[str, Any]):
+        """
+        Queue a control message without waiting on the socket
+        """
+        self.control.append(encode_message(message, self.encoding))
+        self._ready.set()
+    
+    async def _send_loop(self):
+        """
+        Write control frames, then the latest frame of every pending symbol
+        """
+        while True:
+            await self._ready.wait()
+            self._ready.clear()
+            
+            while self.control:
+                await self._send(self.control.popleft())
+                self.frames_sent += 1
+            
+            # Swap the outbox so ticks arriving mid-flush conflate into a fresh one
+            pending, self.pending = self.pending, {}
+            for frame in pending.values():
+                await self._send(frame)
+            self.frames_sent += len(pending)
+    
+    def start(self):
+        """
+        Start writing frames
+        """
+        if self._sender is None:
+            self._sender = asyncio.create_task(self._send_loop())
+    
+    async def stop(self):
+        """
+        Stop writing frames
+        """
+        if self._sender is not None:
+            self._sender.cancel()
+            try:
+                await self._sender
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._sender = None
+
+
+class StreamHub:
+    """
+    Fans ticks out from one shared Redis subscriber to every interested socket.
+    
+    Each worker holds a single pattern subscription on the tick, replay and
+    book channels and an in-memory symbol -> connections index per channel.
+    Replayed ticks never mix with live ones: they reach replay listeners
+    and only the sockets subscribed to the replay channel, as "replay"
+    frames conflated apart from live ticks. A message is framed once per
+    wire encoding in use and then placed in each subscriber's conflating
+    outbox, so a slow socket never blocks the dispatch of the next one.
+    """
+    def __init__(self, max_symbols: int = 500, reconnect_delay: float = 1.0):
+        self.max_symbols = max_symbols
+        self.reconnect_delay = reconnect_delay
+        self.subscriptions: Dict[str, Set[StreamConnection]] = {}
+        self.depth_subscriptions: Dict[str, Set[StreamConnection]] = {}
+        self.replay_subscriptions: Dict[str, Set[StreamConnection]] = {}
+        self.connections: Set[StreamConnection] = set()
+        self.listeners: List[TickListener] = []
+        self.replay_listeners: List[TickListener] = []
+        self._task: Optional[asyncio.Task] = None
+        
+        self.messages_received = 0
+        self.replay_messages_received = 0
+        self.listener_errors = 0
+        self.frames_queued = 0
+    
+    def add_listener(self, listener: TickListener):
+        """
+        Call `listener(symbol, payload)` for every tick received by this worker
+        """
+        self.listeners.append(listener)
+    
+    def add_replay_listener(self, listener: TickListener):
+        """
+        Call `listener(symbol, payload)` for every replayed tick received by this worker
+        """
+        self.replay_listeners.append(listener)
+    
+    def connect(self, websocket, encoding: str = "json") -> StreamConnection:
+        """
+        Register a client socket
+        """
+        connection = StreamConnection(websocket, encoding)
+        self.connections.add(connection)
+        connection.start()
+        return connection
+    
+    async def disconnect(self, connection: StreamConnection):
+        """
+        Drop a client socket and all of its subscriptions
+        """
+        self.unsubscribe(connection, list(connection.symbols))
+        self.unsubscribe(connection, list(connection.depth_symbols), DEPTH)
+        self.unsubscribe(connection, list(connection.replay_symbols), REPLAY)
+        self.connections.discard(connection)
+        await connection.stop()
+    
+    def _indexes(self, connection: StreamConnection, channel: str):
+        """
+        Get the connection's symbol set and the hub's index for a channel
+        """
+        if channel == TICKS:
+            return connection.symbols, self.subscriptions
+        if channel == DEPTH:
+            return connection.depth_symbols, self.depth_subscriptions
+        if channel == REPLAY:
+            return connection.replay_symbols, self.replay_subscriptions
+        raise ValueError(f"channel must be one of {CHANNELS}")
+    
+    def subscribe(self, connection: StreamConnection, symbols: Iterable[str], channel: str = TICKS) -> List[str]:
+        """
+        Subscribe a connection to symbols, returning the ones added
+        """
+        subscribed, index = self._indexes(connection, channel)
+        added = []
+        for symbol in symbols:
+            symbol = symbol.upper()
+            if symbol in subscribed:
+                continue
+            if len(subscribed) >= self.max_symbols:
+                raise ValueError(f"Subscription limit of {self.max_symbols} symbols reached")
+            subscribed.add(symbol)
+            index.setdefault(symbol, set()).add(connection)
+            added.append(symbol)
+        return added
+    
+    def unsubscribe(self, connection: StreamConnection, symbols: Iterable[str], channel: str = TICKS) -> List[str]:
+        """
+        Unsubscribe a connection from symbols, returning the ones removed
+        """
+        subscribed, index = self._indexes(connection, channel)
+        removed = []
+        for symbol in symbols:
+            symbol = symbol.upper()
+            if symbol not in subscribed:
+                continue
+            subscribed.discard(symbol)
+            subscribers = index.get(symbol)
+            if subscribers is not None:
+                subscribers.discard(connection)
+                if not subscribers:
+                    del index[symbol]
+            removed.append(symbol)
+        return removed
+    
+    def dispatch(self, symbol: str, payload: str):
+        """
+        Deliver one tick's raw JSON payload to listeners and subscribers
+        """
+        self.messages_received += 1
+        self._call(self.listeners, symbol, payload)
+        self._push(self.subscriptions, symbol, payload, "tick", symbol)
+    
+    def dispatch_replay(self, symbol: str, payload: str):
+        """
+        Deliver one replayed tick's raw JSON payload to replay listeners and subscribers
+        """
+        self.replay_messages_received += 1
+        self._call(self.replay_listeners, symbol, payload)
+        self._push(self.replay_subscriptions, symbol, payload, REPLAY, f"{REPLAY}:{symbol}")
+    
+    def dispatch_depth(self, symbol: str, payload: str):
+        """
+        Deliver one depth update's raw JSON payload to depth subscribers
+        """
+        self._push(self.depth_subscriptions, symbol, payload, DEPTH, f"{DEPTH}:{symbol}")
+    
+    def _call(self, listeners: List[TickListener], symbol: str, payload: str):
+        """
+        Call listeners, logging rather than propagating their failures
+        """
+        for listener in listeners:
+            try:
+                listener(symbol, payload)
+            except Exception as e:
+                self.listener_errors += 1
+                logger.error(f"Tick listener failed for {symbol}: {str(e)}")
+    
+    def _push(
+        self,
+        index: Dict[str, Set[StreamConnection]],
+        symbol: str,
+        payload: str,
+        frame_type: str,
+        key: str
+    ):
+        """
+        Queue a frame for every subscriber of the symbol in a channel's
+        index, conflated under `key`
+        """
+        subscribers = index.get(symbol)
+        if not subscribers:
+            return
+        
+        frames: Dict[str, Union[str, bytes]] = {}
+        for connection in subscribers:
+            frame = frames.get(connection.encoding)
+            if frame is None:
+                frame = frames[connection.encoding] = encode_tick(symbol, payload, connection.encoding, frame_type)
+            connection.push_tick(key, frame)
+        self.frames_queued += len(subscribers)
+    
+    async def _listen(self):
+        """
+        Consume the tick, replay and book channels, resubscribing after connection loss
+        """
+        tick_prefix = len(TICK_CHANNEL_PREFIX)
+        replay_prefix = len(REPLAY_TICK_CHANNEL_PREFIX)
+        book_prefix = len(BOOK_CHANNEL_PREFIX)
+        while True:
+            pubsub = RedisPubSub()
+            try:
+                await pubsub.psubscribe(
+                    f"{TICK_CHANNEL_PREFIX}*", f"{REPLAY_TICK_CHANNEL_PREFIX}*", f"{BOOK_CHANNEL_PREFIX}*"
+                )
+                async for message in pubsub.listen(decode=False):
+                    channel = message['channel']
+                    if channel.startswith(TICK_CHANNEL_PREFIX):
+                        self.dispatch(channel[tick_prefix:], message['data'])
+                    elif channel.startswith(REPLAY_TICK_CHANNEL_PREFIX):
+                        self.dispatch_replay(channel[replay_prefix:], message['data'])
+                    else:
+                        self.dispatch_depth(channel[book_prefix:], message['data'])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Tick subscriber error: {str(e)}")
+                await asyncio.sleep(self.reconnect_delay)
+            finally:
+                await pubsub.close()
+    
+    def start(self):
+        """
+        Start the shared subscriber
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+    
+    async def stop(self):
+        """
+        Stop the shared subscriber and drop every connection
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for connection in list(self.connections):
+            await self.disconnect(connection)
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get fan-out counters
+        """
+        return {
+            "connections": len(self.connections),
+            "symbols": len(self.subscriptions),
+            "depth_symbols": len(self.depth_subscriptions),
+            "replay_symbols": len(self.replay_subscriptions),
+            "messages_received": self.messages_received,
+            "replay_messages_received": self.replay_messages_received,
+            "listener_errors": self.listener_errors,
+            "frames_queued": self.frames_queued,
+            "frames_conflated": sum(c.frames_conflated for c in self.connections),
+            "pending_frames": sum(len(c.pending) for c in self.connections)
+        }
+
+
+# Global stream hub
+stream_hub: Optional[StreamHub] = None
+
+
+async def init_stream_hub():
+    """
+    Initialize the stream hub and start the shared subscriber
+    """
+    global stream_hub
+    
+    stream_hub = StreamHub(max_symbols=settings.STREAM_MAX_SYMBOLS)
+    stream_hub.start()
+    logger.info("Stream hub started")
+
+
+async def close_stream_hub():
+    """
+    Stop the stream hub
+    """
+    global stream_hub
+    
+    if stream_hub:
+        await stream_hub.stop()
+        stream_hub = None
+        logger.info("Stream hub stopped")
+
+
+def get_stream_hub() -> StreamHub:
+    """
+    Get stream hub instance
+    """
+    if not stream_hub:
+        raise RuntimeError("Stream hub not initialized")
+    return stream_hub
@@ -0,0 +1,288 @@
+"""
+Incremental indicators updated in constant time per tick or bar
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from ..config import settings
+from ..utils.redis_client import RedisPubSub, indicator_channel
+from .indicators import parse_spec, spec_key
+
+logger = logging.getLogger(__name__)
+
+
+class RunningEMA:
+    """
+    Exponential moving average seeded with the SMA of the first `period` values
+    """
+    __slots__ = ("period", "alpha", "value", "_count", "_seed")
+    defaults = (20,)
+    
+    def __init__(self, period: int = 20):
+        self.period = period
+        self.alpha = 2.0 / (period + 1)
+        self.value: Optional[float] = None
+        self._count = 0
+        self._seed = 0.0
+    
+    def update(self, x: float) -> Optional[float]:
+        if self.value is not None:
+            self.value += self.alpha * (x - self.value)
+        else:
+            self._count += 1
+            self._seed += x
+            if self._count == self.period:
+                self.value = self._seed / self.period
+        return self.value
+
+
+class RollingSMA:
+    """
+    Simple moving average over a fixed ring buffer
+    """
+    __slots__ = ("period", "value", "_buffer", "_index", "_count", "_total")
+    defaults = (20,)
+    
+    def __init__(self, period: int = 20):
+        self.period = period
+        self.value: Optional[float] = None
+        self._buffer = [0.0] * period
+        self._index = 0
+        self._count = 0
+        self._total = 0.0
+    
+    def update(self, x: float) -> Optional[float]:
+        self._total += x - self._buffer[self._index]
+        self._buffer[self._index] = x
+        self._index += 1
+        if self._index == self.period:
+            self._index = 0
+            # Re-sum once per lap so floating point drift cannot accumulate
+            self._total = sum(self._buffer)
+        
+        if self._count < self.period:
+            self._count += 1
+            if self._count < self.period:
+                return None
+        self.value = self._total / self.period
+        return self.value
+
+
+class WelfordVariance:
+    """
+    Running population variance using Welford's algorithm
+    """
+    __slots__ = ("value", "mean", "_count", "_m2")
+    defaults = ()
+    
+    def __init__(self):
+        self.value: Optional[float] = None
+        self.mean = 0.0
+        self._count = 0
+        self._m2 = 0.0
+    
+    def update(self, x: float) -> Optional[float]:
+        self._count += 1
+        delta = x - self.mean
+        self.mean += delta / self._count
+        self._m2 += delta * (x - self.mean)
+        self.value = self._m2 / self._count
+        return self.value
+
+
+class WilderRSI:
+    """
+    Relative strength index with Wilder smoothing
+    """
+    __slots__ = ("period", "value", "_previous", "_count", "_avg_gain", "_avg_loss")
+    defaults = (14,)
+    
+    def __init__(self, period: int = 14):
+        self.period = period
+        self.value: Optional[float] = None
+        self._previous: Optional[float] = None
+        self._count = 0
+        self._avg_gain = 0.0
+        self._avg_loss = 0.0
+    
+    def update(self, x: float) -> Optional[float]:
+        previous, self._previous = self._previous, x
+        if previous is None:
+            return None
+        
+        change = x - previous
+        gain = change if change > 0 else 0.0
+        loss = -change if change < 0 else 0.0
+        
+        if self._count < self.period:
+            # Seed both averages with the simple mean of the first changes
+            self._count += 1
+            self._avg_gain += gain / self.period
+            self._avg_loss += loss / self.period
+            if self._count < self.period:
+                return None
+        else:
+            self._avg_gain += (gain - self._avg_gain) / self.period
+            self._avg_loss += (loss - self._avg_loss) / self.period
+        
+        if self._avg_loss == 0:
+            self.value = 50.0 if self._avg_gain == 0 else 100.0
+        else:
+            self.value = 100.0 - 100.0 / (1.0 + self._avg_gain / self._avg_loss)
+        return self.value
+
+
+STREAMING_INDICATORS = {
+    "ema": RunningEMA,
+    "sma": RollingSMA,
+    "rsi": WilderRSI,
+    "var": WelfordVariance,
+}
+
+
+class IndicatorStream:
+    """
+    Keeps a set of incremental indicators per symbol and publishes them.
+    
+    Updates are applied inline in O(1) per indicator; publication is
+    decoupled: updated symbols are marked dirty and flushed to their
+    indicator channels every `interval` seconds in one pipelined round trip,
+    so a burst of ticks for a symbol costs one message, not one per tick.
+    """
+    def __init__(self, spec: List[Tuple[str, Tuple[float, ...]]], interval: float = 0.1):
+        self.spec = spec
+        self.keys = [spec_key(name, params) for name, params in spec]
+        self.interval = interval
+        self.symbols: Dict[str, list] = {}
+        self.last: Dict[str, Tuple[float, float]] = {}
+        self.dirty: Set[str] = set()
+        self.pubsub = RedisPubSub()
+        self._task: Optional[asyncio.Task] = None
+        
+        self.updates = 0
+        self.published = 0
+    
+    def update(self, symbol: str, price: float, timestamp: Optional[float] = None):
+        """
+        Feed a new price for a symbol
+        """
+        indicators = self.symbols.get(symbol)
+        if indicators is None:
+            indicators = self.symbols[symbol] = [
+                STREAMING_INDICATORS[name](*params) for name, params in self.spec
+            ]
+        for indicator in indicators:
+            indicator.update(price)
+        
+        self.last[symbol] = (price, timestamp if timestamp is not None else time.time())
+        self.dirty.add(symbol)
+        self.updates += 1
+    
+    def snapshot(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the current indicator values for a symbol
+        """
+        indicators = self.symbols.get(symbol)
+        if indicators is None:
+            return None
+        
+        price, timestamp = self.last[symbol]
+        values: Dict[str, Any] = {"symbol": symbol, "price": price, "timestamp": timestamp}
+        for key, indicator in zip(self.keys, indicators):
+            values[key] = indicator.value
+        return values
+    
+    async def flush(self) -> int:
+        """
+        Publish every symbol updated since the last flush
+        """
+        if not self.dirty:
+            return 0
+        dirty, self.dirty = self.dirty, set()
+        messages = {indicator_channel(symbol): self.snapshot(symbol) for symbol in dirty}
+        await self.pubsub.publish_many(messages)
+        self.published += len(messages)
+        return len(messages)
+    
+    async def _run(self):
+        """
+        Flush on a fixed interval until stopped
+        """
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Indicator publish failed: {str(e)}")
+    
+    def start(self):
+        """
+        Start publishing
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """
+        Publish outstanding updates and stop
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get update and publish counters
+        """
+        return {
+            "indicators": self.keys,
+            "symbols": len(self.symbols),
+            "updates": self.updates,
+            "published": self.published,
+            "pending": len(self.dirty)
+        }
+
+
+# Global indicator stream
+indicator_stream: Optional[IndicatorStream] = None
+
+
+async def init_indicator_stream():
+    """
+    Initialize the indicator stream and start publishing
+    """
+    global indicator_stream
+    
+    indicator_stream = IndicatorStream(
+        parse_spec(settings.STREAMING_INDICATORS, STREAMING_INDICATORS),
+        interval=settings.STREAMING_PUBLISH_INTERVAL
+    )
+    indicator_stream.start()
+    logger.info(f"Indicator stream started with {indicator_stream.keys}")
+
+
+async def close_indicator_stream():
+    """
+    Stop the indicator stream
+    """
+    global indicator_stream
+    
+    if indicator_stream:
+        await indicator_stream.stop()
+        indicator_stream = None
+
+
+def get_indicator_stream() -> IndicatorStream:
+    """
+    Get indicator stream instance
+    """
+    if not indicator_stream:
+        raise RuntimeError("Indicator stream not initialized")
+    return indicator_stream
@@ -0,0 +1,37 @@
+"""
+Entry point for live ticks produced by this service
+"""
+from typing import Any, Dict, List, Tuple
+
+from .aggregator import get_bar_aggregator
+from .quote_cache import get_quote_cache
+from .streaming_indicators import get_indicator_stream
+
+
+async def publish_tick(symbol: str, quote: Dict[str, Any]) -> int:
+    """
+    Refresh the quote cache, broadcast the tick, update streaming indicators
+    and fold the tick into the open bars
+    """
+    symbol = symbol.upper()
+    timestamp = quote.get("timestamp")
+    get_indicator_stream().update(symbol, quote["price"], timestamp)
+    get_bar_aggregator().update(symbol, quote["price"], quote.get("size", 0.0), timestamp)
+    return await get_quote_cache().publish_tick(symbol, quote)
+
+
+async def publish_ticks(ticks: List[Tuple[str, Dict[str, Any]]]) -> int:
+    """
+    Publish a batch of (symbol, quote) ticks, e.g. one provider message, in
+    a single Redis round trip
+    """
+    indicators = get_indicator_stream()
+    aggregator = get_bar_aggregator()
+    batch = []
+    for symbol, quote in ticks:
+        symbol = symbol.upper()
+        timestamp = quote.get("timestamp")
+        indicators.update(symbol, quote["price"], timestamp)
+        aggregator.update(symbol, quote["price"], quote.get("size", 0.0), timestamp)
+        batch.append((symbol, quote))
+    return await get_quote_cache().publish_ticks(batch)
@@ -0,0 +1,3 @@
+"""
+Utility modules for Market Data Service
+"""
@@ -0,0 +1,79 @@
+"""
+Conditional GET helpers: ETags and cache headers for historical reads
+"""
+import hashlib
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    Build a weak ETag from the values that determine a response.
+    
+    Weak because the same data may be sent with a different encoding
+    (e.g. compressed by the gateway) while meaning the same thing.
+    """
+    digest = hashlib.blake2b("|".join(map(str, parts)).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Check an If-None-Match header against an ETag using weak comparison
+    """
+    if not if_none_match:
+        return False
+    opaque = etag.removeprefix("W/")
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == opaque:
+            return True
+    return False
+
+
+def is_closed_range(
+    end: Optional[datetime],
+    bar_seconds: int,
+    settle_seconds: float,
+    now: Optional[datetime] = None
+) -> bool:
+    """
+    Check whether every bar in a range ending at `end` has closed and had
+    `settle_seconds` for late writes to land
+    """
+    if end is None:
+        return False
+    now = now or datetime.now(timezone.utc)
+    return end + timedelta(seconds=bar_seconds + settle_seconds) <= now
+
+
+def write_time(write_id: str) -> float:
+    """
+    Get when a logged bar write ("<time>-<writer>-<n>") happened
+    """
+    return float(write_id.split("-")[0])
+
+
+def series_version(write_id: Optional[str], refresh_seconds: Optional[float], now: float) -> str:
+    """
+    Get the version of a bar range for its ETag from the id of the last
+    write that touched it. Ranges rolled up on a refresh
+    schedule get a second version once `refresh_seconds` have passed, when
+    the rollup has caught up with the write.
+    """
+    if write_id is None:
+        return "0"
+    if refresh_seconds is None or now >= write_time(write_id) + refresh_seconds:
+        return write_id
+    return f"{write_id}+refreshing"
+
+
+def cache_headers(etag: str, closed: bool, max_age: int) -> Dict[str, str]:
+    """
+    Get the caching headers for a response: closed ranges may be reused for
+    `max_age` seconds, anything else must be revalidated with its ETag
+    """
+    return {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={max_age}" if closed else "no-cache"
+    }
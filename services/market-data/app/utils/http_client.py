@@ -0,0 +1,51 @@
+"""
+Shared HTTP client with pooled keep-alive connections
+"""
+import logging
+from typing import Optional
+
+import httpx
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+# Global HTTP client, shared by every provider so connections are reused
+http_client: Optional[httpx.AsyncClient] = None
+
+
+async def init_http_client():
+    """
+    Initialize the shared HTTP client
+    """
+    global http_client
+    
+    http_client = httpx.AsyncClient(
+        timeout=settings.HTTP_TIMEOUT,
+        limits=httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE
+        )
+    )
+    logger.info("HTTP client initialized")
+
+
+async def close_http_client():
+    """
+    Close the shared HTTP client
+    """
+    global http_client
+    
+    if http_client:
+        await http_client.aclose()
+        http_client = None
+        logger.info("HTTP client closed")
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Get HTTP client instance
+    """
+    if not http_client:
+        raise RuntimeError("HTTP client not initialized")
+    return http_client
@@ -0,0 +1,209 @@
+"""
+Redis client configuration and utilities
+"""
+import redis.asyncio as redis
+import json
+import logging
+from typing import Any, Optional, Dict
+
+from ..config import settings, get_app_config
+
+logger = logging.getLogger(__name__)
+
+# Global Redis client
+redis_client: Optional[redis.Redis] = None
+
+# Live ticks are published on one channel per symbol, e.g. "ticks:AAPL"
+TICK_CHANNEL_PREFIX = "ticks:"
+
+# Replayed historical ticks, e.g. "replay:ticks:AAPL"; kept apart from the
+# live channels so consumers such as the trading engine never act on them
+REPLAY_TICK_CHANNEL_PREFIX = "replay:ticks:"
+
+# Streaming indicator values, e.g. "indicators:AAPL"
+INDICATOR_CHANNEL_PREFIX = "indicators:"
+
+# Closed bars from the tick aggregator, e.g. "bars:1m:AAPL"
+BAR_CHANNEL_PREFIX = "bars:"
+
+# Order book depth, e.g. "book:AAPL"; the latest depth is also stored under the same key
+BOOK_CHANNEL_PREFIX = "book:"
+
+# Bar writes per symbol, e.g. "bar_writes:AAPL": a sorted set of write ids
+# scored by the first day each write touched, from which bar and indicator
+# ETags are versioned so rewritten history is never served as unchanged
+BAR_WRITES_KEY_PREFIX = "bar_writes:"
+
+
+def tick_channel(symbol: str) -> str:
+    """
+    Get the pub/sub channel carrying ticks for a symbol
+    """
+    return f"{TICK_CHANNEL_PREFIX}{symbol.upper()}"
+
+
+def replay_tick_channel(symbol: str) -> str:
+    """
+    Get the pub/sub channel carrying replayed ticks for a symbol
+    """
+    return f"{REPLAY_TICK_CHANNEL_PREFIX}{symbol.upper()}"
+
+
+def indicator_channel(symbol: str) -> str:
+    """
+    Get the pub/sub channel carrying streaming indicators for a symbol
+    """
+    return f"{INDICATOR_CHANNEL_PREFIX}{symbol.upper()}"
+
+
+def bar_channel(symbol: str, timeframe: str) -> str:
+    """
+    Get the pub/sub channel carrying closed bars of a timeframe for a symbol
+    """
+    return f"{BAR_CHANNEL_PREFIX}{timeframe}:{symbol.upper()}"
+
+
+def book_channel(symbol: str) -> str:
+    """
+    Get the pub/sub channel carrying order book depth for a symbol
+    """
+    return f"{BOOK_CHANNEL_PREFIX}{symbol.upper()}"
+
+
+def bar_writes_key(symbol: str) -> str:
+    """
+    Get the key holding the log of a symbol's bar writes
+    """
+    return f"{BAR_WRITES_KEY_PREFIX}{symbol.upper()}"
+
+
+async def init_redis():
+    """
+    Initialize Redis connection
+    """
+    global redis_client
+    
+    try:
+        redis_config = get_app_config().get("redis", {})
+        redis_client = redis.from_url(
+            settings.REDIS_URL,
+            encoding="utf-8",
+            decode_responses=True,
+            max_connections=redis_config.get("max_connections", 50)
+        )
+        
+        # Test connection
+        await redis_client.ping()
+        logger.info("Redis connection initialized successfully")
+        
+    except Exception as e:
+        logger.error(f"Failed to initialize Redis: {str(e)}")
+        raise
+
+
+async def close_redis():
+    """
+    Close Redis connection
+    """
+    global redis_client
+    
+    if redis_client:
+        await redis_client.close()
+        logger.info("Redis connection closed")
+
+
+def get_redis() -> redis.Redis:
+    """
+    Get Redis client instance
+    """
+    if not redis_client:
+        raise RuntimeError("Redis client not initialized")
+    return redis_client
+
+
+class RedisPubSub:
+    """
+    Redis pub/sub wrapper
+    """
+    def __init__(self):
+        self.client = get_redis()
+        self.pubsub = None
+    
+    async def subscribe(self, *channels: str):
+        """
+        Subscribe to channels
+        """
+        self.pubsub = self.client.pubsub()
+        await self.pubsub.subscribe(*channels)
+        logger.info(f"Subscribed to channels: {channels}")
+    
+    async def psubscribe(self, *patterns: str):
+        """
+        Subscribe to channel patterns
+        """
+        self.pubsub = self.client.pubsub()
+        await self.pubsub.psubscribe(*patterns)
+        logger.info(f"Subscribed to patterns: {patterns}")
+    
+    async def unsubscribe(self, *channels: str):
+        """
+        Unsubscribe from channels
+        """
+        if self.pubsub:
+            await self.pubsub.unsubscribe(*channels)
+            logger.info(f"Unsubscribed from channels: {channels}")
+    
+    async def publish(self, channel: str, message: Dict[str, Any]) -> int:
+        """
+        Publish message to channel
+        """
+        try:
+            serialized = json.dumps(message)
+            return await self.client.publish(channel, serialized)
+        except Exception as e:
+            logger.error(f"Redis publish error: {str(e)}")
+            return 0
+    
+    async def publish_many(self, messages: Dict[str, Dict[str, Any]]) -> int:
+        """
+        Publish one message per channel in a single pipelined round trip
+        """
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for channel, message in messages.items():
+                pipe.publish(channel, json.dumps(message))
+            return sum(await pipe.execute())
+        except Exception as e:
+            logger.error(f"Redis publish error: {str(e)}")
+            return 0
+    
+    async def listen(self, decode: bool = True):
+        """
+        Listen for messages, optionally leaving payloads as raw JSON text
+        """
+        if not self.pubsub:
+            raise RuntimeError("Not subscribed to any channels")
+        
+        async for message in self.pubsub.listen():
+            if message['type'] in ('message', 'pmessage'):
+                if not decode:
+                    yield {
+                        'channel': message['channel'],
+                        'data': message['data']
+                    }
+                    continue
+                try:
+                    data = json.loads(message['data'])
+                    yield {
+                        'channel': message['channel'],
+                        'data': data
+                    }
+                except json.JSONDecodeError:
+                    logger.error(f"Failed to decode message: {message['data']}")
+    
+    async def close(self):
+        """
+        Close pub/sub connection
+        """
+        if self.pubsub:
+            await self.pubsub.close()
@@ -0,0 +1,149 @@
+"""
+Single-flight coalescing of identical concurrent calls
+"""
+import asyncio
+import json
+import logging
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+logger = logging.getLogger(__name__)
+
+# Delete the lock only if this caller still owns it
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class SingleFlight:
+    """
+    In-process single flight: concurrent calls with the same key share one
+    in-flight task instead of each running the underlying call.
+    
+    The shared task is shielded, so a caller that gets cancelled (e.g. a
+    client disconnect) does not cancel the work the others are waiting on.
+    """
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.coalesced = 0
+    
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run `fn`, or join the call already running for `key`
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        Get call counters
+        """
+        return {
+            "inflight": len(self._inflight),
+            "calls": self.calls,
+            "coalesced": self.coalesced
+        }
+
+
+class RedisSingleFlight:
+    """
+    Single flight across workers.
+    
+    Calls are first coalesced in-process; the one call per worker that is
+    left then races for a Redis lock (SET NX PX). The winner runs the call
+    and stores its JSON result under a short-lived key, the others poll for
+    that result instead of repeating the work. If Redis is unavailable or
+    the winner overruns `lock_ttl`, callers run the call themselves rather
+    than fail.
+    """
+    def __init__(
+        self,
+        client,
+        prefix: str = "singleflight",
+        lock_ttl: float = 5.0,
+        result_ttl: float = 1.0,
+        poll_interval: float = 0.01
+    ):
+        self.client = client
+        self.prefix = prefix
+        self.lock_ttl = lock_ttl
+        self.result_ttl = result_ttl
+        self.poll_interval = poll_interval
+        self.local = SingleFlight()
+        self.led = 0
+        self.followed = 0
+        self.fallbacks = 0
+    
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run `fn`, or wait for the call another worker is running for `key`
+        """
+        return await self.local.do(key, lambda: self._do_shared(key, fn))
+    
+    async def _do_shared(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Take the lock and run `fn`, or wait for the lock holder's result
+        """
+        lock_key = f"{self.prefix}:lock:{key}"
+        result_key = f"{self.prefix}:result:{key}"
+        token = uuid.uuid4().hex
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.lock_ttl
+        
+        waiting = False
+        while True:
+            try:
+                # Once waiting, look for the holder's result before retrying
+                # the lock, which it releases as soon as the result is stored
+                cached = await self.client.get(result_key) if waiting else None
+                if cached is not None:
+                    self.followed += 1
+                    return json.loads(cached)
+                if await self.client.set(lock_key, token, nx=True, px=int(self.lock_ttl * 1000)):
+                    break
+            except Exception as e:
+                logger.error(f"Single flight lock error: {str(e)}")
+                self.fallbacks += 1
+                return await fn()
+            
+            if loop.time() >= deadline:
+                self.fallbacks += 1
+                return await fn()
+            waiting = True
+            await asyncio.sleep(self.poll_interval)
+        
+        self.led += 1
+        try:
+            result = await fn()
+            try:
+                await self.client.set(result_key, json.dumps(result), px=int(self.result_ttl * 1000))
+            except Exception as e:
+                logger.error(f"Single flight result error: {str(e)}")
+            return result
+        finally:
+            try:
+                await self.client.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+            except Exception as e:
+                logger.error(f"Single flight unlock error: {str(e)}")
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        Get call counters
+        """
+        return {
+            **self.local.stats(),
+            "led": self.led,
+            "followed": self.followed,
+            "fallbacks": self.fallbacks
+        }
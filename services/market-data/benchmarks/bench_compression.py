@@ -0,0 +1,171 @@
+"""
+Benchmark market_data storage size and range-scan latency with compression
+
+Creates a scratch hypertable shaped like market_data, with the same chunk
+interval and compression settings as scripts/init-db.sql. It loads
+synthetic 1m bars, then measures on-disk size and the latency of the bar
+page query the REST and streaming endpoints run. It compresses every chunk
+and measures again, then drops the table.
+
+Usage (from services/market-data, with the service environment loaded):
+    python -m benchmarks.bench_compression --symbols 50 --days 30
+    python -m benchmarks.bench_compression --queries 500 --window-hours 24 --keep
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import asyncpg
+
+from app.config import settings
+from app.services.bars import BARS_QUERY
+
+TABLE = "bench_market_data"
+COLUMNS = ["time", "symbol", "open", "high", "low", "close", "volume", "timeframe"]
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def price(value: float) -> Decimal:
+    return Decimal(f"{value:.4f}")
+
+
+def make_bars(symbol: str, start: datetime, days: int, rng: random.Random):
+    """
+    Generate a random walk of regular-session 1m bars for one symbol
+    """
+    close = rng.uniform(20, 500)
+    for day in range(days):
+        session = start + timedelta(days=day, hours=14, minutes=30)
+        if session.weekday() >= 5:
+            continue
+        for minute in range(390):
+            open_ = close
+            close = max(0.01, open_ * (1 + rng.gauss(0, 0.001)))
+            high = max(open_, close) * (1 + abs(rng.gauss(0, 0.0005)))
+            low = min(open_, close) * (1 - abs(rng.gauss(0, 0.0005)))
+            yield (
+                session + timedelta(minutes=minute), symbol,
+                price(open_), price(high), price(low), price(close),
+                rng.randint(100, 100000), "1m"
+            )
+
+
+async def setup(conn: asyncpg.Connection, args) -> int:
+    """
+    Create and fill the scratch hypertable
+    """
+    await conn.execute(f"DROP TABLE IF EXISTS {TABLE}")
+    await conn.execute(f"CREATE TABLE {TABLE} (LIKE market_data INCLUDING DEFAULTS INCLUDING INDEXES)")
+    await conn.execute(f"SELECT create_hypertable('{TABLE}', 'time', chunk_time_interval => INTERVAL '1 day')")
+    await conn.execute(f"""
+        ALTER TABLE {TABLE} SET (
+            timescaledb.compress,
+            timescaledb.compress_segmentby = 'symbol, timeframe',
+            timescaledb.compress_orderby = 'time DESC'
+        )
+    """)
+    
+    rng = random.Random(args.seed)
+    rows = 0
+    for i in range(args.symbols):
+        records = list(make_bars(f"SYM{i}", args.start, args.days, rng))
+        await conn.copy_records_to_table(TABLE, records=records, columns=COLUMNS)
+        rows += len(records)
+    await conn.execute(f"ANALYZE {TABLE}")
+    return rows
+
+
+async def table_size(conn: asyncpg.Connection) -> int:
+    return await conn.fetchval(f"SELECT hypertable_size('{TABLE}')")
+
+
+async def range_scans(conn: asyncpg.Connection, args) -> list:
+    """
+    Time the bar page query over random symbols and windows
+    """
+    query = BARS_QUERY.format(relation=TABLE, timeframe_filter="\n      AND timeframe = $5")
+    statement = await conn.prepare(query)
+    rng = random.Random(args.seed + 1)
+    window = timedelta(hours=args.window_hours)
+    span = timedelta(days=args.days) - window
+    
+    # Warm up the plan and the buffer cache for a fair comparison
+    for _ in range(min(args.queries, 20)):
+        await statement.fetch("SYM0", args.start, args.start + window, args.limit, "1m")
+    
+    samples = []
+    for _ in range(args.queries):
+        symbol = f"SYM{rng.randrange(args.symbols)}"
+        start = args.start + span * rng.random()
+        t0 = time.perf_counter()
+        await statement.fetch(symbol, start, start + window, args.limit, "1m")
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def report(label: str, size: int, samples: list):
+    print(
+        "{:<12} size={:>10.1f}MB  scan p50={:.2f}ms p90={:.2f}ms p99={:.2f}ms".format(
+            label,
+            size / 1024 / 1024,
+            percentile(samples, 50) * 1000,
+            percentile(samples, 90) * 1000,
+            percentile(samples, 99) * 1000
+        )
+    )
+
+
+async def run(args):
+    conn = await asyncpg.connect(
+        user=settings.POSTGRES_USER,
+        password=settings.POSTGRES_PASSWORD,
+        database=settings.POSTGRES_DB,
+        host=settings.POSTGRES_HOST,
+        port=settings.POSTGRES_PORT,
+        ssl=False
+    )
+    try:
+        started = time.perf_counter()
+        rows = await setup(conn, args)
+        print(f"loaded {rows:,} bars for {args.symbols} symbols over {args.days} days in {time.perf_counter() - started:.1f}s")
+        
+        before = await table_size(conn)
+        report("uncompressed", before, await range_scans(conn, args))
+        
+        started = time.perf_counter()
+        chunks = await conn.fetchval(f"SELECT count(compress_chunk(c)) FROM show_chunks('{TABLE}') c")
+        print(f"compressed {chunks} chunks in {time.perf_counter() - started:.1f}s")
+        await conn.execute(f"ANALYZE {TABLE}")
+        
+        after = await table_size(conn)
+        report("compressed", after, await range_scans(conn, args))
+        print(f"compression ratio: {before / after:.1f}x")
+    finally:
+        if not args.keep:
+            await conn.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        await conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--symbols", type=int, default=50)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--window-hours", type=float, default=6.5, help="range covered by each scan")
+    parser.add_argument("--limit", type=int, default=5000, help="page size of each scan")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--keep", action="store_true", help="keep the scratch table afterwards")
+    args = parser.parse_args()
+    args.start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
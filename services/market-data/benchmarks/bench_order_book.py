@@ -0,0 +1,88 @@
+"""
+Benchmark L2 order book delta application
+
+Builds a book from a snapshot and applies a stream of add/modify/delete
+deltas clustered around the top of book, as an exchange feed would, then
+reports deltas per second and per-delta latency percentiles.
+
+Usage (from services/market-data, with the service environment loaded):
+    python -m benchmarks.bench_order_book --levels 1000 --deltas 200000
+"""
+import argparse
+import random
+import time
+
+from app.services.order_book import OrderBook
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def make_deltas(count: int, levels: int, tick: float, mid: float, seed: int) -> list:
+    """
+    Generate deltas with prices concentrated near the mid
+    """
+    rng = random.Random(seed)
+    deltas = []
+    for sequence in range(1, count + 1):
+        side = "bid" if rng.random() < 0.5 else "ask"
+        offset = min(int(rng.expovariate(1 / 10)), levels - 1) + 1
+        price = round(mid - offset * tick if side == "bid" else mid + offset * tick, 2)
+        roll = rng.random()
+        if roll < 0.2:
+            deltas.append((sequence, side, "delete", price, 0.0))
+        else:
+            deltas.append((sequence, side, "add" if roll < 0.5 else "modify", price, float(rng.randint(1, 500))))
+    return deltas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--levels", type=int, default=1000, help="price levels per side in the snapshot")
+    parser.add_argument("--deltas", type=int, default=200000)
+    parser.add_argument("--tick", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    
+    mid = 100.0
+    book = OrderBook("BENCH")
+    book.apply_snapshot(
+        0,
+        bids=[[round(mid - i * args.tick, 2), 100.0] for i in range(1, args.levels + 1)],
+        asks=[[round(mid + i * args.tick, 2), 100.0] for i in range(1, args.levels + 1)]
+    )
+    deltas = make_deltas(args.deltas, args.levels, args.tick, mid, args.seed)
+    
+    # Throughput: apply the whole stream back to back
+    apply = book.apply_delta
+    started = time.perf_counter()
+    for delta in deltas:
+        apply(*delta)
+    elapsed = time.perf_counter() - started
+    
+    # Latency: time each delta individually on a fresh stream
+    sequence = book.sequence
+    samples = []
+    clock = time.perf_counter
+    for delta in deltas:
+        sequence += 1
+        t0 = clock()
+        apply(sequence, *delta[1:])
+        samples.append(clock() - t0)
+    
+    print(f"levels/side={args.levels} deltas={args.deltas}")
+    print(f"book after run: {len(book.bids)} bids, {len(book.asks)} asks, sequence {book.sequence}")
+    print(f"throughput: {args.deltas / elapsed:,.0f} deltas/s ({elapsed / args.deltas * 1e6:.2f}us/delta)")
+    print(
+        "latency: p50={:.2f}us p99={:.2f}us p99.9={:.2f}us".format(
+            percentile(samples, 50) * 1e6,
+            percentile(samples, 99) * 1e6,
+            percentile(samples, 99.9) * 1e6
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
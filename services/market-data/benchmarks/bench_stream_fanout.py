@@ -0,0 +1,127 @@
+"""
+Benchmark WebSocket tick fan-out on a single worker
+
+Drives StreamHub.dispatch (the path every message from the shared Redis
+subscriber takes) with many in-memory client sockets and reports delivered
+frames per second, publish-to-send latency percentiles, bytes per frame and
+how many frames were conflated for slow clients.
+
+Usage (from services/market-data, with the service environment loaded):
+    python -m benchmarks.bench_stream_fanout --clients 10000 --symbols 500
+    python -m benchmarks.bench_stream_fanout --encoding msgpack --slow 0.1
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+
+import msgpack
+
+from app.services.stream import StreamHub, encode_tick
+
+
+class BenchSocket:
+    """
+    In-memory socket recording publish-to-send latency
+    """
+    def __init__(self, latencies: list, delay: float = 0.0):
+        self.latencies = latencies
+        self.delay = delay
+        self.bytes_sent = 0
+    
+    async def _record(self, data: dict):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.latencies.append(time.perf_counter() - data["ts"])
+    
+    async def send_text(self, frame: str):
+        self.bytes_sent += len(frame.encode())
+        await self._record(json.loads(frame)["data"])
+    
+    async def send_bytes(self, frame: bytes):
+        self.bytes_sent += len(frame)
+        await self._record(msgpack.unpackb(frame)["data"])
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def bench_encoding(encoding: str, rounds: int = 20000) -> float:
+    """
+    Measure the cost of framing one tick, in microseconds
+    """
+    payload = json.dumps({"price": 187.42, "bid": 187.41, "ask": 187.43, "volume": 1234567, "ts": 1.0})
+    started = time.perf_counter()
+    for _ in range(rounds):
+        encode_tick("AAPL", payload, encoding)
+    return (time.perf_counter() - started) / rounds * 1e6
+
+
+async def run(args):
+    hub = StreamHub(max_symbols=args.per_client)
+    latencies: list = []
+    universe = [f"SYM{i}" for i in range(args.symbols)]
+    
+    sockets = []
+    connections = []
+    for i in range(args.clients):
+        delay = args.slow_delay if i < args.clients * args.slow else 0.0
+        socket = BenchSocket(latencies, delay)
+        connection = hub.connect(socket, args.encoding)
+        hub.subscribe(connection, random.sample(universe, args.per_client))
+        sockets.append(socket)
+        connections.append(connection)
+    
+    started = time.perf_counter()
+    for i in range(args.messages):
+        symbol = universe[i % args.symbols]
+        hub.dispatch(symbol, json.dumps({"price": 100.0 + i % 7, "ts": time.perf_counter()}))
+        if i % args.batch == 0:
+            # Let sender tasks drain, as the event loop would between socket reads
+            await asyncio.sleep(0)
+    
+    while any(c.pending or c.control for c in connections):
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - started
+    
+    conflated = sum(c.frames_conflated for c in connections)
+    bytes_sent = sum(s.bytes_sent for s in sockets)
+    await hub.stop()
+    
+    print(f"clients={args.clients} symbols={args.symbols} symbols/client={args.per_client} "
+          f"messages={args.messages} encoding={args.encoding} slow={args.slow:.0%}")
+    print(f"frames delivered: {len(latencies)} ({conflated} conflated) in {elapsed:.3f}s")
+    print(f"throughput: {args.messages / elapsed:,.0f} msgs/s in, {len(latencies) / elapsed:,.0f} frames/s out")
+    if latencies:
+        print(f"bytes/frame: {bytes_sent / len(latencies):.1f}")
+        print(
+            "latency: p50={:.3f}ms p99={:.3f}ms max={:.3f}ms mean={:.3f}ms".format(
+                percentile(latencies, 50) * 1000,
+                percentile(latencies, 99) * 1000,
+                max(latencies) * 1000,
+                statistics.fmean(latencies) * 1000
+            )
+        )
+    for encoding in ("json", "msgpack"):
+        print(f"encode {encoding}: {bench_encoding(encoding):.2f}us/tick")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=10000)
+    parser.add_argument("--symbols", type=int, default=500)
+    parser.add_argument("--per-client", type=int, default=5)
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--batch", type=int, default=100, help="messages dispatched between event loop yields")
+    parser.add_argument("--encoding", choices=("json", "msgpack"), default="json")
+    parser.add_argument("--slow", type=float, default=0.0, help="fraction of clients that are slow consumers")
+    parser.add_argument("--slow-delay", type=float, default=0.005, help="seconds a slow client spends per frame")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
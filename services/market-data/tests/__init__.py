@@ -0,0 +1,3 @@
+"""
+Tests for Market Data Service
+"""
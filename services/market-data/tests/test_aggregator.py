@@ -0,0 +1,83 @@
+"""
+Test streaming tick-to-bar aggregation
+"""
+import pytest
+from app.services.aggregator import BarAggregator
+
+
+def make_aggregator(grace: float = 2.0) -> BarAggregator:
+    return BarAggregator(timeframes=("1s", "1m"), grace=grace, publish=False, clock=lambda: 0.0)
+
+
+def test_ticks_fold_into_ohlcv():
+    """Test ticks within a bar update high, low, close and volume"""
+    agg = make_aggregator()
+    for price, size, ts in [(10.0, 1, 60.1), (12.0, 2, 60.2), (9.0, 3, 60.3), (11.0, 4, 60.4)]:
+        agg.update("AAPL", price, size, ts)
+    
+    agg.close_due(1000)
+    one_second = [bar for bar in agg.closed if bar[1] == "1s"]
+    assert one_second == [("AAPL", "1s", 60, 10.0, 12.0, 9.0, 11.0, 10.0)]
+    assert [bar for bar in agg.closed if bar[1] == "1m"] == [("AAPL", "1m", 60, 10.0, 12.0, 9.0, 11.0, 10.0)]
+
+
+def test_bar_closes_after_boundary_plus_grace():
+    """Test a bar stays open for late ticks until its grace window ends"""
+    agg = BarAggregator(timeframes=("1m",), grace=2.0, publish=False)
+    agg.update("AAPL", 10.0, 1, 100.5)
+    
+    assert agg.close_due(121.9) == 0
+    agg.update("AAPL", 9.0, 1, 100.9)
+    assert agg.close_due(122.0) == 1
+    assert agg.closed[0][2:] == (60, 10.0, 10.0, 9.0, 9.0, 2.0)
+
+
+def test_grace_is_capped_at_one_bar():
+    """Test a 1s bar is not held open longer than one second past its end"""
+    agg = make_aggregator(grace=2.0)
+    agg.update("AAPL", 10.0, 1, 100.5)
+    assert agg.close_due(102.0) == 1
+
+
+def test_late_tick_within_grace_keeps_newest_close():
+    """Test a late tick updates the previous bar without overriding its close"""
+    agg = make_aggregator(grace=1.0)
+    agg.update("AAPL", 10.0, 1, 100.8)
+    agg.update("AAPL", 20.0, 1, 101.1)
+    agg.update("AAPL", 5.0, 1, 100.2)
+    
+    agg.close_due(102.0)
+    bar = next(bar for bar in agg.closed if bar[1] == "1s" and bar[2] == 100)
+    assert bar[3:] == (10.0, 10.0, 5.0, 10.0, 2.0)
+
+
+def test_ticks_after_close_are_dropped():
+    """Test a tick for an already closed bar is counted as late"""
+    agg = make_aggregator(grace=0.5)
+    agg.update("AAPL", 10.0, 1, 100.2)
+    agg.close_due(200.0)
+    closed = len(agg.closed)
+    
+    agg.update("AAPL", 11.0, 1, 100.4)
+    assert agg.late_ticks == 2
+    agg.close_due(200.0)
+    assert len(agg.closed) == closed
+
+
+def test_symbols_are_independent():
+    """Test each symbol keeps its own open bars"""
+    agg = make_aggregator()
+    agg.update("AAPL", 10.0, 1, 100.0)
+    agg.update("MSFT", 50.0, 1, 100.0)
+    agg.update("AAPL", 11.0, 1, 101.0)
+    
+    # AAPL rolled to a new second; MSFT's bar is still open
+    assert agg.closed == []
+    agg.update("AAPL", 12.0, 1, 102.0)
+    assert agg.closed == [("AAPL", "1s", 100, 10.0, 10.0, 10.0, 10.0, 1.0)]
+
+
+def test_unknown_timeframe_is_rejected():
+    """Test only supported timeframes can be aggregated"""
+    with pytest.raises(ValueError):
+        BarAggregator(timeframes=("7s",))
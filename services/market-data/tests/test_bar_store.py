@@ -0,0 +1,111 @@
+"""
+Test memory-mapped columnar bar series
+"""
+import asyncio
+from datetime import datetime, timezone
+import numpy as np
+from app.services import bar_store
+from app.services.bar_store import BarStore, ColumnSeries
+
+DAY = 86400
+
+
+def make_bars(times, price=1.0):
+    times = np.asarray(times, dtype=np.int64)
+    prices = np.full(len(times), price)
+    return {
+        "time": times,
+        "open": prices,
+        "high": prices,
+        "low": prices,
+        "close": prices,
+        "volume": np.arange(len(times), dtype=np.float64),
+    }
+
+
+def test_append_and_reopen(tmp_path):
+    """Test bars survive reopening the series"""
+    series = ColumnSeries(str(tmp_path / "AAPL"))
+    series.write(make_bars([60, 120, 180]))
+    series.write(make_bars([240, 300]))
+    
+    reopened = ColumnSeries(str(tmp_path / "AAPL"))
+    assert reopened.count == 5
+    assert reopened.arrays()["time"].tolist() == [60, 120, 180, 240, 300]
+    assert reopened.last_time() == 300
+
+
+def test_overlapping_write_replaces_tail(tmp_path):
+    """Test re-syncing the newest bar overwrites instead of duplicating it"""
+    series = ColumnSeries(str(tmp_path / "AAPL"))
+    series.write(make_bars([60, 120, 180], price=1.0))
+    series.write(make_bars([180, 240], price=2.0))
+    
+    arrays = series.arrays()
+    assert arrays["time"].tolist() == [60, 120, 180, 240]
+    assert arrays["close"].tolist() == [1.0, 1.0, 2.0, 2.0]
+
+
+def test_read_is_zero_copy_slice(tmp_path):
+    """Test range reads are views over the mapped files"""
+    series = ColumnSeries(str(tmp_path / "AAPL"))
+    series.write(make_bars(range(60, 660, 60)))
+    
+    window = series.read(180, 420, limit=100)
+    assert window["time"].tolist() == [180, 240, 300, 360]
+    assert isinstance(window["close"].base, np.memmap) or isinstance(window["close"], np.memmap)
+    
+    assert series.read(None, None, limit=3)["time"].tolist() == [480, 540, 600]
+    assert series.read(120, None, limit=2)["time"].tolist() == [120, 180]
+
+
+def test_empty_series(tmp_path):
+    """Test an empty series reads as empty columns"""
+    series = ColumnSeries(str(tmp_path / "AAPL"))
+    assert series.last_time() is None
+    assert len(series.read(None, None, limit=10)["time"]) == 0
+
+
+class FakePool:
+    """Serves page queries over an in-memory table of (epoch seconds, close) bars"""
+    def __init__(self, bars):
+        self.bars = dict(bars)
+    
+    async def fetch(self, query, symbol, after, before, limit, *args):
+        rows = [
+            (datetime.fromtimestamp(time, tz=timezone.utc), close, close, close, close, 1.0)
+            for time, close in sorted(self.bars.items())
+            if time > after.timestamp()
+        ]
+        return rows[:limit]
+
+
+def test_sync_resyncs_from_a_rewritten_day(tmp_path, monkeypatch):
+    """Test a write into stored history is copied again and only then served"""
+    pool = FakePool({time: 1.0 for time in range(DAY, 5 * DAY, 3600)})
+    writes = [("100.000000-1-0", DAY)]
+    monkeypatch.setattr(bar_store, "get_pool", lambda: pool)
+    
+    async def get_bar_writes(symbol):
+        return list(writes)
+    
+    monkeypatch.setattr(bar_store, "get_bar_writes", get_bar_writes)
+    store = BarStore(str(tmp_path), chunk_size=16)
+    store.track("AAPL", "1m")
+    last_time = datetime.fromtimestamp(5 * DAY - 3600, tz=timezone.utc)
+    
+    asyncio.run(store.sync("AAPL", "1m"))
+    assert store.covers("AAPL", "1m", last_time, "100.000000-1-0")
+    
+    pool.bars[2 * DAY + 1800] = 2.0
+    pool.bars[3 * DAY] = 3.0
+    writes.append(("200.000000-1-1", 2 * DAY))
+    assert not store.covers("AAPL", "1m", last_time, "200.000000-1-1")
+    
+    asyncio.run(store.sync("AAPL", "1m"))
+    series = store.get_series("AAPL", "1m")
+    assert store.resyncs == 1
+    assert store.covers("AAPL", "1m", last_time, "200.000000-1-1")
+    assert series.arrays()["time"].tolist() == sorted(pool.bars)
+    assert series.arrays()["close"].tolist() == [pool.bars[time] for time in sorted(pool.bars)]
+    assert ColumnSeries(series.path).writes == {"100.000000-1-0", "200.000000-1-1"}
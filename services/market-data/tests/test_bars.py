@@ -0,0 +1,129 @@
+"""
+Test keyset-paged bar reads
+"""
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from app.services import bars
+
+T0 = datetime(2024, 1, 2, tzinfo=timezone.utc)
+MINUTE = timedelta(minutes=1)
+
+
+class FakeConnection:
+    """Serves the page query from an in-memory list of bars"""
+    def __init__(self, pool):
+        self.pool = pool
+    
+    @asynccontextmanager
+    async def transaction(self):
+        yield
+    
+    async def cursor(self, query, symbol, after, end, size, *args, prefetch=None):
+        self.pool.queries.append(query)
+        self.pool.pages.append((after, size, args))
+        for row in [row for row in self.pool.rows if after < row[0] < end][:size]:
+            yield row
+
+
+class FakePool:
+    """Stands in for the asyncpg pool behind the bar queries"""
+    def __init__(self, count):
+        self.rows = [(T0 + i * MINUTE, 1.0, 2.0, 0.5, 1.5, 100 + i) for i in range(count)]
+        self.queries = []
+        self.pages = []
+        self.window_queries = []
+    
+    @asynccontextmanager
+    async def acquire(self):
+        yield FakeConnection(self)
+    
+    async def fetchval(self, query, symbol, end, limit, *args):
+        self.window_queries.append((end, limit))
+        times = [row[0] for row in self.rows if row[0] < end][-limit:]
+        return times[0] if times else None
+
+
+def read_page(monkeypatch, pool, **kwargs):
+    monkeypatch.setattr(bars, "get_pool", lambda: pool)
+    
+    async def collect():
+        return "".join([part async for part in bars.stream_bars("AAPL", "1m", **kwargs)])
+    
+    return json.loads(asyncio.run(collect()))
+
+
+def test_latest_page_reads_in_chunks(monkeypatch):
+    """Test a page without a start covers the newest bars, read chunk by chunk from an inclusive start"""
+    pool = FakePool(10)
+    page = read_page(monkeypatch, pool, start=None, end=None, limit=5, chunk_size=2)
+    
+    assert [bar["time"] for bar in page["bars"]] == [bars.format_time(T0 + i * MINUTE) for i in range(5, 10)]
+    assert page["bars"][0] == {
+        "time": "2024-01-02T00:05:00Z", "open": 1.0, "high": 2.0, "low": 0.5, "close": 1.5, "volume": 105
+    }
+    assert page["count"] == 5
+    assert page["next_cursor"] == "2024-01-02T00:09:00Z"
+    assert pool.window_queries == [(bars.FAR_FUTURE, 5)]
+    assert pool.pages == [
+        (T0 + 5 * MINUTE - bars.ONE_MICROSECOND, 2, ("1m",)),
+        (T0 + 6 * MINUTE, 2, ("1m",)),
+        (T0 + 8 * MINUTE, 1, ("1m",)),
+    ]
+
+
+def test_cursor_resumes_after_the_last_bar(monkeypatch):
+    """Test following next_cursor continues without repeating a bar and ends with a null cursor"""
+    pool = FakePool(7)
+    first = read_page(monkeypatch, pool, start=T0, end=None, limit=4, chunk_size=3)
+    cursor = bars.parse_time(first["next_cursor"])
+    second = read_page(monkeypatch, pool, start=T0, end=None, limit=4, cursor=cursor, chunk_size=3)
+    
+    assert first["count"] == 4 and second["count"] == 3
+    times = [bar["time"] for bar in first["bars"] + second["bars"]]
+    assert times == [bars.format_time(T0 + i * MINUTE) for i in range(7)]
+    assert second["next_cursor"] is None
+    assert pool.window_queries == []
+
+
+def test_empty_series_pages(monkeypatch):
+    """Test a series without bars streams an empty page with no cursor"""
+    pool = FakePool(0)
+    page = read_page(monkeypatch, pool, start=None, end=T0, limit=100)
+    
+    assert page == {"symbol": "AAPL", "timeframe": "1m", "bars": [], "count": 0, "next_cursor": None}
+    assert pool.pages == [(T0 - bars.ONE_MICROSECOND, 100, ("1m",))]
+
+
+def test_coarse_timeframes_read_rollups():
+    """Test coarse timeframes query their continuous aggregate and the rest the raw hypertable by timeframe"""
+    for timeframe, relation in bars.AGGREGATE_RELATIONS.items():
+        queries = bars.get_bar_queries(timeframe)
+        assert queries.args == ()
+        for query in (queries.page, queries.window, queries.last_time):
+            assert f"FROM {relation}\n" in query
+            assert "timeframe =" not in query
+    
+    for timeframe in ("1s", "1m"):
+        queries = bars.get_bar_queries(timeframe)
+        assert queries.args == (timeframe,)
+        assert "AND timeframe = $5" in queries.page
+        assert "AND timeframe = $4" in queries.window
+        assert "AND timeframe = $3" in queries.last_time
+        for query in (queries.page, queries.window, queries.last_time):
+            assert "FROM market_data\n" in query
+
+
+def test_rollup_pages_bind_no_timeframe(monkeypatch):
+    """Test a coarse page reads its rollup without passing a timeframe argument"""
+    pool = FakePool(3)
+    monkeypatch.setattr(bars, "get_pool", lambda: pool)
+    
+    async def collect():
+        return "".join([part async for part in bars.stream_bars("AAPL", "1h", T0, None, 10)])
+    
+    page = json.loads(asyncio.run(collect()))
+    assert page["timeframe"] == "1h" and page["count"] == 3
+    assert "FROM market_data_1h\n" in pool.queries[0]
+    assert pool.pages[0][2] == ()
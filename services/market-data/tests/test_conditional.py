@@ -0,0 +1,51 @@
+"""
+Test conditional GET helpers
+"""
+from datetime import datetime, timedelta, timezone
+from app.utils.conditional import make_etag, etag_matches, is_closed_range, cache_headers, series_version
+
+
+def test_etag_changes_with_last_bar():
+    """Test the ETag is stable for the same inputs and changes with the newest bar"""
+    t = datetime(2024, 1, 2, tzinfo=timezone.utc)
+    etag = make_etag("bars", "AAPL", "1m", None, None, 100, None, t)
+    assert etag == make_etag("bars", "AAPL", "1m", None, None, 100, None, t)
+    assert etag != make_etag("bars", "AAPL", "1m", None, None, 100, None, t + timedelta(minutes=1))
+    assert etag.startswith('W/"')
+
+
+def test_series_version_changes_with_writes_and_rollup_refresh():
+    """Test the version follows bar writes, and rollups again once refreshed"""
+    assert series_version(None, None, 100.0) == "0"
+    assert series_version("50.000000-7", None, 100.0) == "50.000000-7"
+    refreshing = series_version("50.000000-7", 300, 100.0)
+    refreshed = series_version("50.000000-7", 300, 400.0)
+    assert refreshing != refreshed == "50.000000-7"
+    
+    t = datetime(2024, 1, 2, tzinfo=timezone.utc)
+    # A backfilled hole changes neither the newest bar nor the range, only the version
+    assert make_etag("bars", "AAPL", "1m", t, "50.0-7") != make_etag("bars", "AAPL", "1m", t, "60.0-7")
+
+
+def test_if_none_match_uses_weak_comparison():
+    """Test If-None-Match matches lists, strong forms and wildcards"""
+    etag = make_etag("x")
+    strong = etag.removeprefix("W/")
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", {strong}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"other"', etag)
+    assert not etag_matches(None, etag)
+
+
+def test_only_settled_ranges_are_cacheable():
+    """Test ranges are closed once their last bar has closed and settled"""
+    now = datetime(2024, 1, 10, tzinfo=timezone.utc)
+    assert not is_closed_range(None, 60, 3600, now)
+    assert not is_closed_range(now - timedelta(minutes=30), 60, 3600, now)
+    assert is_closed_range(now - timedelta(hours=2), 60, 3600, now)
+    # A daily bar starting two hours ago is still open
+    assert not is_closed_range(now - timedelta(hours=2), 86400, 3600, now)
+    
+    assert cache_headers("e", True, 600)["Cache-Control"] == "public, max-age=600"
+    assert cache_headers("e", False, 600)["Cache-Control"] == "no-cache"
@@ -0,0 +1,70 @@
+"""
+Test vectorized technical indicators
+"""
+import numpy as np
+import pytest
+from app.services import indicators
+
+CLOSES = np.array([
+    44.34, 44.09, 44.15, 43.61, 44.33, 44.83, 45.10, 45.42, 45.84, 46.08,
+    45.89, 46.03, 45.61, 46.28, 46.28, 46.00, 46.03, 46.41, 46.22, 45.64
+])
+
+
+def test_sma():
+    """Test simple moving average and its warm-up"""
+    result = indicators.sma(np.array([1.0, 2.0, 3.0, 4.0, 5.0]), 3)
+    assert np.isnan(result[:2]).all()
+    assert result[2:].tolist() == [2.0, 3.0, 4.0]
+
+
+def test_ema_is_seeded_with_sma():
+    """Test EMA starts from the SMA of its first window"""
+    result = indicators.ema(CLOSES, 5)
+    assert np.isnan(result[:4]).all()
+    assert result[4] == pytest.approx(CLOSES[:5].mean())
+    assert result[5] == pytest.approx(CLOSES[5] / 3 + result[4] * 2 / 3)
+
+
+def test_rsi_matches_wilder_reference():
+    """Test RSI against the classic Wilder worked example"""
+    result = indicators.rsi(CLOSES, 14)
+    assert np.isnan(result[:14]).all()
+    assert result[14] == pytest.approx(70.464, abs=1e-3)
+    assert result[15] == pytest.approx(66.250, abs=1e-3)
+
+
+def test_vwap_resets_each_session():
+    """Test VWAP restarts at the UTC day boundary"""
+    time = np.array([0, 60, 86400, 86460])
+    prices = np.array([1.0, 2.0, 3.0, 4.0])
+    volume = np.array([1.0, 1.0, 1.0, 3.0])
+    result = indicators.vwap(time, prices, prices, prices, volume)
+    assert result.tolist() == [1.0, 1.5, 3.0, 3.75]
+
+
+def test_bollinger_and_atr_shapes():
+    """Test multi-output and multi-input indicators keep column length"""
+    bands = indicators.bollinger(CLOSES, 5, 2.0)
+    assert all(len(column) == len(CLOSES) for column in bands.values())
+    assert (bands["upper"][4:] > bands["lower"][4:]).all()
+    
+    result = indicators.atr(CLOSES + 0.5, CLOSES - 0.5, CLOSES, 5)
+    assert np.isnan(result[:4]).all()
+    assert (result[4:] >= 1.0).all()
+
+
+def test_parse_spec():
+    """Test indicator specs fill defaults and reject bad input"""
+    assert indicators.parse_spec("sma:50, rsi ,macd:5:10") == [
+        ("sma", (50,)), ("rsi", (14,)), ("macd", (5, 10, 9))
+    ]
+    with pytest.raises(ValueError):
+        indicators.parse_spec("foo")
+    with pytest.raises(ValueError):
+        indicators.parse_spec("sma:0")
+    with pytest.raises(ValueError):
+        indicators.parse_spec("sma:10:20")
+    for spec in ("sma:inf", "bbands:20:nan", "rsi:-inf"):
+        with pytest.raises(ValueError):
+            indicators.parse_spec(spec)
@@ -0,0 +1,240 @@
+"""
+Test batched bar ingestion and the bar write log
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+import pytest
+from app.services import bars, ingestion
+from app.services.ingestion import BarWriter
+
+DAY = timedelta(days=1)
+T0 = datetime(2024, 1, 10, 15, 30, tzinfo=timezone.utc)
+
+
+class MemoryRedis:
+    """The sorted set commands of the bar write log, with the record script done in Python"""
+    def __init__(self):
+        self.logs = {}
+        self.fail = False
+    
+    def pipeline(self, transaction=True):
+        return MemoryPipeline(self)
+    
+    def record(self, key, day, write_id, max_entries):
+        log = {member: score for member, score in self.logs.get(key, {}).items() if score < day}
+        log[write_id] = day
+        if len(log) > max_entries:
+            (first, first_day), (second, _) = sorted(log.items(), key=lambda item: item[1])[:2]
+            del log[first]
+            log[second] = first_day
+        self.logs[key] = log
+    
+    async def zrevrangebyscore(self, key, max, min, start=None, num=None):
+        inclusive = not max.startswith("(")
+        bound = float(max.lstrip("("))
+        entries = sorted(
+            (item for item in self.logs.get(key, {}).items() if item[1] < bound or inclusive and item[1] == bound),
+            key=lambda item: item[1],
+            reverse=True
+        )
+        return [member for member, _ in entries][start:start + num]
+
+
+class MemoryPipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+    
+    def eval(self, script, numkeys, key, day, write_id, max_entries):
+        self.calls.append((key, day, write_id, max_entries))
+    
+    async def execute(self):
+        if self.redis.fail:
+            raise ConnectionError("redis down")
+        for call in self.calls:
+            self.redis.record(*call)
+        return [1] * len(self.calls)
+
+
+class RecordingWriter(BarWriter):
+    """Records flushed batches instead of writing them"""
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.flushed = []
+    
+    async def _flush(self, batch):
+        self.flushed.append(batch)
+        return True
+
+
+class FlakyPool:
+    """Fails the first `failures` COPYs and records the rest"""
+    def __init__(self, failures):
+        self.failures = failures
+        self.copied = []
+    
+    @asynccontextmanager
+    async def acquire(self):
+        yield self
+    
+    @asynccontextmanager
+    async def transaction(self):
+        yield
+    
+    async def execute(self, query):
+        pass
+    
+    async def copy_records_to_table(self, table, records, columns):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("database down")
+        self.copied.extend(records)
+
+
+def bar(time, symbol="AAPL"):
+    return (time, symbol, 1.0, 1.0, 1.0, 1.0, 100, "1m")
+
+
+def bar_dict(minute, symbol="AAPL"):
+    return dict(zip(ingestion.COLUMNS, bar(T0 + timedelta(minutes=minute), symbol)))
+
+
+def setup_writer(monkeypatch, **kwargs):
+    redis = MemoryRedis()
+    writer = BarWriter(**kwargs)
+    monkeypatch.setattr(ingestion, "get_redis", lambda: redis)
+    monkeypatch.setattr(bars, "get_redis", lambda: redis)
+    monkeypatch.setattr(bars, "get_bar_writer", lambda: writer)
+    return writer, redis
+
+
+def test_batches_flush_by_size_and_time():
+    """Test a full batch flushes at once and a partial one after the flush interval"""
+    async def scenario():
+        writer = RecordingWriter(batch_size=3, flush_interval=0.05)
+        writer.start()
+        await writer.put_many(bar_dict(minute) for minute in range(7))
+        await asyncio.sleep(0.02)
+        sizes = [len(batch) for batch in writer.flushed]
+        await asyncio.sleep(0.1)
+        after_interval = [len(batch) for batch in writer.flushed]
+        await writer.stop()
+        return sizes, after_interval, writer
+    
+    sizes, after_interval, writer = asyncio.run(scenario())
+    assert sizes == [3, 3]
+    assert after_interval == [3, 3, 1]
+    assert [record[0] for batch in writer.flushed for record in batch] == [
+        T0 + timedelta(minutes=minute) for minute in range(7)
+    ]
+
+
+def test_stop_flushes_queued_bars():
+    """Test stopping the writer flushes a partial batch without waiting out the interval"""
+    async def scenario():
+        writer = RecordingWriter(batch_size=100, flush_interval=60.0)
+        writer.start()
+        await writer.put(bar_dict(0))
+        await asyncio.wait_for(writer.stop(), 1.0)
+        return writer
+    
+    assert [len(batch) for batch in asyncio.run(scenario()).flushed] == [1]
+
+
+def test_full_queue_pushes_back():
+    """Test producers wait while the queue is full and resume once it drains"""
+    async def scenario():
+        writer = RecordingWriter(batch_size=10, flush_interval=0.01, max_queue=2)
+        await writer.put(bar_dict(0))
+        writer.put_nowait(bar_dict(1))
+        with pytest.raises(asyncio.QueueFull):
+            writer.put_nowait(bar_dict(2))
+        
+        blocked = asyncio.create_task(writer.put(bar_dict(2)))
+        await asyncio.sleep(0.02)
+        waiting = not blocked.done()
+        writer.start()
+        await asyncio.wait_for(blocked, 1.0)
+        await writer.stop()
+        return waiting, writer
+    
+    waiting, writer = asyncio.run(scenario())
+    assert waiting
+    assert sum(len(batch) for batch in writer.flushed) == 3
+
+
+def test_flush_retries_then_counts_failures(monkeypatch):
+    """Test a flush retries transient errors and counts the rows of a batch that never lands"""
+    writer, _ = setup_writer(monkeypatch, max_retries=2)
+    pool = FlakyPool(failures=1)
+    monkeypatch.setattr(ingestion, "get_pool", lambda: pool)
+    batch = [bar(T0), bar(T0 + timedelta(minutes=1))]
+    
+    assert asyncio.run(writer._flush(batch))
+    assert pool.copied == batch
+    
+    pool.failures = 2
+    assert not asyncio.run(writer._flush([bar(T0 + timedelta(minutes=2))]))
+    
+    metrics = writer.metrics()
+    assert metrics["rows_written"] == 2 and metrics["rows_failed"] == 1
+    assert metrics["batches"] == 1
+    assert metrics["queue_depth"] == 0 and metrics["unversioned_symbols"] == 0
+    assert metrics["last_flush_latency_ms"] > 0
+    assert metrics["max_flush_latency_ms"] >= metrics["avg_flush_latency_ms"] > 0
+
+
+def test_versions_change_only_for_ranges_a_write_touched(monkeypatch):
+    """Test live writes leave closed ranges alone while a backfill changes the ranges after it"""
+    writer, _ = setup_writer(monkeypatch)
+    
+    async def versions():
+        return [await bars.get_series_version("AAPL", "1m", end) for end in (T0 - 5 * DAY, T0 - DAY, None)]
+    
+    async def scenario():
+        await writer._bump_versions([bar(T0 - 6 * DAY)])
+        initial = await versions()
+        await writer._bump_versions([bar(T0), bar(T0 + timedelta(minutes=1))])
+        live = await versions()
+        await writer._bump_versions([bar(T0 - 3 * DAY)])
+        return initial, live, await versions()
+    
+    initial, live, backfilled = asyncio.run(scenario())
+    assert live[:2] == initial[:2] and live[2] != initial[2]
+    assert backfilled[0] == initial[0]
+    assert backfilled[1] != live[1] and backfilled[2] != live[2]
+
+
+def test_failed_bumps_disable_versions_until_recorded(monkeypatch):
+    """Test a symbol gets no version while its write is unlogged, and the retry covers the older write"""
+    writer, redis = setup_writer(monkeypatch)
+    
+    async def scenario():
+        await writer._bump_versions([bar(T0 - 6 * DAY)])
+        before = await bars.get_series_version("AAPL", "1m", T0 - 2 * DAY)
+        redis.fail = True
+        await writer._bump_versions([bar(T0 - 4 * DAY), bar(T0, "MSFT")])
+        failed = await bars.get_series_version("AAPL", "1m", T0 - 2 * DAY)
+        redis.fail = False
+        await writer._bump_versions([bar(T0, "MSFT")])
+        return before, failed, await bars.get_series_version("AAPL", "1m", T0 - 2 * DAY)
+    
+    before, failed, after = asyncio.run(scenario())
+    assert before != "0" and failed is None
+    assert after not in (None, before)
+    assert writer.unversioned == {}
+
+
+def test_write_log_is_bounded(monkeypatch):
+    """Test the two oldest days are merged once the log is full"""
+    writer, redis = setup_writer(monkeypatch, write_log_size=3)
+    
+    async def scenario():
+        for days in (10, 8, 6, 4):
+            await writer._bump_versions([bar(T0 - days * DAY)])
+    
+    asyncio.run(scenario())
+    log = redis.logs["bar_writes:AAPL"]
+    assert len(log) == 3
+    assert min(log.values()) == int((T0 - 10 * DAY).timestamp()) // 86400 * 86400
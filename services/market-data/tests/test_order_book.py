@@ -0,0 +1,97 @@
+"""
+Test L2 order book delta application and resync
+"""
+import asyncio
+import pytest
+from app.providers.simulated import SimulatedProvider
+from app.services import order_book
+from app.services.order_book import OrderBook, OrderBookManager
+
+
+def synced_book() -> OrderBook:
+    book = OrderBook("AAPL")
+    book.apply_snapshot(10, bids=[[99.0, 5], [100.0, 1], [98.5, 2]], asks=[[101.0, 3], [100.5, 4]])
+    return book
+
+
+def test_snapshot_sorts_best_first():
+    """Test both sides are ordered from the best level"""
+    book = synced_book()
+    depth = book.depth(2)
+    assert depth["bids"] == [[100.0, 1.0], [99.0, 5.0]]
+    assert depth["asks"] == [[100.5, 4.0], [101.0, 3.0]]
+    assert depth["sequence"] == 10
+
+
+def test_add_modify_delete():
+    """Test deltas insert, resize and remove levels"""
+    book = synced_book()
+    assert book.apply_delta(11, "bid", "add", 99.5, 7)
+    assert book.apply_delta(12, "ask", "modify", 100.5, 1)
+    assert book.apply_delta(13, "bid", "delete", 100.0)
+    
+    assert book.best_bid() == [99.5, 7]
+    assert book.best_ask() == [100.5, 1]
+    assert book.depth(10)["bids"] == [[99.5, 7], [99.0, 5.0], [98.5, 2.0]]
+    
+    # Deleting a level that is not there changes nothing
+    assert not book.apply_delta(14, "ask", "delete", 200.0)
+    assert book.sequence == 14
+
+
+def test_stale_deltas_are_ignored():
+    """Test deltas at or below the current sequence are dropped"""
+    book = synced_book()
+    assert not book.apply_delta(10, "bid", "add", 50.0, 1)
+    assert book.stats()["stale"] == 1
+    assert len(book.bids) == 3
+
+
+def test_gap_buffers_until_snapshot():
+    """Test a sequence gap desyncs the book and the snapshot replays newer deltas"""
+    book = synced_book()
+    assert not book.apply_delta(13, "bid", "add", 99.5, 7)
+    assert not book.synced
+    book.apply_delta(14, "ask", "add", 100.25, 2)
+    
+    book.apply_snapshot(13, bids=[[99.5, 7], [99.0, 5]], asks=[[100.5, 4]])
+    assert book.synced
+    assert book.sequence == 14
+    assert book.best_ask() == [100.25, 2]
+    assert book.stats()["gaps"] == 1
+
+
+def test_unknown_side_is_rejected():
+    """Test an invalid side raises"""
+    book = synced_book()
+    with pytest.raises(ValueError):
+        book.apply_delta(11, "middle", "add", 1.0, 1)
+
+
+def test_simulated_provider_books_reach_the_endpoint(monkeypatch):
+    """Test provider deltas build a book that resyncs from its snapshot and is served by the endpoint"""
+    from app import main
+    from app.providers import manager as providers
+    
+    async def sink(ticks):
+        return len(ticks)
+    
+    async def scenario():
+        provider = SimulatedProvider(["AAPL"], sink, rate=0, book_levels=5)
+        monkeypatch.setitem(providers.providers, provider.name, provider)
+        books = OrderBookManager(snapshot_loader=providers.load_book_snapshot)
+        monkeypatch.setattr(order_book, "book_manager", books)
+        provider.attach_book(books.apply_deltas)
+        provider.start()
+        await asyncio.sleep(0.05)
+        await provider.stop()
+        await asyncio.sleep(0)
+        return provider, books, await main.get_book("aapl", depth=3)
+    
+    provider, books, depth = asyncio.run(scenario())
+    book = provider.books["AAPL"]
+    assert books.resyncs == 1 and provider.book_deltas > 0
+    assert depth["synced"] and depth["sequence"] == provider.book_sequences["AAPL"]
+    assert depth["bids"] == [[price, book["bid"][price]] for price in sorted(book["bid"], reverse=True)[:3]]
+    assert depth["asks"] == [[price, book["ask"][price]] for price in sorted(book["ask"])[:3]]
+    assert depth["bids"][0][0] < depth["asks"][0][0]
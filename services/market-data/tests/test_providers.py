@@ -0,0 +1,90 @@
+"""
+Test market data provider base behaviour and the simulated provider
+"""
+import asyncio
+import random
+from datetime import datetime, timezone
+from app.providers.base import StreamingProvider, backoff_delay
+from app.providers.simulated import SimulatedProvider
+
+
+async def collect(ticks):
+    return len(ticks)
+
+
+def test_backoff_is_jittered_and_capped():
+    """Test delays grow exponentially within the upper half of the window"""
+    rng = random.Random(1)
+    for attempt, window in [(1, 5), (2, 10), (3, 20), (6, 60)]:
+        delay = backoff_delay(attempt, base=5, cap=60, rng=rng)
+        assert window / 2 <= delay <= window
+
+
+def test_simulated_prices_are_deterministic():
+    """Test the same seed yields the same tick sequence"""
+    a = SimulatedProvider(["AAPL", "MSFT"], collect, seed=7)
+    b = SimulatedProvider(["AAPL", "MSFT"], collect, seed=7)
+    ticks_a = [a.next_tick(0.0) for _ in range(100)]
+    ticks_b = [b.next_tick(0.0) for _ in range(100)]
+    assert ticks_a == ticks_b
+    assert [symbol for symbol, _ in ticks_a[:4]] == ["AAPL", "MSFT", "AAPL", "MSFT"]
+
+
+def test_simulated_provider_holds_its_rate():
+    """Test the simulator emits about `rate` ticks per second"""
+    received = []
+    
+    async def sink(ticks):
+        received.extend(ticks)
+        return len(ticks)
+    
+    async def scenario():
+        provider = SimulatedProvider(["AAPL"], sink, rate=1000, interval=0.005)
+        provider.start()
+        await asyncio.sleep(0.2)
+        await provider.stop()
+        return provider
+    
+    provider = asyncio.run(scenario())
+    assert 100 <= len(received) <= 260
+    assert provider.ticks == len(received)
+
+
+def test_simulated_bars_are_reproducible():
+    """Test generated history is stable and aligned to the timeframe"""
+    provider = SimulatedProvider(["AAPL"], collect)
+    start = datetime(2024, 1, 2, 14, 30, 30, tzinfo=timezone.utc)
+    end = datetime(2024, 1, 2, 14, 35, tzinfo=timezone.utc)
+    bars = asyncio.run(provider.fetch_bars("AAPL", "1m", start, end))
+    
+    assert [bar["time"].minute for bar in bars] == [31, 32, 33, 34]
+    assert bars == asyncio.run(provider.fetch_bars("AAPL", "1m", start, end))
+    assert all(bar["low"] <= min(bar["open"], bar["close"]) for bar in bars)
+
+
+class FailingProvider(StreamingProvider):
+    name = "failing"
+    
+    def url(self):
+        return "ws://unused"
+    
+    async def connect(self):
+        raise ConnectionRefusedError("refused")
+    
+    def parse(self, message):
+        return []
+    
+    async def fetch_bars(self, symbol, timeframe, start, end):
+        return []
+
+
+def test_streaming_provider_gives_up_after_max_attempts():
+    """Test reconnects stop after max_reconnect_attempts consecutive failures"""
+    async def scenario():
+        provider = FailingProvider(["AAPL"], collect, reconnect_interval=0.001, max_reconnect_attempts=3)
+        await provider._run()
+        return provider
+    
+    provider = asyncio.run(scenario())
+    assert provider.status == "failed"
+    assert provider.reconnects == 3
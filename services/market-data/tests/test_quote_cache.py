@@ -0,0 +1,162 @@
+"""
+Test in-process quote cache tier
+"""
+import asyncio
+import json
+from app.services import quote_cache
+from app.services.quote_cache import LRUCache, QuoteCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+
+class FakeRedis:
+    """Key/value commands of the shared tier"""
+    def __init__(self, values=None):
+        self.values = dict(values or {})
+        self.mgets = []
+        self.fail = False
+    
+    async def mget(self, keys):
+        self.mgets.append(keys)
+        if self.fail:
+            raise ConnectionError("redis down")
+        return [self.values.get(key) for key in keys]
+    
+    async def setex(self, key, ttl, value):
+        self.values[key] = value
+    
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.writes = {}
+    
+    def setex(self, key, ttl, value):
+        self.writes[key] = value
+    
+    async def execute(self):
+        self.redis.values.update(self.writes)
+
+
+def make_cache(monkeypatch, redis, batch_loader=None):
+    monkeypatch.setattr(quote_cache, "get_redis", lambda: redis)
+    monkeypatch.setattr(quote_cache, "RedisPubSub", lambda: None)
+    loaded = []
+    
+    async def loader(symbol):
+        loaded.append([symbol])
+        return {"symbol": symbol, "source": "loader"} if symbol != "NONE" else None
+    
+    async def load_many(symbols):
+        loaded.append(sorted(symbols))
+        return {symbol: {"symbol": symbol, "source": "loader"} for symbol in symbols if symbol != "NONE"}
+    
+    cache = QuoteCache(loader, batch_loader=load_many if batch_loader else None)
+    return cache, loaded
+
+
+def test_get_many_merges_every_tier(monkeypatch):
+    """Test local hits skip Redis, one MGET serves the rest and one batch load fills what it missed"""
+    redis = FakeRedis({"quote:MSFT": json.dumps({"symbol": "MSFT", "source": "redis"})})
+    cache, loaded = make_cache(monkeypatch, redis, batch_loader=True)
+    cache.local.set("AAPL", {"symbol": "AAPL", "source": "local"})
+    
+    quotes = asyncio.run(cache.get_many(["aapl", "MSFT", "tsla", "NONE", "AAPL"]))
+    
+    assert {symbol: quote["source"] for symbol, quote in quotes.items()} == {
+        "AAPL": "local", "MSFT": "redis", "TSLA": "loader"
+    }
+    assert redis.mgets == [["quote:MSFT", "quote:TSLA", "quote:NONE"]]
+    assert loaded == [["NONE", "TSLA"]]
+    assert cache.redis_hits == 1 and cache.redis_misses == 2
+    assert cache.local.get("MSFT")["source"] == "redis"
+    assert json.loads(redis.values["quote:TSLA"])["source"] == "loader"
+
+
+def test_get_many_stops_at_the_first_tier_that_has_everything(monkeypatch):
+    """Test a fully local batch never reaches Redis and a fully shared one never loads"""
+    redis = FakeRedis({"quote:MSFT": json.dumps({"symbol": "MSFT"})})
+    cache, loaded = make_cache(monkeypatch, redis)
+    cache.local.set("AAPL", {"symbol": "AAPL"})
+    
+    assert list(asyncio.run(cache.get_many(["AAPL"]))) == ["AAPL"]
+    assert redis.mgets == []
+    assert list(asyncio.run(cache.get_many(["AAPL", "MSFT"]))) == ["AAPL", "MSFT"]
+    assert redis.mgets == [["quote:MSFT"]]
+    assert loaded == []
+
+
+def test_get_many_loads_per_symbol_when_redis_fails(monkeypatch):
+    """Test a failed MGET counts as misses and falls back to the single-symbol loader"""
+    redis = FakeRedis({"quote:MSFT": json.dumps({"symbol": "MSFT"})})
+    redis.fail = True
+    cache, loaded = make_cache(monkeypatch, redis)
+    
+    quotes = asyncio.run(cache.get_many(["MSFT", "TSLA"]))
+    
+    assert sorted(quotes) == ["MSFT", "TSLA"]
+    assert sorted(loaded) == [["MSFT"], ["TSLA"]]
+    assert cache.redis_misses == 2 and cache.loads == 2
+    assert json.loads(redis.values["quote:TSLA"])["symbol"] == "TSLA"
+
+
+def test_hit_and_miss_counters():
+    """Test hits and misses are counted"""
+    cache = LRUCache(max_size=10, ttl=5)
+    assert cache.get("AAPL") is None
+    cache.set("AAPL", {"price": 1.0})
+    assert cache.get("AAPL") == {"price": 1.0}
+    
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_ratio"] == 0.5
+
+
+def test_evicts_least_recently_used():
+    """Test the least recently used entry is evicted when full"""
+    cache = LRUCache(max_size=2, ttl=5)
+    cache.set("AAPL", 1)
+    cache.set("MSFT", 2)
+    cache.get("AAPL")
+    cache.set("TSLA", 3)
+    
+    assert "MSFT" not in cache
+    assert cache.get("AAPL") == 1
+    assert cache.get("TSLA") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_expire_per_entry_ttl():
+    """Test each entry honours its own TTL"""
+    clock = FakeClock()
+    cache = LRUCache(max_size=10, ttl=5, clock=clock)
+    cache.set("AAPL", 1)
+    cache.set("MSFT", 2, ttl=1)
+    
+    clock.now = 2
+    assert cache.get("MSFT") is None
+    assert cache.get("AAPL") == 1
+    
+    clock.now = 6
+    assert cache.get("AAPL") is None
+    assert cache.stats()["expirations"] == 2
+
+
+def test_invalidate():
+    """Test invalidation drops the entry"""
+    cache = LRUCache(max_size=10, ttl=5)
+    cache.set("AAPL", 1)
+    assert cache.invalidate("AAPL") is True
+    assert cache.invalidate("AAPL") is False
+    assert cache.get("AAPL") is None
+    assert cache.stats()["invalidations"] == 1
@@ -0,0 +1,66 @@
+"""
+Test historical replay pacing and reporting
+"""
+import asyncio
+import json
+from app.services.replay import ReplaySession
+
+
+async def events(items):
+    for item in items:
+        yield item
+
+
+def run_session(items, speed, batch_size=500):
+    published = []
+    
+    async def scenario():
+        session = None
+        
+        async def publisher(messages):
+            published.append(messages)
+            # Loop the messages straight back as if the stream hub delivered them
+            for channel, payload in messages:
+                session.on_tick(channel.rsplit(":", 1)[1], payload)
+        
+        session = ReplaySession(events(items), speed=speed, batch_size=batch_size, publisher=publisher)
+        started = asyncio.get_running_loop().time()
+        await session.run()
+        return session, asyncio.get_running_loop().time() - started
+    
+    session, elapsed = asyncio.run(scenario())
+    return session, elapsed, published
+
+
+def test_max_speed_publishes_in_batches():
+    """Test an unpaced replay sends every event in pipelined batches"""
+    items = [(1000.0 + i, "AAPL", 100.0 + i, 10.0) for i in range(1200)]
+    session, _, published = run_session(items, speed=0)
+    
+    assert [len(batch) for batch in published] == [500, 500, 200]
+    report = session.report()
+    assert report["status"] == "finished"
+    assert report["published"] == report["delivered"] == 1200
+    assert report["speed"] == "max"
+    
+    channel, payload = published[0][0]
+    assert channel == "replay:ticks:AAPL"
+    assert json.loads(payload)["price"] == 100.0
+
+
+def test_speed_multiple_compresses_event_gaps():
+    """Test event gaps are replayed divided by the speed"""
+    items = [(1000.0, "AAPL", 1.0, 1.0), (1001.0, "MSFT", 2.0, 1.0), (1002.0, "AAPL", 3.0, 1.0)]
+    session, elapsed, published = run_session(items, speed=20)
+    
+    # Two seconds of history at 20x take about 0.1s
+    assert 0.09 <= elapsed < 1.0
+    assert sum(len(batch) for batch in published) == 3
+    assert session.report()["latency_ms"]["max"] >= 0
+
+
+def test_foreign_ticks_are_ignored():
+    """Test ticks from live feeds or other replays are not measured"""
+    session = ReplaySession(events([]), speed=0)
+    session.on_tick("AAPL", '{"price": 1.0, "sent_at": 0}')
+    assert session.delivered == 0
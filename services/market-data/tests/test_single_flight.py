@@ -0,0 +1,76 @@
+"""
+Test single-flight request coalescing
+"""
+import asyncio
+import pytest
+from app.utils.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_load():
+    """Test identical concurrent calls run the underlying call once"""
+    flight = SingleFlight()
+    loads = []
+    
+    async def load():
+        loads.append(1)
+        await asyncio.sleep(0.01)
+        return {"price": 1.0}
+    
+    async def run():
+        return await asyncio.gather(*(flight.do("AAPL", load) for _ in range(10)))
+    
+    results = asyncio.run(run())
+    assert results == [{"price": 1.0}] * 10
+    assert len(loads) == 1
+    assert flight.stats() == {"inflight": 0, "calls": 1, "coalesced": 9}
+
+
+def test_different_keys_do_not_coalesce():
+    """Test calls for different keys run independently"""
+    flight = SingleFlight()
+    
+    async def run():
+        return await asyncio.gather(
+            flight.do("AAPL", lambda: asyncio.sleep(0, "AAPL")),
+            flight.do("MSFT", lambda: asyncio.sleep(0, "MSFT"))
+        )
+    
+    assert asyncio.run(run()) == ["AAPL", "MSFT"]
+    assert flight.stats()["calls"] == 2
+
+
+def test_errors_reach_every_waiter_and_release_key():
+    """Test a failed call is raised to all waiters and not reused"""
+    flight = SingleFlight()
+    
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+    
+    async def run():
+        results = await asyncio.gather(*(flight.do("AAPL", fail) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(r, ValueError) for r in results)
+        return await flight.do("AAPL", lambda: asyncio.sleep(0, "ok"))
+    
+    assert asyncio.run(run()) == "ok"
+    assert flight.stats()["calls"] == 2
+
+
+def test_cancelled_caller_does_not_cancel_shared_call():
+    """Test cancelling one waiter leaves the shared call running for the rest"""
+    flight = SingleFlight()
+    
+    async def load():
+        await asyncio.sleep(0.02)
+        return 42
+    
+    async def run():
+        first = asyncio.create_task(flight.do("AAPL", load))
+        second = asyncio.create_task(flight.do("AAPL", load))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+    
+    assert asyncio.run(run()) == 42
@@ -0,0 +1,91 @@
+"""
+Test hypertable storage statistics
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from app.services import storage
+
+
+class FakePool:
+    """Answers the storage queries with canned rows"""
+    def __init__(self, results):
+        self.results = results
+    
+    @asynccontextmanager
+    async def acquire(self):
+        yield self
+    
+    async def fetch(self, query):
+        return self.results[query]
+
+
+def test_compression_ratio():
+    """Test the ratio is before/after and zero when nothing is compressed"""
+    assert storage.compression_ratio(1000, 250) == 4.0
+    assert storage.compression_ratio(1000, 0) == 0.0
+    assert storage.compression_ratio(0, 0) == 0.0
+
+
+def test_storage_stats_shape(monkeypatch):
+    """Test hypertables carry their compression stats and policies are flattened"""
+    pool = FakePool({
+        storage.HYPERTABLES_QUERY: [
+            {"hypertable_name": "market_data", "num_chunks": 12, "compression_enabled": True, "total_bytes": 4096},
+            {"hypertable_name": "trades", "num_chunks": 3, "compression_enabled": False, "total_bytes": 512},
+        ],
+        storage.COMPRESSION_QUERY: [
+            {
+                "hypertable_name": "market_data",
+                "total_chunks": 12,
+                "number_compressed_chunks": 10,
+                "before_compression_total_bytes": 9000,
+                "after_compression_total_bytes": None,
+            },
+        ],
+        storage.POLICY_JOBS_QUERY: [
+            {
+                "job_id": 1001,
+                "proc_name": "policy_compression",
+                "hypertable_name": "market_data",
+                "schedule_interval": "12:00:00",
+                "config": '{"compress_after": "7 days"}',
+                "last_run_status": "Success",
+                "last_successful_finish": None,
+                "next_start": None,
+                "total_failures": 0,
+            },
+            {
+                "job_id": 1002,
+                "proc_name": "policy_retention",
+                "hypertable_name": "market_data",
+                "schedule_interval": "1 day",
+                "config": None,
+                "last_run_status": None,
+                "last_successful_finish": None,
+                "next_start": None,
+                "total_failures": None,
+            },
+        ],
+    })
+    monkeypatch.setattr(storage, "get_pool", lambda: pool)
+    
+    stats = asyncio.run(storage.get_storage_stats())
+    
+    assert stats["hypertables"]["market_data"] == {
+        "chunks": 12,
+        "total_bytes": 4096,
+        "compression_enabled": True,
+        "compression": {
+            "chunks": 12,
+            "compressed_chunks": 10,
+            "before_bytes": 9000,
+            "after_bytes": 0,
+            "ratio": 0.0,
+        },
+    }
+    assert stats["hypertables"]["trades"]["compression"] is None
+    assert [(policy["job_id"], policy["policy"]) for policy in stats["policies"]] == [
+        (1001, "compression"), (1002, "retention")
+    ]
+    assert stats["policies"][0]["config"] == {"compress_after": "7 days"}
+    assert stats["policies"][1]["config"] == {}
@@ -0,0 +1,183 @@
+"""
+Test WebSocket fan-out hub
+"""
+import asyncio
+import json
+import msgpack
+import pytest
+from app.services.stream import REPLAY, StreamHub
+
+
+class FakeSocket:
+    def __init__(self):
+        self.frames = []
+    
+    async def send_text(self, frame: str):
+        self.frames.append(json.loads(frame))
+    
+    async def send_bytes(self, frame: bytes):
+        self.frames.append(msgpack.unpackb(frame))
+
+
+def test_dispatch_reaches_only_subscribers():
+    """Test a tick is delivered to subscribed sockets only"""
+    async def scenario():
+        hub = StreamHub()
+        a, b = FakeSocket(), FakeSocket()
+        conn_a, conn_b = hub.connect(a), hub.connect(b)
+        hub.subscribe(conn_a, ["aapl", "MSFT"])
+        hub.subscribe(conn_b, ["MSFT"])
+        
+        hub.dispatch("AAPL", '{"price": 1.5}')
+        hub.dispatch("MSFT", '{"price": 2.5}')
+        hub.dispatch("TSLA", '{"price": 3.5}')
+        await asyncio.sleep(0)
+        await hub.stop()
+        return a.frames, b.frames
+    
+    frames_a, frames_b = asyncio.run(scenario())
+    assert [f["symbol"] for f in frames_a] == ["AAPL", "MSFT"]
+    assert frames_b == [{"type": "tick", "symbol": "MSFT", "data": {"price": 2.5}}]
+
+
+def test_unsubscribe_and_disconnect_clean_index():
+    """Test the symbol index drops empty entries"""
+    async def scenario():
+        hub = StreamHub()
+        conn = hub.connect(FakeSocket())
+        hub.subscribe(conn, ["AAPL", "MSFT"])
+        assert hub.unsubscribe(conn, ["AAPL", "GOOG"]) == ["AAPL"]
+        assert set(hub.subscriptions) == {"MSFT"}
+        await hub.disconnect(conn)
+        return hub
+    
+    hub = asyncio.run(scenario())
+    assert hub.subscriptions == {}
+    assert hub.connections == set()
+
+
+def test_subscription_limit():
+    """Test a connection cannot exceed its symbol limit"""
+    async def scenario():
+        hub = StreamHub(max_symbols=2)
+        conn = hub.connect(FakeSocket())
+        try:
+            hub.subscribe(conn, ["A", "B", "C"])
+        finally:
+            await hub.stop()
+    
+    with pytest.raises(ValueError):
+        asyncio.run(scenario())
+
+
+def test_listeners_see_every_tick():
+    """Test listeners are called even without subscribers"""
+    seen = []
+    hub = StreamHub()
+    hub.add_listener(lambda symbol, payload: seen.append(symbol))
+    hub.dispatch("AAPL", "{}")
+    assert seen == ["AAPL"]
+
+
+def test_replays_reach_only_sockets_that_opt_in():
+    """Test replayed ticks skip live listeners and subscribers and never conflate with live ticks"""
+    async def scenario():
+        hub = StreamHub()
+        live, replayed = [], []
+        hub.add_listener(lambda symbol, payload: live.append(symbol))
+        hub.add_replay_listener(lambda symbol, payload: replayed.append(symbol))
+        production, load_test = FakeSocket(), FakeSocket()
+        hub.subscribe(hub.connect(production), ["AAPL"])
+        conn = hub.connect(load_test)
+        hub.subscribe(conn, ["AAPL"])
+        hub.subscribe(conn, ["AAPL"], REPLAY)
+        hub.dispatch("AAPL", '{"price": 2.5}')
+        hub.dispatch_replay("AAPL", '{"price": 1.5, "replay_id": "r1"}')
+        await asyncio.sleep(0)
+        await hub.stop()
+        return live, replayed, production.frames, load_test.frames
+    
+    live, replayed, production, load_test = asyncio.run(scenario())
+    assert live == ["AAPL"] and replayed == ["AAPL"]
+    assert production == [{"type": "tick", "symbol": "AAPL", "data": {"price": 2.5}}]
+    assert sorted(frame["type"] for frame in load_test) == ["replay", "tick"]
+
+
+def test_failing_listener_does_not_stop_delivery():
+    """Test a listener that raises is logged and the others still run"""
+    async def scenario():
+        hub = StreamHub()
+        seen = []
+        hub.add_listener(lambda symbol, payload: json.loads(payload)["size"])
+        hub.add_listener(lambda symbol, payload: seen.append(symbol))
+        socket = FakeSocket()
+        hub.subscribe(hub.connect(socket), ["AAPL"])
+        hub.dispatch("AAPL", '{"price": 1.5}')
+        await asyncio.sleep(0)
+        await hub.stop()
+        return seen, socket.frames, hub
+    
+    seen, frames, hub = asyncio.run(scenario())
+    assert seen == ["AAPL"]
+    assert len(frames) == 1
+    assert hub.listener_errors == 1
+
+
+def test_lagging_client_gets_latest_value_per_symbol():
+    """Test unsent ticks are conflated to the newest value per symbol"""
+    async def scenario():
+        hub = StreamHub()
+        socket = FakeSocket()
+        conn = hub.connect(socket)
+        hub.subscribe(conn, ["AAPL", "MSFT"])
+        
+        # No loop iteration between dispatches: the client is behind
+        for price in range(5):
+            hub.dispatch("AAPL", json.dumps({"price": price}))
+        hub.dispatch("MSFT", '{"price": 9}')
+        assert len(conn.pending) == 2
+        
+        await asyncio.sleep(0)
+        await hub.stop()
+        return socket.frames, conn.frames_conflated
+    
+    frames, conflated = asyncio.run(scenario())
+    assert [(f["symbol"], f["data"]["price"]) for f in frames] == [("AAPL", 4), ("MSFT", 9)]
+    assert conflated == 4
+
+
+def test_msgpack_encoding():
+    """Test binary clients receive msgpack frames"""
+    async def scenario():
+        hub = StreamHub()
+        socket = FakeSocket()
+        conn = hub.connect(socket, encoding="msgpack")
+        hub.subscribe(conn, ["AAPL"])
+        hub.dispatch("AAPL", '{"price": 1.5}')
+        await asyncio.sleep(0)
+        await hub.stop()
+        return socket.frames
+    
+    assert asyncio.run(scenario()) == [{"type": "tick", "symbol": "AAPL", "data": {"price": 1.5}}]
+
+
+def test_depth_channel_is_separate_from_ticks():
+    """Test depth updates reach depth subscribers only and conflate per symbol"""
+    async def scenario():
+        hub = StreamHub()
+        ticks, depth = FakeSocket(), FakeSocket()
+        conn_ticks, conn_depth = hub.connect(ticks), hub.connect(depth)
+        hub.subscribe(conn_ticks, ["AAPL"])
+        hub.subscribe(conn_depth, ["AAPL"], channel="depth")
+        
+        hub.dispatch_depth("AAPL", '{"sequence": 1}')
+        hub.dispatch_depth("AAPL", '{"sequence": 2}')
+        hub.dispatch("AAPL", '{"price": 1.5}')
+        await asyncio.sleep(0)
+        await hub.stop()
+        return ticks.frames, depth.frames, hub
+    
+    tick_frames, depth_frames, hub = asyncio.run(scenario())
+    assert [f["type"] for f in tick_frames] == ["tick"]
+    assert depth_frames == [{"type": "depth", "symbol": "AAPL", "data": {"sequence": 2}}]
+    assert hub.depth_subscriptions == {}
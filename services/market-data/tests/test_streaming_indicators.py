@@ -0,0 +1,41 @@
+"""
+Test incremental indicators against their batch equivalents
+"""
+import numpy as np
+import pytest
+from app.services import indicators
+from app.services.streaming_indicators import RunningEMA, RollingSMA, WelfordVariance, WilderRSI
+
+PRICES = np.cumsum(np.random.default_rng(7).normal(0, 1, 500)) + 100
+
+
+def run(indicator, values):
+    return np.array([np.nan if v is None else v for v in map(indicator.update, values)])
+
+
+def test_ema_matches_batch():
+    """Test running EMA tracks the vectorized EMA"""
+    np.testing.assert_allclose(run(RunningEMA(20), PRICES), indicators.ema(PRICES, 20))
+
+
+def test_sma_matches_batch():
+    """Test ring-buffer SMA tracks the vectorized SMA"""
+    np.testing.assert_allclose(run(RollingSMA(20), PRICES), indicators.sma(PRICES, 20))
+
+
+def test_rsi_matches_batch():
+    """Test Wilder RSI tracks the vectorized RSI"""
+    np.testing.assert_allclose(run(WilderRSI(14), PRICES), indicators.rsi(PRICES, 14))
+
+
+def test_welford_variance():
+    """Test Welford variance matches the population variance"""
+    result = run(WelfordVariance(), PRICES)
+    assert result[-1] == pytest.approx(PRICES.var())
+    assert result[9] == pytest.approx(PRICES[:10].var())
+
+
+def test_indicators_are_compact():
+    """Test indicator objects carry no per-instance dict"""
+    for indicator in (RunningEMA(), RollingSMA(), WelfordVariance(), WilderRSI()):
+        assert not hasattr(indicator, "__dict__")
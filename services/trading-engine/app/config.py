@@ -3,7 +3,9 @@ Configuration management for Trading Engine
 """
 from pydantic_settings import BaseSettings
 from pydantic import Field, validator
-from typing import List, Optional
+from typing import List, Optional, Dict, Any
+from functools import lru_cache
+import json
 import os
 
 
@@ -44,6 +46,38 @@ class Settings(BaseSettings):
     LOG_LEVEL: str = Field(default="INFO")
     LOG_FORMAT: str = Field(default="json")
     
+    # Shared JSON configuration (config/<PYTHON_ENV>.json)
+    CONFIG_DIR: str = Field(default="config", env="CONFIG_DIR")
+    
+    # Order management
+    ORDER_PERSISTENCE: str = Field(default="async")  # "async" (write-behind) or "sync" (commit before acknowledging)
+    ORDER_WRITE_BATCH_SIZE: int = Field(default=500)
+    ORDER_WRITE_INTERVAL: float = Field(default=0.05)  # seconds
+    ORDER_WRITE_MAX_PENDING: int = Field(default=50000)  # orders awaiting a write before producers wait
+    ORDER_HISTORY_SIZE: int = Field(default=10000)  # finished orders kept in memory
+    ORDER_BATCH_MAX_SIZE: int = Field(default=500)  # orders per basket request
+    IDEMPOTENCY_TTL: float = Field(default=86400.0)  # seconds a response is replayed for its Idempotency-Key
+    IDEMPOTENCY_LOCK_TTL: float = Field(default=30.0)  # seconds a lock outlives its dead holder, and duplicates wait
+    ACCOUNT_CACHE_TTL: float = Field(default=60.0)  # seconds
+    
+    # Paper trading
+    PAPER_PARTICIPATION: float = Field(default=1.0)  # share of each print's size paper orders may fill
+    
+    # Positions
+    POSITION_RECONCILE_INTERVAL: float = Field(default=300.0)  # seconds between checks against the trades table
+    POSITION_RECONCILE_GRACE: float = Field(default=30.0)  # seconds a position is left alone after a fill
+    
+    # Event streams
+    EVENT_STREAM_MAXLEN: int = Field(default=100000)  # approximate entries kept per stream
+    EVENT_BATCH_SIZE: int = Field(default=500)  # events per pipelined append
+    EVENT_FLUSH_INTERVAL: float = Field(default=0.01)  # seconds
+    EVENT_MAX_PENDING: int = Field(default=100000)  # buffered events before the oldest are dropped
+    
+    # Pre-trade risk; the other limits come from trading.risk_management
+    RISK_MAX_ORDER_NOTIONAL: float = Field(default=0.0)  # 0 disables, overridden by max_order_notional
+    RISK_PRICE_BAND: float = Field(default=0.10)  # share of the last price, overridden by price_band
+    RISK_STOP_PRICE_BAND: float = Field(default=0.50)  # same for stop triggers, overridden by stop_price_band
+    
     # Circuit breaker settings
     CIRCUIT_BREAKER_FAILURE_THRESHOLD: int = Field(default=5)
     CIRCUIT_BREAKER_RECOVERY_TIMEOUT: int = Field(default=60)  # seconds
@@ -56,6 +90,13 @@ class Settings(BaseSettings):
             raise ValueError(f"PYTHON_ENV must be one of {allowed}")
         return v
     
+    @validator("ORDER_PERSISTENCE")
+    def validate_order_persistence(cls, v):
+        allowed = ["async", "sync"]
+        if v not in allowed:
+            raise ValueError(f"ORDER_PERSISTENCE must be one of {allowed}")
+        return v
+    
     @validator("LOG_LEVEL")
     def validate_log_level(cls, v):
         allowed = ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
@@ -121,4 +162,24 @@ def get_safe_config() -> dict:
         if key in config:
             config[key] = "***REDACTED***"
     
-    return config
\ No newline at end of file
+    return config
+
+
+@lru_cache()
+def get_app_config() -> Dict[str, Any]:
+    """
+    Load the shared JSON configuration for the current environment
+    """
+    path = os.path.join(settings.CONFIG_DIR, f"{settings.PYTHON_ENV}.json")
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def get_trading_config() -> Dict[str, Any]:
+    """
+    Get the `trading` section of the shared JSON configuration
+    """
+    return get_app_config().get("trading", {})
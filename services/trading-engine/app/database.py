@@ -4,8 +4,10 @@ Database configuration and session management
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 from sqlalchemy import MetaData
+import asyncpg
 import logging
 from contextlib import asynccontextmanager
+from typing import Optional
 
 from .config import settings
 
@@ -34,6 +36,9 @@ async_session_maker = async_sessionmaker(
 metadata = MetaData()
 Base = declarative_base(metadata=metadata)
 
+# Raw asyncpg pool for hot write paths and bulk operations
+pg_pool: Optional[asyncpg.Pool] = None
+
 
 async def init_db():
     """
@@ -58,6 +63,50 @@ async def close_db():
     logger.info("Database connection closed")
 
 
+async def init_pool():
+    """
+    Initialize the asyncpg connection pool
+    """
+    global pg_pool
+    
+    try:
+        pg_pool = await asyncpg.create_pool(
+            user=settings.POSTGRES_USER,
+            password=settings.POSTGRES_PASSWORD,
+            database=settings.POSTGRES_DB,
+            host=settings.POSTGRES_HOST,
+            port=settings.POSTGRES_PORT,
+            ssl=False,
+            min_size=2,
+            max_size=20,
+        )
+        logger.info("Database pool initialized successfully")
+    except Exception as e:
+        logger.error(f"Failed to initialize database pool: {str(e)}")
+        raise
+
+
+async def close_pool():
+    """
+    Close the asyncpg connection pool
+    """
+    global pg_pool
+    
+    if pg_pool:
+        await pg_pool.close()
+        pg_pool = None
+        logger.info("Database pool closed")
+
+
+def get_pool() -> asyncpg.Pool:
+    """
+    Get asyncpg pool instance
+    """
+    if not pg_pool:
+        raise RuntimeError("Database pool not initialized")
+    return pg_pool
+
+
 @asynccontextmanager
 async def get_session():
     """
@@ -12,10 +12,18 @@ import uuid
 from typing import Dict, Any
 
 from .config import settings
-from .database import init_db, close_db
+from .database import init_db, close_db, init_pool, close_pool
 from .routers import health, auth, trading, accounts
 from .utils.logging import setup_logging
 from .utils.redis_client import init_redis, close_redis
+from .utils.idempotency import init_idempotency, close_idempotency
+from .services.accounts import init_account_directory, close_account_directory
+from .services.order_writer import init_order_writer, close_order_writer
+from .services.orders import init_order_manager, close_order_manager
+from .services.matching import init_paper_exchange, close_paper_exchange
+from .services.positions import init_position_engine, close_position_engine
+from .services.risk import init_risk_engine, close_risk_engine
+from .services.events import init_event_publisher, close_event_publisher
 
 # Setup structured logging
 logger = setup_logging()
@@ -33,17 +41,37 @@ async def lifespan(app: FastAPI):
     
     # Initialize database
     await init_db()
+    await init_pool()
     logger.info("Database connection established")
     
     # Initialize Redis
     await init_redis()
+    await init_idempotency()
     logger.info("Redis connection established")
     
+    # Initialize order management
+    await init_account_directory()
+    await init_order_writer()
+    await init_order_manager()
+    await init_position_engine()
+    await init_risk_engine()
+    await init_paper_exchange()
+    await init_event_publisher()
+    
     yield
     
     # Shutdown
     logger.info("Shutting down Trading Engine Service")
+    await close_paper_exchange()
+    await close_event_publisher()
+    await close_risk_engine()
+    await close_position_engine()
+    await close_order_manager()
+    await close_order_writer()
+    await close_account_directory()
+    await close_pool()
     await close_db()
+    await close_idempotency()
     await close_redis()
     logger.info("All connections closed")
 
@@ -1,146 +1,279 @@
 """
 Trading endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
 import logging
-from typing import Dict, Any, List
-from datetime import datetime
+from typing import Dict, Any, List, Optional, Awaitable, Callable
+from uuid import UUID
 
-from ..database import get_db
-from ..routers.auth import oauth2_scheme
+from ..config import settings
+from ..routers.auth import oauth2_scheme, token_subject
+from ..services.accounts import get_account_directory
+from ..services.orders import get_order_manager, InvalidTransition, STATUSES
+from ..services.matching import get_paper_exchange
+from ..services.positions import get_position_engine
+from ..services.risk import get_risk_engine
+from ..services.events import get_event_publisher
+from ..utils.idempotency import (
+    get_idempotency_store, IdempotencyConflict, IdempotencyInProgress, IdempotencyUnavailable, Response
+)
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 
+class OrderRequest(BaseModel):
+    """
+    One order of a basket
+    """
+    account_id: UUID
+    symbol: str
+    side: str  # buy/sell
+    quantity: float
+    order_type: str  # market/limit/stop
+    price: Optional[float] = None
+    stop_price: Optional[float] = None
+
+
+async def run_idempotent(
+    key: Optional[str],
+    token: str,
+    scope: str,
+    params: Dict[str, Any],
+    fn: Callable[[], Awaitable[Response]]
+) -> Any:
+    """
+    Run a request once per Idempotency-Key and caller, replaying the stored
+    response (marked with an Idempotent-Replayed header) for retries
+    """
+    if key is None:
+        status_code, body = await fn()
+        replayed = False
+    else:
+        try:
+            status_code, body, replayed = await get_idempotency_store().run(
+                token_subject(token), scope, key, params, fn
+            )
+        except IdempotencyConflict as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        except IdempotencyInProgress as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        except IdempotencyUnavailable as e:
+            raise HTTPException(status_code=503, detail=str(e))
+    
+    headers = {"Idempotent-Replayed": "true"} if replayed else None
+    if status_code >= 400:
+        raise HTTPException(status_code=status_code, detail=body["detail"], headers=headers)
+    if replayed:
+        return JSONResponse(content=body, status_code=status_code, headers=headers)
+    return body
+
+
 @router.post("/orders")
 async def create_order(
+    account_id: UUID,
     symbol: str,
     side: str,  # buy/sell
     quantity: float,
-    order_type: str,  # market/limit
+    order_type: str,  # market/limit/stop
     price: float = None,
-    token: str = Depends(oauth2_scheme),
-    db: AsyncSession = Depends(get_db)
+    stop_price: float = None,
+    idempotency_key: Optional[str] = Header(default=None),
+    token: str = Depends(oauth2_scheme)
 ) -> Dict[str, Any]:
     """
     Create a new trading order
     """
-    # TODO: Implement order creation logic
-    order = {
-        "id": "order_123",
+    async def place() -> Response:
+        try:
+            order = await get_order_manager().submit(
+                str(account_id), symbol, side, quantity, order_type, price, stop_price
+            )
+        except ValueError as e:
+            return 400, {"detail": str(e)}
+        
+        logger.info(f"Order {order.id} {order.status}: {order.side} {order.quantity} {order.symbol} {order.order_type}")
+        return 200, order.to_dict()
+    
+    params = {
+        "account_id": str(account_id),
         "symbol": symbol,
         "side": side,
         "quantity": quantity,
         "order_type": order_type,
         "price": price,
-        "status": "pending",
-        "created_at": datetime.utcnow().isoformat()
+        "stop_price": stop_price
     }
+    return await run_idempotent(idempotency_key, token, "orders", params, place)
+
+
+@router.post("/orders/batch")
+async def create_orders(
+    orders: List[OrderRequest],
+    idempotency_key: Optional[str] = Header(default=None),
+    token: str = Depends(oauth2_scheme)
+) -> Dict[str, Any]:
+    """
+    Create a basket of orders, validated, risk checked and persisted
+    together, with a result per order in request order
+    """
+    if not orders:
+        raise HTTPException(status_code=400, detail="The basket is empty")
+    if len(orders) > settings.ORDER_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"A basket holds at most {settings.ORDER_BATCH_MAX_SIZE} orders"
+        )
+    requests = [{**order.dict(), "account_id": str(order.account_id)} for order in orders]
+    
+    async def place() -> Response:
+        results = []
+        counts = {}
+        for index, result in enumerate(await get_order_manager().submit_batch(requests)):
+            if isinstance(result, ValueError):
+                entry = {"index": index, "status": "invalid", "error": str(result), "order": None}
+            else:
+                entry = {"index": index, "status": result.status, "error": result.reason, "order": result.to_dict()}
+            counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+            results.append(entry)
+        
+        logger.info(f"Basket of {len(orders)} orders: {counts}")
+        return 200, {"count": len(orders), "summary": counts, "results": results}
     
-    logger.info(f"Order created: {order}")
-    return order
+    return await run_idempotent(idempotency_key, token, "orders/batch", {"orders": requests}, place)
 
 
 @router.get("/orders")
 async def get_orders(
     status: str = None,
-    token: str = Depends(oauth2_scheme),
-    db: AsyncSession = Depends(get_db)
+    account_id: UUID = None,
+    symbol: str = None,
+    token: str = Depends(oauth2_scheme)
 ) -> List[Dict[str, Any]]:
     """
-    Get user's orders
+    Get working and recent orders, optionally filtered
+    """
+    if status is not None and status not in STATUSES:
+        raise HTTPException(status_code=400, detail=f"status must be one of {list(STATUSES)}")
+    orders = get_order_manager().list_orders(
+        account_id=str(account_id) if account_id else None,
+        symbol=symbol,
+        status=status
+    )
+    return [order.to_dict() for order in orders]
+
+
+@router.get("/admin/orders")
+async def get_order_stats(token: str = Depends(oauth2_scheme)) -> Dict[str, Any]:
+    """
+    Get order management counters and persistence metrics
+    """
+    return get_order_manager().stats()
+
+
+@router.get("/admin/paper")
+async def get_paper_stats(token: str = Depends(oauth2_scheme)) -> Dict[str, Any]:
+    """
+    Get paper matching engine counters
+    """
+    return get_paper_exchange().stats()
+
+
+@router.get("/admin/positions")
+async def get_position_stats(token: str = Depends(oauth2_scheme)) -> Dict[str, Any]:
+    """
+    Get position engine and reconciliation counters
+    """
+    return get_position_engine().stats()
+
+
+@router.get("/admin/risk")
+async def get_risk_stats(token: str = Depends(oauth2_scheme)) -> Dict[str, Any]:
+    """
+    Get risk limits, counters and check latency
+    """
+    return get_risk_engine().stats()
+
+
+@router.get("/admin/events")
+async def get_event_stats(token: str = Depends(oauth2_scheme)) -> Dict[str, Any]:
+    """
+    Get event stream publishing counters
     """
-    # TODO: Implement order retrieval logic
-    return [
-        {
-            "id": "order_123",
-            "symbol": "AAPL",
-            "side": "buy",
-            "quantity": 100,
-            "order_type": "limit",
-            "price": 150.00,
-            "status": "filled",
-            "created_at": datetime.utcnow().isoformat()
-        }
-    ]
+    return get_event_publisher().stats()
+
+
+@router.get("/admin/idempotency")
+async def get_idempotency_stats(token: str = Depends(oauth2_scheme)) -> Dict[str, Any]:
+    """
+    Get idempotency key counters
+    """
+    return get_idempotency_store().stats()
 
 
 @router.get("/orders/{order_id}")
 async def get_order(
     order_id: str,
-    token: str = Depends(oauth2_scheme),
-    db: AsyncSession = Depends(get_db)
+    token: str = Depends(oauth2_scheme)
 ) -> Dict[str, Any]:
     """
     Get specific order details
     """
-    # TODO: Implement order retrieval logic
-    return {
-        "id": order_id,
-        "symbol": "AAPL",
-        "side": "buy",
-        "quantity": 100,
-        "order_type": "limit",
-        "price": 150.00,
-        "status": "filled",
-        "created_at": datetime.utcnow().isoformat()
-    }
+    order = await get_order_manager().get(order_id)
+    if order is None:
+        raise HTTPException(status_code=404, detail=f"Order {order_id} not found")
+    return order.to_dict()
 
 
 @router.delete("/orders/{order_id}")
 async def cancel_order(
     order_id: str,
-    token: str = Depends(oauth2_scheme),
-    db: AsyncSession = Depends(get_db)
+    token: str = Depends(oauth2_scheme)
 ) -> Dict[str, Any]:
     """
     Cancel an order
     """
-    # TODO: Implement order cancellation logic
+    try:
+        order = await get_order_manager().cancel(order_id, "Cancelled by user")
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Order {order_id} not found")
+    except InvalidTransition as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
     return {
         "message": f"Order {order_id} cancelled successfully",
-        "order_id": order_id
+        "order_id": order_id,
+        "order": order.to_dict()
     }
 
 
 @router.get("/positions")
 async def get_positions(
-    token: str = Depends(oauth2_scheme),
-    db: AsyncSession = Depends(get_db)
+    account_id: UUID = None,
+    include_flat: bool = False,
+    token: str = Depends(oauth2_scheme)
 ) -> List[Dict[str, Any]]:
     """
-    Get current positions
+    Get current positions, optionally for one account
     """
-    # TODO: Implement position retrieval logic
-    return [
-        {
-            "symbol": "AAPL",
-            "quantity": 100,
-            "average_price": 150.00,
-            "current_price": 155.00,
-            "pnl": 500.00,
-            "pnl_percentage": 3.33
-        }
-    ]
+    positions = get_position_engine().positions(
+        account_id=str(account_id) if account_id else None,
+        include_flat=include_flat
+    )
+    return [position.to_dict() for position in positions]
 
 
 @router.get("/portfolio/summary")
 async def get_portfolio_summary(
-    token: str = Depends(oauth2_scheme),
-    db: AsyncSession = Depends(get_db)
+    account_id: UUID,
+    token: str = Depends(oauth2_scheme)
 ) -> Dict[str, Any]:
     """
     Get portfolio summary
     """
-    # TODO: Implement portfolio summary logic
-    return {
-        "total_value": 100000.00,
-        "cash_balance": 50000.00,
-        "positions_value": 50000.00,
-        "daily_pnl": 1500.00,
-        "daily_pnl_percentage": 1.5,
-        "total_pnl": 5000.00,
-        "total_pnl_percentage": 5.0
-    }
\ No newline at end of file
+    account = await get_account_directory().get(str(account_id))
+    if account is None:
+        raise HTTPException(status_code=404, detail=f"Account {account_id} not found")
+    return get_position_engine().portfolio(str(account_id)).summary(account.balance)
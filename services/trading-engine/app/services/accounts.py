@@ -0,0 +1,110 @@
+"""
+Cached lookups of trading accounts for the order path
+"""
+import logging
+import time
+from typing import Awaitable, Callable, Dict, NamedTuple, Optional, Tuple
+
+from ..config import settings
+from ..database import get_pool
+
+logger = logging.getLogger(__name__)
+
+PAPER = "paper"
+LIVE = "live"
+
+ACCOUNT_QUERY = """
+    SELECT id::text, account_type, is_active, balance::float8
+    FROM trading_accounts
+    WHERE id = $1
+"""
+
+
+class Account(NamedTuple):
+    id: str
+    account_type: str
+    is_active: bool
+    balance: float = 0.0  # funded cash; fills are accounted for by the position engine
+
+
+AccountLoader = Callable[[str], Awaitable[Optional[Account]]]
+
+
+async def load_account(account_id: str) -> Optional[Account]:
+    """
+    Read an account from the trading_accounts table
+    """
+    async with get_pool().acquire() as conn:
+        row = await conn.fetchrow(ACCOUNT_QUERY, account_id)
+    return Account(*row) if row is not None else None
+
+
+class AccountDirectory:
+    """
+    Caches accounts for `ttl` seconds so routing an order by account type
+    costs a dict lookup rather than a query
+    """
+    def __init__(self, ttl: float = 60.0, loader: AccountLoader = load_account):
+        self.ttl = ttl
+        self.loader = loader
+        self.accounts: Dict[str, Tuple[float, Optional[Account]]] = {}
+        
+        self.hits = 0
+        self.misses = 0
+    
+    async def get(self, account_id: str) -> Optional[Account]:
+        """
+        Get an account, or None if it does not exist
+        """
+        cached = self.accounts.get(account_id)
+        now = time.monotonic()
+        if cached is not None and cached[0] > now:
+            self.hits += 1
+            return cached[1]
+        self.misses += 1
+        account = await self.loader(account_id)
+        self.accounts[account_id] = (now + self.ttl, account)
+        return account
+    
+    def invalidate(self, account_id: str):
+        """
+        Forget a cached account
+        """
+        self.accounts.pop(account_id, None)
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        Get cache counters
+        """
+        return {"cached": len(self.accounts), "hits": self.hits, "misses": self.misses}
+
+
+# Global account directory
+account_directory: Optional[AccountDirectory] = None
+
+
+async def init_account_directory():
+    """
+    Initialize the account directory
+    """
+    global account_directory
+    
+    account_directory = AccountDirectory(ttl=settings.ACCOUNT_CACHE_TTL)
+
+
+async def close_account_directory():
+    """
+    Release the account directory
+    """
+    global account_directory
+    
+    account_directory = None
+
+
+def get_account_directory() -> AccountDirectory:
+    """
+    Get account directory instance
+    """
+    if not account_directory:
+        raise RuntimeError("Account directory not initialized")
+    return account_directory
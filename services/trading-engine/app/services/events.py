@@ -0,0 +1,200 @@
+"""
+Order, fill and position events published to durable Redis streams
+"""
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from ..config import settings
+from ..utils.redis_client import (
+    RedisStream, ORDER_EVENTS_STREAM, FILL_EVENTS_STREAM, POSITION_EVENTS_STREAM
+)
+from .orders import Execution, Order, OrderManager, get_order_manager
+from .positions import PositionEngine, get_position_engine
+
+logger = logging.getLogger(__name__)
+
+# (stream, event)
+Event = Tuple[str, Dict[str, Any]]
+
+
+class EventPublisher:
+    """
+    Appends every order transition, fill and resulting position to the
+    event streams, where consumer groups (see StreamConsumer) can process
+    them in batches and catch up after a restart.
+    
+    The OMS listener only buffers a snapshot of each event. One task
+    appends them in order, up to `batch_size` per pipelined round trip to
+    each stream. While Redis is unavailable the events wait and are retried
+    in order; past `max_pending` the oldest are dropped rather than growing
+    memory. A batch that failed on one stream is appended again to all of
+    them, so delivery is at least once, like the consumer groups'.
+    """
+    def __init__(
+        self,
+        manager: OrderManager,
+        positions: Optional[PositionEngine] = None,
+        batch_size: int = 500,
+        flush_interval: float = 0.01,
+        max_pending: int = 100000,
+        maxlen: int = 100000,
+        retry_delay: float = 1.0
+    ):
+        self.manager = manager
+        self.positions = positions
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.maxlen = maxlen
+        self.retry_delay = retry_delay
+        self.pending: Deque[Event] = deque()
+        self.streams: Dict[str, RedisStream] = {}
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        
+        self.published = 0
+        self.dropped = 0
+        self.failures = 0
+    
+    def _queue(self, stream: str, event: Dict[str, Any]):
+        """
+        Buffer one event, dropping the oldest when the buffer is full
+        """
+        if len(self.pending) >= self.max_pending:
+            self.pending.popleft()
+            self.dropped += 1
+        self.pending.append((stream, event))
+        if len(self.pending) >= self.batch_size:
+            self._wake.set()
+    
+    def on_order(self, order: Order, execution: Optional[Execution]):
+        """
+        Buffer the events of one OMS transition
+        """
+        self._queue(ORDER_EVENTS_STREAM, {"type": "order", "order": order.to_dict()})
+        if execution is None:
+            return
+        self._queue(FILL_EVENTS_STREAM, {"type": "fill", **execution._asdict()})
+        if self.positions is not None:
+            portfolio = self.positions.portfolios.get(execution.account_id)
+            position = portfolio.positions.get(execution.symbol) if portfolio is not None else None
+            if position is not None:
+                self._queue(POSITION_EVENTS_STREAM, {"type": "position", "position": position.to_dict()})
+    
+    async def _execute(self, events: List[Event]):
+        """
+        Append events to their streams, one concurrent round trip per stream
+        """
+        batches: Dict[str, List[Dict[str, Any]]] = {}
+        for stream, event in events:
+            batches.setdefault(stream, []).append(event)
+        for stream in batches:
+            if stream not in self.streams:
+                self.streams[stream] = RedisStream(stream, maxlen=self.maxlen)
+        await asyncio.gather(*(self.streams[stream].add_many(batch) for stream, batch in batches.items()))
+    
+    async def flush(self) -> bool:
+        """
+        Append everything buffered so far, keeping it buffered on failure
+        """
+        pending = self.pending
+        while pending:
+            batch = [pending.popleft() for _ in range(min(self.batch_size, len(pending)))]
+            try:
+                await self._execute(batch)
+            except Exception as e:
+                logger.error(f"Event publish failed: {str(e)}")
+                self.failures += 1
+                pending.extendleft(reversed(batch))
+                return False
+            self.published += len(batch)
+        return True
+    
+    async def _run(self):
+        """
+        Flush every `flush_interval` seconds, or sooner when woken
+        """
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if not await self.flush():
+                await asyncio.sleep(self.retry_delay)
+    
+    def start(self):
+        """
+        Start publishing OMS events
+        """
+        if self._task is None:
+            self.manager.add_listener(self.on_order)
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """
+        Stop publishing after a last flush
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get publishing counters
+        """
+        return {
+            "pending": len(self.pending),
+            "published": self.published,
+            "dropped": self.dropped,
+            "failures": self.failures
+        }
+
+
+# Global event publisher
+event_publisher: Optional[EventPublisher] = None
+
+
+async def init_event_publisher():
+    """
+    Initialize the event publisher and start publishing
+    """
+    global event_publisher
+    
+    event_publisher = EventPublisher(
+        get_order_manager(),
+        get_position_engine(),
+        batch_size=settings.EVENT_BATCH_SIZE,
+        flush_interval=settings.EVENT_FLUSH_INTERVAL,
+        max_pending=settings.EVENT_MAX_PENDING,
+        maxlen=settings.EVENT_STREAM_MAXLEN
+    )
+    event_publisher.start()
+    logger.info("Event publisher started")
+
+
+async def close_event_publisher():
+    """
+    Flush pending events and stop the publisher
+    """
+    global event_publisher
+    
+    if event_publisher:
+        await event_publisher.stop()
+        event_publisher = None
+
+
+def get_event_publisher() -> EventPublisher:
+    """
+    Get event publisher instance
+    """
+    if not event_publisher:
+        raise RuntimeError("Event publisher not initialized")
+    return event_publisher
@@ -0,0 +1,481 @@
+"""
+Paper-trading matching engine driven by market-data ticks
+"""
+import asyncio
+import json
+import logging
+import time
+from bisect import insort
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from ..config import settings
+from ..utils.redis_client import consume_ticks, get_redis, QUOTE_KEY_PREFIX
+from .accounts import PAPER
+from .orders import (
+    ACCEPTED, BUY, CANCELLED, LIMIT, REJECTED, STOP,
+    Execution, InvalidTransition, Order, OrderManager, get_order_manager
+)
+
+logger = logging.getLogger(__name__)
+
+EPSILON = 1e-9
+
+
+class RestingOrder:
+    """
+    The engine's view of a working paper order
+    """
+    __slots__ = ("id", "account_id", "symbol", "side", "order_type", "price", "stop_price", "remaining")
+    
+    def __init__(self, order: Order):
+        self.id = order.id
+        self.account_id = order.account_id
+        self.symbol = order.symbol
+        self.side = order.side
+        self.order_type = order.order_type
+        self.price = order.price
+        self.stop_price = order.stop_price
+        self.remaining = order.remaining
+
+
+class Ladder:
+    """
+    Price levels of one kind of resting order, each a FIFO queue.
+    
+    Keys are prices multiplied by `sign` and kept ascending, so the level
+    that executes first is always the last key and is popped in O(1). A
+    level at key k is crossed by a trade at price p when k >= p * sign:
+    buy limits (sign 1) fill when the market trades at or below them, sell
+    limits (sign -1) at or above them, and stops use the opposite sign of
+    their side.
+    """
+    __slots__ = ("sign", "keys", "levels")
+    
+    def __init__(self, sign: float):
+        self.sign = sign
+        self.keys: List[float] = []
+        self.levels: Dict[float, Deque[RestingOrder]] = {}
+    
+    def __len__(self) -> int:
+        return len(self.keys)
+    
+    def add(self, price: float, order: RestingOrder):
+        """
+        Queue an order behind the others at its price
+        """
+        key = price * self.sign
+        level = self.levels.get(key)
+        if level is None:
+            level = self.levels[key] = deque()
+            insort(self.keys, key)
+        level.append(order)
+    
+    def remove(self, price: float, order: RestingOrder) -> bool:
+        """
+        Take an order out of its level
+        """
+        key = price * self.sign
+        level = self.levels.get(key)
+        if level is None:
+            return False
+        try:
+            level.remove(order)
+        except ValueError:
+            return False
+        if not level:
+            del self.levels[key]
+            self.keys.remove(key)
+        return True
+    
+    def crossed(self, price: float) -> bool:
+        """
+        Check whether a trade at `price` reaches the first level
+        """
+        keys = self.keys
+        return bool(keys) and keys[-1] >= price * self.sign
+    
+    def first(self) -> Deque[RestingOrder]:
+        """
+        Get the queue of the first level
+        """
+        return self.levels[self.keys[-1]]
+    
+    def pop_first(self) -> float:
+        """
+        Drop the first level, returning its price
+        """
+        key = self.keys.pop()
+        del self.levels[key]
+        return key * self.sign
+
+
+class PaperBook:
+    """
+    Resting paper orders of one symbol, matched against market prints.
+    
+    Limit orders rest in price-time priority and fill at their limit price
+    when the market trades through them. Stops rest until the market
+    reaches them, then join market orders, which fill at the trade price.
+    Each print offers `size * participation` shares (unlimited when the
+    print has no size), handed out in priority order, so large orders fill
+    partially over several prints. Orders that are marketable on arrival
+    fill at once at the last price.
+    """
+    def __init__(self, symbol: str, participation: float = 1.0):
+        self.symbol = symbol
+        self.participation = participation
+        self.bids = Ladder(1.0)
+        self.asks = Ladder(-1.0)
+        self.buy_stops = Ladder(-1.0)
+        self.sell_stops = Ladder(1.0)
+        self.market: Deque[RestingOrder] = deque()
+        self.orders: Dict[str, RestingOrder] = {}
+        self.last_price: Optional[float] = None
+    
+    def __len__(self) -> int:
+        return len(self.orders)
+    
+    def _execute(self, order: RestingOrder, quantity: float, price: float, timestamp: float, out: List[Execution]):
+        """
+        Record an execution and forget the order once it is complete
+        """
+        order.remaining -= quantity
+        if order.remaining <= EPSILON:
+            del self.orders[order.id]
+        out.append(Execution(order.id, order.account_id, self.symbol, order.side, quantity, price, timestamp))
+    
+    def add(self, order: Order, timestamp: float, out: List[Execution]):
+        """
+        Enter an accepted order, filling it at once when it is marketable
+        """
+        resting = RestingOrder(order)
+        self.orders[resting.id] = resting
+        last = self.last_price
+        buy = resting.side == BUY
+        
+        if resting.order_type == LIMIT:
+            if last is not None and (resting.price >= last if buy else resting.price <= last):
+                self._execute(resting, resting.remaining, last, timestamp, out)
+            else:
+                (self.bids if buy else self.asks).add(resting.price, resting)
+        elif resting.order_type == STOP:
+            if last is not None and (last >= resting.stop_price if buy else last <= resting.stop_price):
+                self._execute(resting, resting.remaining, last, timestamp, out)
+            else:
+                (self.buy_stops if buy else self.sell_stops).add(resting.stop_price, resting)
+        elif last is not None:
+            self._execute(resting, resting.remaining, last, timestamp, out)
+        else:
+            # Market orders wait for the first price of the symbol
+            self.market.append(resting)
+    
+    def cancel(self, order_id: str) -> bool:
+        """
+        Remove a working order
+        """
+        order = self.orders.pop(order_id, None)
+        if order is None:
+            return False
+        buy = order.side == BUY
+        if order.order_type == LIMIT:
+            (self.bids if buy else self.asks).remove(order.price, order)
+        elif order.order_type == STOP:
+            if not (self.buy_stops if buy else self.sell_stops).remove(order.stop_price, order):
+                # Already triggered
+                self.market.remove(order)
+        else:
+            self.market.remove(order)
+        return True
+    
+    def on_trade(self, price: float, size: float, timestamp: float, out: List[Execution]):
+        """
+        Trigger stops and fill resting orders against a market print
+        """
+        self.last_price = price
+        liquidity = size * self.participation if size > 0 else float("inf")
+        
+        for stops in (self.buy_stops, self.sell_stops):
+            while stops.crossed(price):
+                self.market.extend(stops.first())
+                stops.pop_first()
+        
+        market = self.market
+        while market and liquidity > EPSILON:
+            order = market[0]
+            quantity = min(order.remaining, liquidity)
+            liquidity -= quantity
+            self._execute(order, quantity, price, timestamp, out)
+            if order.remaining <= EPSILON:
+                market.popleft()
+        
+        for ladder in (self.bids, self.asks):
+            while liquidity > EPSILON and ladder.crossed(price):
+                level = ladder.first()
+                limit = ladder.keys[-1] * ladder.sign
+                while level and liquidity > EPSILON:
+                    order = level[0]
+                    quantity = min(order.remaining, liquidity)
+                    liquidity -= quantity
+                    self._execute(order, quantity, limit, timestamp, out)
+                    if order.remaining <= EPSILON:
+                        level.popleft()
+                if not level:
+                    ladder.pop_first()
+
+
+class MatchingEngine:
+    """
+    Paper books for every symbol with working paper orders
+    """
+    def __init__(self, participation: float = 1.0):
+        self.participation = participation
+        self.books: Dict[str, PaperBook] = {}
+        self.locations: Dict[str, str] = {}
+        
+        self.orders = 0
+        self.cancels = 0
+        self.trades = 0
+        self.executions = 0
+    
+    def book(self, symbol: str) -> PaperBook:
+        """
+        Get or create a symbol's book
+        """
+        book = self.books.get(symbol)
+        if book is None:
+            book = self.books[symbol] = PaperBook(symbol, self.participation)
+        return book
+    
+    def add(self, order: Order, timestamp: Optional[float] = None) -> List[Execution]:
+        """
+        Enter an accepted order and return any immediate executions
+        """
+        out: List[Execution] = []
+        self.book(order.symbol).add(order, timestamp or time.time(), out)
+        self.locations[order.id] = order.symbol
+        self.orders += 1
+        self._done(out)
+        return out
+    
+    def cancel(self, order_id: str) -> bool:
+        """
+        Remove a working order from its book
+        """
+        symbol = self.locations.pop(order_id, None)
+        if symbol is None:
+            return False
+        self.cancels += 1
+        return self.books[symbol].cancel(order_id)
+    
+    def on_trade(self, symbol: str, price: float, size: float = 0.0, timestamp: Optional[float] = None) -> List[Execution]:
+        """
+        Match a market print against a symbol's book
+        """
+        book = self.books.get(symbol)
+        if book is None:
+            return []
+        out: List[Execution] = []
+        book.on_trade(price, size, timestamp or time.time(), out)
+        self.trades += 1
+        self._done(out)
+        return out
+    
+    def _done(self, executions: List[Execution]):
+        """
+        Stop tracking orders that have been completely filled
+        """
+        self.executions += len(executions)
+        for execution in executions:
+            book = self.books[execution.symbol]
+            if execution.order_id not in book.orders:
+                self.locations.pop(execution.order_id, None)
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get event counters and book sizes
+        """
+        return {
+            "books": {symbol: len(book) for symbol, book in self.books.items() if len(book)},
+            "working": len(self.locations),
+            "orders": self.orders,
+            "cancels": self.cancels,
+            "trades": self.trades,
+            "executions": self.executions
+        }
+
+
+class PaperExchange:
+    """
+    Connects the matching engine to the OMS and the market-data tick feed.
+    
+    Accepted paper orders enter the engine as the OMS announces them, and
+    cancels and rejections take them out. Ticks arrive from the shared
+    Redis tick channels; ticks for symbols without paper orders are dropped
+    before their payload is parsed. A new symbol's book is seeded from the
+    quote cache so market orders need not wait for the next print.
+    Executions are queued and applied in order by one task through
+    `OrderManager.fill`, the same path live fills take.
+    """
+    def __init__(self, manager: OrderManager, participation: float = 1.0, reconnect_delay: float = 1.0):
+        self.manager = manager
+        self.engine = MatchingEngine(participation)
+        self.reconnect_delay = reconnect_delay
+        self.pending: Deque[Execution] = deque()
+        self._wake = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        
+        self.ticks = 0
+        self.tick_errors = 0
+        self.fills_applied = 0
+        self.fills_dropped = 0
+    
+    def on_order(self, order: Order, execution: Optional[Execution]):
+        """
+        Mirror paper order transitions into the engine
+        """
+        if order.venue != PAPER or execution is not None:
+            return
+        if order.status == ACCEPTED:
+            seed = order.symbol not in self.engine.books
+            self._queue(self.engine.add(order))
+            if seed and self._tasks:
+                asyncio.get_running_loop().create_task(self._seed(order.symbol))
+        elif order.status in (CANCELLED, REJECTED):
+            self.engine.cancel(order.id)
+    
+    def on_tick(self, symbol: str, payload: str):
+        """
+        Match a tick from the market-data service
+        """
+        book = self.engine.books.get(symbol)
+        if book is None:
+            return
+        if not book.orders:
+            # Its last price would go stale; the next order reseeds the book
+            del self.engine.books[symbol]
+            return
+        quote = json.loads(payload)
+        self.ticks += 1
+        self._queue(self.engine.on_trade(
+            symbol, float(quote["price"]), float(quote.get("size") or 0.0), quote.get("timestamp")
+        ))
+    
+    def _queue(self, executions: List[Execution]):
+        if executions:
+            self.pending.extend(executions)
+            self._wake.set()
+    
+    async def _seed(self, symbol: str):
+        """
+        Give a new book the last cached price of its symbol
+        """
+        try:
+            value = await get_redis().get(f"{QUOTE_KEY_PREFIX}{symbol}")
+            book = self.engine.books.get(symbol)
+            if value and book is not None and book.last_price is None:
+                self.on_tick(symbol, value)
+        except Exception as e:
+            logger.error(f"Failed to seed paper book for {symbol}: {str(e)}")
+    
+    async def apply(self) -> int:
+        """
+        Apply every queued execution to the OMS
+        """
+        applied = 0
+        pending = self.pending
+        while pending:
+            execution = pending.popleft()
+            try:
+                await self.manager.fill(execution.order_id, execution.quantity, execution.price, execution.timestamp)
+                applied += 1
+            except (KeyError, ValueError, InvalidTransition) as e:
+                # e.g. the order was cancelled after the engine filled it
+                logger.warning(f"Dropping paper fill for order {execution.order_id}: {str(e)}")
+                self.fills_dropped += 1
+        self.fills_applied += applied
+        return applied
+    
+    async def _apply_loop(self):
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            await self.apply()
+    
+    def _tick_failed(self, symbol: str, error: Exception):
+        """
+        Count a tick `on_tick` could not handle
+        """
+        self.tick_errors += 1
+    
+    def start(self):
+        """
+        Start matching paper orders against live ticks
+        """
+        if not self._tasks:
+            self.manager.add_listener(self.on_order)
+            self._tasks = [
+                asyncio.create_task(self._apply_loop()),
+                asyncio.create_task(consume_ticks(self.on_tick, self.reconnect_delay, self._tick_failed))
+            ]
+    
+    async def stop(self):
+        """
+        Stop matching and apply executions already produced
+        """
+        for task in self._tasks:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        await self.apply()
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get engine and fill counters
+        """
+        return {
+            **self.engine.stats(),
+            "ticks": self.ticks,
+            "tick_errors": self.tick_errors,
+            "fills_pending": len(self.pending),
+            "fills_applied": self.fills_applied,
+            "fills_dropped": self.fills_dropped
+        }
+
+
+# Global paper exchange
+paper_exchange: Optional[PaperExchange] = None
+
+
+async def init_paper_exchange():
+    """
+    Initialize the paper exchange and start matching
+    """
+    global paper_exchange
+    
+    paper_exchange = PaperExchange(get_order_manager(), participation=settings.PAPER_PARTICIPATION)
+    paper_exchange.start()
+    logger.info("Paper exchange started")
+
+
+async def close_paper_exchange():
+    """
+    Stop the paper exchange
+    """
+    global paper_exchange
+    
+    if paper_exchange:
+        await paper_exchange.stop()
+        paper_exchange = None
+
+
+def get_paper_exchange() -> PaperExchange:
+    """
+    Get paper exchange instance
+    """
+    if not paper_exchange:
+        raise RuntimeError("Paper exchange not initialized")
+    return paper_exchange
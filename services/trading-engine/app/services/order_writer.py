@@ -0,0 +1,283 @@
+"""
+Write-behind persistence of orders into the trades hypertable
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from ..config import settings
+from ..database import get_pool
+
+logger = logging.getLogger(__name__)
+
+# (id, account_id, symbol, side, quantity, price, stop_price, order_type, status,
+#  filled_quantity, average_fill_price, filled_at, notes, created_at, updated_at)
+OrderRecord = Tuple[
+    str, str, str, str, float, Optional[float], Optional[float], str, str,
+    float, Optional[float], Optional[datetime], Optional[str], datetime, datetime
+]
+
+# One statement per batch: the columns travel as arrays and are unnested
+# server-side, so a batch costs one round trip however many orders it holds
+UPSERT_ORDERS = """
+    INSERT INTO trades (
+        id, account_id, symbol, side, quantity, price, stop_price, order_type, status,
+        filled_quantity, average_fill_price, filled_at, notes, created_at, updated_at
+    )
+    SELECT * FROM unnest(
+        $1::uuid[], $2::uuid[], $3::varchar[], $4::varchar[], $5::float8[], $6::float8[],
+        $7::float8[], $8::varchar[], $9::varchar[], $10::float8[], $11::float8[],
+        $12::timestamptz[], $13::text[], $14::timestamptz[], $15::timestamptz[]
+    )
+    ON CONFLICT (id, created_at) DO UPDATE SET
+        status = EXCLUDED.status,
+        filled_quantity = EXCLUDED.filled_quantity,
+        average_fill_price = EXCLUDED.average_fill_price,
+        filled_at = EXCLUDED.filled_at,
+        notes = EXCLUDED.notes
+"""
+
+
+def to_columns(records: List[OrderRecord]) -> List[List[Any]]:
+    """
+    Transpose records into one list per column
+    """
+    return [list(column) for column in zip(*records)]
+
+
+class OrderWriter:
+    """
+    Coalesces order state changes and upserts them in batches.
+    
+    Each order is buffered under its id, so several transitions between two
+    flushes cost one row. A single flush loop performs every write, which
+    keeps an order's states landing in the order they happened. `put`
+    returns as soon as the state is buffered; `write` also waits for the
+    flush that contains it, and concurrent `write` callers share that
+    flush's commit. When `max_pending` orders are waiting, `put` waits for
+    the next flush instead of growing memory.
+    
+    A batch that still fails after `max_retries` attempts is retried one
+    order at a time, so one bad row (e.g. an unknown account) does not take
+    the rest of the batch down with it, and each `write` caller only learns
+    about the failures of its own orders.
+    """
+    def __init__(
+        self,
+        batch_size: int = 500,
+        flush_interval: float = 0.05,
+        max_pending: int = 50000,
+        max_retries: int = 3
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self.pending: Dict[str, OrderRecord] = {}
+        # (ids written, future resolved with the ones that failed)
+        self.waiters: List[Tuple[Set[str], asyncio.Future]] = []
+        self._wake = asyncio.Event()
+        self._space = asyncio.Event()
+        self._space.set()
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+        
+        self.puts = 0
+        self.coalesced = 0
+        self.rows_written = 0
+        self.rows_failed = 0
+        self.batches = 0
+        self.last_flush_latency = 0.0
+        self.max_flush_latency = 0.0
+    
+    async def put(self, record: OrderRecord):
+        """
+        Buffer an order's latest state, waiting while the buffer is full
+        """
+        while len(self.pending) >= self.max_pending and record[0] not in self.pending:
+            self._space.clear()
+            self._wake.set()
+            await self._space.wait()
+        if record[0] in self.pending:
+            self.coalesced += 1
+        self.pending[record[0]] = record
+        self.puts += 1
+        if len(self.pending) >= self.batch_size:
+            self._wake.set()
+    
+    async def put_many(self, records: List[OrderRecord]):
+        """
+        Buffer the latest states of several orders
+        """
+        for record in records:
+            await self.put(record)
+    
+    async def write(self, record: OrderRecord) -> bool:
+        """
+        Buffer an order's latest state and wait until it is committed;
+        returns whether the write succeeded
+        """
+        return not await self.write_many([record])
+    
+    async def write_many(self, records: List[OrderRecord]) -> Set[str]:
+        """
+        Buffer the latest states of several orders and wait until they are
+        committed, normally by a single flush; returns the ids of the orders
+        whose write failed
+        """
+        await self.put_many(records)
+        ids = {record[0] for record in records}
+        if self._task is None:
+            return ids & await self.flush()
+        future = asyncio.get_running_loop().create_future()
+        self.waiters.append((ids, future))
+        self._wake.set()
+        return await future
+    
+    async def _execute(self, records: List[OrderRecord]):
+        """
+        Upsert records in one statement
+        """
+        async with get_pool().acquire() as conn:
+            await conn.execute(UPSERT_ORDERS, *to_columns(records))
+    
+    async def _flush(self, records: List[OrderRecord]) -> Set[str]:
+        """
+        Write a batch, retrying it whole and then order by order; returns
+        the ids of the orders that could not be written
+        """
+        started = time.perf_counter()
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                await self._execute(records)
+                break
+            except Exception as e:
+                logger.error(f"Order flush failed (attempt {attempt}/{self.max_retries}): {str(e)}")
+                if attempt < self.max_retries:
+                    await asyncio.sleep(0.05 * 2 ** attempt)
+        else:
+            failed = set()
+            for record in records:
+                try:
+                    await self._execute([record])
+                except Exception as e:
+                    logger.error(f"Dropping write of order {record[0]}: {str(e)}")
+                    failed.add(record[0])
+            self.rows_failed += len(failed)
+            self.rows_written += len(records) - len(failed)
+            return failed
+        
+        latency = time.perf_counter() - started
+        self.batches += 1
+        self.rows_written += len(records)
+        self.last_flush_latency = latency
+        self.max_flush_latency = max(self.max_flush_latency, latency)
+        return set()
+    
+    async def flush(self) -> Set[str]:
+        """
+        Write everything buffered so far and release its waiters; returns
+        the ids of the orders that could not be written
+        """
+        pending, self.pending = self.pending, {}
+        waiters, self.waiters = self.waiters, []
+        self._space.set()
+        
+        records = list(pending.values())
+        failed: Set[str] = set()
+        for i in range(0, len(records), self.batch_size):
+            failed |= await self._flush(records[i:i + self.batch_size])
+        for ids, future in waiters:
+            if not future.done():
+                future.set_result(ids & failed)
+        return failed
+    
+    async def _run(self):
+        """
+        Flush every `flush_interval` seconds, or sooner when woken, until stopped
+        """
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if self.pending or self.waiters:
+                await self.flush()
+        await self.flush()
+    
+    def start(self):
+        """
+        Start the flush loop
+        """
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """
+        Flush everything buffered so far and stop
+        """
+        if self._task is not None:
+            self._stopping = True
+            self._wake.set()
+            await self._task
+            self._task = None
+    
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Get persistence metrics
+        """
+        return {
+            "pending": len(self.pending),
+            "max_pending": self.max_pending,
+            "puts": self.puts,
+            "coalesced": self.coalesced,
+            "rows_written": self.rows_written,
+            "rows_failed": self.rows_failed,
+            "batches": self.batches,
+            "last_flush_latency_ms": round(self.last_flush_latency * 1000, 3),
+            "max_flush_latency_ms": round(self.max_flush_latency * 1000, 3)
+        }
+
+
+# Global order writer
+order_writer: Optional[OrderWriter] = None
+
+
+async def init_order_writer():
+    """
+    Initialize the order writer and start flushing
+    """
+    global order_writer
+    
+    order_writer = OrderWriter(
+        batch_size=settings.ORDER_WRITE_BATCH_SIZE,
+        flush_interval=settings.ORDER_WRITE_INTERVAL,
+        max_pending=settings.ORDER_WRITE_MAX_PENDING
+    )
+    order_writer.start()
+    logger.info("Order writer started")
+
+
+async def close_order_writer():
+    """
+    Flush pending orders and stop the writer
+    """
+    global order_writer
+    
+    if order_writer:
+        await order_writer.stop()
+        order_writer = None
+        logger.info("Order writer stopped")
+
+
+def get_order_writer() -> OrderWriter:
+    """
+    Get order writer instance
+    """
+    if not order_writer:
+        raise RuntimeError("Order writer not initialized")
+    return order_writer
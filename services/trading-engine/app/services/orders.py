@@ -0,0 +1,567 @@
+"""
+In-memory order management with a validated order state machine
+"""
+import logging
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple, Union
+
+from ..config import settings
+from ..database import get_pool
+from .accounts import LIVE, Account, AccountDirectory, get_account_directory
+from .order_writer import OrderRecord, OrderWriter, get_order_writer
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+ACCEPTED = "accepted"
+PARTIALLY_FILLED = "partially_filled"
+FILLED = "filled"
+CANCELLED = "cancelled"
+REJECTED = "rejected"
+
+# Allowed moves out of every non-terminal status
+TRANSITIONS = {
+    PENDING: {ACCEPTED, REJECTED, CANCELLED},
+    ACCEPTED: {PARTIALLY_FILLED, FILLED, CANCELLED, REJECTED},
+    PARTIALLY_FILLED: {PARTIALLY_FILLED, FILLED, CANCELLED},
+}
+TERMINAL = {FILLED, CANCELLED, REJECTED}
+STATUSES = (PENDING, ACCEPTED, PARTIALLY_FILLED, FILLED, CANCELLED, REJECTED)
+
+BUY = "buy"
+SELL = "sell"
+SIDES = (BUY, SELL)
+
+MARKET = "market"
+LIMIT = "limit"
+STOP = "stop"
+ORDER_TYPES = (MARKET, LIMIT, STOP)
+
+ORDER_QUERY = """
+    SELECT id::text, account_id::text, symbol, side, quantity::float8, price::float8,
+           stop_price::float8, order_type, status, filled_quantity::float8,
+           average_fill_price::float8, filled_at, notes, created_at, updated_at
+    FROM trades
+    WHERE id = $1
+"""
+
+
+class Execution(NamedTuple):
+    order_id: str
+    account_id: str
+    symbol: str
+    side: str
+    quantity: float
+    price: float
+    timestamp: float
+
+
+# Called after every transition, with the execution when it was a fill
+OrderListener = Callable[["Order", Optional[Execution]], None]
+
+# Called before an order is accepted; returns the reason to reject it, if any
+RiskCheck = Callable[["Order", Optional[Account]], Awaitable[Optional[str]]]
+
+
+class InvalidTransition(Exception):
+    """
+    Raised when an order is moved to a status its current one does not allow
+    """
+    def __init__(self, order: "Order", status: str):
+        self.order = order
+        self.status = status
+        super().__init__(f"Order {order.id} cannot go from {order.status} to {status}")
+
+
+class Order:
+    """
+    One order and its fill state
+    """
+    __slots__ = (
+        "id", "account_id", "symbol", "side", "order_type", "quantity", "price", "stop_price",
+        "status", "filled_quantity", "average_price", "reason", "created_at", "updated_at", "filled_at",
+        "venue"
+    )
+    
+    def __init__(
+        self,
+        account_id: str,
+        symbol: str,
+        side: str,
+        quantity: float,
+        order_type: str,
+        price: Optional[float] = None,
+        stop_price: Optional[float] = None,
+        order_id: Optional[str] = None,
+        created_at: Optional[datetime] = None,
+        venue: str = LIVE
+    ):
+        self.id = order_id or str(uuid.uuid4())
+        self.account_id = account_id
+        self.symbol = symbol
+        self.side = side
+        self.order_type = order_type
+        self.quantity = quantity
+        self.price = price
+        self.stop_price = stop_price
+        self.status = PENDING
+        self.filled_quantity = 0.0
+        self.average_price: Optional[float] = None
+        self.reason: Optional[str] = None
+        self.created_at = created_at or datetime.now(timezone.utc)
+        self.updated_at = self.created_at
+        self.filled_at: Optional[datetime] = None
+        self.venue = venue
+    
+    @property
+    def remaining(self) -> float:
+        return self.quantity - self.filled_quantity
+    
+    @property
+    def is_working(self) -> bool:
+        return self.status not in TERMINAL
+    
+    def to_record(self) -> OrderRecord:
+        """
+        Convert to a row for the trades table
+        """
+        return (
+            self.id, self.account_id, self.symbol, self.side, self.quantity, self.price,
+            self.stop_price, self.order_type, self.status, self.filled_quantity,
+            self.average_price, self.filled_at, self.reason, self.created_at, self.updated_at
+        )
+    
+    @classmethod
+    def from_record(cls, record: Iterable[Any]) -> "Order":
+        """
+        Rebuild an order from a trades row
+        """
+        (order_id, account_id, symbol, side, quantity, price, stop_price, order_type, status,
+         filled_quantity, average_price, filled_at, reason, created_at, updated_at) = record
+        order = cls(account_id, symbol, side, quantity, order_type, price, stop_price, order_id, created_at)
+        order.status = status
+        order.filled_quantity = filled_quantity or 0.0
+        order.average_price = average_price
+        order.filled_at = filled_at
+        order.reason = reason
+        order.updated_at = updated_at or created_at
+        return order
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "account_id": self.account_id,
+            "symbol": self.symbol,
+            "side": self.side,
+            "quantity": self.quantity,
+            "order_type": self.order_type,
+            "price": self.price,
+            "stop_price": self.stop_price,
+            "status": self.status,
+            "filled_quantity": self.filled_quantity,
+            "average_price": self.average_price,
+            "reason": self.reason,
+            "venue": self.venue,
+            "created_at": self.created_at.isoformat(),
+            "updated_at": self.updated_at.isoformat(),
+            "filled_at": self.filled_at.isoformat() if self.filled_at else None
+        }
+
+
+def validate_order(side: str, quantity: float, order_type: str, price: Optional[float], stop_price: Optional[float]):
+    """
+    Check an order's shape, raising ValueError when it is malformed
+    """
+    if side not in SIDES:
+        raise ValueError(f"side must be one of {list(SIDES)}")
+    if order_type not in ORDER_TYPES:
+        raise ValueError(f"order_type must be one of {list(ORDER_TYPES)}")
+    if not quantity > 0:
+        raise ValueError("quantity must be positive")
+    if order_type == LIMIT and not (price and price > 0):
+        raise ValueError("Limit orders need a positive price")
+    if order_type == STOP and not (stop_price and stop_price > 0):
+        raise ValueError("Stop orders need a positive stop_price")
+
+
+class OrderManager:
+    """
+    Keeps working orders in memory and drives them through their statuses.
+    
+    Working orders are indexed by id, account and symbol, so lookups and
+    per-account or per-symbol listings never touch the database. An order
+    leaves the account and symbol indexes when it reaches a terminal status
+    and is kept in a bounded history of recent orders; older orders are read
+    back from the trades table by id.
+    
+    Every transition is persisted through the order writer. In "async" mode
+    the new state is buffered and written behind, so acknowledging an order
+    costs no database round trip. In "sync" mode each transition waits for
+    its commit, and an order whose acceptance cannot be committed is
+    rejected instead.
+    
+    Orders are routed by their account's type: the venue ("paper" or
+    "live") is stamped on the order and listeners, such as the paper
+    matching engine, act on the orders of their venue. Fills reach the OMS
+    through `fill` whichever venue produced them.
+    
+    When a `risk_check` is set, every order passes it before acceptance;
+    orders it fails are recorded as rejected with its reason.
+    """
+    def __init__(
+        self,
+        writer: OrderWriter,
+        sync: bool = False,
+        history_size: int = 10000,
+        accounts: Optional[AccountDirectory] = None,
+        risk_check: Optional[RiskCheck] = None
+    ):
+        self.writer = writer
+        self.sync = sync
+        self.history_size = history_size
+        self.accounts = accounts
+        self.risk_check = risk_check
+        self.listeners: List[OrderListener] = []
+        self.working: Dict[str, Order] = {}
+        self.by_account: Dict[str, Set[str]] = {}
+        self.by_symbol: Dict[str, Set[str]] = {}
+        self.history: "OrderedDict[str, Order]" = OrderedDict()
+        
+        self.submitted = 0
+        self.batches = 0
+        self.rejected = 0
+        self.risk_rejected = 0
+        self.invalid_transitions = 0
+    
+    def add_listener(self, listener: OrderListener):
+        """
+        Call `listener` after every order transition
+        """
+        self.listeners.append(listener)
+    
+    def _notify(self, order: Order, execution: Optional[Execution] = None):
+        """
+        Pass a transition to every listener
+        """
+        for listener in self.listeners:
+            try:
+                listener(order, execution)
+            except Exception as e:
+                logger.error(f"Order listener failed for {order.id}: {str(e)}")
+    
+    def _index(self, order: Order):
+        """
+        Add a working order to the indexes
+        """
+        self.working[order.id] = order
+        self.by_account.setdefault(order.account_id, set()).add(order.id)
+        self.by_symbol.setdefault(order.symbol, set()).add(order.id)
+    
+    def _unindex(self, order: Order):
+        """
+        Move a finished order from the indexes into the history
+        """
+        self.working.pop(order.id, None)
+        for index, key in ((self.by_account, order.account_id), (self.by_symbol, order.symbol)):
+            ids = index.get(key)
+            if ids is not None:
+                ids.discard(order.id)
+                if not ids:
+                    del index[key]
+        self.history[order.id] = order
+        while len(self.history) > self.history_size:
+            self.history.popitem(last=False)
+    
+    def transition(self, order: Order, status: str, reason: Optional[str] = None) -> Order:
+        """
+        Move an order to a new status, raising InvalidTransition if not allowed
+        """
+        if status not in TRANSITIONS.get(order.status, ()):
+            self.invalid_transitions += 1
+            raise InvalidTransition(order, status)
+        order.status = status
+        order.updated_at = datetime.now(timezone.utc)
+        if reason is not None:
+            order.reason = reason
+        if status in TERMINAL:
+            self._unindex(order)
+        return order
+    
+    async def _persist(self, order: Order) -> bool:
+        """
+        Hand an order's current state to the writer
+        """
+        if self.sync:
+            return await self.writer.write(order.to_record())
+        await self.writer.put(order.to_record())
+        return True
+    
+    async def _create(
+        self,
+        account_id: str,
+        symbol: str,
+        side: str,
+        quantity: float,
+        order_type: str,
+        price: Optional[float] = None,
+        stop_price: Optional[float] = None
+    ) -> Tuple[Order, Optional[Account]]:
+        """
+        Validate and index a new pending order, raising ValueError if it is
+        malformed or its account does not exist or is inactive
+        """
+        validate_order(side, quantity, order_type, price, stop_price)
+        venue = LIVE
+        account = None
+        if self.accounts is not None:
+            account = await self.accounts.get(account_id)
+            if account is None:
+                raise ValueError(f"Unknown account: {account_id}")
+            if not account.is_active:
+                raise ValueError(f"Account {account_id} is inactive")
+            venue = account.account_type
+        
+        order = Order(account_id, symbol.upper(), side, quantity, order_type, price, stop_price, venue=venue)
+        self._index(order)
+        self.submitted += 1
+        return order, account
+    
+    async def _screen(self, order: Order, account: Optional[Account]) -> bool:
+        """
+        Accept a pending order, or reject it if it fails the risk check
+        """
+        if self.risk_check is not None:
+            reason = await self.risk_check(order, account)
+            if reason is not None:
+                self.risk_rejected += 1
+                self.reject(order, reason)
+                return False
+        self.transition(order, ACCEPTED)
+        return True
+    
+    async def submit(
+        self,
+        account_id: str,
+        symbol: str,
+        side: str,
+        quantity: float,
+        order_type: str,
+        price: Optional[float] = None,
+        stop_price: Optional[float] = None
+    ) -> Order:
+        """
+        Create an order and accept it, raising ValueError if it is malformed
+        or its account does not exist or is inactive
+        """
+        order, account = await self._create(account_id, symbol, side, quantity, order_type, price, stop_price)
+        if not await self._screen(order, account):
+            await self._persist(order)
+            return order
+        if not await self._persist(order):
+            return await self._reject_unpersisted(order)
+        self._notify(order)
+        return order
+    
+    async def submit_batch(self, requests: List[Dict[str, Any]]) -> List[Union[Order, ValueError]]:
+        """
+        Create and accept a basket of orders given as `submit` keyword
+        arguments, returning each order or the ValueError it raised.
+        
+        Orders are checked in basket order; the risk check counts each order
+        it passes, so it sees the ones before it. The whole basket is then
+        persisted together: one multi-row write, which in "sync" mode is
+        also the one commit the basket waits for. As with `submit`, accepted
+        orders are only announced once persisted, and those that could not
+        be are rejected instead.
+        """
+        results: List[Union[Order, ValueError]] = []
+        orders: List[Order] = []
+        for request in requests:
+            try:
+                order, account = await self._create(**request)
+            except ValueError as e:
+                results.append(e)
+                continue
+            await self._screen(order, account)
+            results.append(order)
+            orders.append(order)
+        
+        if orders:
+            records = [order.to_record() for order in orders]
+            failed: Set[str] = set()
+            if not self.sync:
+                await self.writer.put_many(records)
+            else:
+                failed = await self.writer.write_many(records)
+            for order in orders:
+                if order.status != ACCEPTED:
+                    continue
+                if order.id in failed:
+                    await self._reject_unpersisted(order)
+                else:
+                    self._notify(order)
+        self.batches += 1
+        return results
+    
+    async def _reject_unpersisted(self, order: Order) -> Order:
+        """
+        Reject an order whose accepted state could not be committed, and
+        queue the rejection so the trades table ends up agreeing
+        """
+        self.reject(order, "Order could not be persisted")
+        await self.writer.put(order.to_record())
+        return order
+    
+    def reject(self, order: Order, reason: str) -> Order:
+        """
+        Reject an order that has not been filled
+        """
+        self.transition(order, REJECTED, reason)
+        self.rejected += 1
+        self._notify(order)
+        return order
+    
+    async def fill(self, order_id: str, quantity: float, price: float, timestamp: Optional[float] = None) -> Order:
+        """
+        Record an execution against a working order
+        """
+        order = self.find(order_id)
+        if order.status not in (ACCEPTED, PARTIALLY_FILLED):
+            self.invalid_transitions += 1
+            raise InvalidTransition(order, PARTIALLY_FILLED)
+        if not 0 < quantity <= order.remaining + 1e-9:
+            raise ValueError(f"Fill of {quantity} exceeds the {order.remaining} remaining on order {order_id}")
+        total = order.filled_quantity + quantity
+        order.average_price = ((order.average_price or 0.0) * order.filled_quantity + price * quantity) / total
+        order.filled_quantity = min(total, order.quantity)
+        done = order.filled_quantity >= order.quantity - 1e-9
+        self.transition(order, FILLED if done else PARTIALLY_FILLED)
+        if done:
+            order.filled_at = order.updated_at
+        await self._persist(order)
+        self._notify(order, Execution(
+            order.id, order.account_id, order.symbol, order.side, quantity, price, timestamp or time.time()
+        ))
+        return order
+    
+    async def cancel(self, order_id: str, reason: Optional[str] = None) -> Order:
+        """
+        Cancel a working order
+        """
+        order = self.find(order_id)
+        self.transition(order, CANCELLED, reason)
+        await self._persist(order)
+        self._notify(order)
+        return order
+    
+    def find(self, order_id: str) -> Order:
+        """
+        Get an in-memory order, raising KeyError if there is none with that id
+        """
+        order = self.working.get(order_id) or self.history.get(order_id)
+        if order is None:
+            raise KeyError(order_id)
+        return order
+    
+    async def get(self, order_id: str) -> Optional[Order]:
+        """
+        Get an order from memory, or from the trades table if it is older
+        """
+        order = self.working.get(order_id) or self.history.get(order_id)
+        if order is not None:
+            return order
+        try:
+            uuid.UUID(order_id)
+        except ValueError:
+            return None
+        async with get_pool().acquire() as conn:
+            row = await conn.fetchrow(ORDER_QUERY, order_id)
+        return Order.from_record(row) if row is not None else None
+    
+    def list_orders(
+        self,
+        account_id: Optional[str] = None,
+        symbol: Optional[str] = None,
+        status: Optional[str] = None
+    ) -> List[Order]:
+        """
+        List in-memory orders, newest first, using the narrowest index available
+        """
+        if status is not None and status not in TERMINAL:
+            if account_id is not None:
+                ids = self.by_account.get(account_id, set())
+            elif symbol is not None:
+                ids = self.by_symbol.get(symbol.upper(), set())
+            else:
+                ids = self.working.keys()
+            candidates: Iterable[Order] = (self.working[order_id] for order_id in ids)
+        else:
+            candidates = list(self.working.values()) + list(self.history.values())
+        
+        symbol = symbol.upper() if symbol else None
+        orders = [
+            order for order in candidates
+            if (account_id is None or order.account_id == account_id)
+            and (symbol is None or order.symbol == symbol)
+            and (status is None or order.status == status)
+        ]
+        orders.sort(key=lambda order: order.created_at, reverse=True)
+        return orders
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get order counters and persistence metrics
+        """
+        return {
+            "persistence": "sync" if self.sync else "async",
+            "working": len(self.working),
+            "history": len(self.history),
+            "accounts": len(self.by_account),
+            "symbols": len(self.by_symbol),
+            "submitted": self.submitted,
+            "batches": self.batches,
+            "rejected": self.rejected,
+            "risk_rejected": self.risk_rejected,
+            "invalid_transitions": self.invalid_transitions,
+            "writer": self.writer.metrics()
+        }
+
+
+# Global order manager
+order_manager: Optional[OrderManager] = None
+
+
+async def init_order_manager():
+    """
+    Initialize the order manager
+    """
+    global order_manager
+    
+    order_manager = OrderManager(
+        get_order_writer(),
+        sync=settings.ORDER_PERSISTENCE == "sync",
+        history_size=settings.ORDER_HISTORY_SIZE,
+        accounts=get_account_directory()
+    )
+    logger.info(f"Order manager started with {settings.ORDER_PERSISTENCE} persistence")
+
+
+async def close_order_manager():
+    """
+    Release the order manager
+    """
+    global order_manager
+    
+    order_manager = None
+
+
+def get_order_manager() -> OrderManager:
+    """
+    Get order manager instance
+    """
+    if not order_manager:
+        raise RuntimeError("Order manager not initialized")
+    return order_manager
@@ -0,0 +1,579 @@
+"""
+Positions and P&L maintained incrementally from fills and ticks
+"""
+import asyncio
+import json
+import logging
+import math
+import time
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from ..config import settings
+from ..database import get_pool
+from ..utils.redis_client import consume_ticks, get_redis, QUOTE_KEY_PREFIX
+from .orders import BUY, Execution, Order, OrderManager, get_order_manager
+
+logger = logging.getLogger(__name__)
+
+EPSILON = 1e-9
+
+# Net quantity and net cash flow per (account, symbol) over every fill. Both
+# are independent of the order fills happened in, so they can be compared
+# with the incrementally maintained positions.
+TOTALS_QUERY = """
+    SELECT account_id::text, symbol,
+           sum(CASE WHEN side = 'buy' THEN filled_quantity ELSE -filled_quantity END)::float8,
+           sum(CASE WHEN side = 'buy' THEN -filled_quantity ELSE filled_quantity END * average_fill_price)::float8
+    FROM trades
+    WHERE filled_quantity > 0
+    GROUP BY account_id, symbol
+"""
+
+FILLS_QUERY = """
+    SELECT t.account_id::text, t.symbol, t.side, t.filled_quantity::float8, t.average_fill_price::float8
+    FROM trades t
+    JOIN unnest($1::uuid[], $2::varchar[]) AS k(account_id, symbol)
+      ON t.account_id = k.account_id AND t.symbol = k.symbol
+    WHERE t.filled_quantity > 0
+    ORDER BY coalesce(t.filled_at, t.updated_at), t.created_at
+"""
+
+
+class PositionTotals(NamedTuple):
+    account_id: str
+    symbol: str
+    quantity: float
+    cash: float
+
+
+PositionKey = Tuple[str, str]
+Fill = Tuple[str, float, float]  # side, quantity, price
+TotalsLoader = Callable[[], Awaitable[List[PositionTotals]]]
+FillsLoader = Callable[[List[PositionKey]], Awaitable[Dict[PositionKey, List[Fill]]]]
+
+
+async def load_totals() -> List[PositionTotals]:
+    """
+    Aggregate every position's net quantity and cash flow from the trades table
+    """
+    async with get_pool().acquire() as conn:
+        rows = await conn.fetch(TOTALS_QUERY)
+    return [PositionTotals(*row) for row in rows]
+
+
+async def load_fills(keys: List[PositionKey]) -> Dict[PositionKey, List[Fill]]:
+    """
+    Read the filled orders of some positions in fill order, one fill per order
+    """
+    async with get_pool().acquire() as conn:
+        rows = await conn.fetch(FILLS_QUERY, [key[0] for key in keys], [key[1] for key in keys])
+    fills: Dict[PositionKey, List[Fill]] = {}
+    for account_id, symbol, side, quantity, price in rows:
+        fills.setdefault((account_id, symbol), []).append((side, quantity, price))
+    return fills
+
+
+def utc_day(now: Optional[float] = None) -> int:
+    """
+    Number of the UTC day containing `now`
+    """
+    return int((now if now is not None else time.time()) // 86400)
+
+
+class Position:
+    """
+    One account's position in one symbol, held at average cost
+    """
+    __slots__ = ("account_id", "symbol", "quantity", "average_price", "realized_pnl", "cash", "last_price", "updated")
+    
+    def __init__(self, account_id: str, symbol: str):
+        self.account_id = account_id
+        self.symbol = symbol
+        self.quantity = 0.0  # negative when short
+        self.average_price = 0.0
+        self.realized_pnl = 0.0
+        self.cash = 0.0  # net cash flow of every fill
+        self.last_price: Optional[float] = None
+        self.updated = 0.0  # monotonic time of the last fill
+    
+    @property
+    def unrealized_pnl(self) -> float:
+        if not self.quantity or self.last_price is None:
+            return 0.0
+        return (self.last_price - self.average_price) * self.quantity
+    
+    @property
+    def market_value(self) -> float:
+        price = self.last_price if self.last_price is not None else self.average_price
+        return self.quantity * price
+    
+    def apply(self, side: str, quantity: float, price: float):
+        """
+        Apply a fill: adding to the position moves the average price,
+        reducing it realizes P&L, and crossing zero opens the remainder at
+        the fill price
+        """
+        signed = quantity if side == BUY else -quantity
+        held = self.quantity
+        self.cash -= signed * price
+        if held == 0 or (held > 0) == (signed > 0):
+            size = abs(held)
+            self.average_price = (self.average_price * size + price * quantity) / (size + quantity)
+        else:
+            closed = min(quantity, abs(held))
+            self.realized_pnl += closed * (price - self.average_price) * (1 if held > 0 else -1)
+            if quantity > abs(held) + EPSILON:
+                self.average_price = price
+        self.quantity = held + signed
+        if abs(self.quantity) < EPSILON:
+            self.quantity = 0.0
+            self.average_price = 0.0
+    
+    def to_dict(self) -> Dict[str, Any]:
+        unrealized = self.unrealized_pnl
+        cost = abs(self.quantity) * self.average_price
+        return {
+            "account_id": self.account_id,
+            "symbol": self.symbol,
+            "quantity": self.quantity,
+            "average_price": self.average_price,
+            "current_price": self.last_price,
+            "market_value": self.market_value,
+            "pnl": unrealized,
+            "pnl_percentage": round(unrealized / cost * 100, 2) if cost else 0.0,
+            "realized_pnl": self.realized_pnl
+        }
+
+
+class Portfolio:
+    """
+    An account's positions with running totals over them.
+    
+    Each position's contribution is taken out before it changes and added
+    back afterwards, so the totals cost O(1) per fill or mark however many
+    positions the account holds.
+    """
+    __slots__ = (
+        "account_id", "positions", "realized_pnl", "unrealized_pnl", "cash",
+        "market_value", "exposure", "open_positions", "day", "day_start_pnl"
+    )
+    
+    def __init__(self, account_id: str):
+        self.account_id = account_id
+        self.positions: Dict[str, Position] = {}
+        self.realized_pnl = 0.0
+        self.unrealized_pnl = 0.0
+        self.cash = 0.0
+        self.market_value = 0.0
+        self.exposure = 0.0
+        self.open_positions = 0
+        self.day = utc_day()
+        self.day_start_pnl = 0.0
+    
+    @property
+    def total_pnl(self) -> float:
+        return self.realized_pnl + self.unrealized_pnl
+    
+    @property
+    def daily_pnl(self) -> float:
+        return self.total_pnl - self.day_start_pnl
+    
+    def contribute(self, position: Position, sign: int):
+        """
+        Add (sign 1) or remove (sign -1) a position's share of the totals
+        """
+        self.realized_pnl += sign * position.realized_pnl
+        self.unrealized_pnl += sign * position.unrealized_pnl
+        self.cash += sign * position.cash
+        value = position.market_value
+        self.market_value += sign * value
+        self.exposure += sign * abs(value)
+        if position.quantity:
+            self.open_positions += sign
+    
+    def recompute(self):
+        """
+        Rebuild the totals from the positions, shedding accumulated rounding
+        """
+        day_pnl = self.daily_pnl
+        self.realized_pnl = self.unrealized_pnl = self.cash = self.market_value = self.exposure = 0.0
+        self.open_positions = 0
+        for position in self.positions.values():
+            self.contribute(position, 1)
+        self.day_start_pnl = self.total_pnl - day_pnl
+    
+    def roll(self, day: int):
+        """
+        Start a new trading day's P&L from the current totals
+        """
+        if day != self.day:
+            self.day = day
+            self.day_start_pnl = self.total_pnl
+    
+    def summary(self, balance: float) -> Dict[str, Any]:
+        """
+        Summarize the portfolio given the account's funded cash balance
+        """
+        cash_balance = balance + self.cash
+        total_value = cash_balance + self.market_value
+        daily_pnl = self.daily_pnl
+        total_pnl = self.total_pnl
+        day_start_value = total_value - daily_pnl
+        return {
+            "account_id": self.account_id,
+            "total_value": total_value,
+            "cash_balance": cash_balance,
+            "positions_value": self.market_value,
+            "exposure": self.exposure,
+            "open_positions": self.open_positions,
+            "daily_pnl": daily_pnl,
+            "daily_pnl_percentage": round(daily_pnl / day_start_value * 100, 2) if day_start_value else 0.0,
+            "realized_pnl": self.realized_pnl,
+            "unrealized_pnl": self.unrealized_pnl,
+            "total_pnl": total_pnl,
+            "total_pnl_percentage": round(total_pnl / balance * 100, 2) if balance else 0.0
+        }
+
+
+class PositionEngine:
+    """
+    Maintains positions and P&L in memory from the OMS fill stream.
+    
+    Every execution the OMS reports, paper or live, updates its position's
+    quantity, average price and realized P&L in O(1). Positions are marked
+    to market by the market-data ticks on Redis; ticks for symbols nobody
+    holds are dropped before their payload is parsed. Reads return this
+    state directly rather than aggregating the trades table.
+    
+    A reconciliation job periodically compares each position's net
+    quantity and cash flow with an aggregate over the trades table and
+    rebuilds the positions that drifted by replaying their orders, one fill
+    per order at its average price. Positions filled within the last
+    `grace` seconds are skipped, since their latest fills may not have been
+    written behind yet. The first run, at startup, loads every position.
+    """
+    def __init__(
+        self,
+        manager: OrderManager,
+        reconcile_interval: float = 300.0,
+        grace: float = 30.0,
+        reconnect_delay: float = 1.0,
+        totals_loader: TotalsLoader = load_totals,
+        fills_loader: FillsLoader = load_fills
+    ):
+        self.manager = manager
+        self.reconcile_interval = reconcile_interval
+        self.grace = grace
+        self.reconnect_delay = reconnect_delay
+        self.totals_loader = totals_loader
+        self.fills_loader = fills_loader
+        self.portfolios: Dict[str, Portfolio] = {}
+        self.by_symbol: Dict[str, Set[Position]] = {}
+        self.day = utc_day()
+        self._tasks: List[asyncio.Task] = []
+        
+        self.fills = 0
+        self.ticks = 0
+        self.tick_errors = 0
+        self.reconciliations = 0
+        self.positions_skipped = 0
+        self.positions_corrected = 0
+        self.last_reconcile: Optional[float] = None
+        self.last_error: Optional[str] = None
+    
+    def _roll(self):
+        """
+        Snapshot every account's P&L when the UTC day changes
+        """
+        day = utc_day()
+        if day != self.day:
+            self.day = day
+            for portfolio in self.portfolios.values():
+                portfolio.roll(day)
+    
+    def _portfolio(self, account_id: str) -> Portfolio:
+        portfolio = self.portfolios.get(account_id)
+        if portfolio is None:
+            portfolio = self.portfolios[account_id] = Portfolio(account_id)
+        return portfolio
+    
+    def _track(self, position: Position):
+        """
+        Keep open positions, and only those, in the symbol index marked by ticks
+        """
+        positions = self.by_symbol.get(position.symbol)
+        if position.quantity:
+            if positions is None:
+                positions = self.by_symbol[position.symbol] = set()
+                if self._tasks:
+                    asyncio.get_running_loop().create_task(self._seed(position.symbol))
+            positions.add(position)
+        elif positions is not None:
+            positions.discard(position)
+            if not positions:
+                del self.by_symbol[position.symbol]
+    
+    def on_order(self, order: Order, execution: Optional[Execution]):
+        """
+        Apply the fills the OMS reports
+        """
+        if execution is not None:
+            self.apply(execution)
+    
+    def apply(self, execution: Execution) -> Position:
+        """
+        Apply one execution to its position
+        """
+        self._roll()
+        portfolio = self._portfolio(execution.account_id)
+        position = portfolio.positions.get(execution.symbol)
+        if position is None:
+            position = portfolio.positions[execution.symbol] = Position(execution.account_id, execution.symbol)
+        portfolio.contribute(position, -1)
+        position.apply(execution.side, execution.quantity, execution.price)
+        if position.last_price is None:
+            position.last_price = execution.price
+        position.updated = time.monotonic()
+        portfolio.contribute(position, 1)
+        self._track(position)
+        self.fills += 1
+        return position
+    
+    def mark(self, symbol: str, price: float):
+        """
+        Mark every open position in a symbol to a new price
+        """
+        positions = self.by_symbol.get(symbol)
+        if not positions:
+            return
+        self._roll()
+        portfolios = self.portfolios
+        for position in positions:
+            portfolio = portfolios[position.account_id]
+            portfolio.contribute(position, -1)
+            position.last_price = price
+            portfolio.contribute(position, 1)
+    
+    def on_tick(self, symbol: str, payload: str):
+        """
+        Mark positions with a tick from the market-data service
+        """
+        if symbol not in self.by_symbol:
+            return
+        self.ticks += 1
+        self.mark(symbol, float(json.loads(payload)["price"]))
+    
+    async def _seed(self, symbol: str):
+        """
+        Mark a newly held symbol with its last cached price
+        """
+        try:
+            value = await get_redis().get(f"{QUOTE_KEY_PREFIX}{symbol}")
+            if value:
+                self.on_tick(symbol, value)
+        except Exception as e:
+            logger.error(f"Failed to seed mark for {symbol}: {str(e)}")
+    
+    def positions(self, account_id: Optional[str] = None, include_flat: bool = False) -> List[Position]:
+        """
+        List positions, optionally for one account and including closed ones
+        """
+        if account_id is not None:
+            portfolio = self.portfolios.get(account_id)
+            portfolios = [portfolio] if portfolio is not None else []
+        else:
+            portfolios = list(self.portfolios.values())
+        return [
+            position
+            for portfolio in portfolios
+            for position in portfolio.positions.values()
+            if include_flat or position.quantity
+        ]
+    
+    def portfolio(self, account_id: str) -> Portfolio:
+        """
+        Get an account's portfolio, empty if it has never been filled
+        """
+        self._roll()
+        return self.portfolios.get(account_id) or Portfolio(account_id)
+    
+    def _rebuild(self, key: PositionKey, fills: List[Fill]):
+        """
+        Replace a position with one replayed from its fills. The correction
+        is booked to earlier days, so it does not show up as daily P&L.
+        """
+        account_id, symbol = key
+        portfolio = self._portfolio(account_id)
+        before = portfolio.total_pnl
+        old = portfolio.positions.get(symbol)
+        position = Position(account_id, symbol)
+        for side, quantity, price in fills:
+            position.apply(side, quantity, price)
+        if old is not None:
+            portfolio.contribute(old, -1)
+            old.quantity = 0.0
+            self._track(old)
+            position.last_price = old.last_price
+            position.updated = old.updated
+        if position.last_price is None and fills:
+            position.last_price = fills[-1][2]
+        portfolio.positions[symbol] = position
+        portfolio.contribute(position, 1)
+        portfolio.day_start_pnl += portfolio.total_pnl - before
+        self._track(position)
+    
+    async def reconcile(self) -> Dict[str, int]:
+        """
+        Compare positions with the trades table and rebuild those that drifted
+        """
+        started = time.monotonic()
+        cutoff = started - self.grace
+        totals = await self.totals_loader()
+        
+        def close(a: float, b: float) -> bool:
+            return math.isclose(a, b, rel_tol=1e-6, abs_tol=1e-4)
+        
+        seen: Set[PositionKey] = set()
+        drifted: List[PositionKey] = []
+        skipped = 0
+        for row in totals:
+            key = (row.account_id, row.symbol)
+            seen.add(key)
+            portfolio = self.portfolios.get(row.account_id)
+            position = portfolio.positions.get(row.symbol) if portfolio is not None else None
+            if position is None:
+                drifted.append(key)
+            elif position.updated > cutoff:
+                skipped += 1
+            elif not close(position.quantity, row.quantity) or not close(position.cash, row.cash):
+                drifted.append(key)
+        for portfolio in self.portfolios.values():
+            for position in portfolio.positions.values():
+                key = (position.account_id, position.symbol)
+                if key in seen or not (position.quantity or position.cash):
+                    continue
+                if position.updated > cutoff:
+                    skipped += 1
+                else:
+                    drifted.append(key)
+        
+        corrected = 0
+        if drifted:
+            fills = await self.fills_loader(drifted)
+            for key in drifted:
+                portfolio = self.portfolios.get(key[0])
+                position = portfolio.positions.get(key[1]) if portfolio is not None else None
+                if position is not None and position.updated > started:
+                    # Filled while the fills were being read
+                    skipped += 1
+                    continue
+                self._rebuild(key, fills.get(key, []))
+                corrected += 1
+        for portfolio in self.portfolios.values():
+            portfolio.recompute()
+        
+        self.reconciliations += 1
+        self.positions_skipped += skipped
+        self.positions_corrected += corrected
+        self.last_reconcile = time.time()
+        if corrected and self.reconciliations > 1:
+            logger.warning(f"Reconciliation corrected {corrected} positions")
+        return {"checked": len(seen), "skipped": skipped, "corrected": corrected}
+    
+    async def _reconcile_loop(self):
+        """
+        Reconcile at startup and then on a fixed interval
+        """
+        while True:
+            try:
+                await self.reconcile()
+            except Exception as e:
+                logger.error(f"Position reconciliation failed: {str(e)}")
+                self.last_error = str(e)
+            await asyncio.sleep(self.reconcile_interval)
+    
+    def _tick_failed(self, symbol: str, error: Exception):
+        """
+        Count a tick `on_tick` could not handle
+        """
+        self.tick_errors += 1
+    
+    def start(self):
+        """
+        Start following fills, ticks and the reconciliation schedule
+        """
+        if not self._tasks:
+            self.manager.add_listener(self.on_order)
+            self._tasks = [
+                asyncio.create_task(consume_ticks(self.on_tick, self.reconnect_delay, self._tick_failed)),
+                asyncio.create_task(self._reconcile_loop())
+            ]
+    
+    async def stop(self):
+        """
+        Stop following ticks and reconciling
+        """
+        for task in self._tasks:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get position and reconciliation counters
+        """
+        return {
+            "accounts": len(self.portfolios),
+            "open_positions": sum(portfolio.open_positions for portfolio in self.portfolios.values()),
+            "symbols": len(self.by_symbol),
+            "fills": self.fills,
+            "ticks": self.ticks,
+            "tick_errors": self.tick_errors,
+            "reconciliations": self.reconciliations,
+            "positions_skipped": self.positions_skipped,
+            "positions_corrected": self.positions_corrected,
+            "last_reconcile": self.last_reconcile,
+            "last_error": self.last_error
+        }
+
+
+# Global position engine
+position_engine: Optional[PositionEngine] = None
+
+
+async def init_position_engine():
+    """
+    Initialize the position engine and start following fills
+    """
+    global position_engine
+    
+    position_engine = PositionEngine(
+        get_order_manager(),
+        reconcile_interval=settings.POSITION_RECONCILE_INTERVAL,
+        grace=settings.POSITION_RECONCILE_GRACE
+    )
+    position_engine.start()
+    logger.info("Position engine started")
+
+
+async def close_position_engine():
+    """
+    Stop the position engine
+    """
+    global position_engine
+    
+    if position_engine:
+        await position_engine.stop()
+        position_engine = None
+
+
+def get_position_engine() -> PositionEngine:
+    """
+    Get position engine instance
+    """
+    if not position_engine:
+        raise RuntimeError("Position engine not initialized")
+    return position_engine
@@ -0,0 +1,326 @@
+"""
+Pre-trade risk checks against in-memory account state
+"""
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, NamedTuple, Optional
+
+from ..config import settings, get_trading_config
+from ..utils.redis_client import consume_ticks, get_redis, QUOTE_KEY_PREFIX
+from .accounts import Account
+from .orders import ACCEPTED, BUY, CANCELLED, REJECTED, Execution, Order, OrderManager, get_order_manager
+from .positions import PositionEngine, get_position_engine
+
+logger = logging.getLogger(__name__)
+
+EPSILON = 1e-9
+
+
+class RiskLimits(NamedTuple):
+    max_position_size: float = 0.0  # share of equity one symbol may hold
+    max_daily_loss: float = 0.0  # share of the day's starting equity
+    max_open_positions: int = 0
+    max_order_notional: float = 0.0
+    price_band: float = 0.0  # share of the last price a limit price may be away from it
+    stop_price_band: float = 0.0  # share of the last price a stop trigger may be away from it
+
+
+def load_limits(config: Dict[str, Any]) -> RiskLimits:
+    """
+    Read limits from a `risk_management` section; a limit of 0 is not enforced
+    """
+    return RiskLimits(
+        max_position_size=float(config.get("max_position_size", 0.0)),
+        max_daily_loss=float(config.get("max_daily_loss", 0.0)),
+        max_open_positions=int(config.get("max_open_positions", 0)),
+        max_order_notional=float(config.get("max_order_notional", settings.RISK_MAX_ORDER_NOTIONAL)),
+        price_band=float(config.get("price_band", settings.RISK_PRICE_BAND)),
+        stop_price_band=float(config.get("stop_price_band", settings.RISK_STOP_PRICE_BAND))
+    )
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """
+    Nearest-rank percentile, 0 for no values
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class RiskEngine:
+    """
+    Checks orders against the account's limits before the OMS accepts them.
+    
+    Everything a check reads is already in memory: positions, equity and
+    day P&L come from the position engine, working order quantities per
+    account and symbol are kept up to date from the OMS transitions, and
+    last prices come from the market-data ticks. A check is a handful of
+    dict lookups and never waits on Postgres or Redis, except for the first
+    order in a symbol without a last price, which reads the quote cache.
+    
+    Limit prices must stay within the price band and stop triggers within
+    the wider stop band; market and stop orders are valued at the last
+    price. Every order must stay within the order notional. Orders that
+    only reduce a position then pass; others are refused once the day's
+    loss limit is reached, when the position including working orders
+    would exceed its share of equity, or when they would open one position
+    too many.
+    
+    An order that passes is counted as working by the check itself, before
+    the OMS persists and announces it, so concurrent orders of an account
+    are checked against each other. The OMS rejection of an order that
+    then fails to persist releases it again.
+    """
+    def __init__(
+        self,
+        manager: OrderManager,
+        positions: PositionEngine,
+        limits: RiskLimits,
+        reconnect_delay: float = 1.0,
+        samples: int = 10000
+    ):
+        self.manager = manager
+        self.positions = positions
+        self.limits = limits
+        self.reconnect_delay = reconnect_delay
+        # account -> symbol -> [buy, sell] quantity still working
+        self.working: Dict[str, Dict[str, List[float]]] = {}
+        # order id -> quantity counted in `working`
+        self.orders: Dict[str, float] = {}
+        self.marks: Dict[str, float] = {}
+        self.latencies: Deque[float] = deque(maxlen=samples)
+        self._tasks: List[asyncio.Task] = []
+        
+        self.checks = 0
+        self.rejected = 0
+        self.tick_errors = 0
+    
+    def _add_working(self, order: Order, quantity: float):
+        symbols = self.working.get(order.account_id)
+        if symbols is None:
+            symbols = self.working[order.account_id] = {}
+        sides = symbols.get(order.symbol)
+        if sides is None:
+            sides = symbols[order.symbol] = [0.0, 0.0]
+        sides[0 if order.side == BUY else 1] += quantity
+        if sides[0] < EPSILON and sides[1] < EPSILON:
+            del symbols[order.symbol]
+            if not symbols:
+                del self.working[order.account_id]
+    
+    def on_order(self, order: Order, execution: Optional[Execution]):
+        """
+        Track the quantity of every working order
+        """
+        if execution is not None:
+            counted = self.orders.get(order.id)
+            if counted is None:
+                return
+            quantity = min(execution.quantity, counted)
+            if order.is_working:
+                self.orders[order.id] = counted - quantity
+            else:
+                del self.orders[order.id]
+            self._add_working(order, -quantity)
+        elif order.status == ACCEPTED:
+            # Already counted if it went through `check`
+            if order.id not in self.orders:
+                self._reserve(order)
+        elif order.status in (CANCELLED, REJECTED):
+            counted = self.orders.pop(order.id, None)
+            if counted:
+                self._add_working(order, -counted)
+    
+    def _reserve(self, order: Order):
+        """
+        Count an order's remaining quantity as working
+        """
+        self.orders[order.id] = order.remaining
+        self._add_working(order, order.remaining)
+    
+    def on_tick(self, symbol: str, payload: str):
+        """
+        Remember the last trade price of a symbol
+        """
+        self.marks[symbol] = float(json.loads(payload)["price"])
+    
+    async def _seed(self, symbol: str):
+        """
+        Get the last cached price of a symbol not seen on the tick feed yet
+        """
+        try:
+            value = await get_redis().get(f"{QUOTE_KEY_PREFIX}{symbol}")
+            if value:
+                self.on_tick(symbol, value)
+        except Exception as e:
+            logger.error(f"Failed to seed risk price for {symbol}: {str(e)}")
+    
+    def evaluate(self, order: Order, balance: float) -> Optional[str]:
+        """
+        Check an order against the limits, returning why it fails or None
+        """
+        limits = self.limits
+        symbol = order.symbol
+        portfolio = self.positions.portfolio(order.account_id)
+        position = portfolio.positions.get(symbol)
+        held = position.quantity if position is not None else 0.0
+        mark = self.marks.get(symbol)
+        if mark is None and position is not None:
+            mark = position.last_price
+        
+        if mark is not None:
+            if order.price is not None and limits.price_band:
+                if abs(order.price - mark) > limits.price_band * mark:
+                    return (
+                        f"Price {order.price} is more than {limits.price_band:.0%} "
+                        f"away from the last trade at {mark}"
+                    )
+            if order.stop_price is not None and limits.stop_price_band:
+                if abs(order.stop_price - mark) > limits.stop_price_band * mark:
+                    return (
+                        f"Stop price {order.stop_price} is more than {limits.stop_price_band:.0%} "
+                        f"away from the last trade at {mark}"
+                    )
+        price = order.price or mark or order.stop_price
+        if price is None:
+            return f"No reference price for {symbol}"
+        if limits.max_order_notional and order.quantity * price > limits.max_order_notional:
+            return f"Order notional {order.quantity * price:.2f} exceeds {limits.max_order_notional:.2f}"
+        
+        symbols = self.working.get(order.account_id)
+        sides = symbols.get(symbol) if symbols is not None else None
+        buying, selling = sides if sides is not None else (0.0, 0.0)
+        if order.side == BUY:
+            if held < 0 and order.quantity + buying <= -held + EPSILON:
+                return None
+            worst = held + buying + order.quantity
+        else:
+            if held > 0 and order.quantity + selling <= held + EPSILON:
+                return None
+            worst = held - selling - order.quantity
+        
+        equity = balance + portfolio.total_pnl
+        if limits.max_daily_loss:
+            daily = portfolio.daily_pnl
+            if daily < 0 and -daily >= limits.max_daily_loss * (equity - daily):
+                return f"Daily loss limit of {limits.max_daily_loss:.0%} reached"
+        if limits.max_position_size and abs(worst) * price > limits.max_position_size * equity:
+            return (
+                f"Position of {abs(worst) * price:.2f} in {symbol} would exceed "
+                f"{limits.max_position_size:.0%} of equity {equity:.2f}"
+            )
+        if limits.max_open_positions and not held and sides is None:
+            opened = portfolio.open_positions
+            if symbols is not None:
+                for other in symbols:
+                    other_position = portfolio.positions.get(other)
+                    if other_position is None or not other_position.quantity:
+                        opened += 1
+            if opened >= limits.max_open_positions:
+                return f"Limit of {limits.max_open_positions} open positions reached"
+        return None
+    
+    async def check(self, order: Order, account: Optional[Account]) -> Optional[str]:
+        """
+        Risk check an order for the OMS, counting it as working if it passes
+        """
+        if order.symbol not in self.marks and self._tasks:
+            await self._seed(order.symbol)
+        started = time.perf_counter()
+        reason = self.evaluate(order, account.balance if account is not None else 0.0)
+        if reason is None:
+            # In the same step as the check, so no other order is checked
+            # against totals that leave this one out
+            self._reserve(order)
+        self.latencies.append(time.perf_counter() - started)
+        self.checks += 1
+        if reason is not None:
+            self.rejected += 1
+            logger.info(f"Risk rejected {order.side} {order.quantity} {order.symbol} for {order.account_id}: {reason}")
+        return reason
+    
+    def _tick_failed(self, symbol: str, error: Exception):
+        """
+        Count a tick `on_tick` could not handle
+        """
+        self.tick_errors += 1
+    
+    def start(self):
+        """
+        Start checking orders and following their transitions and prices
+        """
+        if not self._tasks:
+            self.manager.add_listener(self.on_order)
+            self.manager.risk_check = self.check
+            self._tasks = [asyncio.create_task(consume_ticks(self.on_tick, self.reconnect_delay, self._tick_failed))]
+    
+    async def stop(self):
+        """
+        Stop checking orders
+        """
+        self.manager.risk_check = None
+        for task in self._tasks:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get limits, counters and check latency
+        """
+        latencies = list(self.latencies)
+        return {
+            "limits": self.limits._asdict(),
+            "checks": self.checks,
+            "rejected": self.rejected,
+            "working_orders": len(self.orders),
+            "prices": len(self.marks),
+            "tick_errors": self.tick_errors,
+            "latency_p50_us": round(percentile(latencies, 50) * 1e6, 2),
+            "latency_p99_us": round(percentile(latencies, 99) * 1e6, 2),
+            "latency_max_us": round(max(latencies, default=0.0) * 1e6, 2)
+        }
+
+
+# Global risk engine
+risk_engine: Optional[RiskEngine] = None
+
+
+async def init_risk_engine():
+    """
+    Initialize the risk engine and start checking orders
+    """
+    global risk_engine
+    
+    limits = load_limits(get_trading_config().get("risk_management", {}))
+    risk_engine = RiskEngine(get_order_manager(), get_position_engine(), limits)
+    risk_engine.start()
+    logger.info(f"Risk engine started with {limits._asdict()}")
+
+
+async def close_risk_engine():
+    """
+    Stop the risk engine
+    """
+    global risk_engine
+    
+    if risk_engine:
+        await risk_engine.stop()
+        risk_engine = None
+
+
+def get_risk_engine() -> RiskEngine:
+    """
+    Get risk engine instance
+    """
+    if not risk_engine:
+        raise RuntimeError("Risk engine not initialized")
+    return risk_engine
@@ -0,0 +1,261 @@
+"""
+Idempotency keys for order placement backed by Redis
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from ..config import settings
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Delete the lock only if this caller still owns it
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# Extend the lock only if this caller still owns it
+RENEW_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# (status code, JSON body)
+Response = Tuple[int, Any]
+
+
+class IdempotencyConflict(Exception):
+    """
+    The key was already used for a different request
+    """
+
+
+class IdempotencyInProgress(Exception):
+    """
+    The request holding the key did not finish within the wait
+    """
+
+
+class IdempotencyUnavailable(Exception):
+    """
+    The key cannot be checked, so the request is not run
+    """
+
+
+def fingerprint(params: Dict[str, Any]) -> str:
+    """
+    Hash a request's parameters independently of their order
+    """
+    encoded = json.dumps(params, sort_keys=True, default=str).encode()
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+
+class IdempotencyStore:
+    """
+    Runs each idempotency key's request once and replays its response.
+    
+    Keys belong to a caller: the same key sent by two callers names two
+    different requests. The first request with a key takes a lock (SET NX PX) and runs; its
+    response is stored under the key for `ttl` seconds together with a
+    fingerprint of the request. Duplicates arriving meanwhile wait for that
+    response instead of executing again: in-process duplicates share the
+    first call directly, duplicates on other workers poll Redis for it.
+    Reusing a key for a different request raises IdempotencyConflict.
+    
+    While the request runs its lock is renewed every third of `lock_ttl`,
+    so a slow request keeps it; duplicates give up waiting after `lock_ttl`.
+    A request that raises stores nothing and frees the key so a retry can
+    run. If its holder dies the lock expires after `lock_ttl` and the next
+    duplicate runs the request itself. If Redis is unavailable the request
+    fails with IdempotencyUnavailable rather than risk running twice.
+    """
+    def __init__(
+        self,
+        client,
+        prefix: str = "idempotency",
+        ttl: float = 86400.0,
+        lock_ttl: float = 30.0,
+        poll_interval: float = 0.01
+    ):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+        self.lock_ttl = lock_ttl
+        self.poll_interval = poll_interval
+        self._inflight: Dict[str, Tuple[str, asyncio.Future]] = {}
+        
+        self.executed = 0
+        self.replayed = 0
+        self.conflicts = 0
+        self.unavailable = 0
+    
+    def _replay(self, stored: str, digest: str) -> Response:
+        """
+        Return a stored response if it belongs to the same request
+        """
+        record = json.loads(stored)
+        if record["fingerprint"] != digest:
+            self.conflicts += 1
+            raise IdempotencyConflict("Idempotency-Key was already used for a different request")
+        self.replayed += 1
+        return record["status_code"], record["body"]
+    
+    async def run(
+        self,
+        caller: str,
+        scope: str,
+        key: str,
+        params: Dict[str, Any],
+        fn: Callable[[], Awaitable[Response]]
+    ) -> Tuple[int, Any, bool]:
+        """
+        Run `fn` once per key, returning its status code, body and whether
+        they were replayed from an earlier request
+        """
+        name = f"{caller}:{scope}:{key}"
+        digest = fingerprint(params)
+        inflight = self._inflight.get(name)
+        if inflight is not None:
+            if inflight[0] != digest:
+                self.conflicts += 1
+                raise IdempotencyConflict("Idempotency-Key was already used for a different request")
+            status_code, body, _ = await asyncio.shield(inflight[1])
+            self.replayed += 1
+            return status_code, body, True
+        
+        task = asyncio.ensure_future(self._run_shared(name, digest, fn))
+        self._inflight[name] = (digest, task)
+        task.add_done_callback(lambda _: self._inflight.pop(name, None))
+        return await asyncio.shield(task)
+    
+    async def _run_shared(
+        self,
+        name: str,
+        digest: str,
+        fn: Callable[[], Awaitable[Response]]
+    ) -> Tuple[int, Any, bool]:
+        """
+        Take the key's lock and run `fn`, or wait for the holder's response
+        """
+        lock_key = f"{self.prefix}:lock:{name}"
+        result_key = f"{self.prefix}:result:{name}"
+        token = uuid.uuid4().hex
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.lock_ttl
+        
+        while True:
+            try:
+                stored = await self.client.get(result_key)
+                if stored is not None:
+                    return (*self._replay(stored, digest), True)
+                if await self.client.set(lock_key, token, nx=True, px=int(self.lock_ttl * 1000)):
+                    # The holder may have stored its response and released
+                    # the lock between the two calls above
+                    stored = await self.client.get(result_key)
+                    if stored is not None:
+                        await self._release(lock_key, token)
+                        return (*self._replay(stored, digest), True)
+                    break
+            except (IdempotencyConflict, asyncio.CancelledError):
+                raise
+            except Exception as e:
+                logger.error(f"Idempotency lock error: {str(e)}")
+                self.unavailable += 1
+                raise IdempotencyUnavailable("Idempotency-Key cannot be checked right now") from e
+            
+            if loop.time() >= deadline:
+                raise IdempotencyInProgress("A request with this Idempotency-Key is still in progress")
+            await asyncio.sleep(self.poll_interval)
+        
+        heartbeat = asyncio.create_task(self._renew(lock_key, token))
+        try:
+            status_code, body = await fn()
+            self.executed += 1
+            record = {"fingerprint": digest, "status_code": status_code, "body": body}
+            try:
+                await self.client.set(result_key, json.dumps(record), px=int(self.ttl * 1000))
+            except Exception as e:
+                logger.error(f"Idempotency result error: {str(e)}")
+            return status_code, body, False
+        finally:
+            heartbeat.cancel()
+            await self._release(lock_key, token)
+    
+    async def _renew(self, lock_key: str, token: str):
+        """
+        Keep extending a lock this caller holds until cancelled
+        """
+        lock_ms = int(self.lock_ttl * 1000)
+        while True:
+            await asyncio.sleep(self.lock_ttl / 3)
+            try:
+                if not await self.client.eval(RENEW_LOCK_SCRIPT, 1, lock_key, token, lock_ms):
+                    logger.warning(f"Idempotency lock {lock_key} was lost while its request ran")
+                    return
+            except Exception as e:
+                logger.error(f"Idempotency renew error: {str(e)}")
+    
+    async def _release(self, lock_key: str, token: str):
+        """
+        Release a lock this caller holds
+        """
+        try:
+            await self.client.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+        except Exception as e:
+            logger.error(f"Idempotency unlock error: {str(e)}")
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        Get request counters
+        """
+        return {
+            "inflight": len(self._inflight),
+            "executed": self.executed,
+            "replayed": self.replayed,
+            "conflicts": self.conflicts,
+            "unavailable": self.unavailable
+        }
+
+
+# Global idempotency store
+idempotency_store: Optional[IdempotencyStore] = None
+
+
+async def init_idempotency():
+    """
+    Initialize the idempotency store
+    """
+    global idempotency_store
+    
+    idempotency_store = IdempotencyStore(
+        get_redis(),
+        ttl=settings.IDEMPOTENCY_TTL,
+        lock_ttl=settings.IDEMPOTENCY_LOCK_TTL
+    )
+
+
+async def close_idempotency():
+    """
+    Release the idempotency store
+    """
+    global idempotency_store
+    
+    idempotency_store = None
+
+
+def get_idempotency_store() -> IdempotencyStore:
+    """
+    Get idempotency store instance
+    """
+    if not idempotency_store:
+        raise RuntimeError("Idempotency store not initialized")
+    return idempotency_store
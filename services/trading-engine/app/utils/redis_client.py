@@ -2,15 +2,31 @@
 Redis client configuration and utilities
 """
 import redis.asyncio as redis
+import asyncio
 import json
 import logging
-from typing import Any, Optional, Dict
+from typing import Any, Awaitable, Callable, Optional, Dict, List, Tuple
 from contextlib import asynccontextmanager
 
 from ..config import settings
 
 logger = logging.getLogger(__name__)
 
+# Ticks published by the market-data service, e.g. "ticks:AAPL"
+TICK_CHANNEL_PREFIX = "ticks:"
+
+# Field the market-data service stamps on replayed ticks; replays go to
+# their own channels, and any that reach a live channel are dropped
+REPLAY_MARKER = '"replay_id"'
+
+# Latest quote per symbol cached by the market-data service, e.g. "quote:AAPL"
+QUOTE_KEY_PREFIX = "quote:"
+
+# Durable event streams written by the trading engine
+ORDER_EVENTS_STREAM = "events:orders"
+FILL_EVENTS_STREAM = "events:fills"
+POSITION_EVENTS_STREAM = "events:positions"
+
 # Global Redis client
 redis_client: Optional[redis.Redis] = None
 
@@ -141,6 +157,14 @@ class RedisPubSub:
         await self.pubsub.subscribe(*channels)
         logger.info(f"Subscribed to channels: {channels}")
     
+    async def psubscribe(self, *patterns: str):
+        """
+        Subscribe to channel patterns
+        """
+        self.pubsub = self.client.pubsub()
+        await self.pubsub.psubscribe(*patterns)
+        logger.info(f"Subscribed to patterns: {patterns}")
+    
     async def unsubscribe(self, *channels: str):
         """
         Unsubscribe from channels
@@ -160,15 +184,21 @@ class RedisPubSub:
             logger.error(f"Redis publish error: {str(e)}")
             return 0
     
-    async def listen(self):
+    async def listen(self, decode: bool = True):
         """
-        Listen for messages
+        Listen for messages, optionally leaving payloads as raw JSON text
         """
         if not self.pubsub:
             raise RuntimeError("Not subscribed to any channels")
         
         async for message in self.pubsub.listen():
-            if message['type'] == 'message':
+            if message['type'] in ('message', 'pmessage'):
+                if not decode:
+                    yield {
+                        'channel': message['channel'],
+                        'data': message['data']
+                    }
+                    continue
                 try:
                     data = json.loads(message['data'])
                     yield {
@@ -186,6 +216,279 @@ class RedisPubSub:
             await self.pubsub.close()
 
 
+async def consume_ticks(
+    on_tick: Callable[[str, str], None],
+    reconnect_delay: float = 1.0,
+    on_error: Optional[Callable[[str, Exception], None]] = None
+):
+    """
+    Pass every live market-data tick to `on_tick(symbol, payload)` with the
+    payload left as JSON text, resubscribing after connection loss. A tick
+    `on_tick` raises on is logged and passed to `on_error`, and the
+    subscription carries on.
+    """
+    prefix = len(TICK_CHANNEL_PREFIX)
+    while True:
+        pubsub = RedisPubSub()
+        try:
+            await pubsub.psubscribe(f"{TICK_CHANNEL_PREFIX}*")
+            async for message in pubsub.listen(decode=False):
+                if REPLAY_MARKER in message['data']:
+                    continue
+                symbol = message['channel'][prefix:]
+                try:
+                    on_tick(symbol, message['data'])
+                except Exception as e:
+                    logger.error(f"Tick handler failed for {symbol}: {str(e)}")
+                    if on_error is not None:
+                        on_error(symbol, e)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Tick subscriber error: {str(e)}")
+            await asyncio.sleep(reconnect_delay)
+        finally:
+            await pubsub.close()
+
+
+StreamEntry = Tuple[str, Dict[str, Any]]
+
+
+class RedisStream:
+    """
+    Redis Streams wrapper with consumer groups.
+    
+    Unlike pub/sub, entries stay in the stream (capped at about `maxlen`)
+    until trimmed, and a consumer group tracks what each consumer has read
+    but not acknowledged, so a consumer that restarts or dies loses nothing:
+    its pending entries are read again or claimed by another consumer.
+    Events travel as one JSON "data" field per entry.
+    """
+    def __init__(self, stream: str, maxlen: int = 100000, client: Optional[redis.Redis] = None):
+        self.client = client or get_redis()
+        self.stream = stream
+        self.maxlen = maxlen
+    
+    @staticmethod
+    def _decode(entries) -> List[StreamEntry]:
+        """
+        Parse entries into (id, event) pairs, skipping deleted ones
+        """
+        return [(entry_id, json.loads(fields["data"])) for entry_id, fields in entries if fields]
+    
+    async def add(self, event: Dict[str, Any]) -> str:
+        """
+        Append an event, returning its entry id
+        """
+        return await self.client.xadd(
+            self.stream, {"data": json.dumps(event)}, maxlen=self.maxlen, approximate=True
+        )
+    
+    async def add_many(self, events: List[Dict[str, Any]]) -> List[str]:
+        """
+        Append several events in one round trip
+        """
+        pipe = self.client.pipeline(transaction=False)
+        for event in events:
+            pipe.xadd(self.stream, {"data": json.dumps(event)}, maxlen=self.maxlen, approximate=True)
+        return await pipe.execute()
+    
+    async def ensure_group(self, group: str, start_id: str = "0"):
+        """
+        Create a consumer group (and the stream) unless it exists
+        """
+        try:
+            await self.client.xgroup_create(self.stream, group, id=start_id, mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+    
+    async def read(
+        self,
+        group: str,
+        consumer: str,
+        count: int = 100,
+        block_ms: Optional[int] = 1000,
+        pending: bool = False
+    ) -> List[StreamEntry]:
+        """
+        Read up to `count` new entries for a consumer, waiting up to
+        `block_ms` for the first one; with `pending`, re-read the entries
+        this consumer was given but has not acknowledged instead
+        """
+        response = await self.client.xreadgroup(
+            group,
+            consumer,
+            {self.stream: "0" if pending else ">"},
+            count=count,
+            block=None if pending else block_ms
+        )
+        if not response:
+            return []
+        return self._decode(response[0][1])
+    
+    async def ack(self, group: str, *entry_ids: str) -> int:
+        """
+        Acknowledge processed entries
+        """
+        if not entry_ids:
+            return 0
+        return await self.client.xack(self.stream, group, *entry_ids)
+    
+    async def claim_stale(
+        self,
+        group: str,
+        consumer: str,
+        min_idle_ms: int,
+        count: int = 100
+    ) -> List[StreamEntry]:
+        """
+        Take over entries other consumers have held unacknowledged for at
+        least `min_idle_ms`
+        """
+        claimed: List[StreamEntry] = []
+        start_id = "0-0"
+        while len(claimed) < count:
+            response = await self.client.xautoclaim(
+                self.stream, group, consumer, min_idle_ms, start_id=start_id, count=count - len(claimed)
+            )
+            start_id, entries = response[0], response[1]
+            claimed.extend(self._decode(entries))
+            if start_id in ("0-0", b"0-0"):
+                break
+        return claimed
+    
+    async def pending_count(self, group: str) -> int:
+        """
+        Count the group's unacknowledged entries
+        """
+        summary = await self.client.xpending(self.stream, group)
+        return summary["pending"]
+
+
+class StreamConsumer:
+    """
+    Processes a stream in batches as a member of a consumer group.
+    
+    On start the consumer first re-reads the entries it was given before a
+    restart but never acknowledged. It then reads new entries in batches of
+    up to `batch_size`, hands each batch to `handler` and acknowledges the
+    batch once the handler returns; a batch whose handler raises stays
+    pending and is retried. Every `claim_interval` seconds it also claims
+    entries that other consumers of the group have left unacknowledged for
+    `min_idle_ms`, so the work of a consumer that died is not lost.
+    """
+    def __init__(
+        self,
+        stream: RedisStream,
+        group: str,
+        consumer: str,
+        handler: Callable[[List[StreamEntry]], Awaitable[None]],
+        batch_size: int = 100,
+        block_ms: int = 1000,
+        claim_interval: float = 30.0,
+        min_idle_ms: int = 60000,
+        retry_delay: float = 1.0
+    ):
+        self.stream = stream
+        self.group = group
+        self.consumer = consumer
+        self.handler = handler
+        self.batch_size = batch_size
+        self.block_ms = block_ms
+        self.claim_interval = claim_interval
+        self.min_idle_ms = min_idle_ms
+        self.retry_delay = retry_delay
+        self._task: Optional[asyncio.Task] = None
+        
+        self.processed = 0
+        self.claimed = 0
+        self.failures = 0
+    
+    async def _process(self, entries: List[StreamEntry]) -> bool:
+        """
+        Handle and acknowledge one batch
+        """
+        if not entries:
+            return True
+        try:
+            await self.handler(entries)
+        except Exception as e:
+            logger.error(f"Stream handler for {self.stream.stream} failed: {str(e)}")
+            self.failures += 1
+            return False
+        await self.stream.ack(self.group, *(entry_id for entry_id, _ in entries))
+        self.processed += len(entries)
+        return True
+    
+    async def _run(self):
+        """
+        Consume until cancelled, recovering from connection errors
+        """
+        loop = asyncio.get_running_loop()
+        recovering = True
+        next_claim = loop.time()
+        while True:
+            try:
+                if recovering:
+                    await self.stream.ensure_group(self.group)
+                    # Re-read our own unacknowledged entries first
+                    while True:
+                        entries = await self.stream.read(self.group, self.consumer, self.batch_size, pending=True)
+                        if not entries or not await self._process(entries):
+                            break
+                    recovering = False
+                if loop.time() >= next_claim:
+                    next_claim = loop.time() + self.claim_interval
+                    entries = await self.stream.claim_stale(
+                        self.group, self.consumer, self.min_idle_ms, self.batch_size
+                    )
+                    self.claimed += len(entries)
+                    await self._process(entries)
+                entries = await self.stream.read(self.group, self.consumer, self.batch_size, self.block_ms)
+                if not await self._process(entries):
+                    recovering = True
+                    await asyncio.sleep(self.retry_delay)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Stream consumer error on {self.stream.stream}: {str(e)}")
+                recovering = True
+                await asyncio.sleep(self.retry_delay)
+    
+    def start(self):
+        """
+        Start consuming
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """
+        Stop consuming; unacknowledged entries stay pending
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get consumer counters
+        """
+        return {
+            "stream": self.stream.stream,
+            "group": self.group,
+            "consumer": self.consumer,
+            "processed": self.processed,
+            "claimed": self.claimed,
+            "failures": self.failures
+        }
+
+
 # Rate limiter using Redis
 class RateLimiter:
     """
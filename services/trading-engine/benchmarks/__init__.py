@@ -0,0 +1,3 @@
+"""
+Benchmarks for Trading Engine Service
+"""
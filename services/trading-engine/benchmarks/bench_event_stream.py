@@ -0,0 +1,127 @@
+"""
+Benchmark event delivery over Redis pub/sub and Redis Streams
+
+Sends `--events` order events in pipelined batches of `--batch` from one
+producer to one consumer, first over pub/sub and then over a stream read
+with XREADGROUP and acknowledged with XACK, and reports the throughput
+from the first send to the last event received. Pub/sub drops whatever
+is sent while the subscriber is away; the stream keeps it until acked.
+
+Needs a running Redis. Usage (from services/trading-engine, with the
+service environment loaded):
+    python -m benchmarks.bench_event_stream --events 100000 --batch 500
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from app.utils.redis_client import init_redis, close_redis, get_redis, RedisStream
+
+EVENT = {
+    "type": "order",
+    "order": {
+        "id": "00000000-0000-4000-8000-000000000000",
+        "account_id": "00000000-0000-4000-8000-000000000001",
+        "symbol": "AAPL",
+        "side": "buy",
+        "quantity": 100.0,
+        "order_type": "limit",
+        "price": 187.5,
+        "status": "accepted"
+    }
+}
+
+
+async def bench_pubsub(events: int, batch: int) -> float:
+    """
+    Publish over a channel while one subscriber counts the messages
+    """
+    client = get_redis()
+    channel = f"bench:events:{os.getpid()}"
+    pubsub = client.pubsub()
+    await pubsub.subscribe(channel)
+    await pubsub.get_message(timeout=1.0)
+    
+    async def consume():
+        received = 0
+        while received < events:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            if message is None:
+                break
+            json.loads(message["data"])
+            received += 1
+        return received
+    
+    consumer = asyncio.create_task(consume())
+    started = time.perf_counter()
+    for offset in range(0, events, batch):
+        pipe = client.pipeline(transaction=False)
+        for _ in range(min(batch, events - offset)):
+            pipe.publish(channel, json.dumps(EVENT))
+        await pipe.execute()
+    received = await consumer
+    elapsed = time.perf_counter() - started
+    await pubsub.unsubscribe(channel)
+    await pubsub.close()
+    if received < events:
+        print(f"pub/sub: subscriber received {received} of {events} events")
+    return elapsed
+
+
+async def bench_stream(events: int, batch: int) -> float:
+    """
+    Append to a stream while one group consumer reads and acks in batches
+    """
+    stream = RedisStream(f"bench:events:{os.getpid()}", maxlen=events)
+    group = "bench"
+    await stream.ensure_group(group)
+    
+    async def consume():
+        received = 0
+        while received < events:
+            entries = await stream.read(group, "consumer-1", batch, block_ms=1000)
+            if not entries:
+                break
+            await stream.ack(group, *(entry_id for entry_id, _ in entries))
+            received += len(entries)
+        return received
+    
+    consumer = asyncio.create_task(consume())
+    started = time.perf_counter()
+    for offset in range(0, events, batch):
+        await stream.add_many([EVENT] * min(batch, events - offset))
+    received = await consumer
+    elapsed = time.perf_counter() - started
+    pending = await stream.pending_count(group)
+    await get_redis().delete(stream.stream)
+    if received < events or pending:
+        print(f"streams: consumer received {received} of {events} events, {pending} pending")
+    return elapsed
+
+
+async def run(args):
+    await init_redis()
+    try:
+        results = [
+            ("pub/sub", await bench_pubsub(args.events, args.batch)),
+            ("streams", await bench_stream(args.events, args.batch))
+        ]
+    finally:
+        await close_redis()
+    
+    print(f"events={args.events} batch={args.batch}")
+    for name, elapsed in results:
+        print(f"{name}: {args.events / elapsed:,.0f} events/s ({elapsed * 1000:.0f}ms)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=100000)
+    parser.add_argument("--batch", type=int, default=500)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
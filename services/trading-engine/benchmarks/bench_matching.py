@@ -0,0 +1,105 @@
+"""
+Benchmark the paper matching engine
+
+Replays a mixed stream of order events against one symbol's book: limit
+orders around the price, cancels of resting orders, stops, market orders
+and sized market prints that fill the book partially. Reports events per
+second and the cost of one event on a single core.
+
+Usage (from services/trading-engine, with the service environment loaded):
+    python -m benchmarks.bench_matching --events 500000
+"""
+import argparse
+import random
+import time
+
+from app.services.matching import MatchingEngine
+from app.services.orders import Order
+
+ACCOUNT = "00000000-0000-4000-8000-000000000000"
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def make_events(count: int, seed: int) -> list:
+    """
+    Generate (kind, payload) events: 60% limit orders, 20% cancels, 10%
+    prints, 5% stops and 5% market orders
+    """
+    rng = random.Random(seed)
+    price = 100.0
+    resting = []
+    events = []
+    for _ in range(count):
+        roll = rng.random()
+        side = "buy" if rng.random() < 0.5 else "sell"
+        if roll < 0.6:
+            offset = round(rng.expovariate(1 / 0.2), 2) + 0.01
+            limit = round(price - offset if side == "buy" else price + offset, 2)
+            order = Order(ACCOUNT, "BENCH", side, rng.randint(1, 10) * 100, "limit", price=limit)
+            resting.append(order.id)
+            events.append(("add", order))
+        elif roll < 0.8 and resting:
+            events.append(("cancel", resting.pop(rng.randrange(len(resting)))))
+        elif roll < 0.9:
+            price = round(max(1.0, price + rng.gauss(0, 0.05)), 2)
+            events.append(("trade", (price, rng.randint(1, 20) * 100)))
+        elif roll < 0.95:
+            stop = round(price + 0.5 if side == "buy" else price - 0.5, 2)
+            events.append(("add", Order(ACCOUNT, "BENCH", side, 100, "stop", stop_price=stop)))
+        else:
+            events.append(("add", Order(ACCOUNT, "BENCH", side, 100, "market")))
+    return events
+
+
+def run(engine: MatchingEngine, events: list, samples: list = None):
+    add, cancel, trade = engine.add, engine.cancel, engine.on_trade
+    clock = time.perf_counter
+    for kind, payload in events:
+        t0 = clock() if samples is not None else 0.0
+        if kind == "add":
+            add(payload, 0.0)
+        elif kind == "cancel":
+            cancel(payload)
+        else:
+            trade("BENCH", payload[0], payload[1], 0.0)
+        if samples is not None:
+            samples.append(clock() - t0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=500000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    
+    # Throughput on one stream, latency per event on an identical second one
+    engine = MatchingEngine()
+    engine.on_trade("BENCH", 100.0)
+    events = make_events(args.events, args.seed)
+    started = time.perf_counter()
+    run(engine, events)
+    elapsed = time.perf_counter() - started
+    
+    samples: list = []
+    latency_engine = MatchingEngine()
+    latency_engine.on_trade("BENCH", 100.0)
+    run(latency_engine, make_events(args.events, args.seed), samples)
+    
+    stats = engine.stats()
+    print(f"events={args.events} executions={stats['executions']} resting after run={stats['working']}")
+    print(f"throughput: {args.events / elapsed:,.0f} events/s ({elapsed / args.events * 1e6:.2f}us/event)")
+    print(
+        "latency: p50={:.2f}us p99={:.2f}us p99.9={:.2f}us".format(
+            percentile(samples, 50) * 1e6,
+            percentile(samples, 99) * 1e6,
+            percentile(samples, 99.9) * 1e6
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark pre-trade risk checks
+
+Checks limit orders for one account holding `--positions` positions, with
+working orders in some of the symbols, and reports the latency of a
+single check. The budget is a p99 under 100us; tests/test_risk.py gates it.
+
+Usage (from services/trading-engine, with the service environment loaded):
+    python -m benchmarks.bench_risk --checks 200000
+"""
+import argparse
+import time
+
+from app.services.orders import Execution, Order, OrderManager
+from app.services.order_writer import OrderWriter
+from app.services.positions import PositionEngine
+from app.services.risk import RiskEngine, RiskLimits, percentile
+
+ACCOUNT = "00000000-0000-4000-8000-000000000000"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--checks", type=int, default=200000)
+    parser.add_argument("--positions", type=int, default=50)
+    args = parser.parse_args()
+    
+    manager = OrderManager(OrderWriter())
+    positions = PositionEngine(manager)
+    limits = RiskLimits(
+        max_position_size=0.05,
+        max_daily_loss=0.01,
+        max_open_positions=args.positions * 2,
+        max_order_notional=1e6,
+        price_band=0.1
+    )
+    risk = RiskEngine(manager, positions, limits)
+    for i in range(args.positions):
+        symbol = f"SYM{i}"
+        positions.apply(Execution(str(i), ACCOUNT, symbol, "buy", 10, 100.0, 0.0))
+        risk.on_tick(symbol, '{"price": 101.0}')
+        if i % 2:
+            risk.on_order(Order(ACCOUNT, symbol, "buy", 5, "limit", price=100.0, order_id=f"w{i}"), None)
+    
+    orders = [
+        Order(ACCOUNT, f"SYM{i % (args.positions + 10)}", "buy" if i % 3 else "sell", 1 + i % 7, "limit", price=101.0)
+        for i in range(1000)
+    ]
+    samples = []
+    evaluate = risk.evaluate
+    clock = time.perf_counter
+    started = clock()
+    for i in range(args.checks):
+        t0 = clock()
+        evaluate(orders[i % 1000], 1e7)
+        samples.append(clock() - t0)
+    elapsed = clock() - started
+    
+    print(f"checks={args.checks} positions={args.positions}")
+    print(f"throughput: {args.checks / elapsed:,.0f} checks/s")
+    print(
+        "latency: p50={:.2f}us p99={:.2f}us p99.9={:.2f}us max={:.2f}us".format(
+            percentile(samples, 50) * 1e6,
+            percentile(samples, 99) * 1e6,
+            percentile(samples, 99.9) * 1e6,
+            max(samples) * 1e6
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
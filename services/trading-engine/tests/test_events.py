@@ -0,0 +1,174 @@
+"""
+Test the order, fill and position event streams
+"""
+import asyncio
+import redis.asyncio as redis
+from app.services.events import EventPublisher
+from app.services.order_writer import OrderWriter
+from app.services.orders import OrderManager
+from app.services.positions import PositionEngine
+from app.utils.redis_client import (
+    RedisStream, StreamConsumer, ORDER_EVENTS_STREAM, FILL_EVENTS_STREAM, POSITION_EVENTS_STREAM
+)
+
+ACCOUNT = "7f1c2d4e-0000-4000-8000-000000000001"
+
+
+class NullWriter(OrderWriter):
+    async def _execute(self, records):
+        pass
+
+
+class RecordingPublisher(EventPublisher):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.batches = []
+        self.fail = False
+    
+    async def _execute(self, events):
+        if self.fail:
+            raise ConnectionError("redis down")
+        self.batches.append(list(events))
+
+
+class RecordingStream(RedisStream):
+    def __init__(self, stream):
+        super().__init__(stream, client=object())
+        self.appends = []
+    
+    async def add_many(self, events):
+        self.appends.append(list(events))
+        return [f"{len(self.appends)}-{i}" for i in range(len(events))]
+
+
+class MemoryStreams:
+    """The stream commands of one stream and consumer group, without idle times"""
+    def __init__(self):
+        self.entries = []
+        self.delivered = 0
+        self.pending = {}
+        self.group = None
+    
+    async def xadd(self, stream, fields, maxlen=None, approximate=True):
+        entry_id = f"{len(self.entries) + 1}-0"
+        self.entries.append((entry_id, fields))
+        return entry_id
+    
+    async def xgroup_create(self, stream, group, id="0", mkstream=False):
+        if self.group is not None:
+            raise redis.ResponseError("BUSYGROUP Consumer Group name already exists")
+        self.group = group
+    
+    async def xreadgroup(self, group, consumer, streams, count=None, block=None):
+        stream, start = next(iter(streams.items()))
+        if start == ">":
+            entries = self.entries[self.delivered:self.delivered + count]
+            self.delivered += len(entries)
+            for entry_id, _ in entries:
+                self.pending[entry_id] = consumer
+        else:
+            entries = [entry for entry in self.entries if self.pending.get(entry[0]) == consumer][:count]
+        if not entries:
+            await asyncio.sleep((block or 0) / 1000)
+            return []
+        return [[stream, entries]]
+    
+    async def xack(self, stream, group, *entry_ids):
+        return sum(self.pending.pop(entry_id, None) is not None for entry_id in entry_ids)
+    
+    async def xautoclaim(self, stream, group, consumer, min_idle_time, start_id="0-0", count=None):
+        entries = [entry for entry in self.entries if self.pending.get(entry[0]) not in (None, consumer)][:count]
+        for entry_id, _ in entries:
+            self.pending[entry_id] = consumer
+        return ["0-0", entries, []]
+
+
+def test_transitions_fills_and_positions_are_published_in_order():
+    """Test each transition is snapshotted and appended in batches"""
+    async def scenario():
+        manager = OrderManager(NullWriter())
+        positions = PositionEngine(manager)
+        publisher = RecordingPublisher(manager, positions, batch_size=2)
+        manager.add_listener(positions.on_order)
+        manager.add_listener(publisher.on_order)
+        order = await manager.submit(ACCOUNT, "AAPL", "buy", 10, "market")
+        await manager.fill(order.id, 10, 100.0)
+        await publisher.flush()
+        return publisher
+    
+    publisher = asyncio.run(scenario())
+    events = [event for batch in publisher.batches for event in batch]
+    assert [len(batch) for batch in publisher.batches] == [2] * (len(events) // 2) + [1] * (len(events) % 2)
+    assert [stream for stream, _ in events[-3:]] == [ORDER_EVENTS_STREAM, FILL_EVENTS_STREAM, POSITION_EVENTS_STREAM]
+    statuses = [event["order"]["status"] for stream, event in events if stream == ORDER_EVENTS_STREAM]
+    assert statuses[0] != "filled" and statuses[-1] == "filled"
+    assert events[-2][1]["quantity"] == 10
+    assert events[-1][1]["position"]["quantity"] == 10
+    assert publisher.stats()["published"] == len(events)
+
+
+def test_events_wait_for_redis_and_oldest_are_dropped_when_full():
+    """Test a failed append keeps the events and the buffer stays bounded"""
+    async def scenario():
+        publisher = RecordingPublisher(OrderManager(NullWriter()), max_pending=3)
+        for i in range(4):
+            publisher._queue(ORDER_EVENTS_STREAM, {"n": i})
+        publisher.fail = True
+        failed = await publisher.flush()
+        publisher.fail = False
+        return failed, await publisher.flush(), publisher
+    
+    failed, flushed, publisher = asyncio.run(scenario())
+    assert (failed, flushed) == (False, True)
+    assert [event["n"] for _, event in publisher.batches[0]] == [1, 2, 3]
+    assert publisher.stats() == {"pending": 0, "published": 3, "dropped": 1, "failures": 1}
+
+
+def test_batches_are_appended_per_stream_in_order():
+    """Test a mixed batch is split into one append per stream, keeping each stream's order"""
+    async def scenario():
+        publisher = EventPublisher(OrderManager(NullWriter()))
+        for stream in (ORDER_EVENTS_STREAM, FILL_EVENTS_STREAM):
+            publisher.streams[stream] = RecordingStream(stream)
+        for i, stream in enumerate([ORDER_EVENTS_STREAM, FILL_EVENTS_STREAM, ORDER_EVENTS_STREAM]):
+            publisher._queue(stream, {"n": i})
+        return await publisher.flush(), publisher
+    
+    flushed, publisher = asyncio.run(scenario())
+    assert flushed and publisher.stats()["published"] == 3
+    assert publisher.streams[ORDER_EVENTS_STREAM].appends == [[{"n": 0}, {"n": 2}]]
+    assert publisher.streams[FILL_EVENTS_STREAM].appends == [[{"n": 1}]]
+
+
+def test_entries_left_by_a_failed_consumer_are_claimed():
+    """Test unacknowledged entries are processed by another consumer of the group"""
+    client = MemoryStreams()
+    received = []
+    
+    async def broken(entries):
+        raise RuntimeError("handler failed")
+    
+    async def handle(entries):
+        received.extend(event["n"] for _, event in entries)
+    
+    async def scenario():
+        stream = RedisStream("events:test", client=client)
+        for i in range(3):
+            await stream.add({"n": i})
+        first = StreamConsumer(stream, "audit", "a", broken, block_ms=1, retry_delay=0.001)
+        first.start()
+        await asyncio.sleep(0.02)
+        await first.stop()
+        
+        await stream.add({"n": 3})
+        second = StreamConsumer(stream, "audit", "b", handle, block_ms=1, min_idle_ms=0)
+        second.start()
+        await asyncio.sleep(0.02)
+        await second.stop()
+        return first, second
+    
+    first, second = asyncio.run(scenario())
+    assert first.stats()["processed"] == 0 and first.stats()["failures"] >= 1
+    assert received == [0, 1, 2, 3]
+    assert second.stats()["claimed"] == 3
+    assert client.pending == {}
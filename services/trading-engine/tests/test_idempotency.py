@@ -0,0 +1,178 @@
+"""
+Test idempotency keys for order placement
+"""
+import asyncio
+import pytest
+from app.utils.idempotency import (
+    RENEW_LOCK_SCRIPT, IdempotencyConflict, IdempotencyInProgress, IdempotencyStore, IdempotencyUnavailable
+)
+
+
+class MemoryRedis:
+    """The few Redis commands the idempotency store uses, with expiry"""
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+    
+    def _expire(self, key):
+        if key in self.expires and self.expires[key] <= asyncio.get_running_loop().time():
+            self.data.pop(key, None)
+            self.expires.pop(key)
+    
+    async def get(self, key):
+        self._expire(key)
+        return self.data.get(key)
+    
+    async def set(self, key, value, nx=False, px=None):
+        self._expire(key)
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        self.expires.pop(key, None)
+        if px is not None:
+            self.expires[key] = asyncio.get_running_loop().time() + px / 1000
+        return True
+    
+    async def eval(self, script, numkeys, key, token, *args):
+        self._expire(key)
+        if self.data.get(key) != token:
+            return 0
+        if script == RENEW_LOCK_SCRIPT:
+            self.expires[key] = asyncio.get_running_loop().time() + int(args[0]) / 1000
+        else:
+            del self.data[key]
+            self.expires.pop(key, None)
+        return 1
+
+
+def test_concurrent_duplicates_run_once():
+    """Test duplicates in this and another worker wait for the first response"""
+    redis = MemoryRedis()
+    calls = []
+    
+    async def place():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return 200, {"id": len(calls)}
+    
+    async def scenario():
+        worker, other_worker = IdempotencyStore(redis), IdempotencyStore(redis, poll_interval=0.001)
+        return await asyncio.gather(
+            worker.run("alice", "orders", "k1", {"qty": 1}, place),
+            worker.run("alice", "orders", "k1", {"qty": 1}, place),
+            other_worker.run("alice", "orders", "k1", {"qty": 1}, place)
+        )
+    
+    first, local, remote = asyncio.run(scenario())
+    assert calls == [1]
+    assert first == (200, {"id": 1}, False)
+    assert local == remote == (200, {"id": 1}, True)
+    assert not any(key.startswith("idempotency:lock:") for key in redis.data)
+
+
+def test_later_retries_replay_and_reused_keys_conflict():
+    """Test stored responses are replayed and a key cannot be reused for another request"""
+    redis = MemoryRedis()
+    
+    async def rejected():
+        return 400, {"detail": "quantity must be positive"}
+    
+    async def scenario():
+        store = IdempotencyStore(redis)
+        first = await store.run("alice", "orders", "k2", {"qty": -1}, rejected)
+        retry = await store.run("alice", "orders", "k2", {"qty": -1}, rejected)
+        with pytest.raises(IdempotencyConflict):
+            await store.run("alice", "orders", "k2", {"qty": 5}, rejected)
+        return first, retry, store
+    
+    first, retry, store = asyncio.run(scenario())
+    assert first[2] is False and retry[2] is True
+    assert retry[:2] == (400, {"detail": "quantity must be positive"})
+    assert store.stats()["conflicts"] == 1
+
+
+def test_failed_requests_free_the_key():
+    """Test a request that raises stores nothing, so a retry runs again"""
+    redis = MemoryRedis()
+    attempts = []
+    
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("database down")
+        return 200, {"ok": True}
+    
+    async def scenario():
+        store = IdempotencyStore(redis)
+        with pytest.raises(RuntimeError):
+            await store.run("alice", "orders", "k3", {}, flaky)
+        return await store.run("alice", "orders", "k3", {}, flaky)
+    
+    assert asyncio.run(scenario()) == (200, {"ok": True}, False)
+    assert len(attempts) == 2
+
+
+def test_slow_requests_keep_their_lock():
+    """Test a request running past the lock TTL is not run again by a duplicate"""
+    redis = MemoryRedis()
+    calls = []
+    
+    async def place():
+        calls.append(1)
+        await asyncio.sleep(0.25)
+        return 200, {"id": len(calls)}
+    
+    async def scenario():
+        worker = IdempotencyStore(redis, lock_ttl=0.06)
+        other_worker = IdempotencyStore(redis, lock_ttl=0.06, poll_interval=0.001)
+        first = asyncio.ensure_future(worker.run("alice", "orders", "k4", {}, place))
+        await asyncio.sleep(0.1)
+        with pytest.raises(IdempotencyInProgress):
+            await other_worker.run("alice", "orders", "k4", {}, place)
+        return await first, await other_worker.run("alice", "orders", "k4", {}, place)
+    
+    first, retry = asyncio.run(scenario())
+    assert calls == [1]
+    assert first == (200, {"id": 1}, False)
+    assert retry == (200, {"id": 1}, True)
+
+
+def test_keys_are_scoped_per_caller():
+    """Test two callers sending the same key neither replay nor conflict with each other"""
+    redis = MemoryRedis()
+    
+    async def place(qty):
+        return 200, {"qty": qty}
+    
+    async def scenario():
+        store = IdempotencyStore(redis)
+        alice = await store.run("alice", "orders", "k5", {"qty": 1}, lambda: place(1))
+        bob = await store.run("bob", "orders", "k5", {"qty": 2}, lambda: place(2))
+        return alice, bob
+    
+    alice, bob = asyncio.run(scenario())
+    assert alice == (200, {"qty": 1}, False)
+    assert bob == (200, {"qty": 2}, False)
+
+
+def test_requests_fail_closed_without_redis():
+    """Test a request with a key is not run when its key cannot be checked"""
+    class DownRedis(MemoryRedis):
+        async def get(self, key):
+            raise ConnectionError("redis down")
+    
+    calls = []
+    
+    async def place():
+        calls.append(1)
+        return 200, {}
+    
+    async def scenario():
+        store = IdempotencyStore(DownRedis())
+        with pytest.raises(IdempotencyUnavailable):
+            await store.run("alice", "orders", "k6", {}, place)
+        return store
+    
+    store = asyncio.run(scenario())
+    assert calls == []
+    assert store.stats()["unavailable"] == 1
@@ -0,0 +1,175 @@
+"""
+Test the paper matching engine
+"""
+import asyncio
+import pytest
+from app.services.accounts import Account, AccountDirectory
+from app.services.matching import MatchingEngine, PaperExchange
+from app.services.order_writer import OrderWriter
+from app.services.orders import Execution, Order, OrderManager
+from app.services.positions import PositionEngine
+from app.utils import redis_client
+from app.utils.redis_client import consume_ticks
+
+ACCOUNT = "7f1c2d4e-0000-4000-8000-000000000001"
+
+
+def order(side, quantity, order_type="limit", price=None, stop_price=None, symbol="AAPL"):
+    return Order(ACCOUNT, symbol, side, quantity, order_type, price, stop_price)
+
+
+def fills(executions):
+    return [(e.order_id, e.quantity, e.price) for e in executions]
+
+
+def test_price_time_priority_with_partial_fills():
+    """Test better prices fill first, then earlier orders, limited by print size"""
+    engine = MatchingEngine()
+    engine.on_trade("AAPL", 101.0)
+    early, late, best = order("buy", 100, price=100.0), order("buy", 100, price=100.0), order("buy", 50, price=100.5)
+    for o in (early, late, best):
+        assert engine.add(o) == []
+    
+    assert fills(engine.on_trade("AAPL", 100.0, size=120)) == [(best.id, 50, 100.5), (early.id, 70, 100.0)]
+    assert fills(engine.on_trade("AAPL", 99.0, size=100)) == [(early.id, 30, 100.0), (late.id, 70, 100.0)]
+    assert engine.stats()["working"] == 1
+
+
+def test_market_and_marketable_orders_fill_on_arrival():
+    """Test market orders wait for a price and marketable limits fill at the last price"""
+    engine = MatchingEngine()
+    market = order("buy", 10, "market")
+    assert engine.add(market) == []
+    assert fills(engine.on_trade("AAPL", 50.0)) == [(market.id, 10, 50.0)]
+    
+    marketable = order("sell", 5, price=49.0)
+    assert fills(engine.add(marketable)) == [(marketable.id, 5, 50.0)]
+
+
+def test_stops_trigger_into_market_orders():
+    """Test stops rest until the market reaches them, then fill at the trade price"""
+    engine = MatchingEngine()
+    engine.on_trade("AAPL", 100.0)
+    buy_stop, sell_stop = order("buy", 10, "stop", stop_price=105.0), order("sell", 10, "stop", stop_price=95.0)
+    engine.add(buy_stop)
+    engine.add(sell_stop)
+    assert engine.on_trade("AAPL", 104.0) == []
+    assert fills(engine.on_trade("AAPL", 106.0, size=4)) == [(buy_stop.id, 4, 106.0)]
+    assert fills(engine.on_trade("AAPL", 94.0)) == [(buy_stop.id, 6, 94.0), (sell_stop.id, 10, 94.0)]
+
+
+def test_cancel_removes_resting_orders():
+    """Test cancelled orders never fill"""
+    engine = MatchingEngine()
+    resting = order("sell", 10, price=110.0)
+    engine.add(resting)
+    assert engine.cancel(resting.id)
+    assert engine.on_trade("AAPL", 120.0) == []
+    assert not engine.cancel(resting.id)
+
+
+class NullWriter(OrderWriter):
+    async def _execute(self, records):
+        pass
+
+
+def test_paper_fills_flow_through_the_oms():
+    """Test paper orders are routed by account type and filled through the OMS"""
+    async def load(account_id):
+        return Account(account_id, "paper", True)
+    
+    async def scenario():
+        manager = OrderManager(NullWriter(), accounts=AccountDirectory(loader=load))
+        exchange = PaperExchange(manager)
+        manager.add_listener(exchange.on_order)
+        submitted = await manager.submit(ACCOUNT, "MSFT", "buy", 10, "limit", price=300.0)
+        exchange.on_tick("MSFT", '{"price": 301.0, "size": 100}')
+        exchange.on_tick("MSFT", '{"price": 299.5, "size": 4}')
+        await exchange.apply()
+        return submitted
+    
+    submitted = asyncio.run(scenario())
+    assert submitted.venue == "paper"
+    assert submitted.status == "partially_filled"
+    assert submitted.filled_quantity == 4
+    assert submitted.average_price == pytest.approx(300.0)
+
+
+class FakePubSub:
+    def __init__(self, messages):
+        self.messages = messages
+    
+    async def psubscribe(self, *patterns):
+        pass
+    
+    async def listen(self):
+        for channel, data in self.messages:
+            yield {"type": "pmessage", "channel": channel, "data": data}
+        await asyncio.Event().wait()
+    
+    async def close(self):
+        pass
+
+
+class FakeRedis:
+    def __init__(self, messages):
+        self.messages = messages
+    
+    def pubsub(self):
+        return FakePubSub(self.messages)
+    
+    async def get(self, key):
+        return None
+
+
+def test_replayed_ticks_do_not_fill_or_mark(monkeypatch):
+    """Test ticks stamped with a replay id never fill paper orders or move marks"""
+    async def load(account_id):
+        return Account(account_id, "paper", True)
+    
+    monkeypatch.setattr(redis_client, "redis_client", FakeRedis([
+        ("ticks:AAPL", '{"symbol":"AAPL","price":90.0,"size":100,"replay_id":"r1","sent_at":0}'),
+        ("ticks:AAPL", '{"symbol":"AAPL","price":101.0,"size":100}')
+    ]))
+    
+    async def scenario():
+        manager = OrderManager(NullWriter(), accounts=AccountDirectory(loader=load))
+        exchange = PaperExchange(manager)
+        positions = PositionEngine(manager)
+        manager.add_listener(exchange.on_order)
+        positions.apply(Execution("held", ACCOUNT, "AAPL", "buy", 10, 100.0, 0.0))
+        submitted = await manager.submit(ACCOUNT, "AAPL", "buy", 10, "limit", price=100.0)
+        
+        def on_tick(symbol, payload):
+            exchange.on_tick(symbol, payload)
+            positions.on_tick(symbol, payload)
+        
+        task = asyncio.create_task(consume_ticks(on_tick))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await exchange.apply()
+        return submitted, positions.portfolio(ACCOUNT).positions["AAPL"]
+    
+    submitted, position = asyncio.run(scenario())
+    assert submitted.status == "accepted"
+    assert position.last_price == 101.0
+
+
+def test_bad_tick_does_not_drop_the_subscription(monkeypatch):
+    """Test a tick the handler raises on is counted and later ticks still arrive"""
+    monkeypatch.setattr(redis_client, "redis_client", FakeRedis([
+        ("ticks:AAPL", '{"symbol":"AAPL"}'),
+        ("ticks:AAPL", '{"symbol":"AAPL","price":101.0}')
+    ]))
+    
+    async def scenario():
+        positions = PositionEngine(OrderManager(NullWriter()))
+        positions.apply(Execution("held", ACCOUNT, "AAPL", "buy", 10, 100.0, 0.0))
+        task = asyncio.create_task(consume_ticks(positions.on_tick, on_error=positions._tick_failed))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        return positions
+    
+    positions = asyncio.run(scenario())
+    assert positions.stats()["tick_errors"] == 1
+    assert positions.portfolio(ACCOUNT).positions["AAPL"].last_price == 101.0
@@ -0,0 +1,180 @@
+"""
+Test order management and write-behind persistence
+"""
+import asyncio
+import pytest
+from app.services.order_writer import OrderWriter
+from app.services.orders import OrderManager, InvalidTransition
+
+ACCOUNT = "7f1c2d4e-0000-4000-8000-000000000001"
+
+
+class RecordingWriter(OrderWriter):
+    """Order writer that records batches instead of writing them"""
+    def __init__(self, fail: bool = False, bad_symbols=(), **kwargs):
+        super().__init__(**kwargs)
+        self.fail = fail
+        self.bad_symbols = set(bad_symbols)
+        self.batches_seen = []
+    
+    async def _execute(self, records):
+        if self.fail:
+            raise RuntimeError("database down")
+        if any(record[2] in self.bad_symbols and record[8] == "accepted" for record in records):
+            raise RuntimeError("violates check constraint")
+        self.batches_seen.append([(record[0], record[8]) for record in records])
+
+
+def test_order_lifecycle_and_indexes():
+    """Test fills move an order through its statuses and out of the indexes"""
+    async def scenario():
+        manager = OrderManager(RecordingWriter())
+        order = await manager.submit(ACCOUNT, "aapl", "buy", 10, "limit", price=150.0)
+        assert order.status == "accepted"
+        assert manager.by_symbol["AAPL"] == {order.id}
+        
+        await manager.fill(order.id, 4, 149.0)
+        assert order.status == "partially_filled"
+        await manager.fill(order.id, 6, 150.0)
+        return manager, order
+    
+    manager, order = asyncio.run(scenario())
+    assert order.status == "filled"
+    assert order.average_price == pytest.approx(149.6)
+    assert order.filled_at is not None
+    assert manager.working == {} and manager.by_account == {} and manager.by_symbol == {}
+    assert manager.list_orders(account_id=ACCOUNT) == [order]
+
+
+def test_invalid_transitions_are_refused():
+    """Test finished orders cannot be cancelled or filled and overfills are refused"""
+    async def scenario():
+        manager = OrderManager(RecordingWriter())
+        order = await manager.submit(ACCOUNT, "MSFT", "sell", 5, "market")
+        with pytest.raises(ValueError):
+            await manager.fill(order.id, 6, 300.0)
+        await manager.cancel(order.id)
+        with pytest.raises(InvalidTransition):
+            await manager.cancel(order.id)
+        with pytest.raises(InvalidTransition):
+            await manager.fill(order.id, 1, 300.0)
+        with pytest.raises(KeyError):
+            await manager.cancel("missing")
+        with pytest.raises(ValueError):
+            await manager.submit(ACCOUNT, "MSFT", "buy", 5, "limit")
+        return manager
+    
+    manager = asyncio.run(scenario())
+    assert manager.invalid_transitions == 2
+
+
+def test_write_behind_coalesces_transitions():
+    """Test several transitions between flushes are written as one row"""
+    async def scenario():
+        writer = RecordingWriter(flush_interval=10.0)
+        writer.start()
+        manager = OrderManager(writer)
+        order = await manager.submit(ACCOUNT, "AAPL", "buy", 10, "market")
+        await manager.fill(order.id, 10, 100.0)
+        assert writer.batches_seen == []
+        await writer.stop()
+        return writer, order
+    
+    writer, order = asyncio.run(scenario())
+    assert writer.batches_seen == [[(order.id, "filled")]]
+    assert writer.coalesced == 1
+
+
+def test_sync_mode_rejects_unpersisted_orders():
+    """Test sync persistence waits for the commit and rejects on failure"""
+    async def scenario():
+        ok_writer, failing_writer = RecordingWriter(), RecordingWriter(fail=True)
+        failing_writer.max_retries = 1
+        for writer in (ok_writer, failing_writer):
+            writer.start()
+        accepted = await OrderManager(ok_writer, sync=True).submit(ACCOUNT, "AAPL", "buy", 1, "market")
+        written = list(ok_writer.batches_seen)
+        rejected = await OrderManager(failing_writer, sync=True).submit(ACCOUNT, "AAPL", "buy", 1, "market")
+        for writer in (ok_writer, failing_writer):
+            await writer.stop()
+        return accepted, written, rejected
+    
+    accepted, written, rejected = asyncio.run(scenario())
+    assert accepted.status == "accepted"
+    assert written == [[(accepted.id, "accepted")]]
+    assert rejected.status == "rejected"
+
+
+def test_one_bad_row_only_fails_its_own_order():
+    """Test concurrent sync callers sharing a flush only see their own failures"""
+    async def scenario():
+        writer = RecordingWriter(bad_symbols={"BAD"}, flush_interval=10.0, max_retries=1)
+        writer.start()
+        manager = OrderManager(writer, sync=True)
+        good, bad = await asyncio.gather(
+            manager.submit(ACCOUNT, "AAPL", "buy", 1, "market"),
+            manager.submit(ACCOUNT, "BAD", "buy", 1, "market")
+        )
+        await writer.stop()
+        return good, bad, writer
+    
+    good, bad, writer = asyncio.run(scenario())
+    assert good.status == "accepted"
+    assert (bad.status, bad.reason) == ("rejected", "Order could not be persisted")
+    written = [row for batch in writer.batches_seen for row in batch]
+    assert (good.id, "accepted") in written
+    assert written[-1] == (bad.id, "rejected")
+    assert writer.rows_failed == 1
+
+
+def test_batch_is_written_in_one_statement():
+    """Test a basket gets a result per order and a single multi-row commit"""
+    async def risk_check(order, account):
+        return "Too large" if order.quantity > 100 else None
+    
+    async def scenario():
+        writer = RecordingWriter(flush_interval=10.0)
+        writer.start()
+        manager = OrderManager(writer, sync=True, risk_check=risk_check)
+        results = await manager.submit_batch([
+            {"account_id": ACCOUNT, "symbol": "aapl", "side": "buy", "quantity": 10, "order_type": "market"},
+            {"account_id": ACCOUNT, "symbol": "MSFT", "side": "hold", "quantity": 10, "order_type": "market"},
+            {"account_id": ACCOUNT, "symbol": "TSLA", "side": "sell", "quantity": 500, "order_type": "market"},
+            {"account_id": ACCOUNT, "symbol": "NVDA", "side": "buy", "quantity": 5, "order_type": "limit", "price": 90.0}
+        ])
+        written = list(writer.batches_seen)
+        await writer.stop()
+        return results, written
+    
+    results, written = asyncio.run(scenario())
+    first, invalid, too_large, last = results
+    assert (first.status, first.symbol) == ("accepted", "AAPL")
+    assert isinstance(invalid, ValueError)
+    assert (too_large.status, too_large.reason) == ("rejected", "Too large")
+    assert last.status == "accepted"
+    assert written == [[(first.id, "accepted"), (too_large.id, "rejected"), (last.id, "accepted")]]
+
+
+def test_batch_is_announced_only_once_persisted():
+    """Test basket orders reach listeners after the commit, or as rejections if it fails"""
+    async def scenario(writer):
+        seen = []
+        writer.start()
+        manager = OrderManager(writer, sync=True)
+        manager.add_listener(
+            lambda order, execution: seen.append((order.symbol, order.status, len(writer.batches_seen)))
+        )
+        await manager.submit_batch([
+            {"account_id": ACCOUNT, "symbol": "AAPL", "side": "buy", "quantity": 10, "order_type": "market"},
+            {"account_id": ACCOUNT, "symbol": "MSFT", "side": "buy", "quantity": 10, "order_type": "market"}
+        ])
+        await writer.stop()
+        return seen, writer
+    
+    seen, _ = asyncio.run(scenario(RecordingWriter(flush_interval=10.0)))
+    assert seen == [("AAPL", "accepted", 1), ("MSFT", "accepted", 1)]
+    
+    failing = RecordingWriter(bad_symbols={"AAPL", "MSFT"}, flush_interval=10.0, max_retries=1)
+    seen, writer = asyncio.run(scenario(failing))
+    assert [status for _, status, _ in seen] == ["rejected", "rejected"]
+    assert sorted(status for batch in writer.batches_seen for _, status in batch) == ["rejected", "rejected"]
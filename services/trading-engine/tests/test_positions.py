@@ -0,0 +1,132 @@
+"""
+Test the position and P&L engine
+"""
+import asyncio
+import pytest
+from app.services.order_writer import OrderWriter
+from app.services.orders import Execution, OrderManager
+from app.services.positions import Position, PositionEngine, PositionTotals
+
+ACCOUNT = "7f1c2d4e-0000-4000-8000-000000000001"
+OTHER = "7f1c2d4e-0000-4000-8000-000000000002"
+
+
+class NullWriter(OrderWriter):
+    async def _execute(self, records):
+        pass
+
+
+def execution(side, quantity, price, symbol="AAPL", account_id=ACCOUNT):
+    return Execution("order", account_id, symbol, side, quantity, price, 0.0)
+
+
+def test_average_cost_and_realized_pnl():
+    """Test adding, reducing and flipping a position"""
+    position = Position(ACCOUNT, "AAPL")
+    position.apply("buy", 100, 10.0)
+    position.apply("buy", 100, 12.0)
+    assert (position.quantity, position.average_price) == (200, 11.0)
+    
+    position.apply("sell", 50, 15.0)
+    assert (position.quantity, position.average_price) == (150, 11.0)
+    assert position.realized_pnl == pytest.approx(200.0)
+    
+    position.apply("sell", 200, 9.0)
+    assert (position.quantity, position.average_price) == (-50, 9.0)
+    assert position.realized_pnl == pytest.approx(200.0 - 300.0)
+    
+    position.apply("buy", 50, 8.0)
+    assert (position.quantity, position.average_price) == (0, 0.0)
+    assert position.realized_pnl == pytest.approx(-100.0 + 50.0)
+    assert position.cash == pytest.approx(position.realized_pnl)
+
+
+def test_ticks_mark_positions_and_portfolio_totals():
+    """Test unrealized P&L follows ticks and account totals stay in step"""
+    engine = PositionEngine(OrderManager(NullWriter()))
+    engine.apply(execution("buy", 100, 150.0))
+    engine.apply(execution("sell", 10, 300.0, symbol="MSFT"))
+    engine.apply(execution("buy", 5, 20.0, account_id=OTHER))
+    
+    engine.on_tick("AAPL", '{"price": 155.0}')
+    engine.on_tick("MSFT", '{"price": 310.0}')
+    engine.on_tick("TSLA", 'not parsed')
+    
+    portfolio = engine.portfolio(ACCOUNT)
+    assert portfolio.unrealized_pnl == pytest.approx(500.0 - 100.0)
+    assert portfolio.market_value == pytest.approx(15500.0 - 3100.0)
+    assert portfolio.exposure == pytest.approx(15500.0 + 3100.0)
+    assert portfolio.open_positions == 2
+    assert portfolio.daily_pnl == pytest.approx(400.0)
+    
+    engine.apply(execution("sell", 100, 156.0))
+    assert portfolio.realized_pnl == pytest.approx(600.0)
+    assert portfolio.open_positions == 1
+    assert [p.account_id for p in engine.by_symbol["AAPL"]] == [OTHER]
+    
+    summary = portfolio.summary(balance=100000.0)
+    assert summary["cash_balance"] == pytest.approx(100000.0 + 600.0 + 3000.0)
+    assert summary["total_value"] == pytest.approx(100000.0 + 600.0 - 100.0)
+    assert summary["total_pnl"] == pytest.approx(500.0)
+    assert [p.symbol for p in engine.positions(ACCOUNT)] == ["MSFT"]
+    assert len(engine.positions(include_flat=True)) == 3
+
+
+def test_fills_reach_positions_through_the_oms():
+    """Test the engine follows fills reported by the order manager"""
+    async def scenario():
+        manager = OrderManager(NullWriter())
+        engine = PositionEngine(manager)
+        manager.add_listener(engine.on_order)
+        order = await manager.submit(ACCOUNT, "aapl", "buy", 10, "market")
+        await manager.fill(order.id, 4, 100.0)
+        await manager.fill(order.id, 6, 101.0)
+        return engine
+    
+    engine = asyncio.run(scenario())
+    position = engine.portfolio(ACCOUNT).positions["AAPL"]
+    assert position.quantity == 10
+    assert position.average_price == pytest.approx(100.6)
+
+
+def test_reconciliation_rebuilds_drifted_positions():
+    """Test drifted and missing positions are replayed while recent ones are left alone"""
+    totals = [
+        PositionTotals(ACCOUNT, "AAPL", 100.0, -15000.0),
+        PositionTotals(ACCOUNT, "MSFT", 10.0, -3000.0),
+        PositionTotals(OTHER, "AAPL", 5.0, -500.0)
+    ]
+    history = {
+        (ACCOUNT, "MSFT"): [("buy", 10.0, 300.0)],
+        (OTHER, "AAPL"): [("buy", 10.0, 100.0), ("sell", 5.0, 100.0)],
+        (ACCOUNT, "TSLA"): []
+    }
+    requested = []
+    
+    async def load_totals():
+        return totals
+    
+    async def load_fills(keys):
+        requested.extend(keys)
+        return {key: history[key] for key in keys if key in history}
+    
+    async def scenario():
+        engine = PositionEngine(OrderManager(NullWriter()), grace=30.0, totals_loader=load_totals, fills_loader=load_fills)
+        engine.apply(execution("buy", 100, 150.0))  # matches, but filled just now
+        engine.apply(execution("buy", 1, 250.0, symbol="TSLA"))  # never persisted
+        engine.apply(execution("buy", 12, 300.0, symbol="MSFT"))  # drifted
+        for symbol in ("TSLA", "MSFT"):
+            engine.portfolio(ACCOUNT).positions[symbol].updated -= 60
+        result = await engine.reconcile()
+        return engine, result
+    
+    engine, result = asyncio.run(scenario())
+    assert result == {"checked": 3, "skipped": 1, "corrected": 3}
+    assert sorted(requested) == sorted([(ACCOUNT, "MSFT"), (OTHER, "AAPL"), (ACCOUNT, "TSLA")])
+    portfolio = engine.portfolio(ACCOUNT)
+    assert portfolio.positions["MSFT"].quantity == 10
+    assert portfolio.positions["TSLA"].quantity == 0
+    assert portfolio.open_positions == 2
+    assert portfolio.cash == pytest.approx(-15000.0 - 3000.0)
+    assert engine.portfolio(OTHER).positions["AAPL"].quantity == 5
+    assert engine.portfolio(OTHER).daily_pnl == pytest.approx(0.0)
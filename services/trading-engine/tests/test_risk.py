@@ -0,0 +1,158 @@
+"""
+Test the pre-trade risk checks
+"""
+import asyncio
+import time
+import pytest
+from app.services.accounts import Account, AccountDirectory
+from app.services.order_writer import OrderWriter
+from app.services.orders import Execution, Order, OrderManager
+from app.services.positions import PositionEngine
+from app.services.risk import RiskEngine, RiskLimits, load_limits, percentile
+
+ACCOUNT = "7f1c2d4e-0000-4000-8000-000000000001"
+LIMITS = RiskLimits(
+    max_position_size=0.05,
+    max_daily_loss=0.01,
+    max_open_positions=2,
+    max_order_notional=20000.0,
+    price_band=0.1,
+    stop_price_band=0.5
+)
+
+
+class NullWriter(OrderWriter):
+    async def _execute(self, records):
+        pass
+
+
+class SlowWriter(OrderWriter):
+    async def _execute(self, records):
+        await asyncio.sleep(0.01)
+
+
+def make_engine(limits=LIMITS, balance=100000.0, writer=None, sync=False):
+    async def load(account_id):
+        return Account(account_id, "live", True, balance)
+    
+    manager = OrderManager(writer or NullWriter(), sync=sync, accounts=AccountDirectory(loader=load))
+    positions = PositionEngine(manager)
+    risk = RiskEngine(manager, positions, limits)
+    manager.add_listener(positions.on_order)
+    manager.add_listener(risk.on_order)
+    manager.risk_check = risk.check
+    for symbol, price in (("AAPL", 100.0), ("MSFT", 300.0), ("TSLA", 200.0)):
+        risk.on_tick(symbol, f'{{"price": {price}}}')
+    return manager, positions, risk
+
+
+def order(side, quantity, symbol="AAPL", order_type="market", price=None, stop_price=None):
+    return Order(ACCOUNT, symbol, side, quantity, order_type, price, stop_price)
+
+
+def test_load_limits_from_config():
+    """Test limits come from the risk_management section"""
+    limits = load_limits({"max_position_size": 0.05, "max_daily_loss": 0.01, "max_open_positions": 5})
+    assert limits.max_open_positions == 5
+    assert limits.max_position_size == 0.05
+    assert limits.price_band == 0.1
+    assert limits.stop_price_band == 0.5
+
+
+def test_order_level_checks():
+    """Test price band, order notional and missing prices"""
+    _, _, risk = make_engine()
+    assert risk.evaluate(order("buy", 10, order_type="limit", price=101.0), 1e6) is None
+    assert "away from the last trade" in risk.evaluate(order("buy", 10, order_type="limit", price=120.0), 1e6)
+    assert "notional" in risk.evaluate(order("buy", 300), 1e6)
+    assert "No reference price" in risk.evaluate(order("buy", 1, symbol="NVDA"), 1e6)
+
+
+def test_stop_triggers_use_their_own_band():
+    """Test a protective stop far from the market passes where a limit price would not"""
+    _, positions, risk = make_engine()
+    positions.apply(Execution("a", ACCOUNT, "AAPL", "buy", 10, 100.0, 0.0))
+    assert risk.evaluate(order("sell", 10, order_type="stop", stop_price=75.0), 1e6) is None
+    assert "away from the last trade" in risk.evaluate(order("sell", 10, order_type="limit", price=75.0), 1e6)
+    assert risk.evaluate(order("sell", 10, order_type="stop", stop_price=40.0), 1e6).startswith("Stop price")
+    # Stops are valued at the last trade, not at their trigger
+    assert risk.evaluate(order("buy", 150, order_type="stop", stop_price=140.0), 1e6) is None
+
+
+def test_concurrent_orders_are_checked_against_each_other():
+    """Test orders passing the check count as working before they are persisted"""
+    async def scenario():
+        manager, _, risk = make_engine(writer=SlowWriter(), sync=True)
+        submitted = await asyncio.gather(*(
+            manager.submit(ACCOUNT, "AAPL", "buy", 30, "market") for _ in range(3)
+        ))
+        return submitted, risk
+    
+    submitted, risk = asyncio.run(scenario())
+    assert [o.status for o in submitted] == ["accepted", "rejected", "rejected"]
+    assert risk.working[ACCOUNT]["AAPL"] == [30, 0]
+
+
+def test_position_size_counts_working_orders():
+    """Test the position limit includes working orders and reductions always pass"""
+    async def scenario():
+        manager, _, risk = make_engine()
+        first = await manager.submit(ACCOUNT, "AAPL", "buy", 30, "market")
+        second = await manager.submit(ACCOUNT, "AAPL", "buy", 30, "market")
+        await manager.fill(first.id, 30, 100.0)
+        reduce = await manager.submit(ACCOUNT, "AAPL", "sell", 30, "market")
+        third = await manager.submit(ACCOUNT, "AAPL", "buy", 15, "market")
+        return first, second, reduce, third, risk
+    
+    first, second, reduce, third, risk = asyncio.run(scenario())
+    assert first.status == "filled"
+    assert second.status == "rejected"
+    assert "would exceed 5% of equity" in second.reason
+    assert reduce.status == "accepted"
+    assert third.status == "accepted"
+    assert risk.working[ACCOUNT]["AAPL"] == [15, 30]
+
+
+def test_daily_loss_and_open_positions():
+    """Test new exposure is refused after the daily loss limit or at the open position limit"""
+    manager, positions, risk = make_engine()
+    positions.apply(Execution("a", ACCOUNT, "AAPL", "buy", 10, 100.0, 0.0))
+    positions.apply(Execution("b", ACCOUNT, "MSFT", "buy", 10, 300.0, 0.0))
+    assert "2 open positions" in risk.evaluate(order("buy", 1, symbol="TSLA"), 100000.0)
+    assert risk.evaluate(order("buy", 1), 100000.0) is None
+    
+    positions.mark("MSFT", 190.0)
+    assert "Daily loss limit" in risk.evaluate(order("buy", 1), 100000.0)
+    assert risk.evaluate(order("sell", 10, symbol="MSFT"), 100000.0) is None
+
+
+def test_rejections_are_recorded_by_the_oms():
+    """Test a failed check rejects the order with its reason"""
+    async def scenario():
+        manager, _, risk = make_engine(balance=1000.0)
+        return await manager.submit(ACCOUNT, "AAPL", "buy", 5, "market"), manager, risk
+    
+    submitted, manager, risk = asyncio.run(scenario())
+    assert submitted.status == "rejected"
+    assert submitted.reason.startswith("Position of 500.00 in AAPL")
+    assert manager.stats()["risk_rejected"] == 1
+    assert risk.stats()["rejected"] == 1
+    assert ACCOUNT not in risk.working
+
+
+@pytest.mark.slow
+def test_check_latency_budget():
+    """Test the p99 of a full risk check stays under 100us"""
+    _, positions, risk = make_engine(LIMITS._replace(max_open_positions=100, max_order_notional=0.0))
+    for i in range(50):
+        positions.apply(Execution(str(i), ACCOUNT, f"SYM{i}", "buy", 10, 100.0, 0.0))
+        risk.on_tick(f"SYM{i}", '{"price": 101.0}')
+    orders = [order("buy", 1, symbol=f"SYM{i % 60}", order_type="limit", price=101.0) for i in range(1000)]
+    
+    samples = []
+    for _ in range(20):
+        for o in orders:
+            started = time.perf_counter()
+            risk.evaluate(o, 1e7)
+            samples.append(time.perf_counter() - started)
+    assert percentile(samples, 99) < 100e-6